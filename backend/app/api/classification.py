@@ -1,15 +1,24 @@
 """分类API路由"""
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.db.base import get_db
+from app.models.classification import ClassificationLabel
 from app.models.user import User
 from app.schemas.classification import (
+    BatchClassifyRequest,
+    BatchClassifyResponse,
     ClassifyRequest,
     ClassifyResponse,
-    ManualClassifyRequest
+    ManualClassifyRequest,
+    SegmentClassifyResponse
 )
+from app.core.config import settings
 from app.dependencies.auth import get_current_user
+from app.services.classification_cache import get_classification_cache
 from app.services.classification_service import get_classification_service
+from app.services.llm_gateway import get_llm_gateway
+from app.services.local_classifier import get_local_classifier_service, retrain_in_background, train_from_db
+from app.services.text_segmentation import segment_ocr_output
 from app.utils.logger import logging
 
 router = APIRouter(prefix="/classify", tags=["文本分类"])
@@ -67,6 +76,62 @@ async def classify_text(
         )
 
 
+@router.post(
+    "/batch",
+    response_model=BatchClassifyResponse,
+    summary="分段批量分类",
+    description="把一页OCR输出分成多个条目（按文本框版面、空行和项目符号），一次LLM调用分类全部条目"
+)
+async def classify_batch(
+    request: BatchClassifyRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    分段批量分类
+
+    - **text**: OCR识别的文本
+    - **details**: OCR识别详情（可选），提供时按文本框的垂直间距分段
+    - 需要认证
+    - 返回各条目的分类类型、置信度和提取的结构化数据
+    """
+    details = [line.model_dump() for line in request.details] if request.details else None
+    segments = segment_ocr_output(request.text, details)
+    if not segments:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="没有可分类的文本"
+        )
+
+    try:
+        classification_service = get_classification_service()
+        results = await classification_service.classify_segments([segment["text"] for segment in segments])
+    except Exception as e:
+        logging.error(f"批量分类失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="批量分类失败"
+        )
+
+    logging.info(
+        f"用户 {current_user.username} 批量分类 {len(segments)} 个条目: "
+        f"{', '.join(result['type'] for result in results)}"
+    )
+
+    return BatchClassifyResponse(segments=[
+        SegmentClassifyResponse(
+            type=result["type"],
+            confidence=result["confidence"],
+            extracted_data=result["extracted_data"],
+            needs_manual_selection=classification_service.needs_manual_selection(result["confidence"]),
+            text=segment["text"],
+            box=segment.get("box"),
+            page=segment.get("page"),
+            source=result["source"]
+        )
+        for segment, result in zip(segments, results)
+    ])
+
+
 @router.post(
     "/manual",
     status_code=status.HTTP_200_OK,
@@ -75,6 +140,7 @@ async def classify_text(
 )
 def manual_classify(
     request: ManualClassifyRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -84,6 +150,7 @@ def manual_classify(
     - **text**: 文本内容
     - **type**: 用户选择的类型（schedule 或 memo）
     - 需要认证
+    - 选择结果保存为本地分类器的训练样本
     """
     try:
         # 获取分类服务
@@ -95,6 +162,11 @@ def manual_classify(
         else:
             extracted_data = classification_service.extract_memo_info(request.text)
         
+        db.add(ClassificationLabel(user_id=current_user.id, text=request.text, label=request.type))
+        db.commit()
+        if get_local_classifier_service().record_label():
+            background_tasks.add_task(retrain_in_background)
+
         logging.info(
             f"用户 {current_user.username} 手动选择分类: 类型={request.type}"
         )
@@ -107,8 +179,59 @@ def manual_classify(
         }
         
     except Exception as e:
+        db.rollback()
         logging.error(f"手动分类失败: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="手动分类失败"
         )
+
+
+@router.post(
+    "/local/train",
+    summary="训练本地分类器",
+    description="用已确认的分类（手动选择的分类、已创建的日程和备忘录）训练本地分类器，"
+                "验证集准确率不低于当前模型时立即启用（需开启 LOCAL_CLASSIFIER_HTTP_TRAIN）"
+)
+def train_local_classifier(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    训练本地分类器
+
+    - 需要认证，且配置开启 LOCAL_CLASSIFIER_HTTP_TRAIN（模型全局共享，默认只能通过命令行训练）
+    - 已确认的分类少于 LOCAL_CLASSIFIER_MIN_EXAMPLES 或只有一种类型时不训练（trained 为 false）
+    - 新模型在验证集上不如当前模型时保留当前模型（trained 为 false）
+    """
+    if not settings.LOCAL_CLASSIFIER_HTTP_TRAIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="接口训练未开启，请使用命令行 python -m app.services.local_classifier train"
+        )
+    try:
+        summary = train_from_db(db)
+    except Exception as e:
+        logging.error(f"本地分类器训练失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="本地分类器训练失败"
+        )
+    logging.info(f"用户 {current_user.username} 训练本地分类器: {summary}")
+    return summary
+
+
+@router.get(
+    "/stats",
+    summary="分类服务统计",
+    description="LLM请求数、合并条目数、失败和超时次数、当前超时和熔断状态，分类缓存命中情况，"
+                "以及本地分类器的升级比例和各分类层的耗时"
+)
+def get_classify_stats(current_user: User = Depends(get_current_user)):
+    """获取LLM网关、分类缓存、本地分类器和各分类层的统计（需要认证）"""
+    return {
+        "llm": get_llm_gateway().stats(),
+        "cache": get_classification_cache().stats(),
+        "local": get_local_classifier_service().stats(),
+        "tiers": get_classification_service().tier_stats()
+    }
@@ -1,17 +1,56 @@
 """OCR识别API路由"""
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.db.base import get_db
+from app.db.base import get_db, SessionLocal
 from app.models.user import User
 from app.models.upload import UploadedFile
+from app.models.ocr import OCRResult, OCRPageResult
 from app.schemas.ocr import (
+    OCRRegion,
     OCRRecognizeRequest,
     OCRRecognizeResponse,
-    OCREditRequest
+    OCREditRequest,
+    OCRBatchRecognizeRequest,
+    OCRBatchItemResult,
+    OCRStoredResultResponse,
+    OCRRevisionResponse,
+    OCRJobCreateRequest,
+    OCRJobResponse,
+    OCRUploadRecognizeResponse,
+    OCRPageResultResponse
 )
 from app.dependencies.auth import get_current_user
-from app.services.ocr_service import get_ocr_service
+from app.core.config import settings
+from app.services.ocr_service import OCRService
+from app.services.ocr_engine_pool import get_ocr_engine_pool, EngineUnavailableError
+from app.services.ocr_pool import get_ocr_pool, recognize_bytes, recognize_document
+from app.services.ocr_cache import get_ocr_cache
+from app.services.ocr_cascade import get_cascade_stats
+from app.services.ocr_result_service import (
+    get_ocr_result,
+    is_current,
+    save_ocr_result,
+    load_result_dict,
+    get_reusable_pages,
+    get_or_create_ocr_result,
+    add_revision,
+    list_revisions,
+    page_to_result_dict
+)
+from app.services.ocr_pipeline import recognize_uploaded_file, validate_source, ImageValidationError
+from app.services.document_pages import is_document
+from app.services.ocr_jobs import get_ocr_job_manager, TERMINAL_STATUSES
+from app.services.blob_store import BlobStore
+from app.services.executors import get_inference_executor, run_inference, run_io, executor_stats
+from app.utils.file_handler import validate_upload_file, FileManager
 from app.utils.logger import logging
+from app.utils.timing import span
 
 router = APIRouter(prefix="/ocr", tags=["OCR识别"])
 
@@ -22,7 +61,7 @@ router = APIRouter(prefix="/ocr", tags=["OCR识别"])
     summary="识别图片文字",
     description="对已上传的图片进行OCR文字识别"
 )
-def recognize_image(
+async def recognize_image(
     request: OCRRecognizeRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -36,10 +75,7 @@ def recognize_image(
     """
     try:
         # 查找上传的文件
-        uploaded_file = db.query(UploadedFile).filter(
-            UploadedFile.id == request.file_id,
-            UploadedFile.user_id == current_user.id
-        ).first()
+        uploaded_file = await run_io(_get_user_file, db, request.file_id, current_user)
         
         if not uploaded_file:
             raise HTTPException(
@@ -47,27 +83,28 @@ def recognize_image(
                 detail="文件不存在或无权访问"
             )
         
-        # 获取OCR服务
-        ocr_service = get_ocr_service()
-        
-        # 验证图片
-        is_valid, error_msg = ocr_service.validate_image(uploaded_file.file_path)
-        if not is_valid:
+        # 等待识别的线程来自推理线程池，识别请求再多也不会占满默认线程池
+        try:
+            result = await run_inference(
+                recognize_uploaded_file,
+                db,
+                uploaded_file,
+                region=request.region.as_tuple() if request.region else None,
+                tiled=request.tiled
+            )
+        except ImageValidationError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"图片验证失败: {error_msg}"
+                detail=str(e)
+            )
+        except EngineUnavailableError as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e)
             )
         
-        # 执行OCR识别
-        result = ocr_service.recognize_text(uploaded_file.file_path)
-        
-        # 更新文件状态
-        if result["success"]:
-            uploaded_file.status = "processed"
-        else:
-            uploaded_file.status = "error"
-        
-        db.commit()
+        with span("commit"):
+            await run_io(db.commit)
         
         logging.info(f"用户 {current_user.username} 对文件 {uploaded_file.filename} 进行OCR识别")
         
@@ -83,6 +120,641 @@ def recognize_image(
         )
 
 
+def _get_user_file(db: Session, file_id: str, user: User) -> Optional[UploadedFile]:
+    """查找用户上传的文件"""
+    return db.query(UploadedFile).filter(
+        UploadedFile.id == file_id,
+        UploadedFile.user_id == user.id
+    ).first()
+
+
+@router.post(
+    "/upload-recognize",
+    response_model=OCRUploadRecognizeResponse,
+    summary="上传并识别图片",
+    description="直接识别上传的图片，图片在内存中解码，只有选择归档时才写入磁盘"
+)
+async def upload_and_recognize(
+    file: UploadFile = File(..., description="要识别的图片文件"),
+    archive: bool = Form(False, description="是否同时保存图片和识别结果"),
+    region: Optional[str] = Form(None, description='识别区域JSON，如 {"x": 0, "y": 0, "width": 800, "height": 600}'),
+    tiled: Optional[bool] = Form(None, description="是否分块识别，默认按配置自动判断"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    上传并识别图片
+    
+    - **file**: 图片文件（支持jpg, jpeg, png, bmp格式）
+    - **archive**: 是否归档，归档时返回file_id，之后可通过 /ocr/result/{file_id} 读取结果
+    - **region**: 只识别的区域（原图像素坐标），指定时识别结果不缓存、不保存
+    - **tiled**: 是否分块识别
+    - 需要认证
+    """
+    validate_upload_file(file)
+    if is_document(file.filename):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="多页文档请先通过 /upload/file 上传，再按文件ID识别"
+        )
+    
+    region_box = None
+    if region:
+        try:
+            region_box = OCRRegion.model_validate_json(region).as_tuple()
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="识别区域格式错误"
+            )
+    
+    # 最多读取限制大小多一个字节，超出即可判定，不会把过大的文件整个读入内存
+    content = await run_io(file.file.read, settings.MAX_FILE_SIZE + 1)
+    if len(content) > settings.MAX_FILE_SIZE:
+        max_size_mb = settings.MAX_FILE_SIZE / (1024 * 1024)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"文件大小超过限制。最大允许: {max_size_mb:.1f}MB"
+        )
+    
+    is_valid, error_msg = await run_io(OCRService.validate_image_bytes, content)
+    if not is_valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"图片验证失败: {error_msg}"
+        )
+    
+    try:
+        # 相同内容的图片直接复用缓存结果（区域识别的结果只对应图片的一部分，不参与缓存）
+        file_hash = await run_io(FileManager.calculate_bytes_hash, content)
+        ocr_cache = get_ocr_cache()
+        result = await run_io(ocr_cache.get, file_hash, tiled) if region_box is None else None
+        if result is None:
+            result = await run_inference(recognize_bytes, content, region=region_box, tiled=tiled)
+            if region_box is None:
+                await run_io(ocr_cache.set, file_hash, result, tiled)
+        
+        file_id = None
+        if archive:
+            file_id = await run_io(
+                _archive_upload, db, current_user, file, content, file_hash,
+                result if region_box is None else None
+            )
+        
+        logging.info(
+            f"用户 {current_user.username} 上传并识别文件: {file.filename}, 归档: {archive}"
+        )
+        
+        return OCRUploadRecognizeResponse(file_id=file_id, **result)
+        
+    except EngineUnavailableError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    except Exception as e:
+        db.rollback()
+        logging.error(f"上传并识别失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="OCR识别失败"
+        )
+
+
+def _archive_upload(
+    db: Session,
+    user: User,
+    file: UploadFile,
+    content: bytes,
+    file_hash: str,
+    result: Optional[Dict]
+) -> str:
+    """
+    归档直接识别的图片和识别结果
+    
+    Args:
+        db: 数据库会话
+        user: 当前用户
+        file: 上传的文件
+        content: 图片内容
+        file_hash: 图片内容哈希
+        result: 整图识别结果，区域识别时为None（只归档图片，整图识别结果留待之后识别）
+    
+    Returns:
+        文件ID
+    """
+    uploaded_file = db.query(UploadedFile).filter(
+        UploadedFile.user_id == user.id,
+        UploadedFile.file_hash == file_hash
+    ).first()
+    
+    if uploaded_file is None:
+        # 相同内容已存储时只增加引用
+        blob_store = BlobStore()
+        blob = blob_store.add_bytes(db, content, Path(file.filename).suffix, file_hash)
+        uploaded_file = UploadedFile(
+            user_id=user.id,
+            filename=blob_store.file_manager.generate_filename(file.filename, user.id),
+            original_filename=file.filename,
+            file_path=blob.file_path,
+            file_size=blob.file_size,
+            content_type=file.content_type,
+            file_hash=file_hash
+        )
+        db.add(uploaded_file)
+        db.flush()
+    
+    if result is not None:
+        if result["success"]:
+            save_ocr_result(db, uploaded_file, result)
+            uploaded_file.status = "processed"
+        else:
+            uploaded_file.status = "error"
+    db.commit()
+    return uploaded_file.id
+
+
+@router.post(
+    "/recognize/batch",
+    summary="批量识别图片文字",
+    description="对多个已上传的图片并行进行OCR识别，按完成顺序以NDJSON流式返回每个文件的结果"
+)
+async def recognize_images_batch(
+    request: OCRBatchRecognizeRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    批量识别图片中的文字
+
+    - **file_ids**: 已上传的文件ID列表
+    - 需要认证
+    - 响应为 application/x-ndjson，每行一个文件的识别结果（含file_id）
+    - 多页文档在图片之后逐个识别，每个文档内部按页并行
+    """
+    # 去重并保持请求顺序
+    file_ids = list(dict.fromkeys(request.file_ids))
+    if len(file_ids) > settings.OCR_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次最多识别 {settings.OCR_BATCH_MAX_FILES} 个文件"
+        )
+
+    # 预先校验要打开每个文件，在文件读写线程池中执行
+    ocr_cache = get_ocr_cache()
+    files_by_id, rejected, cached, image_paths, document_paths, known_pages = await run_io(
+        _prepare_batch, db, file_ids, current_user, ocr_cache
+    )
+
+    logging.info(
+        f"用户 {current_user.username} 批量OCR识别: "
+        f"提交 {len(image_paths) + len(document_paths)} 个文件, 缓存命中 {len(cached)} 个, 拒绝 {len(rejected)} 个"
+    )
+
+    def finish(file_id: str, result: Dict) -> str:
+        _save_batch_result(db, files_by_id[file_id], result, ocr_cache)
+        return OCRBatchItemResult(file_id=file_id, **result).model_dump_json() + "\n"
+
+    async def result_stream() -> AsyncIterator[str]:
+        # _prepare_batch 已把待识别的文件标记为 processing；客户端中途断开时由 finally 交给后台收尾
+        unfinished = set(image_paths) | set(document_paths)
+        results = None
+        waiting: Optional[Future] = None
+        try:
+            for file_id, error in rejected.items():
+                yield OCRBatchItemResult(
+                    file_id=file_id, success=False, text="", details=[], error=error
+                ).model_dump_json() + "\n"
+
+            for file_id, result in cached.items():
+                yield OCRBatchItemResult(file_id=file_id, **result).model_dump_json() + "\n"
+
+            # 逐个取出识别结果，等待时占用的是推理线程池的线程；
+            # 保留正在进行的取值，断开时该结果不会丢失
+            if image_paths:
+                results = get_ocr_pool().recognize_many(image_paths)
+                while True:
+                    waiting = get_inference_executor().submit(next, results, None)
+                    item = await asyncio.shield(asyncio.wrap_future(waiting))
+                    waiting = None
+                    if item is None:
+                        results = None
+                        break
+                    unfinished.discard(item[0])
+                    yield await run_io(finish, *item)
+
+            for file_id, document_path in document_paths.items():
+                try:
+                    result = await run_inference(
+                        recognize_document, document_path, use_pool=True, known_pages=known_pages[file_id]
+                    )
+                except Exception as e:
+                    logging.error(f"文档识别失败: {document_path}, 错误: {str(e)}")
+                    result = {"success": False, "text": "", "details": [], "error": str(e)}
+                unfinished.discard(file_id)
+                yield await run_io(finish, file_id, result)
+        finally:
+            if unfinished:
+                logging.warning(f"批量识别的客户端已断开，{len(unfinished)} 个文件转入后台收尾")
+                threading.Thread(
+                    target=_finish_abandoned_batch,
+                    args=(results, waiting, unfinished, ocr_cache),
+                    name="ocr-batch-finish",
+                    daemon=True
+                ).start()
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+
+def _save_batch_result(db: Session, uploaded_file: UploadedFile, result: Dict, ocr_cache) -> None:
+    """缓存并保存批量识别中一个文件的结果，更新文件状态"""
+    ocr_cache.set(uploaded_file.file_hash, result)
+    uploaded_file.status = "processed" if result["success"] else "error"
+    try:
+        save_ocr_result(db, uploaded_file, result)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logging.error(f"更新文件状态失败: {uploaded_file.id}, 错误: {str(e)}")
+
+
+def _finish_abandoned_batch(results, waiting: Optional[Future], unfinished: Set[str], ocr_cache) -> None:
+    """
+    客户端中途断开后收尾批量识别（在后台线程中使用独立的数据库会话）
+
+    已提交给进程池的图片继续等待结果，照常保存和缓存；尚未开始识别的文件恢复为 uploaded 状态，
+    不会一直停留在 processing。
+
+    Args:
+        results: 图片识别结果迭代器，尚未开始或已取完时为None
+        waiting: 断开时正在进行的取值
+        unfinished: 尚未保存结果的文件ID
+        ocr_cache: 识别结果缓存
+    """
+    db = SessionLocal()
+    try:
+        if results is not None:
+            items = iter(results)
+            try:
+                item = waiting.result() if waiting is not None else next(items, None)
+                while item is not None:
+                    file_id, result = item
+                    uploaded_file = db.get(UploadedFile, file_id)
+                    if uploaded_file is not None:
+                        _save_batch_result(db, uploaded_file, result, ocr_cache)
+                    unfinished.discard(file_id)
+                    item = next(items, None)
+            except Exception as e:
+                logging.error(f"批量识别后台收尾失败: {str(e)}")
+        if unfinished:
+            db.query(UploadedFile).filter(
+                UploadedFile.id.in_(unfinished),
+                UploadedFile.status == "processing"
+            ).update({UploadedFile.status: "uploaded"}, synchronize_session=False)
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        logging.error(f"恢复批量识别文件状态失败: {str(e)}")
+    finally:
+        db.close()
+
+
+def _prepare_batch(db: Session, file_ids: List[str], user: User, ocr_cache) -> Tuple:
+    """
+    批量识别前校验文件并查找已有结果
+
+    Args:
+        db: 数据库会话
+        file_ids: 文件ID列表
+        user: 当前用户
+        ocr_cache: 识别结果缓存
+
+    Returns:
+        (文件ID到上传记录, 拒绝的文件及原因, 已有结果, 待识别图片路径, 待识别文档路径,
+        待识别文档中已识别成功、无需重新识别的页)
+    """
+    uploaded_files = db.query(UploadedFile).filter(
+        UploadedFile.id.in_(file_ids),
+        UploadedFile.user_id == user.id
+    ).all()
+    files_by_id = {f.id: f for f in uploaded_files}
+
+    # 校验失败的文件直接返回错误，不进入进程池；命中缓存的文件直接返回缓存结果
+    rejected: Dict[str, str] = {}
+    cached: Dict[str, Dict] = {}
+    image_paths: Dict[str, str] = {}
+    document_paths: Dict[str, str] = {}
+    known_pages: Dict[str, Dict[int, Dict]] = {}
+    for file_id in file_ids:
+        uploaded_file = files_by_id.get(file_id)
+        if uploaded_file is None:
+            rejected[file_id] = "文件不存在或无权访问"
+            continue
+        document = is_document(uploaded_file.file_path)
+        is_valid, error_msg = validate_source(uploaded_file.file_path)
+        if not is_valid:
+            rejected[file_id] = f"{'文档' if document else '图片'}验证失败: {error_msg}"
+            continue
+        stored_result = get_ocr_result(db, file_id)
+        if stored_result is not None and is_current(stored_result):
+            cached[file_id] = load_result_dict(db, stored_result)
+            continue
+        # 批量识别按配置自动判断是否分块（tiled=None），只复用以相同选项识别的结果
+        cached_result = ocr_cache.get(uploaded_file.file_hash)
+        if cached_result is not None:
+            save_ocr_result(db, uploaded_file, cached_result)
+            uploaded_file.status = "processed"
+            cached[file_id] = cached_result
+            continue
+        uploaded_file.status = "processing"
+        if document:
+            document_paths[file_id] = uploaded_file.file_path
+            known_pages[file_id] = get_reusable_pages(db, file_id)
+        else:
+            image_paths[file_id] = uploaded_file.file_path
+    db.commit()
+    return files_by_id, rejected, cached, image_paths, document_paths, known_pages
+
+
+@router.post(
+    "/jobs",
+    response_model=OCRJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="提交OCR异步任务",
+    description="将识别任务加入队列并立即返回任务ID，通过轮询或SSE获取进度和结果"
+)
+def create_ocr_job(
+    request: OCRJobCreateRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    提交OCR异步任务
+    
+    - **file_id**: 已上传的文件ID
+    - 需要认证
+    """
+    uploaded_file = db.query(UploadedFile).filter(
+        UploadedFile.id == request.file_id,
+        UploadedFile.user_id == current_user.id
+    ).first()
+    
+    if not uploaded_file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在或无权访问"
+        )
+    
+    job = get_ocr_job_manager().submit(uploaded_file.id, current_user.id)
+    logging.info(f"用户 {current_user.username} 提交OCR任务: {job['job_id']}, 文件 {uploaded_file.filename}")
+    
+    return OCRJobResponse(**job)
+
+
+def get_user_job(job_id: str, current_user: User) -> Dict:
+    """获取属于当前用户的任务，不存在时抛出404"""
+    job = get_ocr_job_manager().get(job_id)
+    if job is None or job["user_id"] != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="任务不存在或已过期"
+        )
+    return job
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=OCRJobResponse,
+    summary="查询OCR任务状态",
+    description="轮询异步识别任务的状态、进度和结果"
+)
+def get_ocr_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    查询OCR任务状态
+    
+    - **job_id**: 任务ID
+    - 需要认证
+    """
+    return OCRJobResponse(**get_user_job(job_id, current_user))
+
+
+@router.get(
+    "/jobs/{job_id}/events",
+    summary="订阅OCR任务进度",
+    description="以Server-Sent Events推送任务进度，任务完成或失败后结束"
+)
+async def stream_ocr_job_events(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    订阅OCR任务进度
+    
+    - **job_id**: 任务ID
+    - 需要认证
+    - 每次状态或进度变化推送一条 progress 事件，结束时推送 done 事件
+    """
+    get_user_job(job_id, current_user)
+    manager = get_ocr_job_manager()
+    
+    async def event_stream() -> AsyncIterator[str]:
+        last_updated_at = None
+        while True:
+            job = manager.get(job_id)
+            if job is None:
+                yield "event: error\ndata: {\"error\": \"任务不存在或已过期\"}\n\n"
+                return
+            if job["updated_at"] != last_updated_at:
+                last_updated_at = job["updated_at"]
+                terminal = job["status"] in TERMINAL_STATUSES
+                payload = OCRJobResponse(**job).model_dump_json()
+                yield f"event: {'done' if terminal else 'progress'}\ndata: {payload}\n\n"
+                if terminal:
+                    return
+            await asyncio.sleep(settings.OCR_JOB_EVENT_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get(
+    "/result/{file_id}",
+    response_model=OCRStoredResultResponse,
+    summary="获取已保存的识别结果",
+    description="读取已保存的OCR识别结果和最新编辑文本，不会重新识别"
+)
+def get_stored_result(
+    file_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取已保存的识别结果
+    
+    - **file_id**: 文件ID
+    - 需要认证
+    """
+    ocr_result = db.query(OCRResult).filter(
+        OCRResult.file_id == file_id,
+        OCRResult.user_id == current_user.id
+    ).first()
+    
+    if not ocr_result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="识别结果不存在"
+        )
+    
+    result = load_result_dict(db, ocr_result)
+    return OCRStoredResultResponse(
+        file_id=ocr_result.file_id,
+        text=result["text"],
+        details=result["details"],
+        edited_text=ocr_result.edited_text,
+        revision=ocr_result.revision,
+        model_version=ocr_result.model_version,
+        created_at=ocr_result.created_at,
+        updated_at=ocr_result.updated_at
+    )
+
+
+@router.get(
+    "/result/{file_id}/revisions",
+    response_model=List[OCRRevisionResponse],
+    summary="获取识别结果的编辑历史",
+    description="按版本号升序返回识别结果的全部编辑版本"
+)
+def get_result_revisions(
+    file_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取识别结果的编辑历史
+    
+    - **file_id**: 文件ID
+    - 需要认证
+    """
+    ocr_result = db.query(OCRResult).filter(
+        OCRResult.file_id == file_id,
+        OCRResult.user_id == current_user.id
+    ).first()
+    
+    if not ocr_result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="识别结果不存在"
+        )
+    
+    return list_revisions(db, ocr_result)
+
+
+def get_user_page_results(
+    file_id: str,
+    current_user: User,
+    db: Session,
+    page_no: Optional[int] = None
+) -> List[OCRPageResult]:
+    """获取属于当前用户的文件的逐页识别结果（可只取一页），不存在时抛出404"""
+    pages = db.query(OCRPageResult).filter(
+        OCRPageResult.file_id == file_id,
+        OCRPageResult.user_id == current_user.id
+    )
+    if page_no is not None:
+        pages = pages.filter(OCRPageResult.page_no == page_no)
+    pages = pages.order_by(OCRPageResult.page_no.asc()).all()
+    if not pages:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="逐页识别结果不存在"
+        )
+    return pages
+
+
+@router.get(
+    "/result/{file_id}/pages",
+    response_model=List[OCRPageResultResponse],
+    summary="获取多页文档的逐页识别结果",
+    description="按页码升序返回多页文档（PDF、TIFF）每一页的识别结果"
+)
+def get_page_results(
+    file_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取多页文档的逐页识别结果
+    
+    - **file_id**: 文件ID
+    - 需要认证
+    """
+    return [page_to_result_dict(page) for page in get_user_page_results(file_id, current_user, db)]
+
+
+@router.get(
+    "/result/{file_id}/pages/{page_no}",
+    response_model=OCRPageResultResponse,
+    summary="获取多页文档单页的识别结果",
+    description="读取多页文档指定页的识别结果"
+)
+def get_page_result(
+    file_id: str,
+    page_no: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取多页文档单页的识别结果
+    
+    - **file_id**: 文件ID
+    - **page_no**: 页码（从1开始）
+    - 需要认证
+    """
+    return page_to_result_dict(get_user_page_results(file_id, current_user, db, page_no)[0])
+
+
+@router.get(
+    "/cache/stats",
+    summary="OCR缓存统计",
+    description="获取OCR识别结果缓存的命中/未命中统计"
+)
+def get_ocr_cache_stats(current_user: User = Depends(get_current_user)):
+    """
+    获取OCR缓存统计
+    
+    - 需要认证
+    """
+    return get_ocr_cache().stats()
+
+
+@router.get(
+    "/engines/stats",
+    summary="OCR引擎池统计",
+    description="获取当前进程OCR引擎池的加载状态、借用次数、等待时间统计、级联识别各分级的使用次数和线程池使用情况"
+)
+async def get_ocr_engine_stats(current_user: User = Depends(get_current_user)):
+    """
+    获取OCR引擎池统计
+    
+    - 需要认证
+    - 等待时间单位为毫秒
+    - executors 为各线程池的大小、运行中和排队的任务数
+    """
+    return {
+        "engines": get_ocr_engine_pool().stats(),
+        "worker_pool_ready": get_ocr_pool().ready,
+        "cascade": get_cascade_stats().stats(),
+        "executors": executor_stats()
+    }
+
+
 @router.post(
     "/edit",
     status_code=status.HTTP_200_OK,
@@ -114,17 +786,27 @@ def edit_ocr_result(
                 detail="文件不存在或无权访问"
             )
         
-        logging.info(f"用户 {current_user.username} 编辑了文件 {uploaded_file.filename} 的OCR结果")
+        # 保存为新的编辑版本
+        ocr_result = get_or_create_ocr_result(db, uploaded_file)
+        revision = add_revision(db, ocr_result, request.edited_text, current_user.id)
+        db.commit()
+        
+        logging.info(
+            f"用户 {current_user.username} 编辑了文件 {uploaded_file.filename} 的OCR结果, "
+            f"版本 {revision.revision}"
+        )
         
         return {
             "success": True,
             "message": "OCR结果已更新",
-            "edited_text": request.edited_text
+            "edited_text": request.edited_text,
+            "revision": revision.revision
         }
         
     except HTTPException:
         raise
     except Exception as e:
+        db.rollback()
         logging.error(f"编辑OCR结果失败: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
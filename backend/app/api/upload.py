@@ -1,97 +1,118 @@
 """文件上传API路由"""
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, status
+import hashlib
+import hmac
+import secrets
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Header, HTTPException, Response, status
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional, Tuple
 from app.db.base import get_db
 from app.models.user import User
 from app.models.upload import UploadedFile, TextInput
 from app.schemas.upload import (
     FileUploadResponse, 
+    FilePrecheckRequest,
+    FilePrecheckChallenge,
     TextInputRequest, 
     TextInputResponse,
     FileValidationError
 )
 from app.dependencies.auth import get_current_user
-from app.utils.file_handler import validate_upload_file, FileManager
+from app.utils.auth import create_access_token, decode_access_token
+from app.core.config import settings
+from app.utils.file_handler import validate_upload_file, FileValidator, FileTooLargeError
+from app.services.blob_store import BlobStore
+from app.services.derivatives import DerivativeStore, THUMBNAIL, PREVIEW, derivative_etag, schedule_derivatives
+from app.services.executors import run_io
+from app.services.ocr_result_service import delete_ocr_results
+from app.services.storage import get_storage
 from app.utils.logger import logging
+from app.utils.timing import span
 
 router = APIRouter(prefix="/upload", tags=["文件上传"])
 
+# 派生图按内容哈希寻址，同一文件ID的内容不会变化，客户端可以长期缓存
+DERIVATIVE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# 预检挑战令牌的用途标记（与访问令牌使用同一密钥签名，不能互相冒用）
+PRECHECK_PURPOSE = "upload_precheck"
+
+
+def to_file_response(uploaded_file: UploadedFile) -> FileUploadResponse:
+    """
+    上传记录转换为响应，附带缩略图和预览图地址
+    
+    Args:
+        uploaded_file: 上传记录
+    
+    Returns:
+        文件上传响应
+    """
+    base_url = f"{settings.API_V1_STR}{router.prefix}/file/{uploaded_file.id}"
+    return FileUploadResponse(
+        file_id=uploaded_file.id,
+        filename=uploaded_file.filename,
+        file_path=uploaded_file.file_path,
+        file_size=uploaded_file.file_size,
+        content_type=uploaded_file.content_type,
+        uploaded_at=uploaded_file.created_at,
+        thumbnail_url=f"{base_url}/{THUMBNAIL}",
+        preview_url=f"{base_url}/{PREVIEW}"
+    )
+
 
 @router.post(
     "/file",
     response_model=FileUploadResponse,
     status_code=status.HTTP_201_CREATED,
     summary="上传文件",
-    description="上传图片文件进行OCR识别"
+    description="上传图片或多页文档（PDF、TIFF）进行OCR识别"
 )
-def upload_file(
-    file: UploadFile = File(..., description="要上传的图片文件"),
+async def upload_file(
+    file: UploadFile = File(..., description="要上传的图片或多页文档"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     上传文件
     
-    - **file**: 图片文件（支持jpg, jpeg, png, bmp格式）
-    - 文件大小限制: 10MB
+    - **file**: 图片文件（支持jpg, jpeg, png, bmp格式）或多页文档（pdf, tif, tiff）
+    - 文件大小限制: 图片10MB，文档50MB
     - 需要认证
     """
     try:
         # 验证文件
         validate_upload_file(file)
         
-        # 初始化文件管理器
-        file_manager = FileManager()
-        
-        # 生成唯一文件名
-        filename = file_manager.generate_filename(file.filename, current_user.id)
-        
-        # 保存文件
-        file_path, file_size = file_manager.save_file(file, filename)
-        
-        # 计算文件哈希
-        file_hash = file_manager.calculate_file_hash(file_path)
+        blob_store = BlobStore()
         
-        # 检查是否已存在相同文件
-        existing_file = db.query(UploadedFile).filter(
-            UploadedFile.user_id == current_user.id,
-            UploadedFile.file_hash == file_hash
-        ).first()
-        
-        if existing_file:
-            # 删除刚上传的重复文件
-            file_manager.delete_file(file_path)
+        # 流式写入临时文件，同时计算哈希；超过大小限制时立即中止
+        # 文件读写在专用线程池中执行，不占用事件循环和默认线程池
+        max_size = (
+            settings.MAX_DOCUMENT_SIZE if FileValidator.validate_document_format(file)
+            else settings.MAX_FILE_SIZE
+        )
+        try:
+            with span("write"):
+                temp_path, file_size, file_hash = await run_io(blob_store.write_temp, file, max_size)
+        except FileTooLargeError as e:
             raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="文件已存在"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
             )
         
-        # 保存文件信息到数据库
-        uploaded_file = UploadedFile(
-            user_id=current_user.id,
-            filename=filename,
-            original_filename=file.filename,
-            file_path=file_path,
-            file_size=file_size,
-            content_type=file.content_type,
-            file_hash=file_hash
+        uploaded_file = await run_io(
+            _register_upload, db, blob_store, current_user, file, temp_path, file_size, file_hash
         )
-        
-        db.add(uploaded_file)
-        db.commit()
-        db.refresh(uploaded_file)
+        # 缩略图和预览图在后台生成，不延迟响应
+        schedule_derivatives(uploaded_file.file_path, uploaded_file.file_hash)
         
         logging.info(f"用户 {current_user.username} 上传文件: {file.filename}")
         
-        return FileUploadResponse(
-            file_id=uploaded_file.id,
-            filename=uploaded_file.filename,
-            file_path=uploaded_file.file_path,
-            file_size=uploaded_file.file_size,
-            content_type=uploaded_file.content_type,
-            uploaded_at=uploaded_file.created_at
-        )
+        return to_file_response(uploaded_file)
         
     except HTTPException:
         raise
@@ -103,6 +124,429 @@ def upload_file(
         )
 
 
+def _register_upload(
+    db: Session,
+    blob_store: BlobStore,
+    user: User,
+    file: UploadFile,
+    temp_path: str,
+    file_size: int,
+    file_hash: str
+) -> UploadedFile:
+    """
+    将已写入临时文件的上传内容加入存储并创建上传记录
+    
+    Args:
+        db: 数据库会话
+        blob_store: 内容寻址存储
+        user: 当前用户
+        file: 上传的文件
+        temp_path: 临时文件路径
+        file_size: 文件大小
+        file_hash: 文件内容哈希
+    
+    Returns:
+        上传记录
+    
+    Raises:
+        HTTPException: 用户已上传过相同文件
+    """
+    # 检查是否已存在相同文件
+    existing_file = db.query(UploadedFile).filter(
+        UploadedFile.user_id == user.id,
+        UploadedFile.file_hash == file_hash
+    ).first()
+    
+    if existing_file:
+        blob_store.discard_temp(temp_path)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="文件已存在"
+        )
+    
+    # 相同内容已存储时只增加引用，不再保存第二份
+    try:
+        blob = blob_store.add(db, temp_path, file_size, file_hash, Path(file.filename).suffix)
+    except Exception:
+        blob_store.discard_temp(temp_path)
+        raise
+    
+    # 保存文件信息到数据库
+    uploaded_file = UploadedFile(
+        user_id=user.id,
+        filename=blob_store.file_manager.generate_filename(file.filename, user.id),
+        original_filename=file.filename,
+        file_path=blob.file_path,
+        file_size=file_size,
+        content_type=file.content_type,
+        file_hash=file_hash
+    )
+    
+    db.add(uploaded_file)
+    with span("commit"):
+        db.commit()
+    db.refresh(uploaded_file)
+    return uploaded_file
+
+
+@router.post(
+    "/precheck",
+    response_model=FileUploadResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={200: {"model": FilePrecheckChallenge, "description": "需要证明持有文件内容"}},
+    summary="上传预检",
+    description="先提交文件哈希并证明持有文件内容，服务端已存储相同内容时直接创建上传记录，无需上传文件"
+)
+async def precheck_upload(
+    request: FilePrecheckRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    上传预检（两步）
+    
+    - **file_hash**: 文件内容的BLAKE2b哈希（digest_size=16）
+    - **file_size**: 文件大小，必须与已存储的内容一致
+    - **filename** / **content_type**: 与上传时相同的校验规则
+    - 第一步不带 challenge：返回200和随机片段挑战（无论内容是否已存储，避免泄露其他用户的文件是否存在）
+    - 第二步带 challenge 和 proof：证明正确且已存储相同内容时返回201和上传结果；
+      否则返回404，客户端需通过 /upload/file 上传
+    - 需要认证
+    """
+    validate_upload_file(SimpleNamespace(
+        filename=request.filename,
+        content_type=request.content_type,
+        size=request.file_size
+    ))
+    
+    if not request.challenge or not request.proof:
+        await run_io(_check_not_uploaded, db, current_user, request.file_hash)
+        return JSONResponse(
+            status_code=status.HTTP_200_OK,
+            content=_issue_challenge(current_user, request).model_dump()
+        )
+    
+    uploaded_file = await run_io(_register_precheck, db, current_user, request)
+    schedule_derivatives(uploaded_file.file_path, uploaded_file.file_hash)
+    
+    logging.info(f"用户 {current_user.username} 预检命中，跳过上传: {request.filename}")
+    
+    return to_file_response(uploaded_file)
+
+
+def _check_not_uploaded(db: Session, user: User, file_hash: str) -> None:
+    """用户已上传过相同文件时返回冲突"""
+    existing_file = db.query(UploadedFile).filter(
+        UploadedFile.user_id == user.id,
+        UploadedFile.file_hash == file_hash
+    ).first()
+    if existing_file:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="文件已存在"
+        )
+
+
+def _issue_challenge(user: User, request: FilePrecheckRequest) -> FilePrecheckChallenge:
+    """
+    生成预检挑战：服务端随机选择文件中的一段，挑战参数签名后交给客户端，不需要保存状态
+    
+    Args:
+        user: 当前用户
+        request: 预检请求
+    
+    Returns:
+        预检挑战
+    """
+    length = min(settings.UPLOAD_PRECHECK_CHALLENGE_BYTES, request.file_size)
+    offset = secrets.randbelow(request.file_size - length + 1)
+    nonce = secrets.token_hex(16)
+    token = create_access_token(
+        {
+            "purpose": PRECHECK_PURPOSE,
+            "uid": user.id,
+            "hash": request.file_hash,
+            "size": request.file_size,
+            "nonce": nonce,
+            "offset": offset,
+            "length": length
+        },
+        expires_delta=timedelta(seconds=settings.UPLOAD_PRECHECK_CHALLENGE_TTL)
+    )
+    return FilePrecheckChallenge(challenge=token, nonce=nonce, offset=offset, length=length)
+
+
+def _read_challenge(user: User, request: FilePrecheckRequest) -> dict:
+    """
+    校验挑战令牌
+    
+    Args:
+        user: 当前用户
+        request: 预检请求
+    
+    Returns:
+        挑战参数
+    
+    Raises:
+        HTTPException: 挑战令牌无效、过期或与本次预检不符
+    """
+    claims = decode_access_token(request.challenge)
+    if (
+        claims is None
+        or claims.get("purpose") != PRECHECK_PURPOSE
+        or claims.get("uid") != user.id
+        or claims.get("hash") != request.file_hash
+        or claims.get("size") != request.file_size
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="预检挑战无效或已过期，请重新预检"
+        )
+    return claims
+
+
+def _proof_matches(storage, blob_path: str, claims: dict, proof: str) -> bool:
+    """按挑战读取已存储文件的片段，计算持有证明并与客户端提交的比较"""
+    offset, length = claims["offset"], claims["length"]
+    digest = hashlib.blake2b(bytes.fromhex(claims["nonce"]), digest_size=16)
+    for chunk in storage.iter_range(blob_path, offset, offset + length - 1):
+        digest.update(chunk)
+    return hmac.compare_digest(digest.hexdigest(), proof.lower())
+
+
+def _register_precheck(db: Session, user: User, request: FilePrecheckRequest) -> UploadedFile:
+    """
+    持有证明正确且预检命中时，为已存储的内容增加引用并创建上传记录
+    
+    Args:
+        db: 数据库会话
+        user: 当前用户
+        request: 预检请求（带挑战令牌和持有证明）
+    
+    Returns:
+        上传记录
+    
+    Raises:
+        HTTPException: 用户已上传过相同文件，挑战令牌无效，或内容未存储、证明不正确
+    """
+    _check_not_uploaded(db, user, request.file_hash)
+    claims = _read_challenge(user, request)
+    
+    blob_store = BlobStore()
+    blob = blob_store.get(db, request.file_hash)
+    # 内容未存储和证明不正确返回相同的结果，不泄露其他用户的文件是否存在
+    if (
+        blob is None
+        or blob.file_size != request.file_size
+        or not _proof_matches(blob_store.storage, blob.file_path, claims, request.proof)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件内容不存在，请上传文件"
+        )
+    
+    blob_store.acquire(db, request.file_hash)
+    uploaded_file = UploadedFile(
+        user_id=user.id,
+        filename=blob_store.file_manager.generate_filename(request.filename, user.id),
+        original_filename=request.filename,
+        file_path=blob.file_path,
+        file_size=blob.file_size,
+        content_type=request.content_type,
+        file_hash=request.file_hash
+    )
+    db.add(uploaded_file)
+    db.commit()
+    db.refresh(uploaded_file)
+    return uploaded_file
+
+
+@router.head(
+    "/blob/{file_hash}",
+    summary="检查是否已上传过相同内容",
+    description="当前用户已上传过相同内容时返回200，否则返回404"
+)
+def check_blob(
+    file_hash: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    检查当前用户是否已上传过相同内容
+    
+    只查询当前用户自己的上传记录，不透露其他用户是否存储了相同内容；
+    复用其他用户已存储的内容需通过 /upload/precheck 证明持有文件。
+    
+    - **file_hash**: 文件内容的BLAKE2b哈希
+    - 需要认证
+    """
+    uploaded_file = db.query(UploadedFile).filter(
+        UploadedFile.user_id == current_user.id,
+        UploadedFile.file_hash == file_hash
+    ).first()
+    found = uploaded_file is not None and BlobStore().get(db, file_hash) is not None
+    return Response(status_code=status.HTTP_200_OK if found else status.HTTP_404_NOT_FOUND)
+
+
+@router.get(
+    "/file/{file_id}/content",
+    response_class=StreamingResponse,
+    summary="下载上传文件",
+    description="流式返回上传文件的原始内容，支持单段 Range 请求（断点续传、按需读取）"
+)
+async def get_file_content(
+    file_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    下载上传文件
+    
+    - **file_id**: 文件ID
+    - Range 为 bytes=起始-结束 时返回206和对应的片段，超出文件范围时返回416
+    - 需要认证
+    """
+    uploaded_file = await run_io(_get_user_file, db, file_id, current_user)
+    storage = get_storage()
+    file_size = await run_io(storage.size, uploaded_file.file_path) if uploaded_file else None
+    if file_size is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在"
+        )
+    
+    headers = {"Accept-Ranges": "bytes"}
+    if uploaded_file.file_hash:
+        # 内容按哈希寻址，哈希即强ETag
+        headers["ETag"] = f'"{uploaded_file.file_hash}"'
+        if if_none_match and _etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    byte_range = _parse_range(range_header, file_size) if range_header else None
+    if byte_range is None:
+        start, end, status_code = 0, file_size - 1, status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(max(end - start + 1, 0))
+    
+    # 同步迭代器由 StreamingResponse 放到线程池中逐块读取
+    return StreamingResponse(
+        storage.iter_range(uploaded_file.file_path, start, end) if file_size else iter(()),
+        status_code=status_code,
+        media_type=uploaded_file.content_type or "application/octet-stream",
+        headers=headers
+    )
+
+
+def _parse_range(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段 Range 请求头
+    
+    Args:
+        range_header: Range 请求头，如 bytes=0-1023、bytes=1024-、bytes=-500
+        file_size: 文件大小
+    
+    Returns:
+        (起始字节, 结束字节)，均包含；格式不支持（如多段）时返回None，按完整文件返回
+    
+    Raises:
+        HTTPException: 范围超出文件大小（416）
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec or "-" not in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), file_size - 1) if last else file_size - 1
+        else:
+            # 后缀形式：最后 N 个字节
+            start, end = max(file_size - int(last), 0), file_size - 1
+    except ValueError:
+        return None
+    if start > end or start >= file_size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="请求的范围超出文件大小",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+    return start, end
+
+
+@router.get(
+    "/file/{file_id}/{kind}",
+    response_class=FileResponse,
+    summary="获取缩略图或预览图",
+    description="获取上传文件的WebP缩略图或预览图（多页文档为第一页），不存在时当场生成；支持ETag协商缓存"
+)
+async def get_file_derivative(
+    file_id: str,
+    kind: Literal["thumbnail", "preview"],
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取缩略图或预览图
+    
+    - **file_id**: 文件ID
+    - **kind**: thumbnail（缩略图）或 preview（预览图）
+    - 响应带 ETag 和 Cache-Control，If-None-Match 匹配时返回304
+    - 需要认证
+    """
+    uploaded_file = await run_io(_get_user_file, db, file_id, current_user)
+    if not uploaded_file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在"
+        )
+    
+    # 旧文件可能没有哈希，使用文件ID代替
+    file_hash = uploaded_file.file_hash or uploaded_file.id.replace("-", "")
+    etag = derivative_etag(file_hash, kind)
+    headers = {"ETag": etag, "Cache-Control": DERIVATIVE_CACHE_CONTROL}
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    store = DerivativeStore()
+    try:
+        key = await run_io(store.ensure, uploaded_file.file_path, file_hash, kind)
+        # 对象存储中的派生图经本地读穿缓存返回
+        path = await run_io(store.storage.local_path, key)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在"
+        )
+    except Exception as e:
+        logging.error(f"生成{kind}失败: {uploaded_file.file_path}, 错误: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="无法为该文件生成预览"
+        )
+    
+    return FileResponse(path, media_type="image/webp", headers=headers)
+
+
+def _get_user_file(db: Session, file_id: str, user: User) -> Optional[UploadedFile]:
+    """查找用户上传的文件"""
+    return db.query(UploadedFile).filter(
+        UploadedFile.id == file_id,
+        UploadedFile.user_id == user.id
+    ).first()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 是否匹配（忽略弱校验前缀）"""
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
 @router.post(
     "/text",
     response_model=TextInputResponse,
@@ -176,17 +620,7 @@ def get_uploaded_files(
         UploadedFile.created_at.desc()
     ).offset(skip).limit(limit).all()
     
-    return [
-        FileUploadResponse(
-            file_id=file.id,
-            filename=file.filename,
-            file_path=file.file_path,
-            file_size=file.file_size,
-            content_type=file.content_type,
-            uploaded_at=file.created_at
-        )
-        for file in files
-    ]
+    return [to_file_response(file) for file in files]
 
 
 @router.delete(
@@ -220,17 +654,20 @@ def delete_uploaded_file(
         )
     
     try:
-        # 删除物理文件
-        file_manager = FileManager()
-        file_manager.delete_file(file_record.file_path)
-        
-        # 删除数据库记录
+        # 删除数据库记录（包括识别结果和编辑历史）
+        delete_ocr_results(db, file_record.id)
         db.delete(file_record)
+        
+        # 释放文件引用，没有其他上传记录引用时在提交成功后删除物理文件
+        blob_store = BlobStore()
+        orphan = blob_store.release(db, file_record.file_path)
         db.commit()
+        blob_store.purge(db, orphan)
         
         logging.info(f"用户 {current_user.username} 删除文件: {file_record.filename}")
         
     except Exception as e:
+        db.rollback()
         logging.error(f"删除文件失败: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
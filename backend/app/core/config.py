@@ -11,7 +11,8 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "Text Archive Assistant"
     HOST: str = "127.0.0.1"
     PORT: int = 8000
-    WORKERS: int = 1  # 进程数
+    WORKERS: int = 1  # API进程数（由 serve.py 生产启动器使用）
+    GRACEFUL_TIMEOUT: int = 30  # 关闭时等待进行中的请求和OCR识别完成的最长秒数
 
     # 项目路径
     PROJECT_PATH: str = ""
@@ -43,16 +44,107 @@ class Settings(BaseSettings):
     # 文件上传配置
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_IMAGE_FORMATS: list[str] = ["jpg", "jpeg", "png", "bmp"]
+    ALLOWED_DOCUMENT_FORMATS: list[str] = ["pdf", "tif", "tiff"]  # 多页文档，按页识别
+    MAX_DOCUMENT_SIZE: int = 50 * 1024 * 1024  # 50MB
+    UPLOAD_THUMBNAIL_SIZE: int = 256  # 缩略图最长边像素数
+    UPLOAD_PREVIEW_SIZE: int = 1024  # 预览图最长边像素数
+    UPLOAD_DERIVATIVE_QUALITY: int = 80  # 缩略图和预览图的WebP质量
+    UPLOAD_DERIVATIVES_ON_UPLOAD: bool = True  # 上传后在后台生成缩略图和预览图，关闭时在首次请求时生成
     UPLOAD_DIR: str = "uploads"
+    UPLOAD_PRECHECK_CHALLENGE_BYTES: int = 4096  # 预检时客户端需证明持有的随机片段长度（字节）
+    UPLOAD_PRECHECK_CHALLENGE_TTL: int = 300  # 预检挑战的有效期（秒）
+    UPLOAD_MIGRATE_ON_STARTUP: bool = False  # 启动时补建索引，并在后台把旧的平铺文件迁移到按哈希存储（file_hash 由MD5改为BLAKE2b）；serve.py 只在主进程中执行一次
+    UPLOAD_SWEEP_ENABLED: bool = False  # 是否在后台定期清理上传目录中的孤立文件（多进程部署时只需一个进程开启）
+    UPLOAD_SWEEP_INTERVAL: int = 24 * 3600  # 清理间隔（秒）
+    UPLOAD_SWEEP_DRY_RUN: bool = False  # 后台清理只记录报告，不删除文件
+    UPLOAD_SWEEP_BATCH_SIZE: int = 500  # 每批对照数据库检查的文件数
+    UPLOAD_SWEEP_MAX_FILES_PER_SECOND: float = 2000  # 每秒最多检查的文件数，0表示不限速
+    UPLOAD_SWEEP_MIN_AGE: int = 3600  # 只清理修改时间早于该秒数的文件，避免误删正在上传的文件
+    UPLOAD_SWEEP_DELETE_LEGACY: bool = False  # 是否删除上传目录根部没有记录引用的旧文件，默认只报告
+
+    # 请求耗时统计配置
+    SERVER_TIMING_ENABLED: bool = True  # 响应中返回 Server-Timing 头（浏览器开发者工具中可查看各阶段耗时）
+    REQUEST_TIMING_LOG_MIN_MS: float = 0  # 总耗时不低于该毫秒数的请求记录分阶段耗时日志（0表示全部记录，负数表示不记录）
+    METRICS_ENABLED: bool = True  # 提供 /metrics 接口（Prometheus 文本格式）
+
+    # 文件存储后端配置
+    STORAGE_BACKEND: str = "local"  # local: 保存在 UPLOAD_DIR；s3: 保存在S3兼容的对象存储（AWS S3、MinIO 等）
+    S3_ENDPOINT_URL: str = "http://127.0.0.1:9000"  # 对象存储地址（使用路径形式的URL）
+    S3_REGION: str = "us-east-1"
+    S3_BUCKET: str = "uploads"
+    S3_ACCESS_KEY: str = ""
+    S3_SECRET_KEY: str = ""
+    STORAGE_CACHE_DIR: str = "storage_cache"  # 对象存储文件的本地读穿缓存目录（OCR等需要本地文件时使用）
+    STORAGE_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # 本地缓存上限，超过时按最近访问时间淘汰
 
     # OCR配置
     OCR_LANG: str = "ch"  # 中文
     OCR_USE_GPU: bool = False
+    OCR_POOL_WORKERS: int = 2  # OCR进程池大小（每个进程预加载一个引擎），0表示在当前进程内识别
+    OCR_BATCH_MAX_FILES: int = 50  # 单次批量识别的最大文件数
+    OCR_MODEL_VERSION: str = "PP-OCRv4"  # 识别模型版本，参与缓存键，升级模型后旧缓存自动失效
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_MAX_ENTRIES: int = 1000  # 进程内LRU缓存条目数
+    OCR_CACHE_TTL: int = 7 * 24 * 3600  # 缓存有效期（秒）
+    OCR_CACHE_USE_REDIS: bool = True  # 配置了REDIS_URL时使用Redis作为共享缓存
+    OCR_PREPROCESS_ENABLED: bool = True  # 推理前预处理（EXIF方向校正、缩放等）
+    OCR_MAX_SIDE: int = 2048  # 长边超过该值时先缩小再识别，0表示不缩放
+    OCR_PREPROCESS_GRAYSCALE: bool = False
+    OCR_PREPROCESS_DESKEW: bool = False  # 小角度倾斜校正
+    OCR_PREPROCESS_CONTRAST: bool = False  # CLAHE对比度归一化
+    OCR_CASCADE_ENABLED: bool = True  # 级联识别：先不使用方向分类器快速识别，置信度不足再升级
+    OCR_CASCADE_THRESHOLD: float = 0.85  # 快速档平均置信度低于该值时升级到精确档
+    OCR_FAST_DET_MODEL_DIR: Optional[str] = None  # 快速档检测模型目录，默认使用PaddleOCR自带的轻量模型
+    OCR_ACCURATE_DET_MODEL_DIR: Optional[str] = None  # 精确档服务端检测模型目录，未配置时复用快速档模型
+    OCR_ACCURATE_REC_MODEL_DIR: Optional[str] = None  # 精确档服务端识别模型目录，未配置时复用快速档模型
+    OCR_TILE_SIZE: int = 960  # 分块识别的分块边长（与PaddleOCR检测模型默认的长边限制一致）
+    OCR_TILE_OVERLAP: int = 96  # 相邻分块的重叠像素，应大于单行文字高度
+    OCR_TILE_MIN_SIDE: int = 0  # 长边超过该值时自动分块识别，0表示只在请求指定时分块
+    OCR_DOCUMENT_DPI: int = 200  # PDF页面的栅格化分辨率；TIFF页面分辨率更高时按此缩小
+    OCR_DOCUMENT_MAX_PAGES: int = 200  # 单个文档的最大页数
+    OCR_PAGE_CONCURRENCY: int = 2  # 单个文档同时识别的页数（同一时刻最多有这么多页的图片在内存中）
+    OCR_JOB_WORKERS: int = 2  # 异步任务工作线程数（推理在OCR进程池中执行）
+    OCR_JOB_TTL: int = 3600  # 已完成任务状态的保留时间（秒）
+    OCR_JOB_EVENT_INTERVAL: float = 0.5  # SSE推送任务进度的检查间隔（秒）
+    OCR_JOB_RUN_WORKERS: bool = True  # 当前进程是否消费任务队列，使用独立OCR工作进程时设为false
+    OCR_ENGINES_PER_PROCESS: int = 1  # 每个进程常驻的OCR引擎数量（每个引擎同一时刻只处理一个请求）
+    OCR_PRELOAD_ENGINES: bool = True  # 启动时预加载OCR引擎和进程池，避免首个请求等待模型加载
+    OCR_ENGINE_CHECKOUT_TIMEOUT: float = 60.0  # 等待空闲OCR引擎的最长秒数
+    OCR_INFERENCE_MODE: str = "local"  # local: 在当前进程或其OCR进程池中推理；remote: 通过Redis交给独立的OCR推理进程
+    OCR_PROCESSES: int = 2  # serve.py 启动的独立OCR推理进程数（remote模式）
+    OCR_REMOTE_TIMEOUT: float = 120.0  # 等待OCR推理进程返回结果的最长秒数
+    OCR_INFERENCE_THREADS: int = 4  # 异步路由等待OCR推理的线程数，超出的请求在该线程池中排队，不占用默认线程池
+    UPLOAD_IO_THREADS: int = 8  # 异步上传路由的文件读写线程数
+    API_THREADPOOL_SIZE: int = 40  # 同步路由使用的默认线程池大小
 
     # LLM配置
     LLM_API_URL: str = "http://localhost:3001/v1/chat/completions"
     LLM_MODEL: str = "Qwen/Qwen2-VL-7B-Instruct"
     LLM_ENABLED: bool = True
+    LLM_MAX_CONNECTIONS: int = 8  # 到LLM服务的连接池大小
+    LLM_MAX_CONCURRENCY: int = 4  # 同时进行的LLM请求数上限（合并后的批量请求算一个）
+    LLM_QUEUE_TIMEOUT: float = 10.0  # 等待LLM请求名额的最长秒数，超时改用规则方法
+    LLM_BATCH_WINDOW_MS: float = 20  # 该时间窗口内到达的分类请求合并为一次LLM调用，0表示不合并
+    LLM_BATCH_MAX_SIZE: int = 8  # 单次LLM调用合并的最大文本数
+    LLM_TIMEOUT_INITIAL: float = 10.0  # 尚无响应时间样本时的超时（秒），之后按近期响应时间自适应
+    LLM_TIMEOUT_MIN: float = 2.0
+    LLM_TIMEOUT_MAX: float = 30.0
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5  # 连续失败该次数后熔断，熔断期间直接使用规则方法，0表示不熔断
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0  # 熔断持续时间，之后放行一个探测请求
+    LLM_STREAM: bool = True  # 单条分类以流式读取LLM回复，得到类型和置信度后立即结束生成
+    LLM_CLASSIFY_REASONING: bool = False  # 单条分类的提示词是否要求给出分类理由（理由不参与分类，关闭可减少生成的token）
+    LOCAL_CLASSIFIER_ENABLED: bool = True  # 先用本地轻量分类器（字符n-gram + 逻辑回归）分类，不确定时再请求LLM
+    LOCAL_CLASSIFIER_PATH: str = "data/local_classifier.npz"  # 本地分类器模型文件
+    LOCAL_CLASSIFIER_THRESHOLD: float = 0.9  # 本地分类的置信度达到该值时直接采用，否则升级到LLM
+    LOCAL_CLASSIFIER_MIN_EXAMPLES: int = 50  # 已确认的分类少于该数量（或只有一种类型）时不训练
+    LOCAL_CLASSIFIER_HOLDOUT: float = 0.2  # 按文本哈希固定划出的验证集比例，新模型在验证集上不如当前模型时保留当前模型
+    LOCAL_CLASSIFIER_RETRAIN_EVERY: int = 0  # 每新增该数量的手动分类后在后台重新训练，0表示只通过命令行训练
+    LOCAL_CLASSIFIER_HTTP_TRAIN: bool = False  # 是否允许通过 /classify/local/train 接口训练（模型全局共享，只在受信任的部署中开启）
+    CLASSIFY_CACHE_ENABLED: bool = True  # 缓存LLM分类结果（键为规范化文本、提示词版本和模型名称）
+    CLASSIFY_CACHE_MAX_ENTRIES: int = 5000  # 进程内LRU缓存条目数
+    CLASSIFY_CACHE_TTL: int = 7 * 24 * 3600  # 缓存有效期（秒）
+    CLASSIFY_CACHE_USE_REDIS: bool = True  # 配置了REDIS_URL时使用Redis作为多进程共享缓存
+    CLASSIFY_BATCH_MAX_SEGMENTS: int = 20  # 批量分类时单次LLM调用包含的最大条目数
 
     # Redis配置(可选)
     REDIS_URL: Optional[str] = None
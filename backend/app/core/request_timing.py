@@ -0,0 +1,84 @@
+"""请求耗时中间件
+
+为每个请求开始分阶段计时（见 app.utils.timing），响应头中返回总耗时（X-Process-Time）和
+各阶段耗时（Server-Timing），请求结束后把总耗时和各阶段耗时计入 /metrics 的直方图，
+并按配置记录结构化日志。流式响应的响应头在开始发送时生成，只包含此前完成的阶段；
+直方图和日志中的总耗时包含整个响应体的发送。
+"""
+import json
+from starlette.routing import Match
+from app.core.config import settings
+from app.utils.logger import logging
+from app.utils.metrics import REQUEST_DURATION, STAGE_DURATION
+from app.utils.timing import RequestTimings, server_timing_header, start_request
+
+# 没有匹配到路由的请求（404）使用统一的标签，避免任意路径产生大量时间序列
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(scope) -> str:
+    """请求匹配到的路由模板（如 /api/v1/upload/file/{file_id}），用作指标标签"""
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for route in getattr(router, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+
+class RequestTimingMiddleware:
+    """记录请求总耗时和各阶段耗时"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = start_request()
+        status_code = 500
+
+        async def timed_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = timings.elapsed_ms()
+                headers = list(message.get("headers", []))
+                headers.append((b"x-process-time", f"{total_ms / 1000}s".encode("latin-1")))
+                if settings.SERVER_TIMING_ENABLED:
+                    header = server_timing_header(timings.totals(), total_ms)
+                    headers.append((b"server-timing", header.encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            self._observe(scope, timings, status_code)
+
+    @staticmethod
+    def _observe(scope, timings: RequestTimings, status_code: int) -> None:
+        total_ms = timings.elapsed_ms()
+        totals = timings.totals()
+        method = scope.get("method", "")
+        route = route_template(scope)
+        try:
+            REQUEST_DURATION.observe(total_ms / 1000, method=method, route=route, status=str(status_code))
+            for stage, duration_ms in totals.items():
+                STAGE_DURATION.observe(duration_ms / 1000, method=method, route=route, stage=stage)
+        except Exception as e:
+            logging.warning(f"记录请求指标失败: {str(e)}")
+
+        min_ms = settings.REQUEST_TIMING_LOG_MIN_MS
+        if min_ms >= 0 and total_ms >= min_ms:
+            logging.info("request_timing " + json.dumps({
+                "method": method,
+                "route": route,
+                "path": scope.get("path"),
+                "status": status_code,
+                "total_ms": round(total_ms, 3),
+                "stages_ms": {stage: round(duration_ms, 3) for stage, duration_ms in totals.items()}
+            }, ensure_ascii=False))
@@ -0,0 +1,103 @@
+"""上传请求体大小限制中间件
+
+multipart 请求体在进入路由之前就会被完整解析并写入临时文件，路由里的大小检查只能在
+整个请求体接收完之后进行。该中间件在接收请求体时计数，声明的 Content-Length 超限时
+直接拒绝，分块传输时一旦超过限制就停止接收并返回413。
+"""
+import json
+from typing import Callable
+from app.core.config import settings
+
+# multipart 请求中文件以外的部分（分隔符、各字段的头部和表单字段）预留的字节数
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def upload_body_limit() -> int:
+    """上传请求体的最大字节数：最大的单文件限制加上表单开销"""
+    return max(settings.MAX_FILE_SIZE, settings.MAX_DOCUMENT_SIZE) + MULTIPART_OVERHEAD
+
+
+class UploadSizeLimitMiddleware:
+    """限制 multipart 上传请求体的大小"""
+
+    def __init__(self, app, max_body_size: Callable[[], int] = upload_body_limit):
+        """
+        Args:
+            app: ASGI应用
+            max_body_size: 返回最大请求体字节数的函数（每个请求读取，便于配置变更后生效）
+        """
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._is_multipart(scope):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.max_body_size()
+        content_length = self._header(scope, b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                # 超限后不再读取客户端数据，让正在解析的请求体以断开结束
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # 超限后丢弃应用自身的响应（请求体解析失败产生的400/500），统一返回413
+            if exceeded and not response_started:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded or response_started:
+                raise
+        if exceeded and not response_started:
+            await self._reject(send, limit)
+
+    @staticmethod
+    def _header(scope, name: bytes):
+        for key, value in scope.get("headers", []):
+            if key.lower() == name:
+                return value.decode("latin-1")
+        return None
+
+    def _is_multipart(self, scope) -> bool:
+        content_type = self._header(scope, b"content-type") or ""
+        return content_type.lower().startswith("multipart/form-data")
+
+    @staticmethod
+    async def _reject(send, limit: int) -> None:
+        body = json.dumps(
+            {"detail": f"请求体超过大小限制。最大允许: {limit / (1024 * 1024):.1f}MB"},
+            ensure_ascii=False
+        ).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"connection", b"close")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
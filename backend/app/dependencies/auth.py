@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app.db.base import get_db
 from app.models.user import User
 from app.utils.auth import decode_access_token
+from app.utils.timing import span
 
 security = HTTPBearer()
 
@@ -26,7 +27,12 @@ def get_current_user(
     Raises:
         HTTPException: 如果令牌无效或用户不存在
     """
-    token = credentials.credentials
+    with span("auth"):
+        return _authenticate(credentials.credentials, db)
+
+
+def _authenticate(token: str, db: Session) -> User:
+    """校验令牌并查找用户"""
     payload = decode_access_token(token)
     
     if payload is None:
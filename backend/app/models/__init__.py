@@ -1,6 +1,8 @@
 from app.models.user import User
 from app.models.schedule import ScheduleItem
 from app.models.memo import Memo
-from app.models.upload import UploadedFile, TextInput
+from app.models.upload import UploadedFile, TextInput, FileBlob
+from app.models.ocr import OCRResult, OCRResultRevision, OCRPageResult
+from app.models.classification import ClassificationLabel
 
-__all__ = ["User", "ScheduleItem", "Memo", "UploadedFile", "TextInput"]
+__all__ = ["User", "ScheduleItem", "Memo", "UploadedFile", "TextInput", "FileBlob", "OCRResult", "OCRResultRevision", "OCRPageResult", "ClassificationLabel"]
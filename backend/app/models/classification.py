@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, DateTime, Text, ForeignKey
+from sqlalchemy.sql import func
+from app.db.base import Base
+import uuid
+
+
+class ClassificationLabel(Base):
+    """已确认的分类（用户手动选择的类型），用于训练本地分类器"""
+    __tablename__ = "classification_labels"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
+    text = Column(Text, nullable=False)
+    label = Column(String(20), nullable=False)  # schedule 或 memo
+    source = Column(String(20), nullable=False, default="manual")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,62 @@
+"""OCR识别结果相关的数据模型"""
+from sqlalchemy import Column, String, Integer, DateTime, Text, ForeignKey, LargeBinary, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.base import Base
+import uuid
+
+
+class OCRResult(Base):
+    """OCR识别结果模型
+
+    逐行的文本框和置信度以float32紧凑打包存储（见 app.utils.box_codec），
+    每行文本可由 text 按换行拆分还原。
+    """
+    __tablename__ = "ocr_results"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    file_id = Column(String(36), ForeignKey("uploaded_files.id"), nullable=False, unique=True, index=True)
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
+    text = Column(Text, nullable=False, default="")  # 识别出的原始文本
+    edited_text = Column(Text, nullable=True)  # 最新一次编辑后的文本
+    line_count = Column(Integer, nullable=False, default=0)
+    line_boxes = Column(LargeBinary, nullable=True)  # float32 打包的文本框坐标，每行4个点
+    line_confidences = Column(LargeBinary, nullable=True)  # float32 打包的逐行置信度
+    lang = Column(String(20), nullable=True)
+    model_version = Column(String(50), nullable=True)
+    revision = Column(Integer, nullable=False, default=0)  # 当前编辑版本号，0表示未编辑
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class OCRResultRevision(Base):
+    """OCR结果编辑版本模型"""
+    __tablename__ = "ocr_result_revisions"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    result_id = Column(String(36), ForeignKey("ocr_results.id"), nullable=False, index=True)
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
+    revision = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class OCRPageResult(Base):
+    """多页文档的逐页识别结果模型
+
+    文本框和置信度的存储方式与 OCRResult 相同；识别失败的页只记录错误信息。
+    """
+    __tablename__ = "ocr_page_results"
+    __table_args__ = (UniqueConstraint("file_id", "page_no", name="uq_ocr_page_results_file_page"),)
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    file_id = Column(String(36), ForeignKey("uploaded_files.id"), nullable=False, index=True)
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
+    page_no = Column(Integer, nullable=False)  # 页码，从1开始
+    text = Column(Text, nullable=False, default="")
+    line_count = Column(Integer, nullable=False, default=0)
+    line_boxes = Column(LargeBinary, nullable=True)  # float32 打包的文本框坐标（页面栅格化后的像素坐标）
+    line_confidences = Column(LargeBinary, nullable=True)
+    error = Column(Text, nullable=True)  # 识别失败时的错误信息
+    model_version = Column(String(50), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
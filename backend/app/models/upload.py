@@ -16,7 +16,7 @@ class UploadedFile(Base):
     file_path = Column(String(500), nullable=False)
     file_size = Column(Integer, nullable=False)
     content_type = Column(String(100), nullable=False)
-    file_hash = Column(String(64), nullable=True)  # 文件MD5哈希
+    file_hash = Column(String(64), nullable=True, index=True)  # 文件内容哈希（BLAKE2b-128）
     status = Column(String(20), default="uploaded")  # uploaded, processing, processed, error
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -33,3 +33,19 @@ class TextInput(Base):
     status = Column(String(20), default="pending")  # pending, processing, processed
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class FileBlob(Base):
+    """按内容寻址存储的文件
+
+    相同内容的文件在磁盘上只保存一份，UploadedFile.file_path 指向该文件；
+    ref_count 为引用它的上传记录数，降为0时删除磁盘文件。
+    """
+    __tablename__ = "file_blobs"
+
+    file_hash = Column(String(64), primary_key=True)  # 文件内容哈希（BLAKE2b-128）
+    file_path = Column(String(500), nullable=False, unique=True)
+    file_size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
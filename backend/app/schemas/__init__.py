@@ -2,15 +2,25 @@
 from app.schemas.auth import UserCreate, UserLogin, UserResponse, Token
 from app.schemas.upload import (
     FileUploadResponse, 
+    FilePrecheckRequest,
     TextInputRequest, 
     TextInputResponse,
     FileValidationError
 )
 from app.schemas.ocr import (
+    OCRRegion,
     OCRRecognizeRequest,
     OCRRecognizeResponse,
     OCREditRequest,
-    OCRTextDetail
+    OCRTextDetail,
+    OCRBatchRecognizeRequest,
+    OCRBatchItemResult,
+    OCRStoredResultResponse,
+    OCRRevisionResponse,
+    OCRJobCreateRequest,
+    OCRJobResponse,
+    OCRUploadRecognizeResponse,
+    OCRPageResultResponse
 )
 from app.schemas.memo import (
     MemoCreateRequest,
@@ -21,7 +31,9 @@ from app.schemas.memo import (
 
 __all__ = [
     "UserCreate", "UserLogin", "UserResponse", "Token",
-    "FileUploadResponse", "TextInputRequest", "TextInputResponse", "FileValidationError",
-    "OCRRecognizeRequest", "OCRRecognizeResponse", "OCREditRequest", "OCRTextDetail",
+    "FileUploadResponse", "FilePrecheckRequest", "TextInputRequest", "TextInputResponse", "FileValidationError",
+    "OCRRegion", "OCRRecognizeRequest", "OCRRecognizeResponse", "OCREditRequest", "OCRTextDetail",
+    "OCRBatchRecognizeRequest", "OCRBatchItemResult", "OCRStoredResultResponse", "OCRRevisionResponse",
+    "OCRJobCreateRequest", "OCRJobResponse", "OCRUploadRecognizeResponse", "OCRPageResultResponse",
     "MemoCreateRequest", "MemoResponse", "MemoUpdateRequest", "MemoListResponse"
 ]
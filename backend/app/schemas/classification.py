@@ -19,6 +19,32 @@ class ClassifyResponse(BaseModel):
         from_attributes = True
 
 
+class OCRLine(BaseModel):
+    """OCR识别详情中的一行"""
+    text: str = Field(..., description="行文本")
+    box: Optional[List[List[float]]] = Field(None, description="文本框四个顶点坐标")
+    page: Optional[int] = Field(None, description="页码（多页文档）")
+
+
+class BatchClassifyRequest(BaseModel):
+    """批量分类请求：OCR输出先分成多个条目，再一起分类"""
+    text: str = Field("", description="OCR识别的文本")
+    details: Optional[List[OCRLine]] = Field(None, description="OCR识别详情，提供时按文本框版面分段")
+
+
+class SegmentClassifyResponse(ClassifyResponse):
+    """单个条目的分类结果"""
+    text: str = Field(..., description="条目文本")
+    box: Optional[List[float]] = Field(None, description="条目所在区域 [x0, y0, x1, y1]")
+    page: Optional[int] = Field(None, description="页码")
+    source: Literal['local', 'llm', 'cache', 'rules'] = Field(..., description="分类结果来源")
+
+
+class BatchClassifyResponse(BaseModel):
+    """批量分类响应"""
+    segments: List[SegmentClassifyResponse] = Field(..., description="各条目的分类结果（按阅读顺序）")
+
+
 class ManualClassifyRequest(BaseModel):
     """手动分类请求"""
     text: str = Field(..., min_length=1, description="文本内容")
@@ -1,6 +1,7 @@
 """OCR相关的Pydantic schemas"""
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Literal
+from datetime import datetime
 
 
 class OCRTextDetail(BaseModel):
@@ -8,11 +9,30 @@ class OCRTextDetail(BaseModel):
     text: str = Field(..., description="识别的文本")
     confidence: float = Field(..., description="置信度(0-1)")
     box: List[List[float]] = Field(..., description="文本框坐标")
+    page: Optional[int] = Field(None, description="所在页码（多页文档，从1开始）")
+
+
+class OCRRegion(BaseModel):
+    """识别区域（原图像素坐标）"""
+    x: int = Field(..., ge=0, description="左上角横坐标")
+    y: int = Field(..., ge=0, description="左上角纵坐标")
+    width: int = Field(..., gt=0, description="宽度")
+    height: int = Field(..., gt=0, description="高度")
+    
+    def as_tuple(self):
+        return (self.x, self.y, self.width, self.height)
 
 
 class OCRRecognizeRequest(BaseModel):
     """OCR识别请求"""
     file_id: str = Field(..., description="已上传的文件ID")
+    region: Optional[OCRRegion] = Field(None, description="只识别该区域，结果不保存、不缓存")
+    tiled: Optional[bool] = Field(None, description="是否分块识别，默认按配置自动判断")
+
+
+class OCRBatchRecognizeRequest(BaseModel):
+    """批量OCR识别请求"""
+    file_ids: List[str] = Field(..., min_length=1, description="已上传的文件ID列表")
 
 
 class OCRRecognizeResponse(BaseModel):
@@ -21,12 +41,72 @@ class OCRRecognizeResponse(BaseModel):
     text: str = Field(..., description="识别的完整文本")
     details: List[OCRTextDetail] = Field(default=[], description="详细识别结果")
     error: Optional[str] = Field(None, description="错误信息")
+    page_count: Optional[int] = Field(None, description="页数（多页文档）")
     
     class Config:
         from_attributes = True
 
 
+class OCRPageResultResponse(BaseModel):
+    """多页文档的单页识别结果"""
+    page: int = Field(..., description="页码（从1开始）")
+    success: bool = Field(..., description="该页是否识别成功")
+    text: str = Field(..., description="该页识别的文本")
+    details: List[OCRTextDetail] = Field(default=[], description="详细识别结果，坐标为页面栅格化后的像素坐标")
+    error: Optional[str] = Field(None, description="错误信息")
+
+
+class OCRBatchItemResult(OCRRecognizeResponse):
+    """批量识别中单个文件的结果"""
+    file_id: str = Field(..., description="文件ID")
+
+
+class OCRUploadRecognizeResponse(OCRRecognizeResponse):
+    """上传并识别的响应"""
+    file_id: Optional[str] = Field(None, description="归档后的文件ID，未归档时为空")
+
+
 class OCREditRequest(BaseModel):
     """OCR结果编辑请求"""
     file_id: str = Field(..., description="文件ID")
     edited_text: str = Field(..., min_length=1, description="编辑后的文本")
+
+
+class OCRStoredResultResponse(BaseModel):
+    """已保存的OCR识别结果"""
+    file_id: str = Field(..., description="文件ID")
+    text: str = Field(..., description="识别的原始文本")
+    details: List[OCRTextDetail] = Field(default=[], description="详细识别结果")
+    edited_text: Optional[str] = Field(None, description="最新编辑后的文本")
+    revision: int = Field(0, description="当前编辑版本号，0表示未编辑")
+    model_version: Optional[str] = Field(None, description="识别所用的模型版本")
+    created_at: Optional[datetime] = Field(None, description="创建时间")
+    updated_at: Optional[datetime] = Field(None, description="更新时间")
+
+
+class OCRRevisionResponse(BaseModel):
+    """OCR结果编辑版本"""
+    revision: int = Field(..., description="版本号")
+    text: str = Field(..., description="该版本的文本")
+    created_at: datetime = Field(..., description="编辑时间")
+    
+    class Config:
+        from_attributes = True
+
+
+class OCRJobCreateRequest(BaseModel):
+    """创建OCR异步任务请求"""
+    file_id: str = Field(..., description="已上传的文件ID")
+
+
+class OCRJobResponse(BaseModel):
+    """OCR异步任务状态"""
+    job_id: str = Field(..., description="任务ID")
+    file_id: str = Field(..., description="文件ID")
+    status: Literal['queued', 'processing', 'succeeded', 'failed'] = Field(..., description="任务状态")
+    progress: int = Field(0, ge=0, le=100, description="进度百分比")
+    stage: str = Field(..., description="当前阶段")
+    result: Optional[OCRRecognizeResponse] = Field(None, description="识别结果（成功后返回）")
+    error: Optional[str] = Field(None, description="错误信息")
+    created_at: datetime = Field(..., description="创建时间")
+    updated_at: datetime = Field(..., description="更新时间")
@@ -12,11 +12,35 @@ class FileUploadResponse(BaseModel):
     file_size: int
     content_type: str
     uploaded_at: datetime
+    thumbnail_url: Optional[str] = Field(default=None, description="缩略图地址（WebP）")
+    preview_url: Optional[str] = Field(default=None, description="预览图地址（WebP）")
     
     class Config:
         from_attributes = True
 
 
+class FilePrecheckRequest(BaseModel):
+    """上传预检请求：先提交文件哈希，服务端已有相同内容时无需上传"""
+    file_hash: str = Field(..., min_length=32, max_length=32, pattern="^[0-9a-f]+$", description="文件内容的BLAKE2b哈希（16字节摘要的十六进制）")
+    file_size: int = Field(..., gt=0, description="文件大小（字节）")
+    filename: str = Field(..., min_length=1, max_length=255, description="原始文件名")
+    content_type: str = Field(..., description="文件MIME类型")
+    challenge: Optional[str] = Field(default=None, description="第一次预检返回的挑战令牌")
+    proof: Optional[str] = Field(default=None, max_length=64, description="挑战对应的持有证明")
+
+
+class FilePrecheckChallenge(BaseModel):
+    """上传预检挑战：证明客户端持有文件内容
+
+    proof = BLAKE2b(bytes.fromhex(nonce) + 文件[offset:offset+length])（digest_size=16）的十六进制，
+    连同 challenge 再次提交预检。
+    """
+    challenge: str = Field(..., description="挑战令牌（有效期 UPLOAD_PRECHECK_CHALLENGE_TTL 秒）")
+    nonce: str = Field(..., description="随机数（十六进制）")
+    offset: int = Field(..., description="要读取的起始字节")
+    length: int = Field(..., description="要读取的字节数")
+
+
 class TextInputRequest(BaseModel):
     """文本输入请求"""
     text: str = Field(..., min_length=1, max_length=10000, description="输入的文本内容")
@@ -1,4 +1,10 @@
 """服务层模块"""
 from app.services.ocr_service import OCRService, get_ocr_service
+from app.services.ocr_engine_pool import OCREnginePool, get_ocr_engine_pool
+from app.services.ocr_pool import OCRWorkerPool, get_ocr_pool
 
-__all__ = ["OCRService", "get_ocr_service"]
+__all__ = [
+    "OCRService", "get_ocr_service",
+    "OCREnginePool", "get_ocr_engine_pool",
+    "OCRWorkerPool", "get_ocr_pool"
+]
@@ -0,0 +1,222 @@
+"""按内容寻址的上传文件存储
+
+文件按内容哈希保存在存储后端的 blobs/<哈希前2位>/<哈希第3-4位>/<哈希><扩展名>，
+相同内容只保存一份，file_blobs 表记录每份文件被多少条上传记录引用。
+"""
+import os
+import uuid
+from pathlib import Path
+from typing import Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from fastapi import UploadFile
+from app.models.upload import FileBlob
+from app.services.derivatives import DerivativeStore
+from app.services.storage import get_storage
+from app.utils.file_handler import FileManager
+from app.utils.logger import logging
+from app.utils.timing import span
+
+
+class BlobStore:
+    """内容寻址存储
+
+    上传先流式写入临时目录并计算哈希，已有相同内容时直接丢弃临时文件、增加引用计数；
+    客户端也可以先用哈希预检，已存在时完全跳过上传。
+
+    引用计数用 UPDATE ... SET ref_count = ref_count ± 1 在数据库中原子地增减，并发上传或删除
+    相同内容时不会丢失更新；物理文件只在释放引用的事务提交之后才删除（见 release/purge）。
+    """
+
+    BLOB_DIR = "blobs"
+    TEMP_DIR = "tmp"
+
+    def __init__(self):
+        self.file_manager = FileManager()
+        # 临时文件写在本机，完成后再放入存储后端
+        self.root = self.file_manager.upload_dir
+        self.storage = get_storage()
+
+    def blob_key(self, file_hash: str, extension: str = "") -> str:
+        """
+        文件在存储中的键（按哈希前缀分两级目录，避免单个目录文件过多）
+        
+        Args:
+            file_hash: 文件内容哈希
+            extension: 扩展名（含点），保留扩展名以便按格式识别
+        
+        Returns:
+            存储键
+        """
+        return f"{self.BLOB_DIR}/{file_hash[:2]}/{file_hash[2:4]}/{file_hash}{extension.lower()}"
+
+    def get(self, db: Session, file_hash: Optional[str]) -> Optional[FileBlob]:
+        """获取哈希对应的已存储文件，记录存在但文件丢失时返回None"""
+        if not file_hash:
+            return None
+        blob = db.query(FileBlob).filter(FileBlob.file_hash == file_hash).first()
+        if blob is None or not self.storage.exists(blob.file_path):
+            return None
+        return blob
+
+    def write_temp(self, file: UploadFile, max_size: Optional[int] = None) -> Tuple[str, int, str]:
+        """
+        将上传内容流式写入临时文件，同时计算哈希和检查大小
+
+        Args:
+            file: 上传的文件
+            max_size: 最大字节数
+
+        Returns:
+            (临时文件路径, 文件大小, 文件内容哈希)
+
+        Raises:
+            FileTooLargeError: 文件超过大小限制
+        """
+        temp_name = Path(self.TEMP_DIR) / uuid.uuid4().hex
+        return self.file_manager.save_stream(file, str(temp_name), max_size)
+
+    @staticmethod
+    def discard_temp(temp_path: str) -> None:
+        """删除未被采用的临时文件"""
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+    def add(self, db: Session, temp_path: str, file_size: int, file_hash: str, extension: str) -> FileBlob:
+        """
+        将临时文件加入存储并增加一次引用（已存在相同内容时丢弃临时文件）
+
+        Args:
+            db: 数据库会话（调用方负责提交）
+            temp_path: write_temp 写入的临时文件
+            file_size: 文件大小
+            file_hash: 文件内容哈希
+            extension: 扩展名（含点）
+
+        Returns:
+            存储记录
+        """
+        blob = db.query(FileBlob).filter(FileBlob.file_hash == file_hash).first()
+        if blob is not None and self.storage.exists(blob.file_path):
+            self.discard_temp(temp_path)
+            return self.increment(db, blob, 1)
+
+        # 新内容，或记录存在但文件已丢失：放入存储（并发写入相同内容时写的是同一个键、同样的内容）
+        key = self.storage.key_of(blob.file_path) if blob is not None else self.blob_key(file_hash, extension)
+        with span("storage"):
+            file_path = self.storage.put_file(key, temp_path)
+        if blob is not None:
+            return self.increment(db, blob, 1)
+
+        try:
+            # 在保存点中插入，另一个请求同时插入了相同哈希时只回滚这一步
+            with db.begin_nested():
+                blob = FileBlob(file_hash=file_hash, file_path=file_path, file_size=file_size, ref_count=1)
+                db.add(blob)
+        except IntegrityError:
+            blob = db.query(FileBlob).filter(FileBlob.file_hash == file_hash).one()
+            blob = self.increment(db, blob, 1)
+        return blob
+
+    @staticmethod
+    def increment(db: Session, blob: FileBlob, delta: int) -> FileBlob:
+        """在数据库中原子地增减引用计数，并重新读取最新的计数"""
+        db.query(FileBlob).filter(FileBlob.file_hash == blob.file_hash).update(
+            {FileBlob.ref_count: FileBlob.ref_count + delta},
+            synchronize_session=False
+        )
+        db.refresh(blob)
+        return blob
+
+    def add_bytes(
+        self,
+        db: Session,
+        content: bytes,
+        extension: str,
+        file_hash: Optional[str] = None
+    ) -> FileBlob:
+        """
+        将内存中的文件内容加入存储并增加一次引用
+
+        Args:
+            db: 数据库会话（调用方负责提交）
+            content: 文件内容
+            extension: 扩展名（含点）
+            file_hash: 已计算的内容哈希，未提供时在这里计算
+
+        Returns:
+            存储记录
+        """
+        file_hash = file_hash or FileManager.calculate_bytes_hash(content)
+        blob = self.get(db, file_hash)
+        if blob is not None:
+            return self.increment(db, blob, 1)
+        temp_path, file_size = self.file_manager.save_bytes(content, str(Path(self.TEMP_DIR) / uuid.uuid4().hex))
+        return self.add(db, temp_path, file_size, file_hash, extension)
+
+    def acquire(self, db: Session, file_hash: str) -> Optional[FileBlob]:
+        """
+        为已存储的文件增加一次引用（预检命中时使用，无需上传内容）
+
+        Args:
+            db: 数据库会话（调用方负责提交）
+            file_hash: 文件内容哈希
+
+        Returns:
+            存储记录，不存在时返回None
+        """
+        blob = self.get(db, file_hash)
+        if blob is None:
+            return None
+        return self.increment(db, blob, 1)
+
+    def release(self, db: Session, file_path: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        释放一次引用，引用数降为0时删除存储记录
+
+        物理文件不在这里删除：调用方提交事务成功后再对返回值调用 purge()，
+        提交失败回滚时文件仍然存在，数据库记录不会指向已删除的文件。
+
+        Args:
+            db: 数据库会话（调用方负责提交）
+            file_path: 上传记录中的文件路径
+
+        Returns:
+            提交后需要删除的 (文件路径, 内容哈希)；不在存储中的文件（按内容寻址之前上传的文件）
+            哈希为None；仍有其他引用时返回None
+        """
+        blob = db.query(FileBlob).filter(FileBlob.file_path == file_path).first()
+        if blob is None:
+            return file_path, None
+        blob = self.increment(db, blob, -1)
+        if blob.ref_count > 0:
+            return None
+        # 只有计数仍为0时才删除记录：并发的 acquire 已增加引用时不删除
+        deleted = db.query(FileBlob).filter(
+            FileBlob.file_hash == blob.file_hash,
+            FileBlob.ref_count <= 0
+        ).delete(synchronize_session=False)
+        db.expunge(blob)
+        return (blob.file_path, blob.file_hash) if deleted else None
+
+    def purge(self, db: Session, orphan: Optional[Tuple[str, Optional[str]]]) -> None:
+        """
+        删除 release() 返回的不再被引用的文件及其派生图（在释放引用的事务提交之后调用）
+
+        Args:
+            db: 数据库会话
+            orphan: release() 的返回值，为None时不做任何事
+        """
+        if orphan is None:
+            return
+        file_path, file_hash = orphan
+        # 提交之后又有上传写入了相同内容（新建了存储记录）时保留文件
+        if file_hash is not None and db.query(FileBlob).filter(FileBlob.file_path == file_path).first() is not None:
+            return
+        self.file_manager.delete_file(file_path)
+        if file_hash is not None:
+            DerivativeStore().delete(file_hash)
+            logging.info(f"删除不再被引用的文件: {file_path}")
+
@@ -0,0 +1,109 @@
+"""文本分类结果缓存"""
+import hashlib
+import re
+import threading
+import unicodedata
+from typing import Dict, Optional
+from app.core.config import settings
+from app.utils.cache import TieredCache
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化待分类文本：全角转半角（NFKC）、合并空白、转小写
+
+    只影响缓存键，分类和信息提取仍使用原文。
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().lower()
+
+
+class ClassificationCache:
+    """LLM分类结果缓存
+
+    以 (规范化文本的哈希, 提示词版本, 模型名称) 为键，只缓存LLM给出的类型和置信度。
+    日期、时间等提取信息在每次读取时由规则方法根据原文重新计算，"明天"之类的相对日期
+    总是相对于读取当天解析，缓存跨天仍然正确。
+    """
+
+    def __init__(self, cache: TieredCache, prompt_version: str, model: str, enabled: bool = True):
+        self.cache = cache
+        self.prompt_version = prompt_version
+        self.model = model
+        self.enabled = enabled
+
+    @property
+    def shared(self) -> bool:
+        """是否启用了Redis共享缓存（读写会有网络请求）"""
+        return self.enabled and self.cache._redis() is not None
+
+    def make_key(self, text: str) -> str:
+        """生成缓存键"""
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{digest}:{self.prompt_version}:{self.model}"
+
+    def get(self, text: str) -> Optional[Dict]:
+        """
+        查询缓存的分类结果
+
+        Args:
+            text: 待分类的文本
+
+        Returns:
+            {"type", "confidence"}，未命中时返回None
+        """
+        if not self.enabled or not text:
+            return None
+        return self.cache.get(self.make_key(text))
+
+    def set(self, text: str, classification: Dict) -> None:
+        """
+        缓存LLM分类结果
+
+        Args:
+            text: 待分类的文本
+            classification: LLM给出的 {"type", "confidence"}
+        """
+        if not self.enabled or not text:
+            return
+        self.cache.set(self.make_key(text), {
+            "type": classification["type"],
+            "confidence": classification["confidence"]
+        })
+
+    def stats(self) -> Dict:
+        """获取缓存统计"""
+        stats = self.cache.stats()
+        stats.update({
+            "enabled": self.enabled,
+            "prompt_version": self.prompt_version,
+            "model": self.model
+        })
+        return stats
+
+
+# 全局分类缓存实例
+_classification_cache: Optional[ClassificationCache] = None
+_classification_cache_lock = threading.Lock()
+
+
+def get_classification_cache() -> ClassificationCache:
+    """获取分类结果缓存实例（单例模式）"""
+    from app.services.classification_service import ClassificationService
+
+    global _classification_cache
+    with _classification_cache_lock:
+        if _classification_cache is None:
+            _classification_cache = ClassificationCache(
+                TieredCache(
+                    namespace="classify",
+                    max_entries=settings.CLASSIFY_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.CLASSIFY_CACHE_TTL,
+                    use_redis=settings.CLASSIFY_CACHE_USE_REDIS
+                ),
+                prompt_version=ClassificationService.PROMPT_VERSION,
+                model=settings.LLM_MODEL,
+                enabled=settings.CLASSIFY_CACHE_ENABLED
+            )
+    return _classification_cache
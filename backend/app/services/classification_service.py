@@ -1,11 +1,23 @@
 """AI分类服务"""
 import re
 import json
-import httpx
+from collections import Counter
+from time import perf_counter
 from typing import Dict, Optional, List, Tuple
 from datetime import datetime, date, time
 from app.utils.logger import logging
 from app.core.config import settings
+from app.services.classification_cache import ClassificationCache, get_classification_cache
+from app.services.executors import run_io
+from app.services.llm_gateway import LLMGateway, LLMUnavailableError, MicroBatcher, get_llm_gateway
+from app.services.local_classifier import LocalClassifierService, get_local_classifier_service
+from app.services.rule_classifier import compile_rules
+from app.utils.metrics import CLASSIFY_TIER_DURATION
+from app.utils.timing import span, timed
+
+# 流式回复中已完整给出的类型和置信度字段（置信度之后出现分隔符才算完整，避免把 0.85 截成 0.8）
+_TYPE_FIELD = re.compile(r'"type"\s*:\s*"(schedule|memo)"')
+_CONFIDENCE_FIELD = re.compile(r'"confidence"\s*:\s*"?(\d+(?:\.\d+)?)"?\s*[,}\n]')
 
 
 class ClassificationService:
@@ -17,7 +29,6 @@ class ClassificationService:
     # LLM API配置
     LLM_API_URL = getattr(settings, 'LLM_API_URL', 'http://localhost:8000/v1/chat/completions')
     LLM_MODEL = getattr(settings, 'LLM_MODEL', 'Qwen/Qwen2-VL-7B-Instruct')
-    LLM_TIMEOUT = 30.0  # 超时时间（秒）
     
     # 日程关键词
     SCHEDULE_KEYWORDS = [
@@ -39,7 +50,7 @@ class ClassificationService:
     TIME_PATTERNS = [
         r'\d{1,2}[：:]\d{2}',  # 14:30, 14：30
         r'\d{1,2}点\d{0,2}分?',  # 14点30分, 14点
-        r'(上午|下午|晚上|早上)\d{1,2}点',  # 下午2点
+        r'(上午|下午|晚上|早上)\d{1,2}点\d{0,2}分?',  # 下午2点, 下午2点30分
         r'\d{1,2}\s*(am|pm|AM|PM)',  # 2 pm
     ]
     
@@ -52,15 +63,69 @@ class ClassificationService:
         r'(周|星期)(一|二|三|四|五|六|日|天)',
     ]
     
-    def __init__(self):
-        """初始化分类服务"""
-        self.use_llm = True  # 默认使用LLM
-        self.client = httpx.AsyncClient(timeout=self.LLM_TIMEOUT)
-        logging.info(f"分类服务初始化成功 (LLM模式: {self.use_llm}, API: {self.LLM_API_URL})")
+    # 日程安排与备忘录的区分说明（单条和批量提示词共用）
+    CLASSIFY_GUIDE = """日程安排的特征：
+- 包含明确的时间信息（日期、时间）
+- 描述未来要做的事情
+- 通常包含会议、约会、活动等关键词
+
+备忘录的特征：
+- 记录想法、心得、笔记
+- 没有明确的时间要求
+- 通常是个人记录或总结"""
+
+    SYSTEM_PROMPT = "你是一个文本分类助手，擅长区分日程安排和备忘录。"
+
+    # 提示词版本，参与分类缓存键；修改提示词后需要递增，旧的缓存结果自动失效
+    PROMPT_VERSION = "2"
+
+    def __init__(
+        self,
+        gateway: Optional[LLMGateway] = None,
+        cache: Optional[ClassificationCache] = None,
+        local: Optional[LocalClassifierService] = None
+    ):
+        """
+        初始化分类服务
+
+        Args:
+            gateway: LLM网关，默认使用全局实例
+            cache: 分类结果缓存，默认使用全局实例
+            local: 本地分类器，默认使用全局实例
+        """
+        self.use_llm = settings.LLM_ENABLED
+        self.stream = settings.LLM_STREAM
+        self.reasoning = settings.LLM_CLASSIFY_REASONING
+        self.gateway = gateway or get_llm_gateway()
+        self.cache = cache or get_classification_cache()
+        self.local = local or get_local_classifier_service()
+        # 各分类层的调用次数和累计耗时（秒），以及本地分类器直接给出结果和升级到下一层的次数
+        self._tier_counts: Counter = Counter()
+        self._tier_seconds: Counter = Counter()
+        self._local_outcomes: Counter = Counter()
+        # 规则分类器按类属性中的模式和关键词编译，相同规则只编译一次
+        self.rules = compile_rules(
+            tuple(self.TIME_PATTERNS),
+            tuple(self.DATE_PATTERNS),
+            tuple(self.SCHEDULE_KEYWORDS),
+            tuple(self.MEMO_KEYWORDS)
+        )
+        # 短时间内到达的分类请求合并为一次LLM调用
+        self.batcher = MicroBatcher(
+            self._classify_batch_with_llm,
+            settings.LLM_BATCH_WINDOW_MS / 1000,
+            settings.LLM_BATCH_MAX_SIZE
+        )
+        logging.info(f"分类服务初始化成功 (LLM模式: {self.use_llm}, API: {self.gateway.url})")
     
     async def classify_text_with_llm(self, text: str) -> Dict:
         """
         使用LLM分类文本内容
+
+        规范化后相同的文本直接使用缓存的分类结果；未命中时同一时间窗口内的请求经
+        MicroBatcher 合并为一次LLM调用。LLM不可用（熔断、超时、返回错误）或结果
+        无法解析时使用规则方法（规则结果不缓存）。本地分类器已训练时先由它分类，
+        置信度达到 LOCAL_CLASSIFIER_THRESHOLD 时不再请求LLM。
         
         Args:
             text: 待分类的文本
@@ -68,17 +133,215 @@ class ClassificationService:
         Returns:
             分类结果字典
         """
-        prompt = f"""请分析以下文本，判断它是"日程安排"还是"备忘录"。
+        local = self._classify_locally(text)
+        if local is not None:
+            return self._build_result(text, local)
 
-日程安排的特征：
-- 包含明确的时间信息（日期、时间）
-- 描述未来要做的事情
-- 通常包含会议、约会、活动等关键词
+        if not self.use_llm:
+            return self._fallback_classify(text)
 
-备忘录的特征：
-- 记录想法、心得、笔记
-- 没有明确的时间要求
-- 通常是个人记录或总结
+        classification = await self._cache_get(text)
+        if classification is None:
+            started = perf_counter()
+            try:
+                with span("llm"):
+                    classification = await self.batcher.submit(text)
+            except LLMUnavailableError as e:
+                logging.warning(f"LLM不可用，使用规则方法: {str(e)}")
+                return self._fallback_classify(text)
+            except Exception as e:
+                logging.error(f"LLM分类失败: {str(e)}")
+                return self._fallback_classify(text)
+            finally:
+                self._observe_tier("llm", perf_counter() - started)
+            await self._cache_set(text, classification)
+
+        return self._build_result(text, classification)
+
+    async def classify_segments(self, texts: List[str]) -> List[Dict]:
+        """
+        分类同一页中的多个条目
+
+        本地分类器能确定的条目直接采用，其余未命中缓存的条目合并为一次LLM调用（超过
+        CLASSIFY_BATCH_MAX_SEGMENTS 时分成多次），LLM不可用时全部使用规则方法，
+        LLM未给出结果的条目单独使用规则方法。
+
+        Args:
+            texts: 各条目的文本
+
+        Returns:
+            与 texts 顺序相同的分类结果字典，额外包含 source（local/llm/cache/rules）
+        """
+        results: List[Optional[Dict]] = [None] * len(texts)
+        pending: List[int] = []
+        for i, text in enumerate(texts):
+            local = self._classify_locally(text)
+            if local is not None:
+                results[i] = dict(self._build_result(text, local), source="local")
+                continue
+            if not self.use_llm:
+                results[i] = dict(self._fallback_classify(text), source="rules")
+                continue
+            cached = await self._cache_get(text)
+            if cached is not None:
+                results[i] = dict(self._build_result(text, cached), source="cache")
+            else:
+                pending.append(i)
+
+        chunk_size = max(1, settings.CLASSIFY_BATCH_MAX_SEGMENTS)
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            started = perf_counter()
+            try:
+                with span("llm"):
+                    classifications = await self._classify_batch_with_llm([texts[i] for i in chunk])
+            except LLMUnavailableError as e:
+                logging.warning(f"LLM不可用，{len(chunk)} 个条目使用规则方法: {str(e)}")
+                classifications = [e] * len(chunk)
+            except Exception as e:
+                logging.error(f"LLM批量分类失败: {str(e)}")
+                classifications = [e] * len(chunk)
+            finally:
+                self._observe_tier("llm", perf_counter() - started)
+            for i, classification in zip(chunk, classifications):
+                if isinstance(classification, Exception):
+                    results[i] = dict(self._fallback_classify(texts[i]), source="rules")
+                else:
+                    await self._cache_set(texts[i], classification)
+                    results[i] = dict(self._build_result(texts[i], classification), source="llm")
+        return results
+
+    def _build_result(self, text: str, classification: Dict) -> Dict:
+        """由LLM给出的类型和置信度生成分类结果（每次按原文重新提取信息，相对日期相对于当天解析）"""
+        if classification['type'] == 'schedule':
+            extracted_data = self.extract_schedule_info(text)
+        else:
+            extracted_data = self.extract_memo_info(text)
+
+        return {
+            "type": classification['type'],
+            "confidence": classification['confidence'],
+            "extracted_data": extracted_data
+        }
+
+    def _classify_locally(self, text: str) -> Optional[Dict]:
+        """第一层：本地分类器，尚未训练或置信度不足时返回None（升级到缓存/LLM）"""
+        model = self.local.model
+        if model is None or not text or not text.strip():
+            return None
+        started = perf_counter()
+        with span("local"):
+            prediction = model.predict(text)
+        self._observe_tier("local", perf_counter() - started)
+        if prediction["confidence"] >= settings.LOCAL_CLASSIFIER_THRESHOLD:
+            self._local_outcomes["answered"] += 1
+            return prediction
+        self._local_outcomes["escalated"] += 1
+        return None
+
+    def _observe_tier(self, tier: str, seconds: float) -> None:
+        self._tier_counts[tier] += 1
+        self._tier_seconds[tier] += seconds
+        CLASSIFY_TIER_DURATION.observe(seconds, tier=tier)
+
+    def tier_stats(self) -> Dict:
+        """
+        获取各分类层的统计
+
+        Returns:
+            - local_answered / escalated: 本地分类器直接给出结果、升级到下一层的次数
+            - escalation_rate: 升级比例（本地分类器未启用或尚未训练时为None）
+            - tiers: 各层（local/cache/llm/rules）的调用次数和平均耗时（毫秒）
+        """
+        answered = self._local_outcomes["answered"]
+        escalated = self._local_outcomes["escalated"]
+        return {
+            "local_answered": answered,
+            "escalated": escalated,
+            "escalation_rate": round(escalated / (answered + escalated), 4) if answered + escalated else None,
+            "tiers": {
+                tier: {"count": count, "avg_ms": round(self._tier_seconds[tier] / count * 1000, 3)}
+                for tier, count in self._tier_counts.items()
+            }
+        }
+
+    async def _cache_get(self, text: str) -> Optional[Dict]:
+        # 只有进程内缓存时直接读写，启用Redis时在线程池中执行，不阻塞事件循环
+        started = perf_counter()
+        if self.cache.shared:
+            classification = await run_io(self.cache.get, text)
+        else:
+            classification = self.cache.get(text)
+        self._observe_tier("cache", perf_counter() - started)
+        return classification
+
+    async def _cache_set(self, text: str, classification: Dict) -> None:
+        if self.cache.shared:
+            await run_io(self.cache.set, text, classification)
+        else:
+            self.cache.set(text, classification)
+
+    async def _classify_batch_with_llm(self, texts: List[str]) -> List:
+        """
+        一次LLM调用分类多段文本
+
+        Args:
+            texts: 待分类的文本列表
+
+        Returns:
+            与 texts 顺序相同的结果列表，每项为 {"type", "confidence"}，
+            LLM未给出或无法解析的项为 ValueError 实例
+
+        Raises:
+            LLMUnavailableError: LLM服务不可用
+        """
+        if len(texts) == 1:
+            # 单条分类只需要回复开头的类型和置信度，流式读取时得到这两个字段即结束生成
+            content = await self.gateway.chat(
+                [
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
+                    {"role": "user", "content": self._build_prompt(texts[0])}
+                ],
+                max_tokens=200 if self.reasoning else 60,
+                until=(lambda partial: self._extract_fields(partial) is not None) if self.stream else None
+            )
+            try:
+                return [self._parse_single(content)]
+            except ValueError as e:
+                return [e]
+
+        content = await self.gateway.chat(
+            [
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": self._build_batch_prompt(texts)}
+            ],
+            max_tokens=40 + 30 * len(texts),
+            items=len(texts)
+        )
+        results: List = [ValueError(f"LLM未返回第 {i + 1} 段文本的分类结果") for i in range(len(texts))]
+        try:
+            items = self._parse_json(content)
+            if isinstance(items, dict):
+                items = items.get("results", [])
+            for position, item in enumerate(items if isinstance(items, list) else []):
+                if not isinstance(item, dict):
+                    continue
+                index = item.get("index", position + 1)
+                if isinstance(index, int) and 1 <= index <= len(texts):
+                    try:
+                        results[index - 1] = self._parse_classification(item)
+                    except ValueError as e:
+                        results[index - 1] = e
+        except ValueError as e:
+            logging.warning(f"LLM批量分类结果无法解析: {str(e)}")
+        return results
+
+    def _build_prompt(self, text: str) -> str:
+        """单段文本的分类提示词（按 LLM_CLASSIFY_REASONING 决定是否要求分类理由，理由放在最后）"""
+        reasoning = ',\n    "reasoning": "分类理由"' if self.reasoning else ''
+        return f"""请分析以下文本，判断它是"日程安排"还是"备忘录"。
+
+{self.CLASSIFY_GUIDE}
 
 文本内容：
 {text}
@@ -86,65 +349,80 @@ class ClassificationService:
 请以JSON格式返回结果，包含以下字段：
 {{
     "type": "schedule" 或 "memo",
-    "confidence": 0.0-1.0之间的置信度,
-    "reasoning": "分类理由"
+    "confidence": 0.0-1.0之间的置信度{reasoning}
 }}
 
 只返回JSON，不要其他内容。"""
 
+    def _build_batch_prompt(self, texts: List[str]) -> str:
+        """多段文本的分类提示词（文本以JSON数组给出，避免换行造成歧义）"""
+        entries = json.dumps(
+            [{"index": i + 1, "text": text} for i, text in enumerate(texts)],
+            ensure_ascii=False,
+            indent=2
+        )
+        return f"""请分别判断以下每段文本是"日程安排"还是"备忘录"。
+
+{self.CLASSIFY_GUIDE}
+
+文本列表（JSON数组）：
+{entries}
+
+请以JSON数组格式返回结果，每段文本一项，按 index 对应：
+[
+    {{"index": 1, "type": "schedule" 或 "memo", "confidence": 0.0-1.0之间的置信度}}
+]
+
+只返回JSON，不要其他内容。"""
+
+    @staticmethod
+    def _parse_json(content: str):
+        """解析LLM回复中的JSON（可能包含在markdown代码块中）"""
+        if '```json' in content:
+            content = content.split('```json')[1].split('```')[0].strip()
+        elif '```' in content:
+            content = content.split('```')[1].split('```')[0].strip()
+        return json.loads(content)
+
+    @staticmethod
+    def _extract_fields(content: str) -> Optional[Dict]:
+        """
+        从可能不完整的回复中提取类型和置信度
+
+        Args:
+            content: 已收到的回复内容
+
+        Returns:
+            {"type", "confidence"}，两个字段尚未完整给出时返回None
+        """
+        type_match = _TYPE_FIELD.search(content)
+        confidence_match = _CONFIDENCE_FIELD.search(content)
+        if type_match is None or confidence_match is None:
+            return None
+        return {"type": type_match.group(1), "confidence": max(0.0, min(float(confidence_match.group(1)), 1.0))}
+
+    def _parse_single(self, content: str) -> Dict:
+        """解析单条分类的回复，提前结束的流式回复不是完整的JSON，从中提取字段"""
         try:
-            response = await self.client.post(
-                self.LLM_API_URL,
-                json={
-                    "model": self.LLM_MODEL,
-                    "messages": [
-                        {"role": "system", "content": "你是一个文本分类助手，擅长区分日程安排和备忘录。"},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.3,
-                    "max_tokens": 200
-                }
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                # 兼容不同的API响应格式
-                choice = result['choices'][0]
-                if 'messages' in choice:
-                    content = choice['messages']['content']
-                elif 'message' in choice:
-                    content = choice['message']['content']
-                else:
-                    content = choice.get('content', '')
-                
-                # 解析JSON响应
-                # 尝试提取JSON（可能包含在markdown代码块中）
-                if '```json' in content:
-                    content = content.split('```json')[1].split('```')[0].strip()
-                elif '```' in content:
-                    content = content.split('```')[1].split('```')[0].strip()
-                
-                classification = json.loads(content)
-                
-                # 根据分类类型提取信息
-                if classification['type'] == 'schedule':
-                    extracted_data = self.extract_schedule_info(text)
-                else:
-                    extracted_data = self.extract_memo_info(text)
-                
-                return {
-                    "type": classification['type'],
-                    "confidence": float(classification['confidence']),
-                    "extracted_data": extracted_data
-                }
-            else:
-                logging.warning(f"LLM API返回错误: {response.status_code}")
-                return self._fallback_classify(text)
-                
-        except Exception as e:
-            logging.error(f"LLM分类失败: {str(e)}")
-            return self._fallback_classify(text)
+            return self._parse_classification(self._parse_json(content))
+        except ValueError:
+            fields = self._extract_fields(content)
+            if fields is None:
+                raise
+            return fields
+
+    @staticmethod
+    def _parse_classification(data) -> Dict:
+        """校验LLM给出的分类结果，置信度限制在0~1之间"""
+        if not isinstance(data, dict) or data.get('type') not in ('schedule', 'memo'):
+            raise ValueError(f"LLM分类结果无效: {data}")
+        try:
+            confidence = float(data['confidence'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"LLM分类置信度无效: {data}")
+        return {"type": data['type'], "confidence": max(0.0, min(confidence, 1.0))}
     
+    @timed("classify")
     def classify_text(self, text: str) -> Dict:
         """
         分类文本内容（同步接口，用于向后兼容）
@@ -182,21 +460,24 @@ class ClassificationService:
         Returns:
             分类结果字典
         """
-        # 计算日程和备忘录的得分
-        schedule_score = self._calculate_schedule_score(text)
-        memo_score = self._calculate_memo_score(text)
+        started = perf_counter()
+        # 一次扫描得出日程和备忘录的得分以及时间、日期片段
+        analysis = self.rules.analyze(text)
+        schedule_score = analysis["schedule_score"]
+        memo_score = analysis["memo_score"]
         
         # 判断类型
         if schedule_score > memo_score:
             classification_type = "schedule"
             confidence = schedule_score
-            extracted_data = self.extract_schedule_info(text)
+            extracted_data = self.extract_schedule_info(text, analysis)
         else:
             classification_type = "memo"
             confidence = memo_score
             extracted_data = self.extract_memo_info(text)
         
         logging.info(f"文本分类结果（规则方法）: {classification_type}, 置信度: {confidence:.2f}")
+        self._observe_tier("rules", perf_counter() - started)
         
         return {
             "type": classification_type,
@@ -206,52 +487,25 @@ class ClassificationService:
     
     def _calculate_schedule_score(self, text: str) -> float:
         """计算日程得分"""
-        score = 0.0
-        text_lower = text.lower()
-        
-        # 检查时间模式
-        has_time = any(re.search(pattern, text) for pattern in self.TIME_PATTERNS)
-        if has_time:
-            score += 0.4
-        
-        # 检查日期模式
-        has_date = any(re.search(pattern, text) for pattern in self.DATE_PATTERNS)
-        if has_date:
-            score += 0.3
-        
-        # 检查日程关键词
-        keyword_count = sum(1 for keyword in self.SCHEDULE_KEYWORDS if keyword in text_lower)
-        score += min(keyword_count * 0.1, 0.3)
-        
-        return min(score, 1.0)
+        return self.rules.analyze(text)["schedule_score"]
     
     def _calculate_memo_score(self, text: str) -> float:
         """计算备忘录得分"""
-        score = 0.4  # 基础分数（降低以避免默认为备忘录）
-        text_lower = text.lower()
-        
-        # 检查备忘录关键词
-        keyword_count = sum(1 for keyword in self.MEMO_KEYWORDS if keyword in text_lower)
-        score += min(keyword_count * 0.15, 0.3)
-        
-        # 如果文本较长且没有明确的时间信息，更可能是备忘录
-        if len(text) > 50:
-            has_time = any(re.search(pattern, text) for pattern in self.TIME_PATTERNS)
-            if not has_time:
-                score += 0.25
-        
-        return min(score, 1.0)
+        return self.rules.analyze(text)["memo_score"]
     
-    def extract_schedule_info(self, text: str) -> Dict:
+    def extract_schedule_info(self, text: str, analysis: Optional[Dict] = None) -> Dict:
         """
         从文本中提取日程信息
         
         Args:
             text: 文本内容
+            analysis: 规则分类器对同一文本的分析结果（已有时传入，避免重复扫描）
             
         Returns:
             包含日程信息的字典
         """
+        if analysis is None:
+            analysis = self.rules.analyze(text)
         info = {
             "date": None,
             "time": None,
@@ -260,7 +514,7 @@ class ClassificationService:
         }
         
         # 提取时间
-        time_str = self._extract_time(text)
+        time_str = analysis["time"]
         if time_str:
             # 标准化时间格式为 HH:MM
             normalized_time = self._normalize_time(time_str)
@@ -269,7 +523,7 @@ class ClassificationService:
                 info["has_time_info"] = True
         
         # 提取日期
-        date_str = self._extract_date(text)
+        date_str = analysis["date"]
         if date_str:
             # 标准化日期格式为 YYYY-MM-DD
             normalized_date = self._normalize_date(date_str)
@@ -277,11 +531,8 @@ class ClassificationService:
                 info["date"] = normalized_date
                 info["has_time_info"] = True
         
-        # 提取事件描述（移除时间和日期信息）
-        description = text
-        for pattern in self.TIME_PATTERNS + self.DATE_PATTERNS:
-            description = re.sub(pattern, '', description)
-        info["description"] = description.strip() or text
+        # 事件描述（移除时间和日期信息）
+        info["description"] = analysis["description"]
         
         return info
     
@@ -305,19 +556,11 @@ class ClassificationService:
     
     def _extract_time(self, text: str) -> Optional[str]:
         """提取时间信息"""
-        for pattern in self.TIME_PATTERNS:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(0)
-        return None
+        return self.rules.analyze(text)["time"]
     
     def _extract_date(self, text: str) -> Optional[str]:
         """提取日期信息"""
-        for pattern in self.DATE_PATTERNS:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(0)
-        return None
+        return self.rules.analyze(text)["date"]
     
     def _generate_summary(self, text: str, max_length: int = 100) -> str:
         """生成文本摘要"""
@@ -0,0 +1,166 @@
+"""上传文件的缩略图和预览图
+
+派生图按内容哈希保存在存储后端的 derivatives/<类型>/<哈希前2位>/<哈希第3-4位>/<哈希>_<尺寸>.webp，
+与原文件一样相同内容只生成一份。上传后在后台生成，请求时不存在则当场生成；
+文件名包含尺寸，修改尺寸配置后自动按新尺寸重新生成。
+"""
+import threading
+import uuid
+from concurrent.futures import Future
+from typing import Optional
+from app.core.config import settings
+from app.services.document_pages import is_document, render_page
+from app.services.storage import get_storage
+from app.utils.file_handler import FileManager
+from app.utils.logger import logging
+
+# 派生图类型
+THUMBNAIL = "thumbnail"
+PREVIEW = "preview"
+KINDS = (THUMBNAIL, PREVIEW)
+
+# 多页文档取第一页生成派生图时的栅格化分辨率
+DOCUMENT_RENDER_DPI = 150
+
+# 编码参数变化时递增，使客户端缓存的旧图失效
+DERIVATIVE_VERSION = 1
+
+# 按路径分片的锁，同一派生图在进程内只生成一次，锁的数量固定
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def derivative_size(kind: str) -> int:
+    """派生图的最长边像素数"""
+    return settings.UPLOAD_THUMBNAIL_SIZE if kind == THUMBNAIL else settings.UPLOAD_PREVIEW_SIZE
+
+
+def derivative_etag(file_hash: str, kind: str) -> str:
+    """派生图的ETag：由文件内容哈希、类型、尺寸和编码版本决定"""
+    return f'"{file_hash}-{kind}{derivative_size(kind)}-v{DERIVATIVE_VERSION}"'
+
+
+def _key_lock(key: str) -> threading.Lock:
+    return _locks[hash(key) % len(_locks)]
+
+
+class DerivativeStore:
+    """缩略图和预览图存储"""
+
+    DERIVATIVE_DIR = "derivatives"
+
+    def __init__(self):
+        self.file_manager = FileManager()
+        self.storage = get_storage()
+
+    def key(self, file_hash: str, kind: str) -> str:
+        """
+        派生图在存储中的键
+
+        Args:
+            file_hash: 原文件内容哈希
+            kind: 派生图类型（thumbnail 或 preview）
+
+        Returns:
+            存储键
+        """
+        return f"{self._prefix(file_hash, kind)}/{file_hash}_{derivative_size(kind)}.webp"
+
+    def _prefix(self, file_hash: str, kind: str) -> str:
+        return f"{self.DERIVATIVE_DIR}/{kind}/{file_hash[:2]}/{file_hash[2:4]}"
+
+    def generate(self, source_path: str, file_hash: str, kind: str) -> str:
+        """
+        从原文件生成派生图（多页文档取第一页）
+
+        Args:
+            source_path: 原文件位置
+            file_hash: 原文件内容哈希
+            kind: 派生图类型
+
+        Returns:
+            派生图的存储键
+
+        Raises:
+            FileNotFoundError: 原文件不存在
+        """
+        from PIL import Image, ImageOps
+
+        size = derivative_size(kind)
+        local_source = self.storage.local_path(source_path)
+        if is_document(local_source):
+            image = render_page(local_source, 1, dpi=DOCUMENT_RENDER_DPI)
+        else:
+            image = Image.open(local_source)
+            # JPEG 按目标尺寸降采样解码，不解码完整的大图
+            image.draft("RGB", (size, size))
+        try:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            image.thumbnail((size, size), Image.LANCZOS)
+
+            # 先编码到本机临时文件，再放入存储，读取方不会看到不完整的文件
+            temp_path = self.file_manager.upload_dir / "tmp" / f"{uuid.uuid4().hex}.webp"
+            temp_path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                image.save(temp_path, format="WEBP", quality=settings.UPLOAD_DERIVATIVE_QUALITY, method=4)
+                key = self.key(file_hash, kind)
+                self.storage.put_file(key, str(temp_path))
+            except BaseException:
+                self.file_manager.delete_local_file(str(temp_path))
+                raise
+        finally:
+            image.close()
+        return key
+
+    def ensure(self, source_path: str, file_hash: str, kind: str) -> str:
+        """
+        获取派生图，不存在时生成（同一进程内同一派生图只生成一次）
+
+        Args:
+            source_path: 原文件位置
+            file_hash: 原文件内容哈希
+            kind: 派生图类型
+
+        Returns:
+            派生图的存储键
+        """
+        key = self.key(file_hash, kind)
+        if self.storage.exists(key):
+            return key
+        with _key_lock(key):
+            if self.storage.exists(key):
+                return key
+            return self.generate(source_path, file_hash, kind)
+
+    def ensure_all(self, source_path: str, file_hash: str) -> None:
+        """生成所有类型的派生图，失败时只记录日志"""
+        for kind in KINDS:
+            try:
+                self.ensure(source_path, file_hash, kind)
+            except Exception as e:
+                logging.warning(f"生成{kind}失败: {source_path}, 错误: {str(e)}")
+
+    def delete(self, file_hash: str) -> None:
+        """删除原文件的所有派生图（包括按旧尺寸配置生成的）"""
+        for kind in KINDS:
+            for key, _, _ in list(self.storage.list(self._prefix(file_hash, kind))):
+                if key.rsplit("/", 1)[-1].startswith(f"{file_hash}_"):
+                    self.storage.delete(key)
+
+
+def schedule_derivatives(source_path: str, file_hash: Optional[str]) -> Optional[Future]:
+    """
+    在文件读写线程池中后台生成派生图
+
+    Args:
+        source_path: 原文件路径
+        file_hash: 原文件内容哈希
+
+    Returns:
+        后台任务，未开启上传时生成或缺少哈希时返回None
+    """
+    if not settings.UPLOAD_DERIVATIVES_ON_UPLOAD or not file_hash:
+        return None
+    from app.services.executors import get_io_executor
+
+    return get_io_executor().submit(DerivativeStore().ensure_all, source_path, file_hash)
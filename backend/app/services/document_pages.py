@@ -0,0 +1,157 @@
+"""多页文档（PDF、多帧TIFF）的按页栅格化和结果合并
+
+页面只在识别该页时才栅格化，识别完即释放，整个文档的图片不会同时驻留内存。
+PDF 使用 PyMuPDF（paddleocr 的依赖）渲染，TIFF 使用 Pillow 逐帧读取。
+"""
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.services.ocr_cascade import TIER_ACCURATE
+from app.services.storage import get_storage
+from app.utils.timing import timed
+
+PDF_FORMATS = ("pdf",)
+TIFF_FORMATS = ("tif", "tiff")
+
+
+def _suffix(path: str) -> str:
+    return Path(path).suffix.lower().lstrip(".")
+
+
+def is_document(path: str) -> bool:
+    """是否为按页识别的多页文档（按扩展名判断）"""
+    return _suffix(path) in settings.ALLOWED_DOCUMENT_FORMATS
+
+
+def count_pages(path: str) -> int:
+    """
+    获取文档页数（只读取文档结构，不栅格化页面）
+
+    Args:
+        path: 文档路径
+
+    Returns:
+        页数
+
+    Raises:
+        ValueError: 不支持的文档格式
+    """
+    suffix = _suffix(path)
+    if suffix in PDF_FORMATS:
+        import fitz
+
+        with fitz.open(path) as document:
+            return document.page_count
+    if suffix in TIFF_FORMATS:
+        from PIL import Image
+
+        with Image.open(path) as img:
+            return getattr(img, "n_frames", 1)
+    raise ValueError(f"不支持的文档格式: {suffix}")
+
+
+def render_page(path: str, page: int, dpi: Optional[int] = None):
+    """
+    栅格化文档的单页
+
+    Args:
+        path: 文档路径
+        page: 页码（从1开始）
+        dpi: 栅格化分辨率，默认使用 OCR_DOCUMENT_DPI；TIFF页面分辨率高于该值时缩小到该分辨率
+
+    Returns:
+        RGB格式的 PIL.Image
+
+    Raises:
+        ValueError: 页码超出范围或不支持的文档格式
+    """
+    dpi = dpi or settings.OCR_DOCUMENT_DPI
+    suffix = _suffix(path)
+    if suffix in PDF_FORMATS:
+        import fitz
+        from PIL import Image
+
+        with fitz.open(path) as document:
+            if not 1 <= page <= document.page_count:
+                raise ValueError(f"页码超出范围: {page}")
+            pixmap = document.load_page(page - 1).get_pixmap(dpi=dpi, alpha=False)
+            return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+    if suffix in TIFF_FORMATS:
+        from PIL import Image
+
+        with Image.open(path) as img:
+            if not 1 <= page <= getattr(img, "n_frames", 1):
+                raise ValueError(f"页码超出范围: {page}")
+            img.seek(page - 1)
+            frame = img.convert("RGB")
+            source_dpi = img.info.get("dpi", (0, 0))[0]
+        if source_dpi and source_dpi > dpi:
+            scale = dpi / source_dpi
+            size = (max(1, round(frame.width * scale)), max(1, round(frame.height * scale)))
+            frame = frame.resize(size, Image.Resampling.BOX)
+        return frame
+
+    raise ValueError(f"不支持的文档格式: {suffix}")
+
+
+@timed("validate")
+def validate_document(path: str) -> Tuple[bool, Optional[str]]:
+    """
+    验证文档是否可以识别（只检查页数，不栅格化页面）
+
+    Args:
+        path: 文档路径
+
+    Returns:
+        (是否有效, 错误信息)
+    """
+    try:
+        path = get_storage().local_path(path)
+    except FileNotFoundError:
+        return False, "文档文件不存在"
+    try:
+        page_count = count_pages(path)
+    except Exception as e:
+        return False, f"文档验证失败: {str(e)}"
+    if page_count < 1:
+        return False, "文档没有页面"
+    if page_count > settings.OCR_DOCUMENT_MAX_PAGES:
+        return False, f"文档页数超过限制。最多允许: {settings.OCR_DOCUMENT_MAX_PAGES} 页"
+    return True, None
+
+
+def merge_page_results(page_results: Dict[int, Dict], page_count: int) -> Dict:
+    """
+    合并各页的识别结果
+
+    Args:
+        page_results: {页码: 该页的识别结果字典}
+        page_count: 文档页数
+
+    Returns:
+        识别结果字典，details 中每行带有 page 字段；另外包含 page_count 和
+        pages（每页的 page、success、error）。任一页失败时 success 为False，
+        成功页的结果仍保留在 details 中
+    """
+    details = []
+    pages = []
+    for page in range(1, page_count + 1):
+        result = page_results.get(page) or {"success": False, "details": [], "error": "未识别"}
+        details.extend(dict(detail, page=page) for detail in result["details"])
+        pages.append({"page": page, "success": result["success"], "error": result.get("error")})
+
+    failed = [p for p in pages if not p["success"]]
+    tiers = [r.get("tier") for r in page_results.values() if r.get("tier")]
+    error = None
+    if failed:
+        error = f"第 {', '.join(str(p['page']) for p in failed)} 页识别失败: {failed[0]['error']}"
+    return {
+        "success": not failed,
+        "text": "\n".join(d["text"] for d in details),
+        "details": details,
+        "error": error,
+        "tier": TIER_ACCURATE if TIER_ACCURATE in tiers else (tiers[0] if tiers else None),
+        "page_count": page_count,
+        "pages": pages
+    }
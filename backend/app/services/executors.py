@@ -0,0 +1,183 @@
+"""异步路由使用的专用线程池
+
+同步路由运行在AnyIO默认线程池中。上传和OCR路由改为 async def 后，阻塞的文件读写和
+推理等待分别交给独立的线程池执行，各自的大小单独配置，OCR请求突增时只会在推理线程池中
+排队，不会占满默认线程池、拖慢日程和备忘录等普通接口。
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+from app.core.config import settings
+from app.utils.logger import logging
+
+T = TypeVar("T")
+
+
+class MeteredExecutor:
+    """记录排队和执行情况的线程池"""
+
+    def __init__(self, name: str, max_workers: int, wait_samples: int = 1000):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._wait_samples = deque(maxlen=wait_samples)
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._queued = 0
+        self._active = 0
+        self._wait_max_ms = 0.0
+
+    def submit(self, fn: Callable[..., T], *args, **kwargs) -> "Future[T]":
+        """提交任务，排队时间和执行状态计入统计"""
+        queued_at = time.perf_counter()
+        with self._lock:
+            self._submitted += 1
+            self._queued += 1
+
+        def run():
+            wait_ms = (time.perf_counter() - queued_at) * 1000
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._wait_samples.append(wait_ms)
+                self._wait_max_ms = max(self._wait_max_ms, wait_ms)
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+                    self._failed += failed
+
+        try:
+            return self._executor.submit(run)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        在线程池中执行阻塞函数并等待结果（不阻塞事件循环）
+
+        Args:
+            fn: 阻塞函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            函数返回值
+        """
+        # 在调用方的上下文中执行，请求内的分阶段计时等上下文变量在线程中同样可用
+        context = contextvars.copy_context()
+        return await asyncio.wrap_future(self.submit(context.run, fn, *args, **kwargs))
+
+    def stats(self) -> Dict:
+        """获取线程池统计（等待时间单位为毫秒）"""
+        with self._lock:
+            samples = sorted(self._wait_samples)
+
+            def percentile(p: float) -> float:
+                if not samples:
+                    return 0.0
+                return round(samples[min(len(samples) - 1, int(p * len(samples)))], 3)
+
+            return {
+                "size": self.max_workers,
+                "active": self._active,
+                "queued": self._queued,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "wait_ms_p50": percentile(0.5),
+                "wait_ms_p95": percentile(0.95),
+                "wait_ms_max": round(self._wait_max_ms, 3)
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭线程池"""
+        self._executor.shutdown(wait=wait)
+
+
+# 全局线程池实例
+_inference_executor: Optional[MeteredExecutor] = None
+_io_executor: Optional[MeteredExecutor] = None
+_executors_lock = threading.Lock()
+
+
+def get_inference_executor() -> MeteredExecutor:
+    """获取推理线程池（单例模式），线程在等待OCR推理（引擎池、进程池或推理进程）时阻塞"""
+    global _inference_executor
+    with _executors_lock:
+        if _inference_executor is None:
+            _inference_executor = MeteredExecutor("ocr-inference-wait", settings.OCR_INFERENCE_THREADS)
+    return _inference_executor
+
+
+def get_io_executor() -> MeteredExecutor:
+    """获取文件读写线程池（单例模式），用于上传文件的流式写入、哈希和相关的数据库操作"""
+    global _io_executor
+    with _executors_lock:
+        if _io_executor is None:
+            _io_executor = MeteredExecutor("upload-io", settings.UPLOAD_IO_THREADS)
+    return _io_executor
+
+
+async def run_inference(fn: Callable[..., T], *args, **kwargs) -> T:
+    """在推理线程池中执行"""
+    return await get_inference_executor().run(fn, *args, **kwargs)
+
+
+async def run_io(fn: Callable[..., T], *args, **kwargs) -> T:
+    """在文件读写线程池中执行"""
+    return await get_io_executor().run(fn, *args, **kwargs)
+
+
+def configure_default_threadpool() -> None:
+    """按配置设置AnyIO默认线程池（同步路由和依赖项使用）的大小，需要在事件循环中调用"""
+    from anyio.to_thread import current_default_thread_limiter
+
+    current_default_thread_limiter().total_tokens = max(1, settings.API_THREADPOOL_SIZE)
+    logging.info(f"默认线程池大小: {settings.API_THREADPOOL_SIZE}")
+
+
+def executor_stats() -> Dict:
+    """获取各线程池的统计"""
+    stats = {
+        "inference": get_inference_executor().stats(),
+        "io": get_io_executor().stats()
+    }
+    try:
+        from anyio.to_thread import current_default_thread_limiter
+
+        limiter = current_default_thread_limiter()
+        stats["default"] = {
+            "size": int(limiter.total_tokens),
+            "active": limiter.borrowed_tokens,
+            "queued": limiter.statistics().tasks_waiting
+        }
+    except Exception:
+        # 不在事件循环中调用时无法读取默认线程池
+        pass
+    return stats
+
+
+def shutdown_executors() -> None:
+    """关闭全局线程池"""
+    global _inference_executor, _io_executor
+    with _executors_lock:
+        for executor in (_inference_executor, _io_executor):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        _inference_executor = None
+        _io_executor = None
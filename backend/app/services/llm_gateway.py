@@ -0,0 +1,393 @@
+"""LLM服务访问网关
+
+所有对 LLM_API_URL 的请求都经过 LLMGateway：
+- 连接池：显式限制连接数和保持连接数，复用到模型服务的连接；
+- 并发上限：同时进行的请求数不超过 LLM_MAX_CONCURRENCY，其余请求排队，排队超时视为不可用；
+- 自适应超时：按近期响应时间的平滑均值和偏差计算超时（与TCP重传超时的算法相同），
+  模型服务变慢时不至于大面积超时，卡住时也能尽快放弃；
+- 熔断：连续失败达到阈值后一段时间内直接拒绝请求，调用方立即改用规则方法，
+  冷却后放行一个探测请求，成功则恢复。
+
+MicroBatcher 把短时间窗口内到达的请求合并为一次处理，如何合并提示词由调用方决定。
+
+调用方只需要回复开头的部分内容时可以传入 until，网关以流式（SSE）读取回复，
+until 判断已收到的内容足够后立即断开连接，模型服务随之停止生成。
+"""
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+from app.core.config import settings
+from app.utils.logger import logging
+
+
+class LLMUnavailableError(Exception):
+    """LLM服务不可用（熔断中、排队超时、请求超时或返回错误），调用方应使用后备方法"""
+
+
+class CircuitBreaker:
+    """熔断器：连续失败 failure_threshold 次后打开，reset_timeout 秒后放行一个探测请求"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """是否放行请求（半开状态下同一时刻只放行一个探测请求）"""
+        if self.failure_threshold <= 0:
+            return True
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logging.info("LLM服务已恢复，熔断关闭")
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probing = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold > 0:
+            if self._opened_at is None:
+                logging.warning(f"LLM服务连续失败 {self._failures} 次，熔断 {self.reset_timeout} 秒")
+            self._opened_at = self._clock()
+
+    def release(self) -> None:
+        """放行的请求未得到结果（被取消或排队超时）时调用，允许下一个探测请求"""
+        self._probing = False
+
+
+class AdaptiveTimeout:
+    """按响应时间自适应的超时：SRTT + 4 * RTTVAR（RFC 6298），超时后加倍，成功后恢复"""
+
+    def __init__(self, initial: float, minimum: float, maximum: float):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self._srtt: Optional[float] = None
+        self._rttvar = 0.0
+        self._backoff = 1.0
+
+    def observe(self, seconds: float) -> None:
+        """记录一次成功请求的耗时（秒）"""
+        if self._srtt is None:
+            self._srtt = seconds
+            self._rttvar = seconds / 2
+        else:
+            self._rttvar = 0.75 * self._rttvar + 0.25 * abs(self._srtt - seconds)
+            self._srtt = 0.875 * self._srtt + 0.125 * seconds
+        self._backoff = 1.0
+
+    def backoff(self) -> None:
+        """请求超时后加倍超时时间（最多加倍到从下限能达到上限）"""
+        self._backoff = min(self._backoff * 2, self.maximum / max(self.minimum, 0.001))
+
+    @property
+    def value(self) -> float:
+        """当前超时（秒）"""
+        base = self.initial if self._srtt is None else self._srtt + 4 * self._rttvar
+        return min(max(self.minimum, base) * self._backoff, self.maximum)
+
+
+def _message_content(result: Dict) -> str:
+    """从 chat/completions 响应中取出回复内容（兼容不同的API响应格式）"""
+    choice = result['choices'][0]
+    if 'messages' in choice:
+        return choice['messages']['content']
+    if 'message' in choice:
+        return choice['message']['content']
+    return choice.get('content', '')
+
+
+def _delta_content(chunk: Dict) -> str:
+    """从流式响应的一个数据块中取出新增的回复内容"""
+    choices = chunk.get('choices') or [{}]
+    delta = choices[0].get('delta') or {}
+    return delta.get('content') or ''
+
+
+class LLMGateway:
+    """LLM服务访问网关（连接池、并发上限、自适应超时和熔断）"""
+
+    def __init__(
+        self,
+        url: str,
+        model: str,
+        max_connections: int = 8,
+        max_concurrency: int = 4,
+        timeout: Optional[AdaptiveTimeout] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        queue_timeout: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        初始化网关
+
+        Args:
+            url: chat/completions 接口地址
+            model: 模型名称
+            max_connections: 连接池最大连接数
+            max_concurrency: 同时进行的请求数上限
+            timeout: 自适应超时，默认 2~30 秒
+            breaker: 熔断器，默认连续失败5次熔断30秒
+            queue_timeout: 等待并发名额的最长秒数
+            transport: 自定义传输层（测试用）
+        """
+        self.url = url
+        self.model = model
+        self.max_connections = max(1, max_connections)
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout or AdaptiveTimeout(10.0, 2.0, 30.0)
+        self.breaker = breaker or CircuitBreaker(5, 30.0)
+        self.queue_timeout = queue_timeout
+        self._transport = transport
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._counts = {"requests": 0, "items": 0, "failures": 0, "timeouts": 0, "rejected": 0, "early_exits": 0}
+
+    def _bind_loop(self) -> None:
+        """连接池和信号量绑定在事件循环上，事件循环变化时（如测试中每个请求使用新的事件循环）重新创建"""
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_concurrency
+            ),
+            transport=self._transport
+        )
+
+    def _failed(self, message: str) -> LLMUnavailableError:
+        self._counts["failures"] += 1
+        self.breaker.record_failure()
+        return LLMUnavailableError(message)
+
+    async def chat(
+        self,
+        messages: List[Dict],
+        max_tokens: int = 200,
+        temperature: float = 0.3,
+        items: int = 1,
+        until: Optional[Callable[[str], bool]] = None
+    ) -> str:
+        """
+        发送一次 chat/completions 请求
+
+        Args:
+            messages: 对话消息
+            max_tokens: 最大生成token数
+            temperature: 采样温度
+            items: 请求中合并的条目数，超时按条目数放大，响应时间按条目数折算后计入自适应超时
+            until: 提供时以流式读取回复，每收到新内容调用一次，返回True时立即结束请求
+
+        Returns:
+            回复内容（提前结束时为已收到的部分）
+
+        Raises:
+            LLMUnavailableError: 熔断中、排队超时、请求超时或返回错误
+        """
+        if not self.breaker.allow():
+            self._counts["rejected"] += 1
+            raise LLMUnavailableError("LLM服务熔断中")
+        self._bind_loop()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.breaker.release()
+            self._counts["rejected"] += 1
+            raise LLMUnavailableError("等待LLM请求名额超时")
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+
+        self._in_flight += 1
+        self._counts["requests"] += 1
+        self._counts["items"] += items
+        timeout = min(self.timeout.value * items, self.timeout.maximum)
+        started = time.perf_counter()
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        try:
+            # httpx 的超时按连接、读取等阶段分别计算，这里限制的是整个请求的耗时
+            if until is None:
+                content = await asyncio.wait_for(self._complete(payload, timeout), timeout)
+            else:
+                content, stopped = await asyncio.wait_for(self._stream(payload, timeout, until), timeout)
+                if stopped:
+                    self._counts["early_exits"] += 1
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            self._counts["timeouts"] += 1
+            self.timeout.backoff()
+            raise self._failed(f"LLM请求超时（{timeout:.1f}秒）")
+        except httpx.HTTPError as e:
+            raise self._failed(f"LLM请求失败: {str(e)}")
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise self._failed(f"LLM响应格式错误: {str(e)}")
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+        self.timeout.observe((time.perf_counter() - started) / items)
+        self.breaker.record_success()
+        return content
+
+    async def _complete(self, payload: Dict, timeout: float) -> str:
+        response = await self._client.post(self.url, json=payload, timeout=timeout)
+        if response.status_code != 200:
+            raise self._failed(f"LLM API返回错误: {response.status_code}")
+        return _message_content(response.json())
+
+    async def _stream(self, payload: Dict, timeout: float, until: Callable[[str], bool]) -> Tuple[str, bool]:
+        """流式读取回复，返回 (已收到的内容, 是否提前结束)；退出时关闭连接，模型服务停止生成"""
+        async with self._client.stream("POST", self.url, json=dict(payload, stream=True), timeout=timeout) as response:
+            if response.status_code != 200:
+                raise self._failed(f"LLM API返回错误: {response.status_code}")
+            if not response.headers.get("content-type", "").startswith("text/event-stream"):
+                # 服务不支持流式输出时返回的是完整响应
+                return _message_content(json.loads(await response.aread())), False
+            content = ""
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                content += _delta_content(json.loads(data))
+                if until(content):
+                    return content, True
+            return content, False
+
+    def stats(self) -> Dict:
+        """获取网关统计"""
+        return dict(
+            self._counts,
+            in_flight=self._in_flight,
+            max_concurrency=self.max_concurrency,
+            timeout=round(self.timeout.value, 3),
+            circuit=self.breaker.state
+        )
+
+
+class MicroBatcher:
+    """把 window 秒内到达的请求合并为一批处理，批量达到 max_size 时立即处理"""
+
+    def __init__(self, handler: Callable[[List], Awaitable[List]], window: float, max_size: int):
+        """
+        Args:
+            handler: 批量处理函数，接收条目列表，按相同顺序返回结果列表；
+                某个位置的结果是异常实例时，对应的请求抛出该异常
+            window: 合并窗口（秒），0表示不合并
+            max_size: 单批最大条目数
+        """
+        self.handler = handler
+        self.window = window
+        self.max_size = max(1, max_size)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    async def submit(self, item):
+        """提交一个条目并等待其结果"""
+        if self.window <= 0 or self.max_size == 1:
+            result = (await self.handler([item]))[0]
+            if isinstance(result, BaseException):
+                raise result
+            return result
+
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self._loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List) -> None:
+        try:
+            results = await self.handler([item for item, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            # 等待方已取消（如客户端断开）时跳过
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+# 全局网关实例
+_llm_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """获取LLM网关实例（单例模式）"""
+    global _llm_gateway
+    if _llm_gateway is None:
+        _llm_gateway = LLMGateway(
+            url=settings.LLM_API_URL,
+            model=settings.LLM_MODEL,
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            timeout=AdaptiveTimeout(settings.LLM_TIMEOUT_INITIAL, settings.LLM_TIMEOUT_MIN, settings.LLM_TIMEOUT_MAX),
+            breaker=CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_SECONDS),
+            queue_timeout=settings.LLM_QUEUE_TIMEOUT
+        )
+    return _llm_gateway
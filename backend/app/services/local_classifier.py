@@ -0,0 +1,421 @@
+"""本地轻量文本分类器
+
+字符n-gram经哈希映射到固定维度的稀疏特征（不需要保存词表），再用逻辑回归判断日程/备忘录。
+模型只是一个权重向量，以 NumPy 数组保存在 LOCAL_CLASSIFIER_PATH，进程内单条预测不到1毫秒。
+
+训练数据是已确认的分类：用户手动选择的分类（/classify/manual）、已创建日程的原文和已创建
+备忘录的内容。分类时本地分类器作为第一层，置信度达到 LOCAL_CLASSIFIER_THRESHOLD 时直接采用，
+否则升级到LLM。
+
+模型是全局共享的，训练默认只通过命令行执行（python -m app.services.local_classifier train），
+见 LOCAL_CLASSIFIER_HTTP_TRAIN 和 LOCAL_CLASSIFIER_RETRAIN_EVERY。
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.services.classification_cache import normalize_text
+from app.utils.logger import logging
+
+try:
+    import numpy as np
+except ImportError:  # numpy 随 paddleocr 安装，缺少时不使用本地分类器
+    np = None
+
+_DIGIT = re.compile(r"\d")
+
+
+def hash_features(text: str, dim: int, ngram_range: Tuple[int, int] = (1, 3)):
+    """
+    字符n-gram哈希特征
+
+    文本先规范化（见 normalize_text），数字统一替换为0，使"9:30"和"14:00"共享特征。
+    每个n-gram按CRC32映射到 [0, dim) 中的一维，并由哈希的最高位决定正负号以抵消碰撞。
+
+    Args:
+        text: 文本内容
+        dim: 特征维度
+        ngram_range: n-gram 的最小和最大长度
+
+    Returns:
+        (特征下标, 特征值)，特征值经L2归一化
+    """
+    normalized = _DIGIT.sub("0", normalize_text(text))
+    hashes = [
+        zlib.crc32(normalized[i:i + n].encode("utf-8"))
+        for n in range(ngram_range[0], ngram_range[1] + 1)
+        for i in range(len(normalized) - n + 1)
+    ]
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    hashes = np.array(hashes, dtype=np.int64)
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    indices, inverse = np.unique(hashes % dim, return_inverse=True)
+    values = np.bincount(inverse, weights=signs)
+    nonzero = values != 0
+    indices, values = indices[nonzero], values[nonzero]
+    norm = np.linalg.norm(values)
+    return indices, (values / norm if norm else values).astype(np.float32)
+
+
+def is_holdout(text: str) -> bool:
+    """按规范化文本的哈希判断样本是否属于验证集（LOCAL_CLASSIFIER_HOLDOUT 比例）"""
+    return zlib.crc32(normalize_text(text).encode("utf-8")) % 1000 < settings.LOCAL_CLASSIFIER_HOLDOUT * 1000
+
+
+def _accuracy(model: "LocalClassifier", examples: Sequence[Tuple[str, str]]) -> float:
+    correct = sum(1 for text, label in examples if model.predict(text)["type"] == label)
+    return round(correct / len(examples), 4)
+
+
+class LocalClassifier:
+    """字符n-gram哈希特征 + 逻辑回归"""
+
+    def __init__(self, weights, bias: float, ngram_range: Tuple[int, int] = (1, 3), examples: int = 0):
+        """
+        Args:
+            weights: 权重向量（长度即特征维度）
+            bias: 偏置
+            ngram_range: n-gram 的最小和最大长度
+            examples: 训练样本数
+        """
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        self.ngram_range = tuple(ngram_range)
+        self.examples = examples
+
+    @property
+    def dim(self) -> int:
+        return len(self.weights)
+
+    def predict_proba(self, text: str) -> float:
+        """文本是日程的概率"""
+        indices, values = hash_features(text, self.dim, self.ngram_range)
+        z = float(self.weights[indices] @ values) + self.bias
+        return float(1.0 / (1.0 + np.exp(-z)))
+
+    def predict(self, text: str) -> Dict:
+        """
+        分类文本
+
+        Returns:
+            {"type": "schedule"/"memo", "confidence": 0.5~1.0}
+        """
+        probability = self.predict_proba(text)
+        if probability >= 0.5:
+            return {"type": "schedule", "confidence": probability}
+        return {"type": "memo", "confidence": 1.0 - probability}
+
+    @classmethod
+    def train(
+        cls,
+        texts: Sequence[str],
+        labels: Sequence[str],
+        dim: int = 2 ** 18,
+        ngram_range: Tuple[int, int] = (1, 3),
+        epochs: int = 200,
+        learning_rate: float = 5.0,
+        l2: float = 1e-4
+    ) -> "LocalClassifier":
+        """
+        全批量梯度下降训练逻辑回归（两类样本按数量加权平衡）
+
+        只在样本中出现过的特征上计算，之后再放回完整的权重向量。
+
+        Args:
+            texts: 训练文本
+            labels: 对应的类型（schedule/memo）
+            dim: 特征维度
+            ngram_range: n-gram 的最小和最大长度
+            epochs: 迭代次数
+            learning_rate: 学习率（特征已L2归一化）
+            l2: L2正则系数
+
+        Returns:
+            训练好的分类器
+        """
+        rows = [hash_features(text, dim, ngram_range) for text in texts]
+        y = np.array([label == "schedule" for label in labels], dtype=np.float64)
+        n = len(rows)
+        lengths = np.array([len(indices) for indices, _ in rows])
+        row_ids = np.repeat(np.arange(n), lengths)
+        columns, compact = np.unique(np.concatenate([indices for indices, _ in rows]), return_inverse=True)
+        data = np.concatenate([values for _, values in rows]).astype(np.float64)
+
+        positives = y.sum()
+        sample_weight = np.where(y == 1, n / (2 * max(positives, 1)), n / (2 * max(n - positives, 1)))
+        w = np.zeros(len(columns))
+        b = 0.0
+        for _ in range(epochs):
+            z = np.bincount(row_ids, weights=w[compact] * data, minlength=n) + b
+            gradient = (1.0 / (1.0 + np.exp(-z)) - y) * sample_weight / n
+            w -= learning_rate * (np.bincount(compact, weights=data * gradient[row_ids], minlength=len(columns)) + l2 * w)
+            b -= learning_rate * gradient.sum()
+
+        weights = np.zeros(dim, dtype=np.float32)
+        weights[columns] = w
+        return cls(weights, b, ngram_range, examples=n)
+
+    def save(self, path: str) -> None:
+        """
+        保存为 .npz
+
+        先写入同一目录下唯一命名的临时文件再替换，其他线程或进程同时保存时不会互相覆盖临时文件，
+        读取方也不会读到写了一半的文件。
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    weights=self.weights,
+                    bias=np.float64(self.bias),
+                    ngram_range=np.array(self.ngram_range),
+                    examples=np.int64(self.examples)
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "LocalClassifier":
+        """从 .npz 加载"""
+        with np.load(path) as archive:
+            return cls(
+                archive["weights"],
+                float(archive["bias"]),
+                tuple(int(n) for n in archive["ngram_range"]),
+                int(archive["examples"])
+            )
+
+
+class LocalClassifierService:
+    """管理本地分类器：加载、训练、热替换，其他工作进程训练保存后按文件修改时间重新加载"""
+
+    # 检查模型文件是否更新的间隔（秒）
+    RELOAD_INTERVAL = 10.0
+
+    def __init__(self, path: str, enabled: bool = True):
+        """
+        Args:
+            path: 模型文件路径
+            enabled: 是否启用（未安装numpy时始终不启用）
+        """
+        self.path = path
+        self.enabled = enabled and np is not None
+        self._model: Optional[LocalClassifier] = None
+        self._mtime: Optional[float] = None
+        self._checked_at: Optional[float] = None
+        self._labels_since_training = 0
+        self._last_training: Optional[Dict] = None
+        self._lock = threading.Lock()
+        # 训练和保存整体串行执行（手动触发和后台重新训练可能同时发生）
+        self._training_lock = threading.Lock()
+
+    @property
+    def model(self) -> Optional[LocalClassifier]:
+        """当前模型，尚未训练或未启用时为None"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.RELOAD_INTERVAL:
+            self._checked_at = now
+            self._reload()
+        return self._model
+
+    def _reload(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            self._model = LocalClassifier.load(self.path)
+            self._mtime = mtime
+            logging.info(f"本地分类器已加载: {self.path}（{self._model.examples} 个训练样本）")
+        except Exception as e:
+            logging.error(f"本地分类器加载失败: {str(e)}")
+
+    def record_label(self) -> bool:
+        """
+        记录一次新的手动分类
+
+        Returns:
+            是否达到 LOCAL_CLASSIFIER_RETRAIN_EVERY，应在后台重新训练
+        """
+        every = settings.LOCAL_CLASSIFIER_RETRAIN_EVERY
+        with self._lock:
+            self._labels_since_training += 1
+            return self.enabled and every > 0 and self._labels_since_training >= every
+
+    def train(self, texts: List[str], labels: List[str]) -> Dict:
+        """
+        训练、评估并替换当前模型
+
+        按文本哈希固定划出 LOCAL_CLASSIFIER_HOLDOUT 比例的样本作为验证集（同一文本每次训练都落在同一侧，
+        已保存的模型从未见过验证集），只用其余样本训练。新模型在验证集上的准确率低于当前模型时保留当前模型。
+
+        Args:
+            texts: 已确认的文本
+            labels: 对应的类型（schedule/memo）
+
+        Returns:
+            训练结果：trained（是否替换了模型）、examples、schedule、memo，
+            训练后还有 train_examples、holdout_examples、accuracy（验证集准确率）、
+            previous_accuracy（当前模型的验证集准确率，没有模型时为None）和 duration_ms
+        """
+        schedule = sum(1 for label in labels if label == "schedule")
+        summary = {"trained": False, "examples": len(texts), "schedule": schedule, "memo": len(texts) - schedule}
+        if not self.enabled:
+            return summary
+        if len(texts) < settings.LOCAL_CLASSIFIER_MIN_EXAMPLES or not 0 < schedule < len(texts):
+            logging.info(f"已确认的分类不足（日程 {schedule}，备忘录 {len(texts) - schedule}），不训练本地分类器")
+            return summary
+
+        holdout = [is_holdout(text) for text in texts]
+        train_texts = [text for text, held in zip(texts, holdout) if not held]
+        train_labels = [label for label, held in zip(labels, holdout) if not held]
+        holdout_examples = [(text, label) for text, label, held in zip(texts, labels, holdout) if held]
+        train_schedule = sum(1 for label in train_labels if label == "schedule")
+        if not holdout_examples or not 0 < train_schedule < len(train_texts):
+            logging.info(f"训练集或验证集为空（训练 {len(train_texts)}，验证 {len(holdout_examples)}），不训练本地分类器")
+            return summary
+
+        with self._training_lock:
+            started = time.perf_counter()
+            model = LocalClassifier.train(train_texts, train_labels)
+            accuracy = _accuracy(model, holdout_examples)
+            previous = self.model
+            previous_accuracy = _accuracy(previous, holdout_examples) if previous is not None else None
+            replace = previous_accuracy is None or accuracy >= previous_accuracy
+            if replace:
+                model.save(self.path)
+            with self._lock:
+                if replace:
+                    self._model = model
+                    self._mtime = os.path.getmtime(self.path)
+                self._labels_since_training = 0
+                summary.update(
+                    trained=replace,
+                    train_examples=len(train_texts),
+                    holdout_examples=len(holdout_examples),
+                    accuracy=accuracy,
+                    previous_accuracy=previous_accuracy,
+                    duration_ms=round((time.perf_counter() - started) * 1000, 1)
+                )
+                self._last_training = summary
+        if replace:
+            logging.info(f"本地分类器训练完成: {summary}")
+        else:
+            logging.warning(f"新训练的本地分类器在验证集上不如当前模型，保留当前模型: {summary}")
+        return summary
+
+    def stats(self) -> Dict:
+        """获取本地分类器状态"""
+        model = self.model
+        return {
+            "enabled": self.enabled,
+            "trained": model is not None,
+            "examples": model.examples if model is not None else 0,
+            "threshold": settings.LOCAL_CLASSIFIER_THRESHOLD,
+            "labels_since_training": self._labels_since_training,
+            "last_training": self._last_training
+        }
+
+
+def collect_training_data(db) -> Tuple[List[str], List[str]]:
+    """
+    从数据库收集已确认的分类
+
+    已创建的日程（原文）和备忘录（内容）视为对应类型；手动选择的分类优先，
+    规范化后相同的文本只保留一条（同一文本多次手动选择时以最新的为准）。
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        (文本列表, 类型列表)
+    """
+    from app.models.classification import ClassificationLabel
+    from app.models.memo import Memo
+    from app.models.schedule import ScheduleItem
+
+    examples: Dict[str, Tuple[str, str]] = {}
+    for (text,) in db.query(ScheduleItem.original_text):
+        examples[normalize_text(text)] = (text, "schedule")
+    for (text,) in db.query(Memo.content):
+        examples[normalize_text(text)] = (text, "memo")
+    for text, label in db.query(ClassificationLabel.text, ClassificationLabel.label).order_by(
+        ClassificationLabel.created_at, ClassificationLabel.id
+    ):
+        examples[normalize_text(text)] = (text, label)
+    examples.pop("", None)
+    return [text for text, _ in examples.values()], [label for _, label in examples.values()]
+
+
+def train_from_db(db) -> Dict:
+    """从数据库中已确认的分类训练本地分类器，见 LocalClassifierService.train"""
+    texts, labels = collect_training_data(db)
+    return get_local_classifier_service().train(texts, labels)
+
+
+def retrain_in_background() -> None:
+    """后台重新训练（使用独立的数据库会话）"""
+    from app.db.base import SessionLocal
+
+    db = SessionLocal()
+    try:
+        train_from_db(db)
+    except Exception as e:
+        logging.error(f"本地分类器训练失败: {str(e)}")
+    finally:
+        db.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="本地分类器")
+    parser.add_argument("action", choices=["train"], help="train: 用已确认的分类训练本地分类器")
+    args = parser.parse_args(argv)
+
+    from app.db.base import SessionLocal
+
+    db = SessionLocal()
+    try:
+        summary = train_from_db(db)
+    finally:
+        db.close()
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+# 全局本地分类器实例
+_local_classifier_service: Optional[LocalClassifierService] = None
+
+
+def get_local_classifier_service() -> LocalClassifierService:
+    """获取本地分类器服务实例（单例模式）"""
+    global _local_classifier_service
+    if _local_classifier_service is None:
+        _local_classifier_service = LocalClassifierService(
+            settings.LOCAL_CLASSIFIER_PATH,
+            enabled=settings.LOCAL_CLASSIFIER_ENABLED
+        )
+    return _local_classifier_service
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
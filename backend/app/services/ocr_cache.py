@@ -0,0 +1,132 @@
+"""OCR识别结果缓存"""
+import hashlib
+import json
+import threading
+from typing import Dict, Optional
+from app.core.config import settings
+from app.utils.cache import TieredCache
+
+
+class OCRResultCache:
+    """OCR识别结果缓存
+
+    以 (文件哈希, 识别语言, 模型版本, 识别选项摘要) 为键，相同内容的图片（包括不同用户上传的相同图片）
+    以相同的选项识别时直接复用识别结果。只缓存识别成功的结果。
+
+    识别选项包括是否分块、预处理和级联识别的配置（见 options_digest），
+    修改这些配置或以不同的分块方式识别时不会复用旧的结果。
+    """
+
+    def __init__(self, cache: TieredCache, lang: str, model_version: str, enabled: bool = True):
+        self.cache = cache
+        self.lang = lang
+        self.model_version = model_version
+        self.enabled = enabled
+
+    @staticmethod
+    def options_digest(tiled: Optional[bool] = None) -> str:
+        """
+        影响识别结果的选项摘要
+
+        Args:
+            tiled: 请求的分块方式，None表示按 OCR_TILE_MIN_SIDE 自动判断
+
+        Returns:
+            选项的短哈希
+        """
+        options = {
+            "preprocess": settings.OCR_PREPROCESS_ENABLED,
+            "cascade": settings.OCR_CASCADE_ENABLED,
+            "fast_det": settings.OCR_FAST_DET_MODEL_DIR,
+            "document_dpi": settings.OCR_DOCUMENT_DPI
+        }
+        if settings.OCR_PREPROCESS_ENABLED:
+            options.update(
+                max_side=settings.OCR_MAX_SIDE,
+                grayscale=settings.OCR_PREPROCESS_GRAYSCALE,
+                deskew=settings.OCR_PREPROCESS_DESKEW,
+                contrast=settings.OCR_PREPROCESS_CONTRAST
+            )
+        if settings.OCR_CASCADE_ENABLED:
+            options.update(
+                cascade_threshold=settings.OCR_CASCADE_THRESHOLD,
+                accurate_det=settings.OCR_ACCURATE_DET_MODEL_DIR,
+                accurate_rec=settings.OCR_ACCURATE_REC_MODEL_DIR
+            )
+        # 不分块时分块参数不影响结果；未指定时按图片尺寸自动判断
+        if tiled or (tiled is None and settings.OCR_TILE_MIN_SIDE > 0):
+            options.update(
+                tiled="on" if tiled else "auto",
+                tile_min_side=None if tiled else settings.OCR_TILE_MIN_SIDE,
+                tile_size=settings.OCR_TILE_SIZE,
+                tile_overlap=settings.OCR_TILE_OVERLAP
+            )
+        encoded = json.dumps(options, sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+    def make_key(self, file_hash: str, tiled: Optional[bool] = None) -> str:
+        """生成缓存键"""
+        return f"{file_hash}:{self.lang}:{self.model_version}:{self.options_digest(tiled)}"
+
+    def get(self, file_hash: Optional[str], tiled: Optional[bool] = None) -> Optional[Dict]:
+        """
+        查询缓存的识别结果
+
+        Args:
+            file_hash: 文件内容哈希
+            tiled: 请求的分块方式
+
+        Returns:
+            识别结果字典，未命中时返回None
+        """
+        if not self.enabled or not file_hash:
+            return None
+        return self.cache.get(self.make_key(file_hash, tiled))
+
+    def set(self, file_hash: Optional[str], result: Dict, tiled: Optional[bool] = None) -> None:
+        """
+        缓存识别结果
+
+        Args:
+            file_hash: 文件内容哈希
+            result: 识别结果字典
+            tiled: 识别时的分块方式
+        """
+        if not self.enabled or not file_hash or not result.get("success"):
+            return
+        self.cache.set(self.make_key(file_hash, tiled), result)
+
+    def stats(self) -> Dict:
+        """获取缓存统计"""
+        stats = self.cache.stats()
+        stats.update({
+            "enabled": self.enabled,
+            "lang": self.lang,
+            "model_version": self.model_version,
+            "options": self.options_digest()
+        })
+        return stats
+
+
+# 全局OCR缓存实例
+_ocr_cache: Optional[OCRResultCache] = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OCRResultCache:
+    """获取OCR结果缓存实例（单例模式）"""
+    global _ocr_cache
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            _ocr_cache = OCRResultCache(
+                TieredCache(
+                    namespace="ocr",
+                    max_entries=settings.OCR_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.OCR_CACHE_TTL,
+                    use_redis=settings.OCR_CACHE_USE_REDIS
+                ),
+                lang=settings.OCR_LANG,
+                model_version=settings.OCR_MODEL_VERSION,
+                enabled=settings.OCR_CACHE_ENABLED
+            )
+    return _ocr_cache
@@ -0,0 +1,66 @@
+"""级联识别的分级统计"""
+import threading
+from typing import Dict, Optional
+
+# 识别分级
+TIER_FAST = "fast"  # 快速档：不使用方向分类器，使用轻量检测模型
+TIER_ACCURATE = "accurate"  # 精确档：置信度不足时升级，使用方向分类器和服务端模型
+TIER_FULL = "full"  # 未启用级联，直接使用完整流程
+TIERS = (TIER_FAST, TIER_ACCURATE, TIER_FULL)
+
+
+def mean_confidence(details) -> Optional[float]:
+    """识别结果各行的平均置信度，没有文本时返回None"""
+    if not details:
+        return None
+    return sum(d["confidence"] for d in details) / len(details)
+
+
+class CascadeStats:
+    """统计各识别分级的使用次数
+
+    识别结果中的 tier 字段标明最终使用的分级；统计在结果返回到当前进程时记录，
+    因此进程池和独立推理进程中的识别也会计入。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {tier: 0 for tier in TIERS}
+
+    def record(self, result: Dict) -> None:
+        """
+        记录一次识别结果的分级
+
+        Args:
+            result: OCRService 返回的识别结果字典（缓存或已保存的结果没有 tier 字段，不计入）
+        """
+        tier = result.get("tier") if result else None
+        if tier not in self._counts:
+            return
+        with self._lock:
+            self._counts[tier] += 1
+
+    def stats(self) -> Dict:
+        """获取分级统计"""
+        with self._lock:
+            counts = dict(self._counts)
+        cascaded = counts[TIER_FAST] + counts[TIER_ACCURATE]
+        return {
+            "counts": counts,
+            "total": sum(counts.values()),
+            "escalation_rate": round(counts[TIER_ACCURATE] / cascaded, 4) if cascaded else 0.0
+        }
+
+    def reset(self) -> None:
+        """清空统计"""
+        with self._lock:
+            self._counts = {tier: 0 for tier in TIERS}
+
+
+# 全局分级统计实例
+_cascade_stats = CascadeStats()
+
+
+def get_cascade_stats() -> CascadeStats:
+    """获取级联识别统计实例"""
+    return _cascade_stats
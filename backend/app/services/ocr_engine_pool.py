@@ -0,0 +1,225 @@
+"""进程内OCR引擎池"""
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+from app.core.config import settings
+from app.services.ocr_service import OCRService
+from app.utils.logger import logging
+
+
+class EngineUnavailableError(Exception):
+    """OCR引擎未加载成功或等待引擎超时"""
+
+
+class OCREnginePool:
+    """OCR引擎池
+
+    启动时一次性加载 size 个 PaddleOCR 引擎，请求通过 checkout() 借出引擎、用完归还。
+    PaddleOCR 实例不是线程安全的，同一时刻每个引擎只会被一个请求使用；
+    引擎全部借出时后来的请求排队等待，等待时间计入统计。
+    """
+
+    def __init__(
+        self,
+        size: int,
+        factory: Callable[[], OCRService] = OCRService,
+        wait_samples: int = 1000
+    ):
+        self.size = max(1, size)
+        self._factory = factory
+        self._engines: "queue.Queue[OCRService]" = queue.Queue()
+        self._loaded = 0
+        self._load_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._load_error: Optional[str] = None
+        self._load_seconds: Optional[float] = None
+        self._loader: Optional[threading.Thread] = None
+
+        self._stats_lock = threading.Lock()
+        self._wait_samples = deque(maxlen=wait_samples)
+        self._checkouts = 0
+        self._timeouts = 0
+        self._in_use = 0
+        self._wait_total_ms = 0.0
+        self._wait_max_ms = 0.0
+
+    @property
+    def ready(self) -> bool:
+        """全部引擎是否已加载完成"""
+        return self._ready.is_set()
+
+    def load(self) -> bool:
+        """
+        加载全部引擎（线程安全，重复调用无副作用；加载失败后再次调用会重试）
+
+        Returns:
+            是否加载成功
+        """
+        with self._load_lock:
+            if self._ready.is_set():
+                return True
+            started = time.perf_counter()
+            try:
+                while self._loaded < self.size:
+                    self._engines.put(self._factory())
+                    self._loaded += 1
+            except Exception as e:
+                self._load_error = str(e)
+                logging.error(f"OCR引擎池加载失败: 已加载 {self._loaded}/{self.size}, 错误: {str(e)}")
+                return False
+            self._load_error = None
+            self._load_seconds = round(time.perf_counter() - started, 3)
+            self._ready.set()
+            logging.info(f"OCR引擎池加载完成: {self.size} 个引擎, 耗时 {self._load_seconds}s")
+            return True
+
+    def start_loading(self) -> threading.Thread:
+        """在后台线程中加载引擎，服务可以先响应健康检查"""
+        with self._stats_lock:
+            if self._loader is None or not self._loader.is_alive():
+                self._loader = threading.Thread(target=self.load, name="ocr-engine-loader", daemon=True)
+                self._loader.start()
+            return self._loader
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待引擎加载完成"""
+        return self._ready.wait(timeout)
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None) -> Iterator[OCRService]:
+        """
+        借出一个引擎，退出上下文时自动归还
+
+        Args:
+            timeout: 等待空闲引擎的最长秒数，None表示一直等待
+
+        Yields:
+            OCR服务实例
+
+        Raises:
+            EngineUnavailableError: 引擎加载失败或等待超时
+        """
+        started = time.perf_counter()
+        # 尚未加载（或后台加载未完成）时在这里加载/等待，并发的首批请求不会重复创建引擎
+        if not self._ready.is_set() and not self.load():
+            raise EngineUnavailableError(f"OCR引擎加载失败: {self._load_error}")
+
+        remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - started))
+        try:
+            engine = self._engines.get(timeout=remaining)
+        except queue.Empty:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise EngineUnavailableError("等待OCR引擎超时")
+
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._wait_total_ms += wait_ms
+            self._wait_max_ms = max(self._wait_max_ms, wait_ms)
+            self._wait_samples.append(wait_ms)
+        try:
+            yield engine
+        finally:
+            with self._stats_lock:
+                self._in_use -= 1
+            self._engines.put(engine)
+
+    @contextmanager
+    def borrow_idle(self) -> Iterator[List[OCRService]]:
+        """
+        借出当前所有空闲引擎（不等待），用于分块识别时并行处理分块
+
+        Yields:
+            空闲引擎列表，可能为空
+        """
+        engines: List[OCRService] = []
+        while True:
+            try:
+                engines.append(self._engines.get_nowait())
+            except queue.Empty:
+                break
+        with self._stats_lock:
+            self._in_use += len(engines)
+        try:
+            yield engines
+        finally:
+            with self._stats_lock:
+                self._in_use -= len(engines)
+            for engine in engines:
+                self._engines.put(engine)
+
+    def recognize_path(self, image_path: str, timeout: Optional[float] = None, **options) -> Dict:
+        """
+        借出引擎识别图片文件，分块识别时会额外借用空闲引擎并行处理
+
+        Args:
+            image_path: 图片文件路径
+            timeout: 等待空闲引擎的最长秒数
+            **options: 传给 OCRService.recognize_text 的参数（region、tiled、page）
+
+        Returns:
+            识别结果字典
+        """
+        with self.checkout(timeout) as engine:
+            return engine.recognize_text(image_path, borrow_engines=self.borrow_idle, **options)
+
+    def recognize_bytes(self, content: bytes, timeout: Optional[float] = None, **options) -> Dict:
+        """
+        借出引擎识别内存中的图片，分块识别时会额外借用空闲引擎并行处理
+
+        Args:
+            content: 图片文件内容
+            timeout: 等待空闲引擎的最长秒数
+            **options: 传给 OCRService.recognize_text_from_bytes 的参数（region、tiled）
+
+        Returns:
+            识别结果字典
+        """
+        with self.checkout(timeout) as engine:
+            return engine.recognize_text_from_bytes(content, borrow_engines=self.borrow_idle, **options)
+
+    def stats(self) -> Dict:
+        """获取引擎池状态和等待时间统计（毫秒）"""
+        with self._stats_lock:
+            samples = sorted(self._wait_samples)
+            checkouts = self._checkouts
+
+            def percentile(p: float) -> float:
+                if not samples:
+                    return 0.0
+                return round(samples[min(len(samples) - 1, int(p * len(samples)))], 3)
+
+            return {
+                "ready": self.ready,
+                "size": self.size,
+                "loaded": self._loaded,
+                "in_use": self._in_use,
+                "available": self._engines.qsize(),
+                "load_seconds": self._load_seconds,
+                "load_error": self._load_error,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "wait_ms_avg": round(self._wait_total_ms / checkouts, 3) if checkouts else 0.0,
+                "wait_ms_p50": percentile(0.5),
+                "wait_ms_p95": percentile(0.95),
+                "wait_ms_max": round(self._wait_max_ms, 3)
+            }
+
+
+# 全局OCR引擎池实例
+_engine_pool: Optional[OCREnginePool] = None
+_engine_pool_lock = threading.Lock()
+
+
+def get_ocr_engine_pool() -> OCREnginePool:
+    """获取OCR引擎池实例（单例模式）"""
+    global _engine_pool
+    with _engine_pool_lock:
+        if _engine_pool is None:
+            _engine_pool = OCREnginePool(settings.OCR_ENGINES_PER_PROCESS)
+    return _engine_pool
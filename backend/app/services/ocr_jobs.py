@@ -0,0 +1,282 @@
+"""OCR异步任务队列"""
+import json
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.models.upload import UploadedFile
+from app.services.ocr_pipeline import recognize_uploaded_file, ImageValidationError
+from app.utils.logger import logging
+
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_PROCESSING = "processing"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+TERMINAL_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class InMemoryJobBackend:
+    """进程内任务存储与队列（单进程部署使用）"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, Dict] = {}
+        self._expires: Dict[str, float] = {}
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._lock = threading.Lock()
+
+    def save(self, job: Dict) -> None:
+        with self._lock:
+            self._jobs[job["job_id"]] = dict(job)
+            if job["status"] in TERMINAL_STATUSES:
+                self._expires[job["job_id"]] = time.time() + self.ttl_seconds
+            self._evict_expired()
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def push(self, job_id: str) -> None:
+        self._queue.put(job_id)
+
+    def pop(self, timeout: float) -> Optional[str]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def queue_length(self) -> int:
+        return self._queue.qsize()
+
+    def _evict_expired(self) -> None:
+        now = time.time()
+        for job_id in [k for k, expires_at in self._expires.items() if expires_at <= now]:
+            self._jobs.pop(job_id, None)
+            self._expires.pop(job_id, None)
+
+
+class RedisJobBackend:
+    """基于Redis的任务存储与队列（多进程/多节点部署使用）"""
+
+    QUEUE_KEY = "ocr:jobs:queue"
+
+    def __init__(self, redis, ttl_seconds: int):
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds
+
+    def _job_key(self, job_id: str) -> str:
+        return f"ocr:job:{job_id}"
+
+    def save(self, job: Dict) -> None:
+        # 未完成的任务保留更久，避免排队时间过长时任务状态丢失
+        ttl = self.ttl_seconds if job["status"] in TERMINAL_STATUSES else self.ttl_seconds * 4
+        self.redis.set(self._job_key(job["job_id"]), json.dumps(job, ensure_ascii=False), ex=ttl)
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        raw = self.redis.get(self._job_key(job_id))
+        return json.loads(raw) if raw is not None else None
+
+    def push(self, job_id: str) -> None:
+        self.redis.rpush(self.QUEUE_KEY, job_id)
+
+    def pop(self, timeout: float) -> Optional[str]:
+        item = self.redis.blpop(self.QUEUE_KEY, timeout=max(1, int(timeout)))
+        if item is None:
+            return None
+        job_id = item[1]
+        return job_id.decode("utf-8") if isinstance(job_id, bytes) else job_id
+
+    def queue_length(self) -> int:
+        return int(self.redis.llen(self.QUEUE_KEY))
+
+
+class OCRJobManager:
+    """OCR任务管理器
+
+    请求线程只负责入队并立即返回任务ID；工作线程从队列取任务，把推理交给OCR进程池执行，
+    并在各阶段更新任务进度和 UploadedFile.status。
+    """
+
+    def __init__(
+        self,
+        backend,
+        workers: int = 2,
+        session_factory: Callable = SessionLocal,
+        use_pool: bool = True
+    ):
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.session_factory = session_factory
+        self.use_pool = use_pool
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def submit(self, file_id: str, user_id: str) -> Dict:
+        """
+        提交识别任务
+
+        Args:
+            file_id: 文件ID
+            user_id: 用户ID
+
+        Returns:
+            任务状态字典
+        """
+        now = datetime.now().isoformat()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "file_id": file_id,
+            "user_id": user_id,
+            "status": JOB_QUEUED,
+            "progress": 0,
+            "stage": "queued",
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        self.backend.save(job)
+        self.backend.push(job["job_id"])
+        if settings.OCR_JOB_RUN_WORKERS:
+            self.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """获取任务状态"""
+        return self.backend.load(job_id)
+
+    def _update(self, job: Dict, **fields) -> None:
+        job.update(fields)
+        job["updated_at"] = datetime.now().isoformat()
+        self.backend.save(job)
+
+    def process(self, job_id: str) -> None:
+        """
+        执行单个任务
+
+        Args:
+            job_id: 任务ID
+        """
+        job = self.backend.load(job_id)
+        if job is None:
+            logging.warning(f"OCR任务不存在或已过期: {job_id}")
+            return
+
+        db = self.session_factory()
+        try:
+            uploaded_file = db.query(UploadedFile).filter(
+                UploadedFile.id == job["file_id"],
+                UploadedFile.user_id == job["user_id"]
+            ).first()
+            if uploaded_file is None:
+                self._update(job, status=JOB_FAILED, stage="failed", error="文件不存在或无权访问")
+                return
+
+            uploaded_file.status = "processing"
+            db.commit()
+            self._update(job, status=JOB_PROCESSING, stage="processing", progress=5)
+
+            def on_progress(progress: int, stage: str) -> None:
+                self._update(job, progress=progress, stage=stage)
+
+            try:
+                result = recognize_uploaded_file(
+                    db, uploaded_file, use_pool=self.use_pool, on_progress=on_progress
+                )
+            except ImageValidationError as e:
+                db.commit()
+                self._update(job, status=JOB_FAILED, stage="failed", error=str(e))
+                return
+
+            db.commit()
+            if result["success"]:
+                self._update(job, status=JOB_SUCCEEDED, stage="done", progress=100, result=result)
+            else:
+                self._update(job, status=JOB_FAILED, stage="failed", error=result.get("error"))
+
+        except Exception as e:
+            db.rollback()
+            logging.error(f"OCR任务执行失败: {job_id}, 错误: {str(e)}")
+            try:
+                uploaded_file = db.query(UploadedFile).filter(UploadedFile.id == job["file_id"]).first()
+                if uploaded_file is not None:
+                    uploaded_file.status = "error"
+                    db.commit()
+            except Exception:
+                db.rollback()
+            self._update(job, status=JOB_FAILED, stage="failed", error=str(e))
+        finally:
+            db.close()
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job_id = self.backend.pop(timeout=1.0)
+            except Exception as e:
+                logging.error(f"读取OCR任务队列失败: {str(e)}")
+                self._stop.wait(1.0)
+                continue
+            if job_id is not None:
+                self.process(job_id)
+
+    def start(self) -> None:
+        """启动工作线程（重复调用无副作用）"""
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"ocr-job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logging.info(f"OCR任务工作线程已启动: {self.workers} 个")
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """停止工作线程，正在执行的任务会先完成"""
+        with self._lock:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join(timeout=timeout)
+            self._threads = []
+
+    def stats(self) -> Dict:
+        """获取队列统计"""
+        return {
+            "backend": type(self.backend).__name__,
+            "workers": self.workers,
+            "running": bool(self._threads),
+            "queue_length": self.backend.queue_length()
+        }
+
+
+# 全局任务管理器实例
+_job_manager: Optional[OCRJobManager] = None
+_job_manager_lock = threading.Lock()
+
+
+def get_ocr_job_manager() -> OCRJobManager:
+    """获取OCR任务管理器实例（单例模式），配置了REDIS_URL时使用Redis队列"""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            from app.db.redis import redis_client
+            if redis_client is not None:
+                backend = RedisJobBackend(redis_client, settings.OCR_JOB_TTL)
+            else:
+                backend = InMemoryJobBackend(settings.OCR_JOB_TTL)
+            _job_manager = OCRJobManager(backend, workers=settings.OCR_JOB_WORKERS)
+    return _job_manager
+
+
+def shutdown_ocr_job_manager() -> None:
+    """停止全局任务管理器的工作线程"""
+    if _job_manager is not None:
+        _job_manager.stop()
@@ -0,0 +1,121 @@
+"""上传文件的OCR识别流程"""
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.upload import UploadedFile
+from app.services.ocr_service import OCRService
+from app.services.ocr_pool import recognize_file, recognize_document
+from app.services.document_pages import is_document, validate_document
+from app.services.ocr_cache import get_ocr_cache
+from app.services.ocr_result_service import (
+    get_ocr_result,
+    get_reusable_pages,
+    is_current,
+    load_result_dict,
+    save_ocr_result
+)
+from app.utils.logger import logging
+
+
+class ImageValidationError(Exception):
+    """图片未通过识别前的校验"""
+
+
+def validate_source(file_path: str) -> Tuple[bool, Optional[str]]:
+    """
+    识别前校验已上传的文件（多页文档只检查页数，图片检查格式和尺寸）
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        (是否有效, 错误信息)
+    """
+    if is_document(file_path):
+        return validate_document(file_path)
+    return OCRService.validate_image(file_path)
+
+
+def recognize_uploaded_file(
+    db: Session,
+    uploaded_file: UploadedFile,
+    use_pool: bool = False,
+    on_progress: Optional[Callable[[int, str], None]] = None,
+    region: Optional[Tuple[int, int, int, int]] = None,
+    tiled: Optional[bool] = None
+) -> Dict:
+    """
+    识别已上传的文件：依次尝试已保存结果、结果缓存，最后才执行推理，并保存结果、更新文件状态
+
+    指定识别区域时只识别该区域，结果只返回给调用方，不读写已保存结果和缓存。
+    多页文档（PDF、TIFF）按页并行识别，逐页保存结果。调用方负责提交事务。
+
+    Args:
+        db: 数据库会话
+        uploaded_file: 上传文件记录
+        use_pool: 是否将推理交给OCR进程池执行
+        on_progress: 进度回调 (进度百分比, 阶段名)
+        region: 识别区域 (x, y, 宽, 高)
+        tiled: 是否分块识别，None表示按配置自动判断
+
+    Returns:
+        识别结果字典
+
+    Raises:
+        ImageValidationError: 图片校验失败，或对多页文档指定了识别区域
+        EngineUnavailableError: OCR引擎不可用
+    """
+    def report(progress: int, stage: str) -> None:
+        if on_progress is not None:
+            on_progress(progress, stage)
+
+    document = is_document(uploaded_file.file_path)
+    if region is not None:
+        if document:
+            raise ImageValidationError("多页文档不支持区域识别")
+        report(10, "validating")
+        is_valid, error_msg = OCRService.validate_image(uploaded_file.file_path)
+        if not is_valid:
+            raise ImageValidationError(f"图片验证失败: {error_msg}")
+        report(30, "recognizing")
+        return recognize_file(uploaded_file.file_path, use_pool=use_pool, region=region, tiled=tiled)
+
+    # 已保存且由当前模型识别的结果直接返回，无需重复推理
+    stored_result = get_ocr_result(db, uploaded_file.id)
+    if stored_result is not None and is_current(stored_result):
+        uploaded_file.status = "processed"
+        report(100, "stored")
+        return load_result_dict(db, stored_result)
+
+    # 验证图片
+    report(10, "validating")
+    is_valid, error_msg = validate_source(uploaded_file.file_path)
+    if not is_valid:
+        uploaded_file.status = "error"
+        raise ImageValidationError(f"{'文档' if document else '图片'}验证失败: {error_msg}")
+
+    # 优先使用缓存的识别结果（相同内容的图片无需重复推理）
+    ocr_cache = get_ocr_cache()
+    result = ocr_cache.get(uploaded_file.file_hash, tiled)
+    if result is None:
+        report(30, "recognizing")
+        if document:
+            # 识别进度按已完成页数从30%推进到90%；之前部分页失败时只重新识别失败的页
+            result = recognize_document(
+                uploaded_file.file_path,
+                use_pool=use_pool,
+                on_page=lambda done, total: report(30 + 60 * done // total, "recognizing"),
+                known_pages=get_reusable_pages(db, uploaded_file.id),
+                tiled=tiled
+            )
+        else:
+            result = recognize_file(uploaded_file.file_path, use_pool=use_pool, tiled=tiled)
+        ocr_cache.set(uploaded_file.file_hash, result, tiled)
+    else:
+        logging.info(f"OCR缓存命中: {uploaded_file.filename}")
+
+    # 保存识别结果并更新文件状态
+    report(90, "saving")
+    save_ocr_result(db, uploaded_file, result)
+    uploaded_file.status = "processed" if result["success"] else "error"
+
+    return result
@@ -0,0 +1,278 @@
+"""OCR工作进程池"""
+import multiprocessing
+import threading
+from concurrent.futures import (
+    Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+)
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from app.utils.logger import logging
+from app.core.config import settings
+from app.services.ocr_service import OCRService
+from app.services.ocr_engine_pool import get_ocr_engine_pool
+from app.services.ocr_cascade import get_cascade_stats
+from app.services.document_pages import count_pages, merge_page_results
+from app.services.storage import get_storage
+from app.utils.timing import record_stages, span, timed
+
+
+# 工作进程内的OCR服务实例（每个进程一个）
+_worker_service: Optional[OCRService] = None
+
+
+def _init_worker() -> None:
+    """工作进程初始化：预加载PaddleOCR引擎"""
+    global _worker_service
+    _worker_service = OCRService()
+
+
+def _recognize_in_worker(image_path: str, options: Dict) -> Dict:
+    """在工作进程中执行识别"""
+    return _worker_service.recognize_text(image_path, **options)
+
+
+def _recognize_inline(image_path: str, options: Dict) -> Dict:
+    """在当前进程中执行识别（未启用进程池时使用）"""
+    return get_ocr_engine_pool().recognize_path(image_path, settings.OCR_ENGINE_CHECKOUT_TIMEOUT, **options)
+
+
+def _ping() -> bool:
+    """空任务，用于确认工作进程已完成初始化"""
+    return True
+
+
+class OCRWorkerPool:
+    """OCR工作进程池
+
+    每个工作进程在启动时加载一个PaddleOCR引擎，识别任务按完成顺序返回。
+    max_workers 为0时退化为当前进程内的单线程识别。
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(0, max_workers)
+        self._executor: Optional[Executor] = None
+        self._warm_up_futures: List[Future] = []
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        """按需创建执行器"""
+        with self._lock:
+            if self._executor is None:
+                if self.max_workers > 0:
+                    # 使用spawn避免fork时复制推理框架的线程状态
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker
+                    )
+                    logging.info(f"OCR进程池已启动: {self.max_workers} 个工作进程")
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=1)
+                    logging.info("OCR进程池未启用，在当前进程内识别")
+            return self._executor
+
+    def warm_up(self) -> None:
+        """
+        启动工作进程并为每个进程提交一个空任务（不等待完成）
+
+        工作进程在初始化时加载引擎，空任务全部完成即表示进程池已可用。
+        """
+        if self.max_workers == 0:
+            return
+        executor = self._get_executor()
+        with self._lock:
+            if not self._warm_up_futures:
+                self._warm_up_futures = [executor.submit(_ping) for _ in range(self.max_workers)]
+
+    @property
+    def ready(self) -> bool:
+        """工作进程是否已完成初始化（未启用进程池时始终为True）"""
+        if self.max_workers == 0:
+            return True
+        futures = self._warm_up_futures
+        return bool(futures) and all(f.done() and f.exception() is None for f in futures)
+
+    def submit(self, image_path: str, **options) -> Future:
+        """
+        提交单个识别任务
+
+        Args:
+            image_path: 图片文件路径
+            **options: 识别参数（region、tiled、page）
+
+        Returns:
+            识别结果的Future
+        """
+        executor = self._get_executor()
+        if self.max_workers > 0:
+            return executor.submit(_recognize_in_worker, image_path, options)
+        return executor.submit(_recognize_inline, image_path, options)
+
+    def recognize_many(self, image_paths: Dict[str, str]) -> Iterator[Tuple[str, Dict]]:
+        """
+        批量识别，按完成顺序逐个返回结果
+
+        Args:
+            image_paths: {任务键: 图片路径}
+
+        Yields:
+            (任务键, 识别结果字典)
+        """
+        futures = {self.submit(path): key for key, path in image_paths.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"OCR工作进程执行失败: {image_paths[key]}, 错误: {str(e)}")
+                yield key, {
+                    "success": False,
+                    "text": "",
+                    "details": [],
+                    "error": str(e)
+                }
+                continue
+            get_cascade_stats().record(result)
+            yield key, result
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+                self._warm_up_futures = []
+
+
+# 全局OCR进程池实例
+_ocr_pool: Optional[OCRWorkerPool] = None
+_ocr_pool_lock = threading.Lock()
+
+
+def get_ocr_pool() -> OCRWorkerPool:
+    """获取OCR进程池实例（单例模式），remote模式下返回交给独立推理进程的远程池"""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            if settings.OCR_INFERENCE_MODE == "remote":
+                from app.db.redis import get_redis
+                from app.services.ocr_remote import RemoteOCRPool
+                _ocr_pool = RemoteOCRPool(get_redis(), settings.OCR_REMOTE_TIMEOUT)
+            else:
+                _ocr_pool = OCRWorkerPool(settings.OCR_POOL_WORKERS)
+    return _ocr_pool
+
+
+def recognize_file(image_path: str, use_pool: bool = False, **options) -> Dict:
+    """
+    识别单个图片文件
+
+    remote模式下总是交给独立推理进程；否则 use_pool 为True时交给进程池，为False时借用当前进程的引擎。
+
+    Args:
+        image_path: 图片文件路径
+        use_pool: 是否使用进程池
+        **options: 识别参数（region、tiled、page）
+
+    Returns:
+        识别结果字典
+    """
+    with span("ocr"):
+        if use_pool or settings.OCR_INFERENCE_MODE == "remote":
+            result = get_ocr_pool().submit(image_path, **options).result()
+        else:
+            result = _recognize_inline(image_path, options)
+    # 识别进程中各阶段（预处理、推理等）的耗时随结果带回
+    record_stages(result.get("timings"), "ocr_")
+    get_cascade_stats().record(result)
+    return result
+
+
+def recognize_bytes(content: bytes, **options) -> Dict:
+    """
+    识别内存中的图片（remote模式下交给独立推理进程）
+
+    Args:
+        content: 图片文件内容
+        **options: 识别参数（region、tiled）
+
+    Returns:
+        识别结果字典
+    """
+    with span("ocr"):
+        if settings.OCR_INFERENCE_MODE == "remote":
+            result = get_ocr_pool().submit_bytes(content, **options).result()
+        else:
+            result = get_ocr_engine_pool().recognize_bytes(content, settings.OCR_ENGINE_CHECKOUT_TIMEOUT, **options)
+    record_stages(result.get("timings"), "ocr_")
+    get_cascade_stats().record(result)
+    return result
+
+
+@timed("ocr")
+def recognize_document(
+    document_path: str,
+    use_pool: bool = False,
+    on_page: Optional[Callable[[int, int], None]] = None,
+    known_pages: Optional[Dict[int, Dict]] = None,
+    **options
+) -> Dict:
+    """
+    按页并行识别多页文档（PDF、TIFF）
+
+    同时最多提交 OCR_PAGE_CONCURRENCY 页，每完成一页再提交下一页；页面在执行识别的
+    进程中才栅格化，因此无论文档多少页，同时存在的页面图片不超过并发页数。
+    执行位置与 recognize_file 相同（当前进程的引擎池、OCR进程池或独立推理进程）。
+
+    Args:
+        document_path: 文档路径
+        use_pool: 是否使用进程池
+        on_page: 每完成一页的回调 (已完成页数, 总页数)
+        known_pages: 之前已识别成功的页 {页码: 识别结果字典}，这些页不再识别，直接合并
+        **options: 识别参数（tiled）
+
+    Returns:
+        合并后的识别结果字典（见 merge_page_results）
+    """
+    page_count = count_pages(get_storage().local_path(document_path))
+    remote = use_pool or settings.OCR_INFERENCE_MODE == "remote"
+    concurrency = max(1, settings.OCR_PAGE_CONCURRENCY)
+    if not remote:
+        # 当前进程内识别时并发页数超过引擎数只会排队等待引擎
+        concurrency = min(concurrency, get_ocr_engine_pool().size)
+    page_results = {page: result for page, result in (known_pages or {}).items() if page <= page_count}
+    reused = len(page_results)
+    pages = iter([page for page in range(1, page_count + 1) if page not in page_results])
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ocr-page") as local:
+        def submit(page: int) -> Future:
+            page_options = dict(options, page=page)
+            if remote:
+                return get_ocr_pool().submit(document_path, **page_options)
+            return local.submit(_recognize_inline, document_path, page_options)
+
+        pending = {submit(page): page for _, page in zip(range(concurrency), pages)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logging.error(f"文档页面识别失败: {document_path}#{page}, 错误: {str(e)}")
+                    result = {"success": False, "text": "", "details": [], "error": str(e)}
+                get_cascade_stats().record(result)
+                page_results[page] = result
+                if on_page is not None:
+                    on_page(len(page_results), page_count)
+                next_page = next(pages, None)
+                if next_page is not None:
+                    pending[submit(next_page)] = next_page
+
+    logging.info(f"文档识别完成: {document_path}, 共 {page_count} 页, 复用已识别的 {reused} 页")
+    return merge_page_results(page_results, page_count)
+
+
+def shutdown_ocr_pool() -> None:
+    """关闭全局OCR进程池"""
+    if _ocr_pool is not None:
+        _ocr_pool.shutdown()
@@ -0,0 +1,252 @@
+"""独立OCR推理进程的任务分发
+
+API进程只负责请求处理和数据库读写，推理任务通过Redis队列交给独立的OCR推理进程
+（由 serve.py 启动）。引擎只在推理进程中加载，模型权重的副本数等于推理进程数，
+与API进程数无关。
+"""
+import json
+import math
+import os
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.ocr_engine_pool import OCREnginePool, EngineUnavailableError, get_ocr_engine_pool
+from app.services.ocr_pool import OCRWorkerPool
+from app.utils.logger import logging
+
+
+TASK_QUEUE_KEY = "ocr:inference:queue"
+WORKER_KEY_PREFIX = "ocr:inference:worker:"
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TTL = 15
+
+
+def _result_key(task_id: str) -> str:
+    return f"ocr:inference:result:{task_id}"
+
+
+def _data_key(task_id: str) -> str:
+    return f"ocr:inference:data:{task_id}"
+
+
+class RemoteOCRPool(OCRWorkerPool):
+    """远程OCR推理池
+
+    与 OCRWorkerPool 接口相同；submit 把任务推入Redis队列，由本地线程阻塞等待推理进程写回结果。
+    max_workers 为同时等待结果的线程数，不占用推理资源。
+    """
+
+    def __init__(self, redis, timeout: float, max_workers: int = 32):
+        super().__init__(max_workers)
+        self.redis = redis
+        self.timeout = timeout
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, self.max_workers), thread_name_prefix="ocr-remote"
+                )
+            return self._executor
+
+    def warm_up(self) -> None:
+        """推理进程由 serve.py 单独启动，这里无需预热"""
+
+    @property
+    def ready(self) -> bool:
+        """是否至少有一个推理进程在线（根据心跳判断）"""
+        try:
+            for _ in self.redis.scan_iter(match=f"{WORKER_KEY_PREFIX}*", count=100):
+                return True
+        except Exception as e:
+            logging.error(f"检查OCR推理进程心跳失败: {str(e)}")
+        return False
+
+    def submit(self, image_path: str, **options) -> Future:
+        """
+        提交单个图片文件的识别任务（推理进程需要能访问同一路径）
+
+        Args:
+            image_path: 图片文件路径
+            **options: 识别参数（region、tiled、page）
+
+        Returns:
+            识别结果的Future
+        """
+        return self._get_executor().submit(self._call, {"path": image_path, "options": options})
+
+    def submit_bytes(self, content: bytes, **options) -> Future:
+        """
+        提交图片字节流的识别任务
+
+        Args:
+            content: 图片文件内容
+            **options: 识别参数（region、tiled）
+
+        Returns:
+            识别结果的Future
+        """
+        return self._get_executor().submit(self._call, {"options": options}, content)
+
+    def _call(self, task: Dict, data: Optional[bytes] = None) -> Dict:
+        """推送任务并等待结果"""
+        task_id = str(uuid.uuid4())
+        expire = max(1, math.ceil(self.timeout))
+        task = dict(task, task_id=task_id, deadline=time.time() + self.timeout)
+        if data is not None:
+            self.redis.set(_data_key(task_id), data, ex=expire)
+        self.redis.rpush(TASK_QUEUE_KEY, json.dumps(task, ensure_ascii=False))
+
+        item = self.redis.blpop(_result_key(task_id), timeout=expire)
+        if item is None:
+            self.redis.delete(_data_key(task_id))
+            raise EngineUnavailableError("等待OCR推理进程超时")
+        return json.loads(item[1])
+
+
+class InferenceWorker:
+    """OCR推理进程中的任务循环
+
+    每个线程对应引擎池中的一个引擎；stop() 后不再领取新任务，已领取的任务执行完才退出。
+    """
+
+    def __init__(self, redis, engine_pool: OCREnginePool, threads: Optional[int] = None):
+        self.redis = redis
+        self.engine_pool = engine_pool
+        self.threads = max(1, threads or engine_pool.size)
+        self.worker_key = f"{WORKER_KEY_PREFIX}{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._in_flight = 0
+        self._processed = 0
+        self._lock = threading.Lock()
+
+    def handle(self, raw) -> None:
+        """
+        执行单个推理任务并写回结果
+
+        Args:
+            raw: 队列中的任务JSON
+        """
+        task = json.loads(raw)
+        task_id = task["task_id"]
+        result_key = _result_key(task_id)
+        # 等待方已超时放弃的任务不再执行
+        if task.get("deadline") and time.time() > task["deadline"]:
+            self.redis.delete(_data_key(task_id))
+            logging.warning(f"OCR推理任务已过期，跳过: {task_id}")
+            return
+
+        options = task.get("options") or {}
+        if options.get("region") is not None:
+            options["region"] = tuple(options["region"])
+        timeout = settings.OCR_ENGINE_CHECKOUT_TIMEOUT
+        try:
+            if "path" in task:
+                result = self.engine_pool.recognize_path(task["path"], timeout, **options)
+            else:
+                data = self.redis.get(_data_key(task_id))
+                if data is None:
+                    raise ValueError("图片数据已过期")
+                result = self.engine_pool.recognize_bytes(data, timeout, **options)
+        except Exception as e:
+            logging.error(f"OCR推理任务失败: {task_id}, 错误: {str(e)}")
+            result = {"success": False, "text": "", "details": [], "error": str(e)}
+        finally:
+            self.redis.delete(_data_key(task_id))
+
+        self.redis.rpush(result_key, json.dumps(result, ensure_ascii=False))
+        self.redis.expire(result_key, max(1, math.ceil(settings.OCR_REMOTE_TIMEOUT)))
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                item = self.redis.blpop(TASK_QUEUE_KEY, timeout=1)
+            except Exception as e:
+                logging.error(f"读取OCR推理队列失败: {str(e)}")
+                self._stop.wait(1.0)
+                continue
+            if item is None:
+                continue
+            with self._lock:
+                self._in_flight += 1
+            try:
+                self.handle(item[1])
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._processed += 1
+
+    def _heartbeat(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.redis.set(self.worker_key, os.getpid(), ex=HEARTBEAT_TTL)
+            except Exception as e:
+                logging.error(f"写入OCR推理进程心跳失败: {str(e)}")
+            self._stop.wait(HEARTBEAT_INTERVAL)
+
+    def start(self) -> None:
+        """启动任务线程和心跳线程"""
+        self._stop.clear()
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._loop, name=f"ocr-inference-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name="ocr-inference-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        logging.info(f"OCR推理进程已就绪: pid={os.getpid()}, 线程 {self.threads} 个")
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """停止领取新任务，等待进行中的任务完成"""
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        self._threads = []
+        try:
+            self.redis.delete(self.worker_key)
+        except Exception:
+            pass
+        logging.info(f"OCR推理进程已停止: pid={os.getpid()}, 未完成任务 {self._in_flight} 个")
+
+    def stats(self) -> Dict:
+        """获取推理进程统计"""
+        with self._lock:
+            return {
+                "threads": self.threads,
+                "in_flight": self._in_flight,
+                "processed": self._processed
+            }
+
+
+def run_inference_worker(ignore_sigint: bool = False) -> int:
+    """
+    OCR推理进程入口：加载引擎后消费推理任务，收到SIGTERM后处理完进行中的任务再退出
+
+    Args:
+        ignore_sigint: 是否忽略SIGINT（由启动器管理时，终端Ctrl+C只交给启动器处理，
+            以便API进程先排空请求，推理进程最后停止）
+
+    Returns:
+        进程退出码
+    """
+    from app.db.redis import get_redis
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN if ignore_sigint else (lambda *_: stop.set()))
+
+    engine_pool = get_ocr_engine_pool()
+    if not engine_pool.load():
+        return 1
+
+    worker = InferenceWorker(get_redis(), engine_pool)
+    worker.start()
+    stop.wait()
+    worker.stop(timeout=settings.GRACEFUL_TIMEOUT)
+    return 0
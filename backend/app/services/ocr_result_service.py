@@ -0,0 +1,258 @@
+"""OCR识别结果持久化服务"""
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.ocr import OCRResult, OCRResultRevision, OCRPageResult
+from app.models.upload import UploadedFile
+from app.utils.box_codec import pack_boxes, unpack_boxes, pack_floats, unpack_floats
+
+
+def get_ocr_result(db: Session, file_id: str) -> Optional[OCRResult]:
+    """
+    获取文件已保存的识别结果
+
+    Args:
+        db: 数据库会话
+        file_id: 文件ID
+
+    Returns:
+        识别结果记录，不存在时返回None
+    """
+    return db.query(OCRResult).filter(OCRResult.file_id == file_id).first()
+
+
+def is_current(ocr_result: OCRResult) -> bool:
+    """判断已保存的结果是否由当前配置的语言和模型版本识别得到"""
+    return ocr_result.lang == settings.OCR_LANG and ocr_result.model_version == settings.OCR_MODEL_VERSION
+
+
+def save_ocr_result(db: Session, uploaded_file: UploadedFile, result: Dict) -> Optional[OCRResult]:
+    """
+    保存识别结果（已存在时覆盖识别内容，保留编辑版本）
+
+    多页文档的结果（带 pages 字段）同时保存逐页结果，部分页失败时成功页的结果仍会保存。
+
+    Args:
+        db: 数据库会话
+        uploaded_file: 上传文件记录
+        result: OCRService 返回的识别结果字典
+
+    Returns:
+        识别结果记录；识别失败时不保存，返回None
+    """
+    if result.get("pages"):
+        save_page_results(db, uploaded_file, result)
+    if not result.get("success"):
+        return None
+
+    details = result.get("details") or []
+    ocr_result = get_ocr_result(db, uploaded_file.id)
+    if ocr_result is None:
+        ocr_result = OCRResult(file_id=uploaded_file.id, user_id=uploaded_file.user_id)
+        db.add(ocr_result)
+
+    ocr_result.text = result.get("text", "")
+    ocr_result.line_count = len(details)
+    ocr_result.line_boxes = pack_boxes([d["box"] for d in details])
+    ocr_result.line_confidences = pack_floats([d["confidence"] for d in details])
+    ocr_result.lang = settings.OCR_LANG
+    ocr_result.model_version = settings.OCR_MODEL_VERSION
+    return ocr_result
+
+
+def save_page_results(db: Session, uploaded_file: UploadedFile, result: Dict) -> List[OCRPageResult]:
+    """
+    保存多页文档的逐页识别结果（已存在的页覆盖）
+
+    Args:
+        db: 数据库会话
+        uploaded_file: 上传文件记录
+        result: recognize_document 返回的合并结果字典
+
+    Returns:
+        逐页结果记录列表
+    """
+    existing = {p.page_no: p for p in list_page_results(db, uploaded_file.id)}
+    details_by_page: Dict[int, List[Dict]] = {}
+    for detail in result.get("details") or []:
+        details_by_page.setdefault(detail["page"], []).append(detail)
+
+    records = []
+    for page in result["pages"]:
+        record = existing.get(page["page"])
+        if record is None:
+            record = OCRPageResult(file_id=uploaded_file.id, user_id=uploaded_file.user_id, page_no=page["page"])
+            db.add(record)
+        details = details_by_page.get(page["page"], [])
+        record.text = "\n".join(d["text"] for d in details)
+        record.line_count = len(details)
+        record.line_boxes = pack_boxes([d["box"] for d in details])
+        record.line_confidences = pack_floats([d["confidence"] for d in details])
+        record.error = None if page["success"] else page.get("error")
+        record.model_version = settings.OCR_MODEL_VERSION
+        records.append(record)
+    return records
+
+
+def list_page_results(db: Session, file_id: str) -> List[OCRPageResult]:
+    """获取文件的逐页识别结果（按页码升序）"""
+    return db.query(OCRPageResult).filter(
+        OCRPageResult.file_id == file_id
+    ).order_by(OCRPageResult.page_no.asc()).all()
+
+
+def page_to_result_dict(page_result: OCRPageResult) -> Dict:
+    """
+    将逐页结果记录还原为识别结果字典
+
+    Args:
+        page_result: 逐页结果记录
+
+    Returns:
+        识别结果字典，额外包含 page
+    """
+    boxes = unpack_boxes(page_result.line_boxes)
+    confidences = unpack_floats(page_result.line_confidences)
+    lines = page_result.text.split("\n") if page_result.line_count else []
+    details = [
+        {"text": text, "confidence": round(confidence, 6), "box": box, "page": page_result.page_no}
+        for text, confidence, box in zip(lines, confidences, boxes)
+    ]
+    return {
+        "page": page_result.page_no,
+        "success": page_result.error is None,
+        "text": page_result.text,
+        "details": details,
+        "error": page_result.error
+    }
+
+
+def to_result_dict(ocr_result: OCRResult, page_results: Optional[List[OCRPageResult]] = None) -> Dict:
+    """
+    将识别结果记录还原为与 OCRService 相同结构的结果字典
+
+    多页文档的行按逐页结果还原，与 merge_page_results 的结果一样每行带有 page，
+    并包含 page_count 和 pages。
+
+    Args:
+        ocr_result: 识别结果记录
+        page_results: 文件的逐页结果记录（list_page_results），单张图片为空
+
+    Returns:
+        识别结果字典
+    """
+    if page_results:
+        pages = [page_to_result_dict(page_result) for page_result in page_results]
+        return {
+            "success": True,
+            "text": ocr_result.text,
+            "details": [detail for page in pages for detail in page["details"]],
+            "error": None,
+            "page_count": len(pages),
+            "pages": [{"page": p["page"], "success": p["success"], "error": p["error"]} for p in pages]
+        }
+
+    boxes = unpack_boxes(ocr_result.line_boxes)
+    confidences = unpack_floats(ocr_result.line_confidences)
+    lines = ocr_result.text.split("\n") if ocr_result.line_count else []
+    details = [
+        {"text": text, "confidence": round(confidence, 6), "box": box}
+        for text, confidence, box in zip(lines, confidences, boxes)
+    ]
+    return {
+        "success": True,
+        "text": ocr_result.text,
+        "details": details,
+        "error": None
+    }
+
+
+def load_result_dict(db: Session, ocr_result: OCRResult) -> Dict:
+    """还原已保存的识别结果（多页文档连同逐页结果一起还原）"""
+    return to_result_dict(ocr_result, list_page_results(db, ocr_result.file_id))
+
+
+def get_reusable_pages(db: Session, file_id: str) -> Dict[int, Dict]:
+    """
+    获取文档中由当前模型版本识别成功的页，重新识别时只需识别其余的页
+
+    Args:
+        db: 数据库会话
+        file_id: 文件ID
+
+    Returns:
+        {页码: 该页的识别结果字典}
+    """
+    return {
+        page_result.page_no: page_to_result_dict(page_result)
+        for page_result in list_page_results(db, file_id)
+        if page_result.error is None and page_result.model_version == settings.OCR_MODEL_VERSION
+    }
+
+
+def get_or_create_ocr_result(db: Session, uploaded_file: UploadedFile) -> OCRResult:
+    """
+    获取文件的识别结果记录，不存在时创建空记录（用于尚未识别就手动录入文本的情况）
+
+    Args:
+        db: 数据库会话
+        uploaded_file: 上传文件记录
+
+    Returns:
+        识别结果记录
+    """
+    ocr_result = get_ocr_result(db, uploaded_file.id)
+    if ocr_result is None:
+        ocr_result = OCRResult(
+            file_id=uploaded_file.id,
+            user_id=uploaded_file.user_id,
+            text="",
+            line_count=0
+        )
+        db.add(ocr_result)
+        db.flush()
+    return ocr_result
+
+
+def add_revision(db: Session, ocr_result: OCRResult, text: str, user_id: str) -> OCRResultRevision:
+    """
+    保存一次编辑版本
+
+    Args:
+        db: 数据库会话
+        ocr_result: 识别结果记录
+        text: 编辑后的文本
+        user_id: 编辑的用户ID
+
+    Returns:
+        新的版本记录
+    """
+    if ocr_result.id is None:
+        db.flush()
+    ocr_result.revision = (ocr_result.revision or 0) + 1
+    ocr_result.edited_text = text
+    revision = OCRResultRevision(
+        result_id=ocr_result.id,
+        user_id=user_id,
+        revision=ocr_result.revision,
+        text=text
+    )
+    db.add(revision)
+    return revision
+
+
+def list_revisions(db: Session, ocr_result: OCRResult) -> List[OCRResultRevision]:
+    """获取识别结果的全部编辑版本（按版本号升序）"""
+    return db.query(OCRResultRevision).filter(
+        OCRResultRevision.result_id == ocr_result.id
+    ).order_by(OCRResultRevision.revision.asc()).all()
+
+
+def delete_ocr_results(db: Session, file_id: str) -> None:
+    """删除文件的识别结果（包括逐页结果）及其全部编辑版本"""
+    db.query(OCRPageResult).filter(OCRPageResult.file_id == file_id).delete()
+    ocr_result = get_ocr_result(db, file_id)
+    if ocr_result is None:
+        return
+    db.query(OCRResultRevision).filter(OCRResultRevision.result_id == ocr_result.id).delete()
+    db.delete(ocr_result)
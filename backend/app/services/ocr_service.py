@@ -1,35 +1,80 @@
 """OCR识别服务"""
-import os
-from typing import Optional, List, Dict, Tuple
-from paddleocr import PaddleOCR
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Optional, List, Dict, Tuple
 from app.utils.logger import logging
 from app.core.config import settings
+from app.services.image_preprocessor import ImagePreprocessor
+from app.services.ocr_tiling import split_tiles, merge_tile_details, map_tiles
+from app.services.ocr_cascade import TIER_FAST, TIER_ACCURATE, TIER_FULL, mean_confidence
+from app.services.document_pages import render_page
+from app.services.storage import get_storage
+from app.utils.timing import span
 
 
 class OCRService:
     """OCR识别服务类"""
     
-    def __init__(self):
-        """初始化OCR引擎"""
+    def __init__(self, preprocessor: Optional[ImagePreprocessor] = None):
+        """
+        初始化OCR引擎
+        
+        Args:
+            preprocessor: 推理前的图片预处理器，默认按配置创建
+        """
+        if preprocessor is None and settings.OCR_PREPROCESS_ENABLED:
+            preprocessor = ImagePreprocessor.from_settings()
+        self.preprocessor = preprocessor
+        
         try:
-            # 初始化PaddleOCR，支持中英文识别
+            # 延迟导入PaddleOCR，避免只转发任务的进程也加载推理框架
+            from paddleocr import PaddleOCR
+
+            # 初始化PaddleOCR，支持中英文识别（未指定模型目录时使用默认的轻量模型）
             self.ocr = PaddleOCR(
-                use_angle_cls=True,  # 使用方向分类器
-                lang='ch',  # 中文模型，也支持英文
-                use_gpu=False,  # 使用CPU
+                use_angle_cls=True,  # 加载方向分类器，快速档调用时跳过
+                lang=settings.OCR_LANG,  # 默认中文模型，也支持英文
+                use_gpu=settings.OCR_USE_GPU,  # 默认使用CPU
+                det_model_dir=settings.OCR_FAST_DET_MODEL_DIR,
                 show_log=False  # 不显示详细日志
             )
+            
+            # 配置了服务端模型时，精确档使用单独的引擎；否则复用同一引擎并开启方向分类
+            self.accurate_ocr = self.ocr
+            if settings.OCR_CASCADE_ENABLED and (
+                settings.OCR_ACCURATE_DET_MODEL_DIR or settings.OCR_ACCURATE_REC_MODEL_DIR
+            ):
+                self.accurate_ocr = PaddleOCR(
+                    use_angle_cls=True,
+                    lang=settings.OCR_LANG,
+                    use_gpu=settings.OCR_USE_GPU,
+                    det_model_dir=settings.OCR_ACCURATE_DET_MODEL_DIR,
+                    rec_model_dir=settings.OCR_ACCURATE_REC_MODEL_DIR,
+                    show_log=False
+                )
             logging.info("OCR引擎初始化成功")
         except Exception as e:
             logging.error(f"OCR引擎初始化失败: {str(e)}")
             raise
     
-    def recognize_text(self, image_path: str) -> Dict:
+    def recognize_text(
+        self,
+        image_path: str,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        tiled: Optional[bool] = None,
+        borrow_engines: Optional[Callable[[], ContextManager[List["OCRService"]]]] = None,
+        page: Optional[int] = None
+    ) -> Dict:
         """
         识别图片中的文字
         
         Args:
             image_path: 图片文件路径
+            region: 只识别的区域 (x, y, 宽, 高)，坐标基于原图
+            tiled: 是否分块识别，None表示按 OCR_TILE_MIN_SIDE 自动判断
+            borrow_engines: 分块识别时借用其他空闲引擎并行处理分块，返回上下文管理器
+            page: 多页文档（PDF、TIFF）的页码（从1开始），只栅格化并识别该页
             
         Returns:
             识别结果字典，包含：
@@ -38,61 +83,257 @@ class OCRService:
             - details: 详细识别结果列表
             - error: 错误信息（如果失败）
         """
+        # 验证文件是否存在（对象存储中的文件先下载到本地缓存）
         try:
-            # 验证文件是否存在
-            if not os.path.exists(image_path):
-                return {
-                    "success": False,
-                    "text": "",
-                    "details": [],
-                    "error": "图片文件不存在"
-                }
+            image_path = get_storage().local_path(image_path)
+        except FileNotFoundError:
+            return {
+                "success": False,
+                "text": "",
+                "details": [],
+                "error": "图片文件不存在"
+            }
+        
+        if page is not None:
+            return self._recognize_page(image_path, page, region, tiled, borrow_engines)
+        if self._needs_preprocessing(region, tiled):
+            return self._recognize_preprocessed(image_path, image_path, region, tiled, borrow_engines)
+        return self._recognize(image_path, image_path)
+    
+    def _recognize_page(self, document_path: str, page: int, region=None, tiled=None, borrow_engines=None) -> Dict:
+        """栅格化文档的单页并识别，页面图片在识别完成后释放"""
+        label = f"{document_path}#{page}"
+        started = time.perf_counter()
+        try:
+            image = render_page(document_path, page)
+        except Exception as e:
+            logging.error(f"文档页面栅格化失败: {label}, 错误: {str(e)}")
+            return {
+                "success": False,
+                "text": "",
+                "details": [],
+                "error": f"文档页面栅格化失败: {str(e)}"
+            }
+        render_ms = round((time.perf_counter() - started) * 1000, 3)
+        try:
+            result = self._recognize_preprocessed(image, label, region, tiled, borrow_engines)
+        finally:
+            image.close()
+        if "timings" in result:
+            result["timings"] = dict(render=render_ms, **result["timings"])
+        return result
+    
+    def recognize_image_array(self, image, source: str = "<array>") -> Dict:
+        """
+        识别已解码的图片
+        
+        Args:
+            image: BGR格式的图片数组（numpy.ndarray）
+            source: 用于日志的图片来源描述
             
-            # 执行OCR识别
-            result = self.ocr.ocr(image_path, cls=True)
+        Returns:
+            识别结果字典
+        """
+        return self._recognize(image, source)
+    
+    def _needs_preprocessing(self, region, tiled: Optional[bool]) -> bool:
+        """是否需要先解码预处理（裁剪区域和分块都在预处理后的图片上进行）"""
+        return (
+            self.preprocessor is not None
+            or region is not None
+            or bool(tiled)
+            or (tiled is None and settings.OCR_TILE_MIN_SIDE > 0)
+        )
+    
+    def _plan_tiles(self, image, tiled: Optional[bool]) -> List[Tuple[int, int, int, int]]:
+        """按图片尺寸决定分块，不分块时返回空列表"""
+        height, width = image.shape[:2]
+        if tiled is None:
+            tiled = 0 < settings.OCR_TILE_MIN_SIDE < max(width, height)
+        if not tiled:
+            return []
+        tiles = split_tiles(width, height, settings.OCR_TILE_SIZE, settings.OCR_TILE_OVERLAP)
+        return tiles if len(tiles) > 1 else []
+    
+    def _recognize_tiles(self, image, tiles, source: str, borrow_engines=None) -> Dict:
+        """
+        分块识别并合并结果
+        
+        Args:
+            image: 图片数组
+            tiles: 分块列表 (x0, y0, x1, y1)
+            source: 用于日志的图片来源描述
+            borrow_engines: 借用其他空闲引擎的上下文管理器工厂
+            
+        Returns:
+            识别结果字典，文本框为整图坐标
+        """
+        crops = [image[y0:y1, x0:x1] for x0, y0, x1, y1 in tiles]
+        with (borrow_engines() if borrow_engines is not None else nullcontext([])) as extra:
+            tile_results = map_tiles([self] + list(extra), crops, source)
+        
+        failed = next((r for r in tile_results if not r["success"]), None)
+        if failed is not None:
+            return failed
+        
+        details = merge_tile_details([(tile, r["details"]) for tile, r in zip(tiles, tile_results)])
+        logging.info(f"OCR分块识别: {source}, {len(tiles)} 个分块, 合并后 {len(details)} 行文本")
+        # 任一分块升级到精确档即记为精确档
+        tiers = {r.get("tier") for r in tile_results}
+        return {
+            "success": True,
+            "text": "\n".join(d["text"] for d in details),
+            "details": details,
+            "error": None,
+            "tier": TIER_ACCURATE if TIER_ACCURATE in tiers else tile_results[0].get("tier")
+        }
+    
+    def _recognize_preprocessed(
+        self,
+        source,
+        label: str,
+        region=None,
+        tiled: Optional[bool] = None,
+        borrow_engines=None
+    ) -> Dict:
+        """
+        预处理后识别（可裁剪区域、分块），文本框坐标映射回原图，并记录各阶段耗时
+        
+        Args:
+            source: 图片路径、图片字节流或 PIL.Image
+            label: 用于日志的图片来源描述
+            region: 识别区域 (x, y, 宽, 高)
+            tiled: 是否分块识别
+            borrow_engines: 借用其他空闲引擎的上下文管理器工厂
+            
+        Returns:
+            识别结果字典，额外包含 timings（各阶段耗时，毫秒）
+        """
+        preprocessor = self.preprocessor or ImagePreprocessor()
+        try:
+            preprocessed = preprocessor.process(source, region=region)
+        except Exception as e:
+            logging.error(f"图片预处理失败: {label}, 错误: {str(e)}")
+            return {
+                "success": False,
+                "text": "",
+                "details": [],
+                "error": f"图片预处理失败: {str(e)}"
+            }
+        
+        started = time.perf_counter()
+        tiles = self._plan_tiles(preprocessed.image, tiled)
+        if tiles:
+            result = self._recognize_tiles(preprocessed.image, tiles, label, borrow_engines)
+        else:
+            result = self._recognize(preprocessed.image, label)
+        timings = dict(preprocessed.timings)
+        timings["inference"] = round((time.perf_counter() - started) * 1000, 3)
+        
+        for detail in result["details"]:
+            detail["box"] = preprocessed.to_original(detail["box"])
+        result["timings"] = timings
+        
+        logging.debug(f"OCR各阶段耗时(ms): {label}, {timings}")
+        return result
+    
+    @staticmethod
+    def _run_engine(engine, image, cls: bool) -> List[Dict]:
+        """
+        调用PaddleOCR并整理为行列表
+        
+        Args:
+            engine: PaddleOCR实例
+            image: 图片路径或图片数组
+            cls: 是否使用方向分类器
+            
+        Returns:
+            识别的行列表（text、confidence、box）
+        """
+        result = engine.ocr(image, cls=cls)
+        if not result or not result[0]:
+            return []
+        
+        details = []
+        for line in result[0]:
+            # line格式: [坐标框, (文本, 置信度)]
+            box = line[0]  # 坐标框
+            text, confidence = line[1]  # (文本, 置信度)
+            details.append({
+                "text": text,
+                "confidence": float(confidence),
+                "box": [[float(x), float(y)] for x, y in box]
+            })
+        return details
+    
+    def _run_cascade(self, image, source: str) -> Tuple[List[Dict], str]:
+        """
+        级联识别：先走快速档，平均置信度低于阈值时升级到精确档
+        
+        Args:
+            image: 图片路径或图片数组
+            source: 用于日志的图片来源描述
+            
+        Returns:
+            (识别的行列表, 使用的分级)
+        """
+        if not settings.OCR_CASCADE_ENABLED:
+            return self._run_engine(self.ocr, image, cls=True), TIER_FULL
+        
+        details = self._run_engine(self.ocr, image, cls=False)
+        confidence = mean_confidence(details)
+        # 没有检测到文本时升级也无济于事（方向分类只作用于已检测到的行）
+        if confidence is None or confidence >= settings.OCR_CASCADE_THRESHOLD:
+            return details, TIER_FAST
+        
+        accurate = self._run_engine(self.accurate_ocr, image, cls=True)
+        accurate_confidence = mean_confidence(accurate)
+        logging.info(f"OCR置信度 {confidence:.3f} 低于阈值，升级到精确档: {source}")
+        # 精确档结果更差（例如未检测到文本）时保留快速档结果，但仍记为已升级
+        if accurate_confidence is None or accurate_confidence < confidence:
+            return details, TIER_ACCURATE
+        return accurate, TIER_ACCURATE
+    
+    def _recognize(self, image, source: str) -> Dict:
+        """
+        执行OCR识别并整理结果
+        
+        Args:
+            image: 图片路径或图片数组，直接交给PaddleOCR
+            source: 用于日志的图片来源描述
+            
+        Returns:
+            识别结果字典
+        """
+        try:
+            details, tier = self._run_cascade(image, source)
             
             # 检查识别结果
-            if not result or not result[0]:
-                logging.warning(f"OCR未能识别到文本: {image_path}")
+            if not details:
+                logging.warning(f"OCR未能识别到文本: {source}")
                 return {
                     "success": True,
                     "text": "",
                     "details": [],
-                    "error": None
+                    "error": None,
+                    "tier": tier
                 }
             
-            # 提取文本和详细信息
-            text_lines = []
-            details = []
-            
-            for line in result[0]:
-                # line格式: [坐标框, (文本, 置信度)]
-                box = line[0]  # 坐标框
-                text_info = line[1]  # (文本, 置信度)
-                text = text_info[0]
-                confidence = text_info[1]
-                
-                text_lines.append(text)
-                details.append({
-                    "text": text,
-                    "confidence": float(confidence),
-                    "box": box
-                })
-            
             # 合并所有文本行
-            full_text = "\n".join(text_lines)
+            full_text = "\n".join(d["text"] for d in details)
             
-            logging.info(f"OCR识别成功: {image_path}, 识别到 {len(text_lines)} 行文本")
+            logging.info(f"OCR识别成功: {source}, 识别到 {len(details)} 行文本, 分级: {tier}")
             
             return {
                 "success": True,
                 "text": full_text,
                 "details": details,
-                "error": None
+                "error": None,
+                "tier": tier
             }
             
         except Exception as e:
-            logging.error(f"OCR识别失败: {image_path}, 错误: {str(e)}")
+            logging.error(f"OCR识别失败: {source}, 错误: {str(e)}")
             return {
                 "success": False,
                 "text": "",
@@ -100,35 +341,31 @@ class OCRService:
                 "error": str(e)
             }
     
-    def recognize_text_from_bytes(self, image_bytes: bytes) -> Dict:
+    def recognize_text_from_bytes(
+        self,
+        image_bytes: bytes,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        tiled: Optional[bool] = None,
+        borrow_engines: Optional[Callable[[], ContextManager[List["OCRService"]]]] = None
+    ) -> Dict:
         """
-        从字节流识别文字
+        从字节流识别文字（在内存中解码，不写临时文件）
         
         Args:
             image_bytes: 图片字节流
+            region: 只识别的区域 (x, y, 宽, 高)，坐标基于原图
+            tiled: 是否分块识别，None表示按 OCR_TILE_MIN_SIDE 自动判断
+            borrow_engines: 分块识别时借用其他空闲引擎并行处理分块
             
         Returns:
             识别结果字典
         """
-        import tempfile
+        label = f"<bytes:{len(image_bytes)}>"
+        if self._needs_preprocessing(region, tiled):
+            return self._recognize_preprocessed(image_bytes, label, region, tiled, borrow_engines)
         
         try:
-            # 创建临时文件
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                temp_file.write(image_bytes)
-                temp_path = temp_file.name
-            
-            # 识别文本
-            result = self.recognize_text(temp_path)
-            
-            # 删除临时文件
-            try:
-                os.unlink(temp_path)
-            except Exception:
-                pass
-            
-            return result
-            
+            image = self.decode_image_bytes(image_bytes)
         except Exception as e:
             logging.error(f"从字节流识别文本失败: {str(e)}")
             return {
@@ -137,8 +374,35 @@ class OCRService:
                 "details": [],
                 "error": str(e)
             }
+        
+        return self.recognize_image_array(image, label)
+    
+    @staticmethod
+    def decode_image_bytes(image_bytes: bytes):
+        """
+        将图片字节流直接解码为BGR数组
+        
+        Args:
+            image_bytes: 图片字节流
+            
+        Returns:
+            numpy.ndarray 图片数组
+            
+        Raises:
+            ValueError: 无法解码
+        """
+        import numpy as np
+        import cv2
+        
+        # frombuffer 直接引用字节流的内存，不做拷贝
+        buffer = np.frombuffer(memoryview(image_bytes), dtype=np.uint8)
+        image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("无法解码图片数据")
+        return image
     
-    def validate_image(self, image_path: str) -> Tuple[bool, Optional[str]]:
+    @staticmethod
+    def validate_image(image_path: str) -> Tuple[bool, Optional[str]]:
         """
         验证图片是否有效
         
@@ -148,15 +412,39 @@ class OCRService:
         Returns:
             (是否有效, 错误信息)
         """
-        try:
-            from PIL import Image
-            
+        with span("validate"):
             # 检查文件是否存在
-            if not os.path.exists(image_path):
+            try:
+                image_path = get_storage().local_path(image_path)
+            except FileNotFoundError:
                 return False, "图片文件不存在"
             
+            return OCRService._validate_source(image_path)
+    
+    @staticmethod
+    def validate_image_bytes(image_bytes: bytes) -> Tuple[bool, Optional[str]]:
+        """
+        验证内存中的图片是否有效
+        
+        Args:
+            image_bytes: 图片字节流
+            
+        Returns:
+            (是否有效, 错误信息)
+        """
+        from io import BytesIO
+        
+        with span("validate"):
+            return OCRService._validate_source(BytesIO(image_bytes))
+    
+    @staticmethod
+    def _validate_source(source) -> Tuple[bool, Optional[str]]:
+        """验证图片格式和尺寸（只读取图片头）"""
+        try:
+            from PIL import Image
+            
             # 尝试打开图片
-            with Image.open(image_path) as img:
+            with Image.open(source) as img:
                 # 验证图片格式
                 if img.format not in ['JPEG', 'PNG', 'BMP']:
                     return False, f"不支持的图片格式: {img.format}"
@@ -177,11 +465,18 @@ class OCRService:
 
 # 全局OCR服务实例
 _ocr_service: Optional[OCRService] = None
+_ocr_service_lock = threading.Lock()
 
 
 def get_ocr_service() -> OCRService:
-    """获取OCR服务实例（单例模式）"""
+    """
+    获取OCR服务实例（单例模式）
+
+    请求处理中应通过 get_ocr_engine_pool().checkout() 借用引擎，
+    该实例供脚本和测试等单线程场景使用。
+    """
     global _ocr_service
-    if _ocr_service is None:
-        _ocr_service = OCRService()
+    with _ocr_service_lock:
+        if _ocr_service is None:
+            _ocr_service = OCRService()
     return _ocr_service
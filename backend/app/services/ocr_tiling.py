@@ -0,0 +1,215 @@
+"""大图分块识别：切分重叠分块、并行识别、合并去重"""
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+# 分块 (x0, y0, x1, y1)
+Tile = Tuple[int, int, int, int]
+
+# 接缝两侧重复识别的文字至少匹配这么多个字符才去掉（单个字符相同更可能是真实的重复文字，如"2000"）
+MIN_SEAM_OVERLAP = 2
+
+
+def _axis_starts(length: int, tile_size: int, overlap: int) -> List[int]:
+    """计算单个方向上各分块的起点，最后一块与边缘对齐"""
+    if length <= tile_size:
+        return [0]
+    step = max(1, tile_size - overlap)
+    starts = list(range(0, length - tile_size, step))
+    starts.append(length - tile_size)
+    return starts
+
+
+def split_tiles(width: int, height: int, tile_size: int, overlap: int) -> List[Tile]:
+    """
+    将图片切分为相互重叠的分块
+
+    Args:
+        width: 图片宽度
+        height: 图片高度
+        tile_size: 分块边长
+        overlap: 相邻分块的重叠像素（应大于单行文字高度，保证跨缝的文字至少在一个分块中完整出现）
+
+    Returns:
+        分块列表，按行优先排列
+    """
+    return [
+        (x, y, min(width, x + tile_size), min(height, y + tile_size))
+        for y in _axis_starts(height, tile_size, overlap)
+        for x in _axis_starts(width, tile_size, overlap)
+    ]
+
+
+def _bounds(box: Sequence[Sequence[float]]) -> Tuple[float, float, float, float]:
+    xs = [p[0] for p in box]
+    ys = [p[1] for p in box]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _overlap_ratio(a: Tuple[float, float, float, float], b: Tuple[float, float, float, float]) -> float:
+    """交集面积占较小框面积的比例"""
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return (iw * ih) / smaller if smaller > 0 else 0.0
+
+
+def sort_reading_order(details: List[Dict], line_tolerance: float = 10.0) -> List[Dict]:
+    """按阅读顺序（从上到下、同一行从左到右）排列识别结果"""
+    ordered = sorted(details, key=lambda d: (_bounds(d["box"])[1], _bounds(d["box"])[0]))
+    # 与PaddleOCR相同：纵坐标相差不超过容差的视为同一行，按横坐标排序
+    for i in range(len(ordered) - 1):
+        for j in range(i, -1, -1):
+            top_a, left_a = _bounds(ordered[j]["box"])[1], _bounds(ordered[j]["box"])[0]
+            top_b, left_b = _bounds(ordered[j + 1]["box"])[1], _bounds(ordered[j + 1]["box"])[0]
+            if abs(top_b - top_a) < line_tolerance and left_b < left_a:
+                ordered[j], ordered[j + 1] = ordered[j + 1], ordered[j]
+            else:
+                break
+    return ordered
+
+
+def _join_text(left: str, right: str, max_overlap: int) -> str:
+    """
+    拼接同一行的两段文本，去掉重叠区域内被两个分块重复识别的部分
+
+    Args:
+        left: 左侧片段的文本
+        right: 右侧片段的文本
+        max_overlap: 两个框横向相交部分最多容纳的字符数，重复部分不会比它更长
+
+    Returns:
+        拼接后的文本
+    """
+    for k in range(min(len(left), len(right), max_overlap), MIN_SEAM_OVERLAP - 1, -1):
+        if left.endswith(right[:k]):
+            return left + right[k:]
+    return left + right
+
+
+def _overlap_chars(left: Dict, right: Dict) -> int:
+    """两个片段的框横向相交部分大约容纳的字符数（按两段文本的平均字符宽度估算）"""
+    la, lb = _bounds(left["box"]), _bounds(right["box"])
+    iw = min(la[2], lb[2]) - max(la[0], lb[0])
+    widths = [(b[2] - b[0]) / len(d["text"]) for b, d in ((la, left), (lb, right)) if d["text"]]
+    if iw <= 0 or not widths:
+        return 0
+    char_width = sum(widths) / len(widths)
+    return round(iw / char_width) if char_width > 0 else 0
+
+
+def _same_line(a: Tuple[float, float, float, float], b: Tuple[float, float, float, float]) -> bool:
+    """两个框纵向重叠超过较矮框高度的一半，且横向相交（被接缝截断的同一行）"""
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    return iw > 0 and ih > 0.5 * min(a[3] - a[1], b[3] - b[1])
+
+
+def _join_details(a: Dict, b: Dict) -> Dict:
+    """合并被接缝截断的同一行的两个片段"""
+    left, right = (a, b) if _bounds(a["box"])[0] <= _bounds(b["box"])[0] else (b, a)
+    la, lb = _bounds(left["box"]), _bounds(right["box"])
+    x0, y0, x1, y1 = min(la[0], lb[0]), min(la[1], lb[1]), max(la[2], lb[2]), max(la[3], lb[3])
+    weight_l, weight_r = max(1, len(left["text"])), max(1, len(right["text"]))
+    return dict(
+        left,
+        text=_join_text(left["text"], right["text"], _overlap_chars(left, right)),
+        confidence=(left["confidence"] * weight_l + right["confidence"] * weight_r) / (weight_l + weight_r),
+        box=[[x0, y0], [x1, y0], [x1, y1], [x0, y1]],
+        _tiles=left["_tiles"] | right["_tiles"]
+    )
+
+
+def merge_tile_details(
+    tile_results: List[Tuple[Tile, List[Dict]]],
+    duplicate_ratio: float = 0.6
+) -> List[Dict]:
+    """
+    合并各分块的识别结果，处理接缝处的重复和截断
+
+    重叠区域内的文字会被相邻分块各识别一次：
+    1. 一个框基本包含在另一个分块的框内（交集占较小框的比例超过 duplicate_ratio），视为重复，保留较大的框；
+    2. 同一行被接缝截断成两段（纵向同一行、横向相交），合并为一个框并去掉重复识别的文字
+       （重复部分不超过两个框横向相交处容纳的字符数，且至少 MIN_SEAM_OVERLAP 个字符）。
+
+    Args:
+        tile_results: [(分块, 分块坐标系下的识别结果列表)]
+        duplicate_ratio: 判定为重复的重叠比例
+
+    Returns:
+        整图坐标系下按阅读顺序排列的识别结果列表
+    """
+    candidates = []
+    for index, ((x0, y0, _, _), details) in enumerate(tile_results):
+        for detail in details:
+            box = [[float(x + x0), float(y + y0)] for x, y in detail["box"]]
+            candidates.append(dict(detail, box=box, _tiles={index}))
+
+    def area(detail: Dict) -> float:
+        left, top, right, bottom = _bounds(detail["box"])
+        return (right - left) * (bottom - top)
+
+    # 去除重复：只比较来自不同分块的框
+    candidates.sort(key=lambda d: (area(d), d["confidence"]), reverse=True)
+    kept: List[Dict] = []
+    for detail in candidates:
+        bounds = _bounds(detail["box"])
+        if any(
+            not (detail["_tiles"] & other["_tiles"])
+            and _overlap_ratio(bounds, _bounds(other["box"])) > duplicate_ratio
+            for other in kept
+        ):
+            continue
+        kept.append(detail)
+
+    # 合并被接缝截断的同一行，直到没有可合并的片段
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(kept)):
+            for j in range(i + 1, len(kept)):
+                a, b = kept[i], kept[j]
+                if not (a["_tiles"] & b["_tiles"]) and _same_line(_bounds(a["box"]), _bounds(b["box"])):
+                    kept[i] = _join_details(a, b)
+                    del kept[j]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    for detail in kept:
+        del detail["_tiles"]
+    return sort_reading_order(kept)
+
+
+def map_tiles(engines: List, tiles: List, source: str = "<tile>") -> List[Dict]:
+    """
+    将分块分配给多个引擎并行识别（每个引擎同一时刻只处理一个分块）
+
+    Args:
+        engines: OCR服务实例列表
+        tiles: 分块图片数组列表
+        source: 用于日志的图片来源描述
+
+    Returns:
+        与 tiles 顺序一致的识别结果列表
+    """
+    if len(engines) <= 1 or len(tiles) <= 1:
+        return [engines[0].recognize_image_array(tile, source) for tile in tiles]
+
+    idle: "queue.Queue" = queue.Queue()
+    for engine in engines:
+        idle.put(engine)
+
+    def run(tile) -> Dict:
+        engine = idle.get()
+        try:
+            return engine.recognize_image_array(tile, source)
+        finally:
+            idle.put(engine)
+
+    # 推理时框架会释放GIL，多个引擎可在线程中并行
+    with ThreadPoolExecutor(max_workers=min(len(engines), len(tiles))) as executor:
+        return list(executor.map(run, tiles))
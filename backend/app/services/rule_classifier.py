@@ -0,0 +1,227 @@
+"""预编译的单遍规则分类器
+
+时间、日期模式预编译为一个组合正则：每个模式是一个命名分组，整体前面加上由各模式首字符
+推导出的预检字符集，不可能作为匹配起点的字符直接跳过。一次扫描即可得到所有时间、日期片段，
+再由这些片段得出日程/备忘录得分、时间、日期和去掉时间日期后的描述，不再对同一段文本
+按模式逐个反复搜索和替换。
+
+关键词在转小写后的文本中各查找一次（CPython的子串查找在C中完成，关键词只有几十个时比
+逐字符推进的多模式自动机更快），得分达到上限后不再查找其余关键词。
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python 3.10 及更早版本
+    import sre_parse
+
+# 正则字符类别 -> 预检字符集中的写法
+_CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: r"\d",
+    sre_parse.CATEGORY_NOT_DIGIT: r"\D",
+    sre_parse.CATEGORY_SPACE: r"\s",
+    sre_parse.CATEGORY_NOT_SPACE: r"\S",
+    sre_parse.CATEGORY_WORD: r"\w",
+    sre_parse.CATEGORY_NOT_WORD: r"\W",
+}
+_REPEATS = tuple(
+    getattr(sre_parse, name) for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") if hasattr(sre_parse, name)
+)
+
+
+def _start_chars(items) -> Optional[List[str]]:
+    """
+    推导正则匹配的首字符集合
+
+    Args:
+        items: sre_parse 解析出的子模式
+
+    Returns:
+        字符集中的各项（如 r"\\d"、"上"），无法确定（可能匹配空串、否定字符集等）时返回None
+    """
+    for op, av in items:
+        if op is sre_parse.AT:
+            # ^、\b 等零宽断言不消耗字符
+            continue
+        if op is sre_parse.LITERAL:
+            return [re.escape(chr(av))]
+        if op is sre_parse.IN:
+            chars = []
+            for item_op, item_av in av:
+                if item_op is sre_parse.LITERAL:
+                    chars.append(re.escape(chr(item_av)))
+                elif item_op is sre_parse.RANGE:
+                    chars.append(f"{re.escape(chr(item_av[0]))}-{re.escape(chr(item_av[1]))}")
+                elif item_op is sre_parse.CATEGORY and item_av in _CATEGORIES:
+                    chars.append(_CATEGORIES[item_av])
+                else:
+                    return None
+            return chars
+        if op is sre_parse.SUBPATTERN:
+            add_flags, del_flags, pattern = av[1], av[2], av[3]
+            return None if add_flags or del_flags else _start_chars(pattern)
+        if op is sre_parse.BRANCH:
+            chars = []
+            for branch in av[1]:
+                branch_chars = _start_chars(branch)
+                if branch_chars is None:
+                    return None
+                chars.extend(branch_chars)
+            return chars
+        if op in _REPEATS:
+            low, _, pattern = av
+            return _start_chars(pattern) if low > 0 else None
+        return None
+    return None
+
+
+def _prefilter(patterns: Iterable[str]) -> str:
+    """由各模式的首字符组成的前瞻预检，无法推导时返回空串（不预检）"""
+    chars = []
+    try:
+        for pattern in patterns:
+            pattern_chars = _start_chars(sre_parse.parse(pattern))
+            if pattern_chars is None:
+                return ""
+            chars.extend(pattern_chars)
+    except Exception:
+        return ""
+    return f"(?=[{''.join(dict.fromkeys(chars))}])" if chars else ""
+
+
+def _count_keywords(text: str, keywords: Sequence[str], limit: int) -> int:
+    """统计文本中出现的不同关键词个数，达到 limit 后不再查找"""
+    count = 0
+    for keyword in keywords:
+        if keyword in text:
+            count += 1
+            if count >= limit:
+                break
+    return count
+
+
+class RuleClassifier:
+    """单遍规则分类器"""
+
+    # 关键词得分：日程每个0.1、备忘录每个0.15，各自最多0.3
+    SCHEDULE_KEYWORD_WEIGHT = 0.1
+    MEMO_KEYWORD_WEIGHT = 0.15
+    KEYWORD_SCORE_CAP = 0.3
+
+    def __init__(
+        self,
+        time_patterns: Sequence[str],
+        date_patterns: Sequence[str],
+        schedule_keywords: Sequence[str],
+        memo_keywords: Sequence[str]
+    ):
+        """
+        编译规则
+
+        Args:
+            time_patterns: 时间模式（按优先级排列）
+            date_patterns: 日期模式（按优先级排列）
+            schedule_keywords: 日程关键词
+            memo_keywords: 备忘录关键词
+        """
+        self.time_patterns = list(time_patterns)
+        self.date_patterns = list(date_patterns)
+        # 小写化的文本中查找，关键词也统一为小写并去重
+        self.schedule_keywords = list(dict.fromkeys(k.lower() for k in schedule_keywords))
+        self.memo_keywords = list(dict.fromkeys(k.lower() for k in memo_keywords))
+        self._schedule_limit = round(self.KEYWORD_SCORE_CAP / self.SCHEDULE_KEYWORD_WEIGHT)
+        self._memo_limit = round(self.KEYWORD_SCORE_CAP / self.MEMO_KEYWORD_WEIGHT)
+
+        alternatives = [f"(?P<t{i}>{p})" for i, p in enumerate(self.time_patterns)]
+        alternatives += [f"(?P<d{i}>{p})" for i, p in enumerate(self.date_patterns)]
+        patterns = self.time_patterns + self.date_patterns
+        self.pattern = re.compile(_prefilter(patterns) + "(?:" + "|".join(alternatives) + ")") if patterns else None
+
+    def scan(self, text: str) -> List[Tuple[str, int, int, int]]:
+        """
+        扫描文本中的时间、日期片段（互不重叠，按出现顺序）
+
+        Args:
+            text: 文本内容
+
+        Returns:
+            [(类型 'time'/'date', 模式序号, 起始位置, 结束位置), ...]
+        """
+        spans = []
+        if self.pattern is None:
+            return spans
+        for match in self.pattern.finditer(text):
+            group = match.lastgroup
+            kind = "time" if group[0] == "t" else "date"
+            start, end = match.span()
+            spans.append((kind, int(group[1:]), start, end))
+        return spans
+
+    def analyze(self, text: str) -> Dict:
+        """
+        一次分析得出分类和提取所需的全部信息
+
+        Args:
+            text: 文本内容
+
+        Returns:
+            分析结果字典，包含：
+            - schedule_score / memo_score: 日程和备忘录得分 (0-1)
+            - time / date: 优先级最高的时间、日期片段（同一模式取最先出现的），没有时为None
+            - spans: 所有时间、日期片段，见 scan()
+            - description: 去掉时间、日期片段后的文本（为空时为原文）
+        """
+        spans = self.scan(text)
+        best = {}
+        for kind, index, start, end in spans:
+            if kind not in best or index < best[kind][0]:
+                best[kind] = (index, start, end)
+        has_time = "time" in best
+        has_date = "date" in best
+
+        text_lower = text.lower()
+        schedule_keywords = _count_keywords(text_lower, self.schedule_keywords, self._schedule_limit)
+        memo_keywords = _count_keywords(text_lower, self.memo_keywords, self._memo_limit)
+
+        schedule_score = 0.0
+        if has_time:
+            schedule_score += 0.4
+        if has_date:
+            schedule_score += 0.3
+        schedule_score += min(schedule_keywords * self.SCHEDULE_KEYWORD_WEIGHT, self.KEYWORD_SCORE_CAP)
+
+        # 基础分数（降低以避免默认为备忘录）；文本较长且没有明确的时间信息时更可能是备忘录
+        memo_score = 0.4
+        memo_score += min(memo_keywords * self.MEMO_KEYWORD_WEIGHT, self.KEYWORD_SCORE_CAP)
+        if len(text) > 50 and not has_time:
+            memo_score += 0.25
+
+        pieces = []
+        position = 0
+        for _, _, start, end in spans:
+            pieces.append(text[position:start])
+            position = end
+        pieces.append(text[position:])
+        description = "".join(pieces).strip() or text
+
+        return {
+            "schedule_score": min(schedule_score, 1.0),
+            "memo_score": min(memo_score, 1.0),
+            "time": text[best["time"][1]:best["time"][2]] if has_time else None,
+            "date": text[best["date"][1]:best["date"][2]] if has_date else None,
+            "spans": spans,
+            "description": description
+        }
+
+
+@lru_cache(maxsize=8)
+def compile_rules(
+    time_patterns: Tuple[str, ...],
+    date_patterns: Tuple[str, ...],
+    schedule_keywords: Tuple[str, ...],
+    memo_keywords: Tuple[str, ...]
+) -> RuleClassifier:
+    """编译规则（相同的规则只编译一次）"""
+    return RuleClassifier(time_patterns, date_patterns, schedule_keywords, memo_keywords)
@@ -0,0 +1,588 @@
+"""上传文件的存储后端
+
+上传文件、派生图等持久文件都通过存储后端读写，按键（相对路径，如 blobs/ab/cd/<哈希>.png）寻址：
+
+- local: 保存在 UPLOAD_DIR 下，记录中的 file_path 为本地路径（与之前的记录兼容）
+- s3: 保存在S3兼容的对象存储（AWS S3、MinIO 等）中，file_path 为 s3://<桶>/<键>；
+  PaddleOCR、Pillow、PyMuPDF 需要本地文件时，先下载到本地的读穿缓存再读取
+
+上传时的临时文件始终写在本机的 UPLOAD_DIR/tmp，写完并算出哈希后再放入存储。
+各方法既接受键也接受记录中的 file_path；切换到对象存储之前保存的本地文件仍从本地读取，
+可以用 upload_maintenance migrate 迁移到对象存储。
+"""
+import hashlib
+import hmac
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+from xml.etree import ElementTree
+from app.core.config import settings
+from app.utils.logger import logging
+
+# 流式读写的块大小
+CHUNK_SIZE = 1024 * 1024
+
+
+class StorageBackend:
+    """存储后端接口"""
+
+    name = ""
+
+    def locate(self, key: str) -> str:
+        """键对应的文件位置（保存在上传记录的 file_path 中）"""
+        raise NotImplementedError
+
+    def key_of(self, ref: str) -> str:
+        """文件位置或键转换为键"""
+        raise NotImplementedError
+
+    def exists(self, ref: str) -> bool:
+        """文件是否存在"""
+        raise NotImplementedError
+
+    def size(self, ref: str) -> Optional[int]:
+        """文件大小，不存在时返回None"""
+        raise NotImplementedError
+
+    def put_file(self, key: str, local_path: str) -> str:
+        """
+        把本地文件放入存储（本地文件随后被移动或删除）
+
+        Args:
+            key: 存储键
+            local_path: 本地文件路径
+
+        Returns:
+            文件位置
+        """
+        raise NotImplementedError
+
+    def put_bytes(self, key: str, content: bytes) -> str:
+        """保存内存中的内容，返回文件位置"""
+        raise NotImplementedError
+
+    def open(self, ref: str):
+        """以流的方式读取文件（上下文管理器，返回二进制文件对象）"""
+        raise NotImplementedError
+
+    def iter_range(self, ref: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        分块读取文件的一段
+
+        Args:
+            ref: 文件位置或键
+            start: 起始字节（含）
+            end: 结束字节（含），None表示到文件末尾
+
+        Returns:
+            数据块迭代器
+        """
+        raise NotImplementedError
+
+    def delete(self, ref: str) -> bool:
+        """删除文件，返回是否删除了文件"""
+        raise NotImplementedError
+
+    def list(self, prefix: str) -> Iterator[Tuple[str, int, float]]:
+        """列出前缀下的文件，返回 (键, 大小, 修改时间戳)"""
+        raise NotImplementedError
+
+    def local_path(self, ref: str) -> str:
+        """
+        获取可以直接打开的本地文件路径（供需要文件路径的库使用）
+
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    """本地文件系统存储（UPLOAD_DIR）"""
+
+    name = "local"
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Args:
+            root: 存储根目录，默认每次读取 UPLOAD_DIR 配置
+        """
+        self._root = root
+
+    @property
+    def root(self) -> Path:
+        return Path(self._root or settings.UPLOAD_DIR)
+
+    def _path(self, ref: str) -> Path:
+        # 绝对路径和已带根目录前缀的记录路径直接使用，其余视为键
+        path = Path(ref)
+        root = str(self.root)
+        if path.is_absolute() or ref == root or ref.startswith(root + os.sep):
+            return path
+        return self.root / ref
+
+    def locate(self, key: str) -> str:
+        return str(self.root / key)
+
+    def key_of(self, ref: str) -> str:
+        path = self._path(ref)
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            return ref
+
+    def exists(self, ref: str) -> bool:
+        return self._path(ref).is_file()
+
+    def size(self, ref: str) -> Optional[int]:
+        try:
+            return self._path(ref).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def put_file(self, key: str, local_path: str) -> str:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(local_path, path)
+        return str(path)
+
+    def put_bytes(self, key: str, content: bytes) -> str:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.part")
+        temp_path.write_bytes(content)
+        os.replace(temp_path, path)
+        return str(path)
+
+    def open(self, ref: str):
+        return open(self._path(ref), "rb")
+
+    def iter_range(self, ref: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self._path(ref), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, ref: str) -> bool:
+        try:
+            self._path(ref).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def list(self, prefix: str) -> Iterator[Tuple[str, int, float]]:
+        base = self.root / prefix
+        if not base.is_dir():
+            return
+        for dirpath, _, filenames in os.walk(base):
+            for filename in filenames:
+                path = Path(dirpath) / filename
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                yield path.relative_to(self.root).as_posix(), stat.st_size, stat.st_mtime
+
+    def local_path(self, ref: str) -> str:
+        path = self._path(ref)
+        if not path.is_file():
+            # 不在存储根目录下的本地文件（如命令行传入的相对路径）直接使用
+            if os.path.isfile(ref):
+                return ref
+            raise FileNotFoundError(ref)
+        return str(path)
+
+
+class ReadThroughCache:
+    """对象存储文件的本地读穿缓存
+
+    存储中的文件按内容寻址、写入后不再修改，缓存的副本不会过期；总大小超过上限时
+    按最近访问时间淘汰。
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None
+
+    def path(self, key: str) -> Path:
+        parts = Path(key).parts
+        if ".." in parts or Path(key).is_absolute():
+            raise ValueError(f"非法的存储键: {key}")
+        return self.directory / key
+
+    def get(self, key: str, fetch) -> str:
+        """
+        获取缓存文件路径，未缓存时调用 fetch(目标文件对象) 下载
+
+        Args:
+            key: 存储键
+            fetch: 把文件内容写入给定文件对象的函数
+
+        Returns:
+            本地文件路径
+        """
+        path = self.path(key)
+        if path.is_file():
+            # 更新访问时间，用于淘汰
+            try:
+                os.utime(path)
+                return str(path)
+            except FileNotFoundError:
+                pass
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            with open(temp_path, "wb") as f:
+                fetch(f)
+            size = temp_path.stat().st_size
+            os.replace(temp_path, path)
+        except BaseException:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
+        self._added(size)
+        return str(path)
+
+    def discard(self, key: str) -> None:
+        """删除缓存的副本"""
+        try:
+            path = self.path(key)
+            size = path.stat().st_size
+            path.unlink()
+        except (FileNotFoundError, ValueError):
+            return
+        with self._lock:
+            if self._total is not None:
+                self._total -= size
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(".part"):
+                    continue
+                path = Path(dirpath) / filename
+                try:
+                    yield path, path.stat()
+                except FileNotFoundError:
+                    continue
+
+    def _added(self, size: int) -> None:
+        with self._lock:
+            if self._total is None:
+                self._total = sum(stat.st_size for _, stat in self._entries())
+            else:
+                self._total += size
+            if self._total <= self.max_bytes:
+                return
+            # 淘汰到上限的90%，避免每次写入都触发淘汰
+            target = self.max_bytes * 0.9
+            for path, stat in sorted(self._entries(), key=lambda item: item[1].st_mtime):
+                if self._total <= target:
+                    break
+                try:
+                    path.unlink()
+                    self._total -= stat.st_size
+                except FileNotFoundError:
+                    pass
+
+
+def sign_v4(
+    method: str,
+    url: str,
+    headers: dict,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    now: Optional[datetime] = None,
+    service: str = "s3"
+) -> dict:
+    """
+    AWS Signature Version 4 请求签名（S3、MinIO 通用）
+
+    签名 host、range 和所有 x-amz-* 请求头，请求体哈希取 x-amz-content-sha256（默认 UNSIGNED-PAYLOAD）。
+
+    Args:
+        method: HTTP方法
+        url: 完整URL（路径和查询参数需已编码）
+        headers: 请求头
+        access_key: 访问密钥ID
+        secret_key: 访问密钥
+        region: 区域
+        now: 签名时间，默认当前时间
+
+    Returns:
+        加上 x-amz-date、x-amz-content-sha256 和 Authorization 的请求头
+    """
+    import httpx
+
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = amz_date[:8]
+    parsed = httpx.URL(url)
+
+    headers = {k.lower(): str(v).strip() for k, v in headers.items()}
+    headers.setdefault("x-amz-content-sha256", "UNSIGNED-PAYLOAD")
+    headers["x-amz-date"] = amz_date
+    headers["host"] = parsed.netloc.decode("ascii")
+    signed = sorted(k for k in headers if k in ("host", "range") or k.startswith("x-amz-"))
+
+    query = sorted(
+        (quote(k, safe="-_.~"), quote(v, safe="-_.~"))
+        for k, v in parsed.params.multi_items()
+    )
+    canonical_request = "\n".join([
+        method,
+        parsed.raw_path.split(b"?", 1)[0].decode("ascii") or "/",
+        "&".join(f"{k}={v}" for k, v in query),
+        "".join(f"{k}:{headers[k]}\n" for k in signed),
+        ";".join(signed),
+        headers["x-amz-content-sha256"]
+    ])
+    scope = f"{date}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+    ])
+
+    key = f"AWS4{secret_key}".encode("utf-8")
+    for part in (date, region, service, "aws4_request"):
+        key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    headers["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={';'.join(signed)}, Signature={signature}"
+    )
+    return headers
+
+
+class StorageError(Exception):
+    """对象存储请求失败"""
+
+
+class S3Storage(StorageBackend):
+    """S3兼容的对象存储（使用路径形式的URL: <endpoint>/<桶>/<键>，兼容MinIO）"""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        cache: Optional[ReadThroughCache] = None,
+        client=None,
+        timeout: float = 30.0
+    ):
+        """
+        Args:
+            endpoint_url: 对象存储地址，如 http://127.0.0.1:9000
+            bucket: 桶名
+            access_key: 访问密钥ID
+            secret_key: 访问密钥
+            region: 区域
+            cache: 本地读穿缓存，默认按配置创建
+            client: httpx.Client，测试时可传入使用本地替身的客户端
+            timeout: 请求超时（秒）
+        """
+        import httpx
+
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.cache = cache or ReadThroughCache(settings.STORAGE_CACHE_DIR, settings.STORAGE_CACHE_MAX_BYTES)
+        self.client = client or httpx.Client(timeout=timeout)
+        self._prefix = f"s3://{bucket}/"
+        self._local = LocalStorage()
+
+    def _is_local(self, ref: str) -> bool:
+        # 不在对象存储中的本地文件（切换存储前的记录、命令行传入的文件）
+        return not ref.startswith(self._prefix) and (os.path.isabs(ref) or os.path.isfile(ref))
+
+    def locate(self, key: str) -> str:
+        return self._prefix + key
+
+    def key_of(self, ref: str) -> str:
+        return ref[len(self._prefix):] if ref.startswith(self._prefix) else ref
+
+    def _url(self, key: str = "") -> str:
+        return f"{self.endpoint_url}/{quote(self.bucket)}/{quote(key, safe='/-_.~')}"
+
+    def _request(self, method: str, key: str = "", params: Optional[dict] = None, headers: Optional[dict] = None,
+                 content=None, stream: bool = False):
+        import httpx
+
+        url = str(httpx.URL(self._url(key), params=params))
+        signed = sign_v4(method, url, headers or {}, self.access_key, self.secret_key, self.region)
+        request = self.client.build_request(method, url, headers=signed, content=content)
+        response = self.client.send(request, stream=stream)
+        if response.status_code >= 400 and response.status_code != 404:
+            detail = response.read()[:200] if stream else response.content[:200]
+            response.close()
+            raise StorageError(f"{method} {key} 失败: HTTP {response.status_code} {detail!r}")
+        return response
+
+    def exists(self, ref: str) -> bool:
+        return self.size(ref) is not None
+
+    def size(self, ref: str) -> Optional[int]:
+        if self._is_local(ref):
+            return self._local.size(ref)
+        response = self._request("HEAD", self.key_of(ref))
+        if response.status_code == 404:
+            return None
+        return int(response.headers.get("content-length", 0))
+
+    def put_file(self, key: str, local_path: str) -> str:
+        size = os.path.getsize(local_path)
+
+        def body():
+            with open(local_path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    yield chunk
+
+        # 流式上传，不把文件读入内存
+        self._request("PUT", key, headers={"content-length": str(size)}, content=body())
+        os.remove(local_path)
+        return self.locate(key)
+
+    def put_bytes(self, key: str, content: bytes) -> str:
+        self._request("PUT", key, content=content)
+        return self.locate(key)
+
+    @contextmanager
+    def open(self, ref: str):
+        if self._is_local(ref):
+            with self._local.open(ref) as f:
+                yield f
+            return
+        response = self._request("GET", self.key_of(ref), stream=True)
+        try:
+            if response.status_code == 404:
+                raise FileNotFoundError(ref)
+            yield _ResponseReader(response)
+        finally:
+            response.close()
+
+    def iter_range(self, ref: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        if self._is_local(ref):
+            yield from self._local.iter_range(ref, start, end)
+            return
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        response = self._request("GET", self.key_of(ref), headers={"range": byte_range}, stream=True)
+        try:
+            if response.status_code == 404:
+                raise FileNotFoundError(ref)
+            yield from response.iter_bytes(CHUNK_SIZE)
+        finally:
+            response.close()
+
+    def delete(self, ref: str) -> bool:
+        if self._is_local(ref):
+            return self._local.delete(ref)
+        key = self.key_of(ref)
+        existed = self.exists(key)
+        self._request("DELETE", key)
+        self.cache.discard(key)
+        return existed
+
+    def list(self, prefix: str) -> Iterator[Tuple[str, int, float]]:
+        namespace = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+        token = None
+        while True:
+            params = {"list-type": "2", "prefix": prefix.rstrip("/") + "/"}
+            if token:
+                params["continuation-token"] = token
+            root = ElementTree.fromstring(self._request("GET", params=params).content)
+            for item in root.iter(f"{namespace}Contents"):
+                modified = datetime.fromisoformat(item.findtext(f"{namespace}LastModified").replace("Z", "+00:00"))
+                yield (
+                    item.findtext(f"{namespace}Key"),
+                    int(item.findtext(f"{namespace}Size")),
+                    modified.timestamp()
+                )
+            if root.findtext(f"{namespace}IsTruncated") != "true":
+                break
+            token = root.findtext(f"{namespace}NextContinuationToken")
+
+    def local_path(self, ref: str) -> str:
+        if self._is_local(ref):
+            return self._local.local_path(ref)
+        key = self.key_of(ref)
+
+        def fetch(f):
+            with self.open(key) as stream:
+                shutil.copyfileobj(stream, f, CHUNK_SIZE)
+
+        return self.cache.get(key, fetch)
+
+
+class _ResponseReader:
+    """把流式HTTP响应包装成只读文件对象"""
+
+    def __init__(self, response):
+        self._chunks = response.iter_bytes(CHUNK_SIZE)
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+# 全局存储后端实例
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def create_storage() -> StorageBackend:
+    """按配置创建存储后端"""
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            bucket=settings.S3_BUCKET,
+            access_key=settings.S3_ACCESS_KEY,
+            secret_key=settings.S3_SECRET_KEY,
+            region=settings.S3_REGION
+        )
+    if settings.STORAGE_BACKEND != "local":
+        logging.warning(f"未知的存储后端 {settings.STORAGE_BACKEND}，使用本地存储")
+    return LocalStorage()
+
+
+def get_storage() -> StorageBackend:
+    """获取存储后端（单例模式）"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = create_storage()
+            logging.info(f"上传文件存储后端: {_storage.name}")
+    return _storage
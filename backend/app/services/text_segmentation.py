@@ -0,0 +1,113 @@
+"""OCR文本分段：把一页手写内容拆成相互独立的条目（会议、待办、想法等）
+
+有识别详情（每行文字及其文本框）时按版面分段：与上一行的垂直间距明显大于行高（相当于
+空一行）或换页时开始新条目；没有详情时按空行分段。两种情况下以项目符号或编号开头的行
+都开始新条目，其余行接在当前条目后面。
+"""
+import re
+import statistics
+from itertools import groupby
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.services.ocr_tiling import sort_reading_order
+
+# 行首的项目符号或编号：- * • □ ☐ 1. 1、 (1) （1） ① 一、
+_BULLET = re.compile(
+    r"^\s*(?:[-*•·●○◦▪■□☐☑✓✔→]"
+    r"|\d{1,2}(?:[.．](?!\d)|[、)）])"
+    r"|[(（]\d{1,2}[)）]"
+    r"|[①-⑳]"
+    r"|[一二三四五六七八九十]{1,3}[、.．])"
+)
+
+
+def is_bullet(line: str) -> bool:
+    """是否以项目符号或编号开头"""
+    return bool(_BULLET.match(line))
+
+
+def segment_text(text: str) -> List[Dict]:
+    """
+    按空行和项目符号分段
+
+    Args:
+        text: OCR识别的文本（多行）
+
+    Returns:
+        [{"text": 条目文本}, ...]，条目内的行以换行连接
+    """
+    segments: List[List[str]] = []
+    current: List[str] = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or (is_bullet(stripped) and current):
+            if current:
+                segments.append(current)
+            current = []
+        if stripped:
+            current.append(stripped)
+    if current:
+        segments.append(current)
+    return [{"text": "\n".join(lines)} for lines in segments]
+
+
+def _bounds(box: Sequence[Sequence[float]]) -> Tuple[float, float, float, float]:
+    xs = [p[0] for p in box]
+    ys = [p[1] for p in box]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def segment_details(details: List[Dict], gap_ratio: float = 0.8) -> List[Dict]:
+    """
+    按识别详情中的文本框分段
+
+    Args:
+        details: 识别详情 [{"text", "box", "page"(可选)}, ...]，缺少文本框的行视为紧接上一行
+        gap_ratio: 与上一行的垂直间距超过行高中位数的该倍数时开始新条目
+
+    Returns:
+        [{"text": 条目文本, "box": [x0, y0, x1, y1] 或 None, "page": 页码或None}, ...]
+    """
+    lines = [d for d in details if (d.get("text") or "").strip()]
+    heights = [b[3] - b[1] for b in (_bounds(d["box"]) for d in lines if d.get("box"))]
+    line_height = statistics.median(heights) if heights else 0.0
+
+    segments: List[Dict] = []
+    for page, page_lines in groupby(lines, key=lambda d: d.get("page")):
+        page_lines = list(page_lines)
+        if all(d.get("box") for d in page_lines):
+            page_lines = sort_reading_order(page_lines)
+        current: Optional[Dict] = None
+        previous_bottom: Optional[float] = None
+        for detail in page_lines:
+            text = detail["text"].strip()
+            bounds = _bounds(detail["box"]) if detail.get("box") else None
+            gap = bounds[1] - previous_bottom if bounds and previous_bottom is not None else 0.0
+            if current is None or is_bullet(text) or (line_height and gap > gap_ratio * line_height):
+                current = {"lines": [], "bounds": [], "page": page}
+                segments.append(current)
+            current["lines"].append(text)
+            if bounds:
+                current["bounds"].append(bounds)
+                # 同一行的多个文本框（与上一个框纵向重叠）取最低的底边
+                previous_bottom = max(previous_bottom, bounds[3]) if gap < 0 else bounds[3]
+
+    return [
+        {
+            "text": "\n".join(segment["lines"]),
+            "box": [
+                min(b[0] for b in segment["bounds"]),
+                min(b[1] for b in segment["bounds"]),
+                max(b[2] for b in segment["bounds"]),
+                max(b[3] for b in segment["bounds"])
+            ] if segment["bounds"] else None,
+            "page": segment["page"]
+        }
+        for segment in segments
+    ]
+
+
+def segment_ocr_output(text: str, details: Optional[List[Dict]] = None) -> List[Dict]:
+    """有识别详情时按版面分段，否则按文本分段"""
+    if details and any((d.get("text") or "").strip() for d in details):
+        return segment_details(details)
+    return segment_text(text or "")
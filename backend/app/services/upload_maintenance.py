@@ -0,0 +1,547 @@
+"""上传目录维护：旧文件迁移和孤立文件清理
+
+按内容寻址存储之前的上传文件平铺在 UPLOAD_DIR 根目录（{user_id}_{时间戳}_{uuid}.ext），
+迁移工具把它们移入存储后端 blobs/ 下按哈希分两级的目录（切换到对象存储后也用它上传本地的旧文件）。文件先写入磁盘再提交数据库，请求失败或
+进程退出时会在磁盘上留下没有记录引用的文件；清理任务分批对照数据库找出这些文件，
+并修正 file_blobs 的引用计数。
+
+两项操作都支持只报告不修改（dry run），也可以在命令行执行：
+
+    python -m app.services.upload_maintenance migrate --dry-run
+    python -m app.services.upload_maintenance sweep
+
+旧文件的 file_hash 是MD5，迁移时改为BLAKE2b；迁移之前重复上传检查、预检和OCR缓存都匹配不到
+这些文件。迁移只需执行一次：命令行 migrate 会先用 upgrade_schema() 为已有数据库补建
+uploaded_files.file_hash 等索引；开启 UPLOAD_MIGRATE_ON_STARTUP 时由 serve.py 在启动API进程之前
+（单进程运行时在应用启动时）于后台执行。多个进程同时迁移同一文件时只有一个生效。
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import func, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.base import Base, SessionLocal
+from app.models.upload import UploadedFile, FileBlob
+from app.services.blob_store import BlobStore
+from app.services.derivatives import DerivativeStore, KINDS, derivative_size
+from app.utils.file_handler import FileManager
+from app.utils.logger import logging
+
+# 报告中每类最多列出的文件数
+REPORT_SAMPLES = 100
+
+
+class RateLimiter:
+    """按每秒处理的文件数限速，避免维护任务占满磁盘IO"""
+
+    def __init__(self, per_second: float):
+        self.per_second = per_second
+        self._started = time.monotonic()
+        self._count = 0
+
+    def wait(self, count: int) -> None:
+        """记录处理了 count 个文件，超过速率时等待"""
+        if self.per_second <= 0:
+            return
+        self._count += count
+        delay = self._count / self.per_second - (time.monotonic() - self._started)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _new_report(action: str, dry_run: bool) -> Dict:
+    return {"action": action, "dry_run": dry_run, "scanned": 0, "samples": {}}
+
+
+def _record(report: Dict, key: str, path: Optional[str] = None, size: int = 0) -> None:
+    """报告中的某类计数加一，并保留少量示例路径"""
+    report[key] = report.get(key, 0) + 1
+    if size:
+        report[f"{key}_bytes"] = report.get(f"{key}_bytes", 0) + size
+    if path is not None:
+        samples = report["samples"].setdefault(key, [])
+        if len(samples) < REPORT_SAMPLES:
+            samples.append(path)
+
+
+def _batches(items: Iterator, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class UploadMaintenance:
+    """上传目录的迁移和清理"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch_size: Optional[int] = None,
+        max_files_per_second: Optional[float] = None,
+        min_age: Optional[int] = None,
+        delete_legacy: Optional[bool] = None
+    ):
+        """
+        Args:
+            session_factory: 数据库会话工厂
+            batch_size: 每批处理的文件数，默认读取配置
+            max_files_per_second: 每秒最多处理的文件数，<=0 表示不限速，默认读取配置
+            min_age: 只清理修改时间早于该秒数的文件和记录，避免误删正在上传的文件，默认读取配置
+            delete_legacy: 是否删除根目录中没有记录引用的旧文件（否则只报告），默认读取配置
+        """
+        self.session_factory = session_factory
+        self.batch_size = max(1, batch_size or settings.UPLOAD_SWEEP_BATCH_SIZE)
+        self.max_files_per_second = (
+            settings.UPLOAD_SWEEP_MAX_FILES_PER_SECOND if max_files_per_second is None else max_files_per_second
+        )
+        self.min_age = settings.UPLOAD_SWEEP_MIN_AGE if min_age is None else min_age
+        self.delete_legacy = settings.UPLOAD_SWEEP_DELETE_LEGACY if delete_legacy is None else delete_legacy
+
+    def migrate_legacy(self, dry_run: bool = False) -> Dict:
+        """
+        把平铺在上传目录根部的旧文件迁移到按哈希分级的存储
+
+        先把旧文件硬链接（不支持时复制）到临时目录再加入存储，数据库提交成功后才删除旧文件，
+        中途失败时旧文件和记录保持不变，临时文件由清理任务回收。迁移后记录的 file_hash
+        改为 BLAKE2b，相同内容的旧文件合并为一份。
+
+        Args:
+            dry_run: 只统计需要迁移的文件，不修改
+
+        Returns:
+            迁移报告
+        """
+        report = _new_report("migrate", dry_run)
+        limiter = RateLimiter(self.max_files_per_second)
+        blob_store = BlobStore()
+        db = self.session_factory()
+        try:
+            last_path = ""
+            while True:
+                # 按路径分页：同一个旧文件被多条记录引用时一起迁移
+                paths = [row[0] for row in db.query(UploadedFile.file_path).filter(
+                    UploadedFile.file_path > last_path,
+                    ~UploadedFile.file_path.in_(db.query(FileBlob.file_path))
+                ).distinct().order_by(UploadedFile.file_path).limit(self.batch_size).all()]
+                if not paths:
+                    break
+                last_path = paths[-1]
+                for path in paths:
+                    report["scanned"] += 1
+                    try:
+                        self._migrate_file(db, blob_store, path, report, dry_run)
+                    except Exception as e:
+                        db.rollback()
+                        _record(report, "failed", path)
+                        logging.error(f"迁移文件失败: {path}, 错误: {str(e)}")
+                limiter.wait(len(paths))
+        finally:
+            db.close()
+        logging.info(f"上传文件迁移完成: {self._summary(report)}")
+        return report
+
+    def _migrate_file(self, db: Session, blob_store: BlobStore, path: str, report: Dict, dry_run: bool) -> None:
+        try:
+            size = os.path.getsize(path)
+            if dry_run:
+                _record(report, "migrated", path, size)
+                return
+            with open(path, "rb") as f:
+                file_hash = FileManager.calculate_stream_hash(f)
+            temp_path = blob_store.root / BlobStore.TEMP_DIR / uuid.uuid4().hex
+            temp_path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(path, temp_path)
+            except OSError:
+                shutil.copyfile(path, temp_path)
+        except FileNotFoundError:
+            self._record_missing(db, path, report)
+            return
+
+        try:
+            blob = blob_store.add(db, str(temp_path), size, file_hash, Path(path).suffix)
+        except Exception:
+            blob_store.discard_temp(str(temp_path))
+            raise
+        # 按实际改写的记录数增加引用：另一个进程已迁移这些记录时改写0条，撤销 add 增加的引用
+        moved = db.query(UploadedFile).filter(UploadedFile.file_path == path).update(
+            {UploadedFile.file_path: blob.file_path, UploadedFile.file_hash: file_hash},
+            synchronize_session=False
+        )
+        if moved == 0:
+            db.rollback()
+            _record(report, "skipped", path)
+            return
+        # add 已为一条记录增加引用
+        if moved > 1:
+            blob_store.increment(db, blob, moved - 1)
+        db.commit()
+
+        if os.path.abspath(path) != os.path.abspath(blob.file_path):
+            FileManager.delete_local_file(path)
+        _record(report, "migrated", path, size)
+
+    @staticmethod
+    def _record_missing(db: Session, path: str, report: Dict) -> None:
+        """旧文件不存在：仍有记录引用时报告丢失，否则是其他进程刚迁移完成"""
+        db.rollback()
+        if db.query(UploadedFile.id).filter(UploadedFile.file_path == path).first() is None:
+            _record(report, "skipped", path)
+        else:
+            _record(report, "missing", path)
+
+    def sweep(self, dry_run: bool = False) -> Dict:
+        """
+        对照数据库清理上传目录
+
+        - tmp/ 中超过最短保留时间的临时文件
+        - blobs/ 中没有 file_blobs 记录的文件
+        - 根目录中没有上传记录引用的旧文件（按解析符号链接后的绝对路径比较；默认只报告，
+          delete_legacy 开启时才删除）
+        - 修正与实际引用数不一致的引用计数，没有引用的存储文件连同记录一起删除
+        - 没有上传记录对应的派生图，以及尺寸配置修改前生成的派生图
+        - 上传记录引用但存储中不存在的文件只报告，不修改
+
+        Args:
+            dry_run: 只报告，不删除也不修改数据库
+
+        Returns:
+            清理报告
+        """
+        report = _new_report("sweep", dry_run)
+        report["delete_legacy"] = self.delete_legacy
+        limiter = RateLimiter(self.max_files_per_second)
+        blob_store = BlobStore()
+        cutoff = time.time() - self.min_age
+        db = self.session_factory()
+        storage = blob_store.storage
+        try:
+            self._sweep_files(db, self._local_files(blob_store.root / BlobStore.TEMP_DIR), None, cutoff, report,
+                              limiter, dry_run, "orphan_temp", FileManager.delete_local_file)
+            self._sweep_files(db, self._stored_files(storage, BlobStore.BLOB_DIR), FileBlob.file_path, cutoff,
+                              report, limiter, dry_run, "orphan_blobs", storage.delete)
+            self._sweep_files(db, self._local_files(blob_store.root), None, cutoff, report, limiter,
+                              dry_run or not self.delete_legacy, "orphan_legacy", FileManager.delete_local_file,
+                              references=self._legacy_references(db, blob_store.root))
+            self._reconcile_refcounts(db, blob_store, cutoff, report, limiter, dry_run)
+            self._sweep_derivatives(db, cutoff, report, limiter, dry_run)
+            self._report_missing(db, storage, report, limiter)
+        finally:
+            db.close()
+        logging.info(f"上传目录清理完成: {self._summary(report)}")
+        return report
+
+    @staticmethod
+    def _stored_files(storage, prefix: str) -> Iterator[Tuple[str, int, float]]:
+        """存储后端中前缀下的文件：(文件位置, 大小, 修改时间戳)"""
+        for key, size, mtime in storage.list(prefix):
+            yield storage.locate(key), size, mtime
+
+    @staticmethod
+    def _local_files(directory: Path) -> Iterator[Tuple[str, int, float]]:
+        """本机目录下的普通文件：(路径, 大小, 修改时间戳)"""
+        # 只检查目录本身的普通文件（跳过 .gitkeep 等隐藏文件），子目录（blobs、tmp 等）由各自的规则处理
+        if not directory.is_dir():
+            return
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and not entry.name.startswith("."):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def _legacy_references(self, db: Session, root: Path) -> Set[str]:
+        """
+        上传记录引用的根目录文件（解析符号链接后的绝对路径）
+
+        旧记录的 file_path 可能是相对路径，也可能使用与当前 UPLOAD_DIR 不同的写法，
+        直接按字符串比较会把仍被引用的文件当作孤立文件。
+        """
+        root = os.path.realpath(root)
+        references = set()
+        last_id = ""
+        while True:
+            rows = db.query(UploadedFile.id, UploadedFile.file_path).filter(
+                UploadedFile.id > last_id
+            ).order_by(UploadedFile.id).limit(self.batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            for _, file_path in rows:
+                real_path = os.path.realpath(file_path)
+                if os.path.dirname(real_path) == root:
+                    references.add(real_path)
+        return references
+
+    def _sweep_files(self, db: Session, files: Iterator[Tuple[str, int, float]], column, cutoff: float,
+                     report: Dict, limiter: RateLimiter, dry_run: bool, key: str,
+                     remove: Callable[[str], object], references: Optional[Set[str]] = None) -> None:
+        """
+        删除足够旧且没有被引用的文件
+
+        column 为数据库中引用文件位置的列；也可以用 references 给出已解析的绝对路径集合，
+        两者都为None时不检查引用。
+        """
+        for batch in _batches(files, self.batch_size):
+            report["scanned"] += len(batch)
+            referenced = set()
+            if references is not None:
+                referenced = {location for location, _, _ in batch if os.path.realpath(location) in references}
+            elif column is not None:
+                referenced = {row[0] for row in db.query(column).filter(
+                    column.in_([location for location, _, _ in batch])
+                ).all()}
+            for location, size, mtime in batch:
+                if location in referenced or mtime >= cutoff:
+                    continue
+                _record(report, key, location, size)
+                if not dry_run:
+                    remove(location)
+            limiter.wait(len(batch))
+
+    def _reconcile_refcounts(self, db: Session, blob_store: BlobStore, cutoff: float, report: Dict,
+                             limiter: RateLimiter, dry_run: bool) -> None:
+        last_hash = ""
+        while True:
+            blobs = db.query(FileBlob).filter(
+                FileBlob.file_hash > last_hash
+            ).order_by(FileBlob.file_hash).limit(self.batch_size).all()
+            if not blobs:
+                break
+            last_hash = blobs[-1].file_hash
+            counts = dict(db.query(UploadedFile.file_path, func.count(UploadedFile.id)).filter(
+                UploadedFile.file_path.in_([b.file_path for b in blobs])
+            ).group_by(UploadedFile.file_path).all())
+            for blob in blobs:
+                actual = counts.get(blob.file_path, 0)
+                if actual == blob.ref_count:
+                    continue
+                # 最近变更过的记录可能属于正在进行的上传或删除，留到下次检查
+                updated_at = blob.updated_at or blob.created_at
+                if updated_at is not None:
+                    if updated_at.tzinfo is None:
+                        # SQLite 的 CURRENT_TIMESTAMP 为不带时区的UTC时间
+                        updated_at = updated_at.replace(tzinfo=timezone.utc)
+                    if updated_at.timestamp() >= cutoff:
+                        continue
+                if actual == 0:
+                    size = blob_store.storage.size(blob.file_path) or 0
+                    _record(report, "unreferenced_blobs", blob.file_path, size)
+                    if not dry_run:
+                        db.delete(blob)
+                        blob_store.file_manager.delete_file(blob.file_path)
+                else:
+                    _record(report, "refcounts_fixed", blob.file_path)
+                    if not dry_run:
+                        blob.ref_count = actual
+            if not dry_run:
+                db.commit()
+            limiter.wait(len(blobs))
+
+    def _sweep_derivatives(self, db: Session, cutoff: float, report: Dict, limiter: RateLimiter,
+                           dry_run: bool) -> None:
+        store = DerivativeStore()
+        for kind in KINDS:
+            current_suffix = f"_{derivative_size(kind)}.webp"
+            files = self._stored_files(store.storage, f"{DerivativeStore.DERIVATIVE_DIR}/{kind}")
+            for batch in _batches(files, self.batch_size):
+                report["scanned"] += len(batch)
+                names = [os.path.basename(location) for location, _, _ in batch]
+                referenced = {row[0] for row in db.query(UploadedFile.file_hash).filter(
+                    UploadedFile.file_hash.in_({name.split("_", 1)[0] for name in names})
+                ).distinct().all()}
+                for name, (location, size, mtime) in zip(names, batch):
+                    if name.endswith(current_suffix) and name.split("_", 1)[0] in referenced:
+                        continue
+                    if mtime < cutoff:
+                        _record(report, "orphan_derivatives", location, size)
+                        if not dry_run:
+                            store.storage.delete(location)
+                limiter.wait(len(batch))
+
+    def _report_missing(self, db: Session, storage, report: Dict, limiter: RateLimiter) -> None:
+        last_path = ""
+        while True:
+            paths = [row[0] for row in db.query(UploadedFile.file_path).filter(
+                UploadedFile.file_path > last_path
+            ).distinct().order_by(UploadedFile.file_path).limit(self.batch_size).all()]
+            if not paths:
+                break
+            last_path = paths[-1]
+            for path in paths:
+                if not storage.exists(path):
+                    _record(report, "missing", path)
+            limiter.wait(len(paths))
+
+    @staticmethod
+    def _summary(report: Dict) -> str:
+        return json.dumps({k: v for k, v in report.items() if k != "samples"}, ensure_ascii=False)
+
+
+class UploadSweeper:
+    """后台定期执行上传目录清理"""
+
+    def __init__(self, maintenance: UploadMaintenance, interval: float, dry_run: bool = False):
+        self.maintenance = maintenance
+        self.interval = interval
+        self.dry_run = dry_run
+        self.last_report: Optional[Dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _loop(self) -> None:
+        # 启动后先等待一个周期，不与启动时的预加载争抢资源
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_report = self.maintenance.sweep(dry_run=self.dry_run)
+            except Exception as e:
+                logging.error(f"上传目录清理失败: {str(e)}")
+
+    def start(self) -> None:
+        """启动后台线程（已启动时不重复启动）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="upload-sweeper", daemon=True)
+        self._thread.start()
+        logging.info(f"上传目录清理任务已启动，间隔 {self.interval} 秒，dry_run={self.dry_run}")
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """停止后台线程，等待正在执行的清理完成"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+
+# 全局清理任务实例
+_upload_sweeper: Optional[UploadSweeper] = None
+
+
+def get_upload_sweeper() -> UploadSweeper:
+    """获取上传目录清理任务（单例模式）"""
+    global _upload_sweeper
+    if _upload_sweeper is None:
+        _upload_sweeper = UploadSweeper(
+            UploadMaintenance(),
+            interval=settings.UPLOAD_SWEEP_INTERVAL,
+            dry_run=settings.UPLOAD_SWEEP_DRY_RUN
+        )
+    return _upload_sweeper
+
+
+def shutdown_upload_sweeper() -> None:
+    """停止上传目录清理任务"""
+    global _upload_sweeper
+    if _upload_sweeper is not None:
+        _upload_sweeper.stop()
+        _upload_sweeper = None
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """
+    为已有数据库补建新表和缺少的索引
+
+    create_all 只创建不存在的表，不会给已存在的表添加新索引（如 uploaded_files.file_hash）。
+    重复执行是安全的，其他进程同时创建了同一索引时跳过。
+
+    Args:
+        engine: 数据库引擎
+
+    Returns:
+        新建的索引名
+    """
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except SQLAlchemyError:
+                if index.name not in {i["name"] for i in inspect(engine).get_indexes(table.name)}:
+                    raise
+                continue
+            created.append(index.name)
+    if created:
+        logging.info(f"已补建数据库索引: {', '.join(created)}")
+    return created
+
+
+def start_legacy_migration(engine: Engine, session_factory: Callable[[], Session] = SessionLocal) -> threading.Thread:
+    """
+    补建索引，并在后台线程中把旧文件迁移到按哈希分级的存储（file_hash 由MD5改为BLAKE2b）
+
+    迁移只处理还没有存储记录的上传记录，重复执行、多个进程同时执行都是安全的，
+    但只需在一个进程中执行（见 serve.py）。
+
+    Args:
+        engine: 数据库引擎
+        session_factory: 数据库会话工厂
+
+    Returns:
+        执行迁移的后台线程
+    """
+    upgrade_schema(engine)
+
+    def run() -> None:
+        try:
+            UploadMaintenance(session_factory=session_factory).migrate_legacy()
+        except Exception as e:
+            logging.error(f"上传文件迁移失败: {str(e)}")
+
+    thread = threading.Thread(target=run, name="upload-migration", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="上传目录维护")
+    parser.add_argument("action", choices=["migrate", "sweep"], help="migrate: 迁移旧文件; sweep: 清理孤立文件")
+    parser.add_argument("--dry-run", action="store_true", help="只输出报告，不修改")
+    parser.add_argument("--batch-size", type=int, default=None, help="每批处理的文件数")
+    parser.add_argument("--rate", type=float, default=None, help="每秒最多处理的文件数，0表示不限速")
+    parser.add_argument("--min-age", type=int, default=None, help="只清理早于该秒数的文件")
+    parser.add_argument("--delete-legacy", action="store_true", default=None,
+                        help="删除根目录中没有记录引用的旧文件（默认只报告）")
+    args = parser.parse_args(argv)
+
+    maintenance = UploadMaintenance(
+        batch_size=args.batch_size,
+        max_files_per_second=args.rate,
+        min_age=args.min_age,
+        delete_legacy=args.delete_legacy
+    )
+    if args.action == "migrate":
+        if not args.dry_run:
+            from app.db.base import engine
+            upgrade_schema(engine)
+        report = maintenance.migrate_legacy(dry_run=args.dry_run)
+    else:
+        report = maintenance.sweep(dry_run=args.dry_run)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
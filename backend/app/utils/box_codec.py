@@ -0,0 +1,74 @@
+"""OCR文本框的紧凑编码"""
+import sys
+from array import array
+from typing import List, Sequence
+
+# 每个文本框为4个点，每个点2个坐标
+POINTS_PER_BOX = 4
+FLOATS_PER_BOX = POINTS_PER_BOX * 2
+
+
+def _to_bytes(values: array) -> bytes:
+    """统一按小端序输出"""
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(data: bytes) -> array:
+    values = array("f")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def pack_boxes(boxes: Sequence[Sequence[Sequence[float]]]) -> bytes:
+    """
+    将文本框列表打包为float32字节串
+
+    Args:
+        boxes: 文本框列表，每个文本框为4个 [x, y] 点
+
+    Returns:
+        打包后的字节串（每个文本框32字节）
+    """
+    values = array("f")
+    for box in boxes:
+        if len(box) != POINTS_PER_BOX:
+            raise ValueError(f"文本框应包含{POINTS_PER_BOX}个点，实际为{len(box)}个")
+        for point in box:
+            values.append(float(point[0]))
+            values.append(float(point[1]))
+    return _to_bytes(values)
+
+
+def unpack_boxes(data: bytes) -> List[List[List[float]]]:
+    """
+    将字节串还原为文本框列表
+
+    Args:
+        data: pack_boxes 的输出
+
+    Returns:
+        文本框列表
+    """
+    if not data:
+        return []
+    values = _from_bytes(data)
+    return [
+        [[values[i + j], values[i + j + 1]] for j in range(0, FLOATS_PER_BOX, 2)]
+        for i in range(0, len(values), FLOATS_PER_BOX)
+    ]
+
+
+def pack_floats(values: Sequence[float]) -> bytes:
+    """将浮点数列表打包为float32字节串"""
+    return _to_bytes(array("f", (float(v) for v in values)))
+
+
+def unpack_floats(data: bytes) -> List[float]:
+    """将字节串还原为浮点数列表"""
+    if not data:
+        return []
+    return _from_bytes(data).tolist()
@@ -0,0 +1,157 @@
+"""两级结果缓存：进程内LRU + 可选Redis"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.utils.logger import logging
+
+
+class TieredCache:
+    """两级缓存
+
+    第一级为进程内LRU，第二级为Redis（配置了REDIS_URL时启用，供多个工作进程共享）。
+    值需要可JSON序列化，两级中都以JSON字符串保存，取出时返回新对象，调用方可以放心修改。
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 1000,
+        ttl_seconds: Optional[int] = None,
+        use_redis: bool = True
+    ):
+        self.namespace = namespace
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self._entries: "OrderedDict[str, Tuple[Optional[float], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._redis_hits = 0
+        self._misses = 0
+
+    def _redis(self):
+        """获取Redis连接，未配置时返回None"""
+        if not self.use_redis:
+            return None
+        from app.db.redis import redis_client
+        return redis_client
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def _set_memory(self, key: str, payload: str) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的值，未命中时返回None
+        """
+        payload = self._get_memory(key)
+        if payload is not None:
+            with self._lock:
+                self._memory_hits += 1
+            return json.loads(payload)
+
+        redis = self._redis()
+        if redis is not None:
+            try:
+                raw = redis.get(self._redis_key(key))
+            except Exception as e:
+                logging.warning(f"读取Redis缓存失败: {key}, 错误: {str(e)}")
+                raw = None
+            if raw is not None:
+                payload = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+                # 回填进程内缓存
+                self._set_memory(key, payload)
+                with self._lock:
+                    self._redis_hits += 1
+                return json.loads(payload)
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 可JSON序列化的值
+        """
+        payload = json.dumps(value, ensure_ascii=False)
+        self._set_memory(key, payload)
+
+        redis = self._redis()
+        if redis is not None:
+            try:
+                redis.set(self._redis_key(key), payload, ex=self.ttl_seconds)
+            except Exception as e:
+                logging.warning(f"写入Redis缓存失败: {key}, 错误: {str(e)}")
+
+    def delete(self, key: str) -> None:
+        """删除缓存项"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+        redis = self._redis()
+        if redis is not None:
+            try:
+                redis.delete(self._redis_key(key))
+            except Exception as e:
+                logging.warning(f"删除Redis缓存失败: {key}, 错误: {str(e)}")
+
+    def clear(self) -> None:
+        """清空进程内缓存并重置统计（不影响Redis）"""
+        with self._lock:
+            self._entries.clear()
+            self._memory_hits = 0
+            self._redis_hits = 0
+            self._misses = 0
+
+    def stats(self) -> Dict:
+        """
+        获取缓存统计
+
+        Returns:
+            命中/未命中次数、命中率和当前进程内条目数
+        """
+        with self._lock:
+            hits = self._memory_hits + self._redis_hits
+            total = hits + self._misses
+            return {
+                "namespace": self.namespace,
+                "hits": hits,
+                "memory_hits": self._memory_hits,
+                "redis_hits": self._redis_hits,
+                "misses": self._misses,
+                "hit_rate": hits / total if total else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "redis_enabled": self._redis() is not None
+            }
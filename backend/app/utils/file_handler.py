@@ -1,11 +1,21 @@
 """文件处理工具函数"""
 import os
+import uuid
 import hashlib
 import mimetypes
 from pathlib import Path
 from typing import Tuple, Optional, List
 from fastapi import UploadFile, HTTPException, status
 from app.core.config import settings
+from app.utils.logger import logging
+
+
+class FileTooLargeError(Exception):
+    """上传文件超过大小限制"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"文件大小超过限制。最大允许: {max_size / (1024 * 1024):.1f}MB")
 
 
 class FileValidator:
@@ -32,23 +42,43 @@ class FileValidator:
         return file_ext in settings.ALLOWED_IMAGE_FORMATS
     
     @staticmethod
-    def validate_file_size(file: UploadFile) -> bool:
+    def validate_document_format(file: UploadFile) -> bool:
+        """
+        验证是否为支持的多页文档格式（PDF、TIFF）
+        
+        Args:
+            file: 上传的文件
+            
+        Returns:
+            是否为支持的文档格式
+        """
+        if not file.filename:
+            return False
+        
+        file_ext = Path(file.filename).suffix.lower().lstrip('.')
+        return file_ext in settings.ALLOWED_DOCUMENT_FORMATS
+    
+    @staticmethod
+    def validate_file_size(file: UploadFile, max_size: Optional[int] = None) -> bool:
         """
         验证文件大小
         
         Args:
             file: 上传的文件
+            max_size: 最大字节数，默认为 MAX_FILE_SIZE
             
         Returns:
             文件大小是否符合要求
         """
+        max_size = max_size or settings.MAX_FILE_SIZE
         if not hasattr(file, 'size') or file.size is None:
-            # 如果无法获取文件大小，尝试读取内容来检查
-            content = file.file.read()
-            file.file.seek(0)  # 重置文件指针
-            return len(content) <= settings.MAX_FILE_SIZE
+            # 无法获取文件大小时定位到末尾取得长度，不读取内容
+            position = file.file.tell()
+            size = file.file.seek(0, os.SEEK_END)
+            file.file.seek(position)  # 重置文件指针
+            return size <= max_size
         
-        return file.size <= settings.MAX_FILE_SIZE
+        return file.size <= max_size
     
     @staticmethod
     def validate_content_type(file: UploadFile) -> bool:
@@ -73,11 +103,46 @@ class FileValidator:
         ]
         
         return file.content_type.lower() in allowed_mime_types
+    
+    @staticmethod
+    def validate_document_content_type(file: UploadFile) -> bool:
+        """
+        验证多页文档的MIME类型
+        
+        Args:
+            file: 上传的文件
+            
+        Returns:
+            MIME类型是否正确
+        """
+        if not file.content_type:
+            return False
+        
+        allowed_mime_types = [
+            "application/pdf",
+            "image/tiff",
+            "image/tif"
+        ]
+        
+        return file.content_type.lower() in allowed_mime_types
 
 
 class FileManager:
     """文件管理器"""
     
+    # 流式读写的块大小
+    CHUNK_SIZE = 1024 * 1024
+    
+    @staticmethod
+    def new_hash():
+        """
+        创建文件内容哈希对象
+        
+        使用128位BLAKE2b：比MD5更快，十六进制长度与MD5相同（32位），且抗碰撞，
+        可以安全地用作跨用户共享的内容寻址键。
+        """
+        return hashlib.blake2b(digest_size=16)
+    
     def __init__(self):
         self.upload_dir = Path(settings.UPLOAD_DIR)
         self.upload_dir.mkdir(exist_ok=True)
@@ -93,7 +158,6 @@ class FileManager:
         Returns:
             生成的唯一文件名
         """
-        import uuid
         from datetime import datetime
         
         # 获取文件扩展名
@@ -108,62 +172,189 @@ class FileManager:
     
     def save_file(self, file: UploadFile, filename: str) -> Tuple[str, int]:
         """
-        保存文件到磁盘
+        保存文件到存储后端
+        
+        先流式写入本机临时文件，再放入存储（本地存储为重命名，对象存储为流式上传）。
+        
+        Args:
+            file: 上传的文件
+            filename: 保存的文件名（存储键）
+            
+        Returns:
+            (文件位置, 文件大小)
+        """
+        from app.services.storage import get_storage
+        
+        temp_path, file_size, _ = self.save_stream(file, str(Path("tmp") / uuid.uuid4().hex))
+        try:
+            return get_storage().put_file(filename, temp_path), file_size
+        except BaseException:
+            self.delete_local_file(temp_path)
+            raise
+    
+    def save_stream(
+        self,
+        file: UploadFile,
+        filename: str,
+        max_size: Optional[int] = None
+    ) -> Tuple[str, int, str]:
+        """
+        分块流式保存文件，同时计算哈希和检查大小（只读取一遍，内存占用与文件大小无关）
+        
+        先写入临时文件，完成后再重命名，超过大小限制或写入失败时不会留下不完整的文件。
         
         Args:
             file: 上传的文件
             filename: 保存的文件名
+            max_size: 最大字节数，超过时立即停止读取，None表示不限制
             
         Returns:
-            (文件路径, 文件大小)
+            (文件路径, 文件大小, 文件内容哈希)
+            
+        Raises:
+            FileTooLargeError: 文件超过大小限制
         """
         file_path = self.upload_dir / filename
         
         # 确保目录存在
         file_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = file_path.with_name(file_path.name + ".part")
         
-        # 保存文件
-        content = file.file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
+        file_hash = self.new_hash()
+        size = 0
+        buffer = bytearray(self.CHUNK_SIZE)
+        view = memoryview(buffer)
+        try:
+            with open(temp_path, "wb") as f:
+                while True:
+                    read = self._read_chunk(file.file, buffer)
+                    if not read:
+                        break
+                    size += read
+                    if max_size is not None and size > max_size:
+                        raise FileTooLargeError(max_size)
+                    file_hash.update(view[:read])
+                    f.write(view[:read])
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
         
         # 重置文件指针
-        file.file.seek(0)
+        if file.file.seekable():
+            file.file.seek(0)
+        
+        return str(file_path), size, file_hash.hexdigest()
+    
+    @staticmethod
+    def _read_chunk(stream, buffer: bytearray) -> int:
+        """读取一块数据到复用的缓冲区，返回读取的字节数"""
+        readinto = getattr(stream, "readinto", None)
+        if readinto is not None:
+            return readinto(buffer) or 0
+        chunk = stream.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+    
+    def save_bytes(self, content: bytes, filename: str) -> Tuple[str, int]:
+        """
+        将内存中的文件内容保存到磁盘
+        
+        Args:
+            content: 文件内容
+            filename: 保存的文件名
+            
+        Returns:
+            (文件路径, 文件大小)
+        """
+        file_path = self.upload_dir / filename
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with open(file_path, "wb") as f:
+            f.write(content)
         
         return str(file_path), len(content)
     
+    @staticmethod
+    def calculate_bytes_hash(content: bytes) -> str:
+        """
+        计算内存中文件内容的哈希（与 calculate_file_hash 结果一致）
+        
+        Args:
+            content: 文件内容
+            
+        Returns:
+            文件内容哈希值
+        """
+        file_hash = FileManager.new_hash()
+        file_hash.update(content)
+        return file_hash.hexdigest()
+    
     def calculate_file_hash(self, file_path: str) -> str:
         """
-        计算文件MD5哈希
+        计算存储中文件的内容哈希（流式读取）
         
         Args:
-            file_path: 文件路径
+            file_path: 文件位置
             
         Returns:
-            文件MD5哈希值
+            文件内容哈希值
         """
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        from app.services.storage import get_storage
+        
+        with get_storage().open(file_path) as f:
+            return self.calculate_stream_hash(f)
+    
+    @classmethod
+    def calculate_stream_hash(cls, stream) -> str:
+        """
+        分块计算文件对象的内容哈希
+        
+        Args:
+            stream: 以二进制方式打开的文件对象
+            
+        Returns:
+            文件内容哈希值
+        """
+        file_hash = cls.new_hash()
+        for chunk in iter(lambda: stream.read(cls.CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+        return file_hash.hexdigest()
     
     def delete_file(self, file_path: str) -> bool:
         """
-        删除文件
+        从存储后端删除文件
         
         Args:
-            file_path: 文件路径
+            file_path: 文件位置
             
         Returns:
             是否删除成功
         """
+        from app.services.storage import get_storage
+        
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                return True
+            return get_storage().delete(file_path)
+        except Exception as e:
+            logging.error(f"删除文件失败: {file_path}, 错误: {str(e)}")
             return False
-        except Exception:
+    
+    @staticmethod
+    def delete_local_file(file_path: str) -> bool:
+        """
+        删除本机文件（临时文件等不在存储后端中的文件）
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            是否删除成功
+        """
+        try:
+            os.remove(file_path)
+            return True
+        except FileNotFoundError:
             return False
 
 
@@ -186,23 +377,30 @@ def validate_upload_file(file: UploadFile) -> None:
             detail="未选择文件"
         )
     
-    # 验证文件格式
-    if not validator.validate_file_format(file):
+    # 验证文件格式（图片或多页文档）
+    is_document = validator.validate_document_format(file)
+    if not is_document and not validator.validate_file_format(file):
+        allowed_formats = settings.ALLOWED_IMAGE_FORMATS + settings.ALLOWED_DOCUMENT_FORMATS
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"不支持的文件格式。支持的格式: {', '.join(settings.ALLOWED_IMAGE_FORMATS)}"
+            detail=f"不支持的文件格式。支持的格式: {', '.join(allowed_formats)}"
         )
     
-    # 验证文件大小
-    if not validator.validate_file_size(file):
-        max_size_mb = settings.MAX_FILE_SIZE / (1024 * 1024)
+    # 验证文件大小（多页文档单独限制）
+    max_size = settings.MAX_DOCUMENT_SIZE if is_document else settings.MAX_FILE_SIZE
+    if not validator.validate_file_size(file, max_size):
+        max_size_mb = max_size / (1024 * 1024)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"文件大小超过限制。最大允许: {max_size_mb:.1f}MB"
         )
     
     # 验证MIME类型
-    if not validator.validate_content_type(file):
+    if is_document:
+        content_type_valid = validator.validate_document_content_type(file)
+    else:
+        content_type_valid = validator.validate_content_type(file)
+    if not content_type_valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="无效的文件类型"
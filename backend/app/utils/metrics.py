@@ -0,0 +1,110 @@
+"""Prometheus 文本格式的指标
+
+进程内的直方图，由 /metrics 以 Prometheus 文本格式（0.0.4）输出，不依赖 prometheus_client。
+多进程部署时每个工作进程各自统计，由 Prometheus 按实例分别抓取。
+"""
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+# 默认分桶（秒）：覆盖普通接口的毫秒级延迟和OCR推理的数十秒延迟
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else f"{int(value)}"
+
+
+class Histogram:
+    """带标签的直方图"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        记录一次观测值
+
+        Args:
+            value: 观测值（秒）
+            **labels: 标签值，需与 labelnames 一致
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [各桶计数（非累计）, 总和, 次数]
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        """输出为 Prometheus 文本格式的行"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        for key, (counts, total, count) in series:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key))
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{_format_number(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            label_block = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{label_block} {total}")
+            lines.append(f"{self.name}_count{label_block} {count}")
+        return lines
+
+
+_registry: List[Histogram] = []
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str],
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """创建并注册直方图"""
+    metric = Histogram(name, documentation, labelnames, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    """所有已注册指标的 Prometheus 文本"""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# 每个路由的请求耗时，以及请求中各阶段（认证、数据库、推理等）的耗时
+REQUEST_DURATION = histogram(
+    "http_request_duration_seconds",
+    "HTTP请求耗时（秒）",
+    ("method", "route", "status")
+)
+STAGE_DURATION = histogram(
+    "http_request_stage_duration_seconds",
+    "HTTP请求中各阶段的耗时（秒）",
+    ("method", "route", "stage")
+)
+# 文本分类各层（本地分类器、缓存、LLM、规则）的耗时
+CLASSIFY_TIER_DURATION = histogram(
+    "classification_tier_duration_seconds",
+    "文本分类各层（本地分类器、缓存、LLM、规则）的耗时（秒）",
+    ("tier",)
+)
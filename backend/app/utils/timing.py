@@ -0,0 +1,160 @@
+"""请求内的分阶段计时
+
+中间件为每个请求创建一个 RequestTimings 并放入上下文变量，认证、数据库、图片校验、推理、
+分类等代码用 span() 记录各阶段耗时；请求结束时汇总为 Server-Timing 响应头、结构化日志和
+/metrics 中的直方图。不在请求中调用时（后台任务、命令行、测试）span() 不做任何事。
+
+上下文变量会随 AnyIO 线程池和 MeteredExecutor.run 传入工作线程；OCR工作进程中的耗时通过
+识别结果的 timings 字段带回，由调用方用 record() 记录。
+"""
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class RequestTimings:
+    """一个请求中记录的各阶段耗时"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._spans: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, duration_ms: float) -> None:
+        """记录一个阶段的耗时（毫秒）"""
+        with self._lock:
+            self._spans.append((name, duration_ms))
+
+    def totals(self) -> Dict[str, float]:
+        """按阶段名汇总的耗时（毫秒），同名阶段（如多次数据库查询）相加，保持首次出现的顺序"""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for name, duration_ms in self._spans:
+                totals[name] = totals.get(name, 0.0) + duration_ms
+        return totals
+
+    def elapsed_ms(self) -> float:
+        """请求开始至今的耗时（毫秒）"""
+        return (time.perf_counter() - self.started) * 1000
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    """开始记录当前请求的耗时（由中间件调用）"""
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """当前请求的耗时记录，不在请求中时返回None"""
+    return _current.get()
+
+
+def record(name: str, duration_ms: float) -> None:
+    """
+    记录一个已测得的阶段耗时
+
+    Args:
+        name: 阶段名（用于 Server-Timing，只使用字母、数字、下划线和连字符）
+        duration_ms: 耗时（毫秒）
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, duration_ms)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    记录代码块的耗时
+
+    用法：
+        with span("inference"):
+            result = recognize_file(path)
+
+    Args:
+        name: 阶段名
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - started) * 1000)
+
+
+def timed(name: str):
+    """记录函数耗时的装饰器（同步和异步函数均可）"""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_stages(stages: Optional[Dict[str, float]], prefix: str) -> None:
+    """把识别结果等带回的各阶段耗时（毫秒）加上前缀后记录"""
+    for name, duration_ms in (stages or {}).items():
+        if isinstance(duration_ms, (int, float)):
+            record(f"{prefix}{name}", duration_ms)
+
+
+def server_timing_header(totals: Dict[str, float], total_ms: float) -> str:
+    """
+    生成 Server-Timing 响应头
+
+    Args:
+        totals: 各阶段耗时（毫秒）
+        total_ms: 请求总耗时（毫秒）
+
+    Returns:
+        如 "auth;dur=1.2, db;dur=3.4, total;dur=20.1"
+    """
+    entries = [f"{name};dur={duration_ms:.1f}" for name, duration_ms in totals.items()]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+def install_sqlalchemy_timing() -> None:
+    """所有数据库语句的执行时间记为 db 阶段（对所有 Engine 生效，只需调用一次）"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if getattr(install_sqlalchemy_timing, "_installed", False):
+        return
+    install_sqlalchemy_timing._installed = True
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        record("db", (time.perf_counter() - started) * 1000)
+
+    @event.listens_for(Engine, "handle_error")
+    def _error(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("query_started"):
+            started = conn.info["query_started"].pop()
+            record("db", (time.perf_counter() - started) * 1000)
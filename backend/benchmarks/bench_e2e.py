@@ -0,0 +1,410 @@
+"""上传→OCR→分类→保存 的端到端吞吐/延迟基准
+
+在进程内通过ASGI调用应用（不经过网络），使用临时的SQLite数据库和上传目录，
+模拟多个用户并发执行完整流程，输出每个场景的延迟分位数、吞吐量和峰值内存（JSON），
+并与保存的基线比较，吞吐或延迟变差超过阈值时以非0状态退出。峰值内存在场景执行期间
+采样 /proc/self/status 得到（仅Linux），start_rss_mb 是场景开始时的内存。
+
+仓库中没有提交基线文件（结果与机器有关），--baseline 需要先在同一台机器上用
+--save-baseline 生成基线。
+
+场景：
+- upload: 只上传文件
+- pipeline: 上传 → 按文件ID识别 → 分类 → 保存为日程或备忘录
+- classify: 只分类并保存（文本固定，不经过OCR）
+
+缓存模式：
+- cold: 每次请求的图片内容都不同，不命中去重存储和识别结果缓存
+- warm: 所有请求上传同一张已由预热用户上传并识别过的图片，命中去重存储和识别结果缓存
+  （同一用户不能重复上传相同内容，每次请求后删除自己的上传记录，删除不计入耗时）
+
+用法：
+    python -m benchmarks.bench_e2e --scenarios upload pipeline --sizes 800 2000 --users 1 8 --requests 10
+    python -m benchmarks.bench_e2e --save-baseline benchmarks/baseline_e2e.json
+    python -m benchmarks.bench_e2e --baseline benchmarks/baseline_e2e.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.bench_preprocess import make_sample
+
+SCENARIOS = ("upload", "pipeline", "classify")
+CACHE_MODES = ("cold", "warm")
+CLASSIFY_TEXT = "明天下午3点和团队开会讨论项目进度"
+PASSWORD = "Bench123!"
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """最近秩法计算分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1
+    return round(ordered[index], 3)
+
+
+def summarize(latencies: List[float]) -> Dict:
+    """延迟列表的统计（毫秒）"""
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": round(statistics.mean(latencies), 3),
+        "max": round(max(latencies), 3),
+    }
+
+
+def current_rss_mb() -> Optional[float]:
+    """当前进程的常驻内存（MB），读取 /proc/self/status，不支持的平台返回None"""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    # 单位为KB
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class RSSSampler:
+    """在后台线程中定时采样常驻内存，得到一个场景期间的峰值
+
+    getrusage 的 ru_maxrss 是整个进程生命周期的峰值，前面场景的峰值会带到后面所有场景，
+    因此每个场景单独采样。
+    """
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.start_mb: Optional[float] = None
+        self.peak_mb: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-rss", daemon=True)
+
+    def _sample(self) -> None:
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "RSSSampler":
+        self.start_mb = current_rss_mb()
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def create_app(work_dir: Path):
+    """使用临时数据库和上传目录创建应用"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.core.config import settings
+
+    settings.UPLOAD_DIR = str(work_dir / "uploads")
+    settings.OCR_PRELOAD_ENGINES = False
+
+    from app.db.base import Base, get_db
+    from main import app
+
+    engine = create_engine(
+        f"sqlite:///{work_dir / 'bench.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30}
+    )
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+class Recorder:
+    """收集一个场景的请求耗时"""
+
+    def __init__(self):
+        self.totals: List[float] = []
+        self.stages: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def stage(self, name: str, elapsed_ms: float) -> None:
+        self.stages.setdefault(name, []).append(elapsed_ms)
+
+    def error(self, message: str) -> None:
+        self.errors[message] = self.errors.get(message, 0) + 1
+
+
+class BenchUser:
+    """一个并发用户：注册后按场景顺序发送请求"""
+
+    def __init__(self, client, name: str, size: int, recorder: Recorder, warm_image: Optional[bytes] = None):
+        """
+        Args:
+            client: 连接到应用的 httpx.AsyncClient
+            name: 用户名
+            size: 上传图片的长边像素
+            recorder: 耗时记录
+            warm_image: warm 模式下所有请求共用的图片，None 表示每次生成不同的图片
+        """
+        self.client = client
+        self.name = name
+        self.size = size
+        self.recorder = recorder
+        self.warm_image = warm_image
+        self.headers: Dict[str, str] = {}
+        self.last_file_id: Optional[str] = None
+
+    async def register(self) -> None:
+        response = await self.client.post("/api/v1/auth/register", json={
+            "username": self.name,
+            "email": f"{self.name}@example.com",
+            "password": PASSWORD
+        })
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    def image(self, index: int) -> bytes:
+        if self.warm_image is not None:
+            return self.warm_image
+        content, _ = make_sample(self.size, tag=f"{self.name} #{index}")
+        return content
+
+    async def _call(self, stage: str, method: str, url: str, **kwargs):
+        """发送请求并记录阶段耗时，失败时抛出带阶段名的异常"""
+        started = time.perf_counter()
+        response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        self.recorder.stage(stage, (time.perf_counter() - started) * 1000)
+        body = response.json() if response.content else {}
+        # 参数校验失败时全局异常处理返回200和业务错误码
+        if response.status_code >= 400 or (isinstance(body, dict) and body.get("code", 200) >= 400):
+            detail = body.get("detail") or body.get("msg") if isinstance(body, dict) else None
+            raise RuntimeError(f"{stage}: HTTP {response.status_code} {detail or ''}".strip())
+        return body
+
+    async def upload(self, index: int) -> Dict:
+        files = {"file": (f"{self.name}_{index}.jpg", self.image(index), "image/jpeg")}
+        uploaded = await self._call("upload", "POST", "/api/v1/upload/file", files=files)
+        self.last_file_id = uploaded["file_id"]
+        return uploaded
+
+    async def classify_and_save(self, text: str) -> None:
+        result = await self._call("classify", "POST", "/api/v1/classify", json={"text": text})
+        data = result.get("extracted_data") or {}
+        if result["type"] == "schedule":
+            await self._call("save", "POST", "/api/v1/schedules", json={
+                "date": data.get("date"),
+                "time": data.get("time"),
+                "description": data.get("description") or text,
+                "original_text": text
+            })
+        else:
+            await self._call("save", "POST", "/api/v1/memos", json={
+                "content": text,
+                "summary": data.get("summary"),
+                "tags": data.get("tags")
+            })
+
+    async def pipeline(self, index: int) -> None:
+        uploaded = await self.upload(index)
+        result = await self._call("ocr", "POST", "/api/v1/ocr/recognize", json={"file_id": uploaded["file_id"]})
+        if not result.get("success") or not result.get("text"):
+            raise RuntimeError(f"ocr: {result.get('error') or '未识别到文字'}")
+        await self.classify_and_save(result["text"])
+
+    async def run_once(self, scenario: str, index: int) -> None:
+        if scenario == "upload":
+            await self.upload(index)
+        elif scenario == "pipeline":
+            await self.pipeline(index)
+        else:
+            await self.classify_and_save(CLASSIFY_TEXT)
+
+    async def run(self, scenario: str, requests: int) -> None:
+        for index in range(1, requests + 1):
+            self.last_file_id = None
+            started = time.perf_counter()
+            try:
+                await self.run_once(scenario, index)
+                self.recorder.totals.append((time.perf_counter() - started) * 1000)
+            except Exception as e:
+                self.recorder.error(str(e)[:200])
+            if self.last_file_id and self.warm_image is not None:
+                await self.client.delete(f"/api/v1/upload/file/{self.last_file_id}", headers=self.headers)
+
+
+async def run_scenario(client, scenario: str, size: int, users: int, cache: str, requests: int,
+                       run_id: str) -> Dict:
+    """执行一个场景，返回统计结果"""
+    recorder = Recorder()
+    warm_image = None
+    if cache == "warm":
+        # 预热用户先上传并识别，保留上传记录，使存储文件和识别结果在测量期间一直有效
+        warm_image, _ = make_sample(size, tag=f"bench {run_id}")
+        warmer = BenchUser(client, f"bench_{run_id}_warm", size, Recorder(), warm_image)
+        await warmer.register()
+        try:
+            await warmer.run_once(scenario, 0)
+        except Exception as e:
+            recorder.error(f"warm-up: {str(e)[:200]}")
+
+    bench_users = [
+        BenchUser(client, f"bench_{run_id}_{i}", size, recorder, warm_image)
+        for i in range(users)
+    ]
+    await asyncio.gather(*(user.register() for user in bench_users))
+
+    with RSSSampler() as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(user.run(scenario, requests) for user in bench_users))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": scenario,
+        "size": size,
+        "users": users,
+        "cache": cache,
+        "requests": users * requests,
+        "completed": len(recorder.totals),
+        "errors": recorder.errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(recorder.totals) / elapsed, 3) if elapsed > 0 else None,
+        "latency_ms": summarize(recorder.totals),
+        "stages_ms": {stage: summarize(values) for stage, values in recorder.stages.items()},
+        "start_rss_mb": round(rss.start_mb, 1) if rss.start_mb is not None else None,
+        "peak_rss_mb": round(rss.peak_mb, 1) if rss.peak_mb is not None else None,
+    }
+
+
+def run_key(scenario: str, size: int, users: int, cache: str) -> str:
+    """场景的唯一键，用于与基线对应"""
+    if scenario == "classify":
+        return f"{scenario}/{users}u"
+    return f"{scenario}/{size}px/{users}u/{cache}"
+
+
+async def run(scenarios: List[str], sizes: List[int], users: List[int], caches: List[str], requests: int) -> Dict:
+    """按参数组合执行所有场景"""
+    import httpx
+    from app.services.executors import configure_default_threadpool, shutdown_executors
+
+    with tempfile.TemporaryDirectory(prefix="bench_e2e_") as work_dir:
+        app = create_app(Path(work_dir))
+        configure_default_threadpool()
+        runs = {}
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                for scenario, size, user_count, cache in itertools.product(scenarios, sizes, users, caches):
+                    key = run_key(scenario, size, user_count, cache)
+                    if key in runs:
+                        continue
+                    runs[key] = await run_scenario(
+                        client, scenario, size, user_count, cache, requests, run_id=str(len(runs))
+                    )
+                    print(f"{key}: {json.dumps(runs[key]['latency_ms'])} rps={runs[key]['rps']}", file=sys.stderr)
+        finally:
+            app.dependency_overrides.clear()
+            shutdown_executors()
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "requests_per_user": requests,
+        "runs": runs,
+    }
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> Tuple[Dict, List[str]]:
+    """
+    与基线比较p95延迟和吞吐量
+
+    Args:
+        report: 本次结果
+        baseline: 基线结果
+        tolerance: 允许变差的比例，如0.2表示20%
+
+    Returns:
+        (每个场景的对比, 超出阈值的场景说明)
+    """
+    comparison, regressions = {}, []
+    for key, current in report["runs"].items():
+        base = baseline.get("runs", {}).get(key)
+        if not base:
+            continue
+        entry = {}
+        for metric, worse_if_higher in (("p95_ms", True), ("rps", False)):
+            before = base["latency_ms"]["p95"] if metric == "p95_ms" else base["rps"]
+            after = current["latency_ms"]["p95"] if metric == "p95_ms" else current["rps"]
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            entry[metric] = {"baseline": before, "current": after, "change": round(change, 4)}
+            if (change > tolerance) if worse_if_higher else (change < -tolerance):
+                regressions.append(f"{key} {metric}: {before} -> {after} ({change:+.1%})")
+        comparison[key] = entry
+    return comparison, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="上传→OCR→分类→保存 的端到端基准")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS), help="执行的场景")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[800, 2000], help="样例图片长边像素")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8], help="并发用户数")
+    parser.add_argument("--cache", nargs="+", choices=CACHE_MODES, default=list(CACHE_MODES), help="缓存模式")
+    parser.add_argument("--requests", type=int, default=10, help="每个用户的请求数")
+    parser.add_argument("--output", help="结果JSON输出路径，默认输出到标准输出")
+    parser.add_argument("--baseline", help="对比的基线JSON，p95或吞吐变差超过阈值时返回1")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许变差的比例")
+    parser.add_argument("--save-baseline", help="把本次结果保存为基线")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.scenarios, args.sizes, args.users, args.cache, args.requests))
+
+    regressions = []
+    if args.baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                report["comparison"], regressions = compare(report, json.load(f), args.tolerance)
+            report["regressions"] = regressions
+        else:
+            print(f"基线文件不存在: {args.baseline}（先用 --save-baseline 生成）", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(output)
+    if not args.output:
+        print(output)
+    for regression in regressions:
+        print(f"性能退化: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""预处理配置的精度/延迟基准
+
+使用与测试用例相同方式生成的文本图片（PIL默认字体绘制），按不同的预处理配置
+执行OCR，输出每种配置的平均耗时、各阶段耗时和文本相似度（JSON）。
+
+用法：
+    python -m benchmarks.bench_preprocess --sizes 400 2000 4000 --repeat 3
+"""
+import argparse
+import difflib
+import json
+import statistics
+import sys
+import time
+from io import BytesIO
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.services.image_preprocessor import ImagePreprocessor
+from app.services.ocr_service import OCRService
+
+
+SAMPLE_LINES = [
+    "Meeting with team tomorrow 3pm",
+    "Buy milk eggs and bread",
+    "Project deadline Friday",
+    "Call Alice about the report",
+]
+
+# 对比的预处理配置：名称 -> ImagePreprocessor 参数（None 表示不预处理）
+CONFIGS: Dict[str, Dict] = {
+    "none": None,
+    "max1024": {"max_side": 1024},
+    "max2048": {"max_side": 2048},
+    "max2048_gray": {"max_side": 2048, "grayscale": True},
+    "max2048_gray_deskew": {"max_side": 2048, "grayscale": True, "deskew": True},
+    "max2048_contrast": {"max_side": 2048, "normalize_contrast": True},
+}
+
+
+def make_sample(width: int, tag: str = "") -> Tuple[bytes, str]:
+    """生成长边为 width、按比例放大文字的手写笔记样例图片（JPEG字节流, 期望文本）
+
+    tag 不为空时作为额外一行绘制，用于生成内容各不相同的图片。
+    """
+    height = width * 3 // 4
+    img = Image.new('RGB', (width, height), color='white')
+    draw = ImageDraw.Draw(img)
+    font_size = max(10, width // 25)
+    try:
+        font = ImageFont.load_default(size=font_size)
+    except TypeError:
+        # 旧版Pillow的默认字体不支持指定字号
+        font = ImageFont.load_default()
+    line_height = int(font_size * 1.6)
+    lines = SAMPLE_LINES + [tag] if tag else SAMPLE_LINES
+    for i, line in enumerate(lines):
+        draw.text((width // 20, height // 10 + i * line_height), line, fill='black', font=font)
+
+    buffer = BytesIO()
+    img.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue(), "\n".join(lines)
+
+
+def similarity(expected: str, actual: str) -> float:
+    """忽略大小写和空白的文本相似度"""
+    normalize = lambda s: "".join(s.lower().split())
+    return round(difflib.SequenceMatcher(None, normalize(expected), normalize(actual)).ratio(), 4)
+
+
+def run(sizes: List[int], repeat: int) -> Dict:
+    """执行基准测试"""
+    engine = OCRService(preprocessor=None)
+    results = {}
+    for name, options in CONFIGS.items():
+        engine.preprocessor = ImagePreprocessor(**options) if options is not None else None
+        per_size = {}
+        for size in sizes:
+            content, expected = make_sample(size)
+            latencies, scores, stages = [], [], {}
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = engine.recognize_text_from_bytes(content)
+                latencies.append((time.perf_counter() - started) * 1000)
+                scores.append(similarity(expected, result["text"]))
+                for stage, ms in (result.get("timings") or {}).items():
+                    stages.setdefault(stage, []).append(ms)
+            per_size[str(size)] = {
+                "latency_ms": round(statistics.mean(latencies), 3),
+                "accuracy": round(statistics.mean(scores), 4),
+                "stages_ms": {stage: round(statistics.mean(v), 3) for stage, v in stages.items()},
+            }
+        results[name] = per_size
+    return {"sizes": sizes, "repeat": repeat, "results": results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="OCR预处理配置的精度/延迟基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[400, 2000, 4000], help="样例图片长边像素")
+    parser.add_argument("--repeat", type=int, default=3, help="每种配置重复次数")
+    parser.add_argument("--output", help="结果JSON输出路径，默认输出到标准输出")
+    args = parser.parse_args(argv)
+
+    report = json.dumps(run(args.sizes, args.repeat), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""规则分类的微基准
+
+对比逐模式搜索的旧实现（每个模式、每个关键词各扫描一遍文本）与预编译单遍规则分类器
+在不同长度OCR文本上的耗时，并统计两者分类类型、时间、日期是否一致（JSON）。
+
+用法：
+    python -m benchmarks.bench_rules --lengths 100 1000 10000 --repeat 200
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+from app.services.classification_service import ClassificationService
+from app.services.rule_classifier import compile_rules
+
+
+# OCR输出中常见的行（日程、备忘录和噪声），按随机顺序拼接成指定长度
+SAMPLE_LINES = [
+    "明天下午2点开会讨论项目进度",
+    "2024年1月15日 14:30 项目评审会议",
+    "下周一上午10点和客户预约",
+    "今天学习了Python编程，感觉很有收获",
+    "记录一下读书笔记和心得体会",
+    "需要继续深入学习面向对象编程的概念",
+    "Meeting with team tomorrow 3 pm",
+    "idea: write a short journal every day",
+    "买牛奶 鸡蛋 面包",
+    "第3章 习题 1-5 完成",
+    "……（字迹不清）……",
+]
+
+
+def make_text(length: int, seed: int) -> str:
+    """生成长度约为 length 的多行OCR文本"""
+    rng = random.Random(seed)
+    lines: List[str] = []
+    while sum(len(line) + 1 for line in lines) < length:
+        lines.append(rng.choice(SAMPLE_LINES))
+    return "\n".join(lines)[:length]
+
+
+def legacy_analyze(service: ClassificationService, text: str) -> Dict:
+    """旧实现：得分、时间、日期和描述分别按模式、关键词逐个扫描"""
+    def first(patterns) -> Optional[str]:
+        for pattern in patterns:
+            match = re.search(pattern, text)
+            if match:
+                return match.group(0)
+        return None
+
+    text_lower = text.lower()
+    has_time = any(re.search(p, text) for p in service.TIME_PATTERNS)
+    has_date = any(re.search(p, text) for p in service.DATE_PATTERNS)
+    schedule = (0.4 if has_time else 0.0) + (0.3 if has_date else 0.0)
+    schedule += min(sum(1 for k in service.SCHEDULE_KEYWORDS if k in text_lower) * 0.1, 0.3)
+    memo = 0.4 + min(sum(1 for k in service.MEMO_KEYWORDS if k.lower() in text.lower()) * 0.15, 0.3)
+    if len(text) > 50 and not any(re.search(p, text) for p in service.TIME_PATTERNS):
+        memo += 0.25
+    description = text
+    for pattern in service.TIME_PATTERNS + service.DATE_PATTERNS:
+        description = re.sub(pattern, '', description)
+    return {
+        "schedule_score": min(schedule, 1.0),
+        "memo_score": min(memo, 1.0),
+        "time": first(service.TIME_PATTERNS),
+        "date": first(service.DATE_PATTERNS),
+        "description": description.strip() or text,
+    }
+
+
+def _type(result: Dict) -> str:
+    return "schedule" if result["schedule_score"] > result["memo_score"] else "memo"
+
+
+def measure(fn, texts: List[str], repeat: int) -> float:
+    """平均每段文本的耗时（微秒）"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - started) / (repeat * len(texts)) * 1e6
+
+
+def run(lengths: List[int], repeat: int, samples: int) -> Dict:
+    """执行基准测试"""
+    service = ClassificationService.__new__(ClassificationService)
+    rules = compile_rules(
+        tuple(service.TIME_PATTERNS),
+        tuple(service.DATE_PATTERNS),
+        tuple(service.SCHEDULE_KEYWORDS),
+        tuple(service.MEMO_KEYWORDS)
+    )
+    results = {}
+    for length in lengths:
+        texts = [make_text(length, seed) for seed in range(samples)]
+        legacy_us = measure(lambda text: legacy_analyze(service, text), texts, repeat)
+        single_pass_us = measure(rules.analyze, texts, repeat)
+        agree = {"type": 0, "time": 0, "date": 0}
+        for text in texts:
+            old, new = legacy_analyze(service, text), rules.analyze(text)
+            agree["type"] += _type(old) == _type(new)
+            agree["time"] += old["time"] == new["time"]
+            agree["date"] += old["date"] == new["date"]
+        results[str(length)] = {
+            "legacy_us": round(legacy_us, 1),
+            "single_pass_us": round(single_pass_us, 1),
+            "speedup": round(legacy_us / single_pass_us, 2),
+            "agreement": {key: round(count / len(texts), 3) for key, count in agree.items()},
+        }
+    return {"lengths": lengths, "repeat": repeat, "samples": samples, "results": results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="规则分类的微基准")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000], help="文本长度（字符）")
+    parser.add_argument("--repeat", type=int, default=50, help="每段文本重复次数")
+    parser.add_argument("--samples", type=int, default=20, help="每种长度生成的文本数")
+    parser.add_argument("--output", help="结果JSON输出路径，默认输出到标准输出")
+    args = parser.parse_args(argv)
+
+    report = json.dumps(run(args.lengths, args.repeat, args.samples), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
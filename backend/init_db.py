@@ -1,12 +1,14 @@
 """初始化数据库"""
-from app.db.base import Base, engine
-from app.models import User, ScheduleItem, Memo, UploadedFile, TextInput
+from app.db.base import engine
+from app.models import User, ScheduleItem, Memo, UploadedFile, TextInput, FileBlob, OCRResult, OCRResultRevision, OCRPageResult, ClassificationLabel
 
 
 def init_db():
-    """创建所有数据库表"""
+    """创建所有数据库表，并为已有数据库补建缺少的索引"""
+    from app.services.upload_maintenance import upgrade_schema
+
     print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
     print("Database tables created successfully!")
 
 
@@ -1,6 +1,7 @@
 import os
-import time
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.staticfiles import StaticFiles
 
@@ -8,8 +9,48 @@ from app.core.config import settings
 from app.utils.logger import logging
 from app.utils.businessexception import register_exception_handlers
 from app.core.cors import CORSSetup
+from app.core.upload_limit import UploadSizeLimitMiddleware
+from app.core.request_timing import RequestTimingMiddleware
+from app.utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
+from app.utils.timing import install_sqlalchemy_timing
 
-app = FastAPI(title=settings.PROJECT_NAME, docs_url=None)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时设置线程池并预加载OCR引擎，关闭时先停止任务队列再回收OCR工作进程"""
+    from app.services.executors import configure_default_threadpool, shutdown_executors
+    from app.services.ocr_engine_pool import get_ocr_engine_pool
+    from app.services.ocr_pool import get_ocr_pool, shutdown_ocr_pool
+    from app.services.ocr_jobs import shutdown_ocr_job_manager
+    from app.services.upload_maintenance import get_upload_sweeper, shutdown_upload_sweeper, start_legacy_migration
+
+    # 同步路由使用的默认线程池与上传、OCR路由的专用线程池分开设置大小
+    configure_default_threadpool()
+
+    # remote模式下引擎只在独立的OCR推理进程中加载
+    if settings.OCR_PRELOAD_ENGINES and settings.OCR_INFERENCE_MODE != "remote":
+        # 在后台加载，加载期间服务可以响应健康检查，就绪状态见 /health/ready
+        get_ocr_engine_pool().start_loading()
+        get_ocr_pool().warm_up()
+        logging.info("OCR引擎开始预加载")
+
+    if settings.UPLOAD_MIGRATE_ON_STARTUP:
+        from app.db.base import engine
+        start_legacy_migration(engine)
+
+    if settings.UPLOAD_SWEEP_ENABLED:
+        get_upload_sweeper().start()
+
+    yield
+
+    shutdown_upload_sweeper()
+    shutdown_ocr_job_manager()
+    shutdown_ocr_pool()
+    shutdown_executors()
+    logging.info("OCR进程池已关闭")
+
+
+app = FastAPI(title=settings.PROJECT_NAME, docs_url=None, lifespan=lifespan)
 
 # 路径配置
 settings.PROJECT_PATH = os.path.dirname(os.path.abspath(__file__))
@@ -29,6 +70,13 @@ cors_setup = CORSSetup(
 ).setup()
 logging.info("CORS 配置完成")
 
+# 上传请求体超过大小限制时在接收阶段就中止，不等整个请求体写入临时文件
+app.add_middleware(UploadSizeLimitMiddleware)
+
+# 请求总耗时和分阶段耗时（X-Process-Time、Server-Timing 响应头和 /metrics），最后添加的中间件在最外层
+app.add_middleware(RequestTimingMiddleware)
+install_sqlalchemy_timing()
+
 # 挂载静态文件夹
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -76,16 +124,43 @@ def root():
     return {"message": f"Welcome to {settings.PROJECT_NAME}"}
 
 
-# 添加中间件判断程序运行时间
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.perf_counter()
-    response = await call_next(request)
-    process_time = time.perf_counter() - start_time
-    response.headers["X-Process-Time"] = str(process_time) + "s"
-    return response
+@app.get("/health/live", include_in_schema=False)
+def liveness():
+    """存活检查：进程能响应即可"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready", include_in_schema=False)
+def readiness():
+    """就绪检查：OCR引擎和工作进程（remote模式下为推理进程）可用时返回200，否则返回503"""
+    from app.services.ocr_engine_pool import get_ocr_engine_pool
+    from app.services.ocr_pool import get_ocr_pool
+
+    engines = get_ocr_engine_pool().stats()
+    worker_pool_ready = get_ocr_pool().ready
+    if settings.OCR_INFERENCE_MODE == "remote":
+        # 至少有一个独立推理进程在线即可
+        ready = worker_pool_ready
+    else:
+        # 未开启预加载时引擎在首次使用时加载，不阻塞就绪
+        ready = not settings.OCR_PRELOAD_ENGINES or (engines["ready"] and worker_pool_ready)
+    content = {
+        "status": "ready" if ready else "loading",
+        "ocr_engines": engines,
+        "worker_pool_ready": worker_pool_ready
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus 指标：各路由的请求耗时和各阶段耗时直方图"""
+    if not settings.METRICS_ENABLED:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
 
+# 开发环境单进程启动；生产环境多进程部署使用 serve.py
 if __name__ == "__main__":
     import uvicorn
 
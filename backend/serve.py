@@ -0,0 +1,138 @@
+"""生产环境启动器
+
+按 Settings.WORKERS 启动多个API进程，并把OCR推理交给 OCR_PROCESSES 个独立的推理进程：
+
+    python serve.py              # API进程 + OCR推理进程（需要配置REDIS_URL）
+    python serve.py api          # 只启动API进程（推理进程在其他地方运行）
+    python serve.py ocr          # 只启动OCR推理进程
+
+API进程之间不共享内存，推理任务经Redis队列分发到推理进程；PaddleOCR 引擎只在推理进程中加载，
+模型权重的副本数等于推理进程数，不随API进程数增加。推理进程与API进程通过相同的路径访问上传文件，
+因此 `ocr` 模式单独部署时需要共享上传目录。
+
+开启 UPLOAD_MIGRATE_ON_STARTUP 时，旧文件迁移只在本进程中执行一次（先补建索引，再在后台迁移），
+API进程不再重复执行。
+
+关闭时（SIGINT/SIGTERM）先由uvicorn排空API进程中的请求，再通知推理进程处理完已领取的任务后退出。
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+from typing import Dict, List
+
+from app.core.config import settings
+from app.utils.logger import logging
+
+
+def api_environment() -> Dict[str, str]:
+    """API进程的环境变量：推理交给独立推理进程，自身不加载引擎"""
+    return {
+        "OCR_INFERENCE_MODE": "remote",
+        "OCR_POOL_WORKERS": "0",
+        # 旧文件迁移由主进程在启动API进程之前执行一次
+        "UPLOAD_MIGRATE_ON_STARTUP": "false",
+    }
+
+
+def _inference_process_main(index: int) -> None:
+    """推理进程入口（spawn启动，在子进程中重新读取配置）"""
+    from app.services.ocr_remote import run_inference_worker
+
+    logging.info(f"OCR推理进程 {index} 启动: pid={os.getpid()}")
+    sys.exit(run_inference_worker(ignore_sigint=True))
+
+
+def start_inference_processes(count: int) -> List[multiprocessing.Process]:
+    """
+    启动独立的OCR推理进程
+
+    Args:
+        count: 进程数
+
+    Returns:
+        进程列表
+    """
+    # 使用spawn避免fork时复制推理框架的线程状态
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for i in range(count):
+        process = context.Process(target=_inference_process_main, args=(i,), name=f"ocr-inference-{i}")
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def stop_inference_processes(processes: List[multiprocessing.Process], timeout: float) -> None:
+    """
+    通知推理进程退出并等待其处理完进行中的任务，超时后强制结束
+
+    Args:
+        processes: 推理进程列表
+        timeout: 等待秒数
+    """
+    for process in processes:
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+    for process in processes:
+        process.join(timeout)
+        if process.is_alive():
+            logging.warning(f"OCR推理进程未在 {timeout}s 内退出，强制结束: pid={process.pid}")
+            process.kill()
+            process.join()
+
+
+def run_api(workers: int, host: str, port: int) -> None:
+    """启动API进程（uvicorn多进程模式）"""
+    import uvicorn
+
+    # uvicorn以spawn方式启动子进程，子进程通过环境变量读取配置
+    os.environ.update(api_environment())
+    uvicorn.run(
+        "main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT,
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="生产环境启动器")
+    parser.add_argument("role", nargs="?", choices=["all", "api", "ocr"], default="all", help="启动的进程类型")
+    parser.add_argument("--workers", type=int, default=settings.WORKERS, help="API进程数")
+    parser.add_argument("--ocr-processes", type=int, default=settings.OCR_PROCESSES, help="OCR推理进程数")
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    args = parser.parse_args(argv)
+
+    if not settings.REDIS_URL:
+        print("多进程部署需要配置REDIS_URL（推理任务和异步任务通过Redis在进程间分发）", file=sys.stderr)
+        return 2
+
+    if args.role == "ocr":
+        from app.services.ocr_remote import run_inference_worker
+        return run_inference_worker()
+
+    if settings.UPLOAD_MIGRATE_ON_STARTUP:
+        from app.db.base import engine
+        from app.services.upload_maintenance import start_legacy_migration
+        start_legacy_migration(engine)
+
+    processes = []
+    if args.role == "all":
+        processes = start_inference_processes(max(1, args.ocr_processes))
+        logging.info(f"已启动 {len(processes)} 个OCR推理进程")
+
+    try:
+        run_api(max(1, args.workers), args.host, args.port)
+    finally:
+        # API进程已排空请求后再停止推理进程
+        stop_inference_processes(processes, settings.GRACEFUL_TIMEOUT)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
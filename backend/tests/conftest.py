@@ -8,6 +8,13 @@ from app.db.base import Base, get_db
 from app.core.config import settings
 from main import app
 
+# 测试中不在启动时预加载OCR引擎和工作进程
+settings.OCR_PRELOAD_ENGINES = False
+# 上传后不在后台生成派生图（后台任务可能在测试修改的上传目录恢复之后才执行），需要的测试单独开启
+settings.UPLOAD_DERIVATIVES_ON_UPLOAD = False
+# 启动时不迁移开发数据库中的旧上传文件，需要的测试直接调用 UploadMaintenance
+settings.UPLOAD_MIGRATE_ON_STARTUP = False
+
 # 预先初始化bcrypt以避免测试时的初始化问题
 from passlib.context import CryptContext
 _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -55,6 +62,23 @@ def client(db_session):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """把上传目录指向临时目录"""
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def register_user(client, name="testuser"):
+    """注册用户并返回认证请求头"""
+    response = client.post("/api/v1/auth/register", json={
+        "username": name,
+        "email": f"{name}@example.com",
+        "password": "Test123!"
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
 @pytest.fixture
 def sample_user_data():
     """示例用户数据"""
@@ -0,0 +1,147 @@
+"""内容寻址存储单元测试"""
+import hashlib
+import os
+from io import BytesIO
+import pytest
+from PIL import Image
+from app.core.config import settings
+from app.models.upload import FileBlob, UploadedFile
+from app.services.blob_store import BlobStore
+from app.utils.file_handler import FileManager
+from tests.conftest import TestingSessionLocal, register_user
+
+
+def _image_bytes(color):
+    buffer = BytesIO()
+    Image.new("RGB", (64, 64), color=color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.unit
+def test_same_content_stored_once_with_refcount(client, db_session, upload_dir):
+    """测试不同用户上传相同内容只保存一份，全部删除后才删除磁盘文件"""
+    content = _image_bytes("teal")
+    headers = [register_user(client, "alice"), register_user(client, "bob")]
+
+    uploads = [
+        client.post("/api/v1/upload/file", files={"file": ("note.png", BytesIO(content), "image/png")}, headers=h)
+        for h in headers
+    ]
+    assert [u.status_code for u in uploads] == [201, 201]
+    file_path = uploads[0].json()["file_path"]
+    assert uploads[1].json()["file_path"] == file_path
+
+    file_hash = FileManager.calculate_bytes_hash(content)
+    assert file_path.endswith(os.path.join(file_hash[:2], file_hash[2:4], f"{file_hash}.png"))
+    assert db_session.query(FileBlob).filter(FileBlob.file_hash == file_hash).one().ref_count == 2
+    assert not os.listdir(upload_dir / "tmp")
+
+    client.delete(f"/api/v1/upload/file/{uploads[0].json()['file_id']}", headers=headers[0])
+    assert os.path.exists(file_path)
+
+    client.delete(f"/api/v1/upload/file/{uploads[1].json()['file_id']}", headers=headers[1])
+    assert not os.path.exists(file_path)
+    db_session.expire_all()
+    assert db_session.query(FileBlob).count() == 0
+
+
+def _prove(content, challenge):
+    """按预检挑战计算持有证明"""
+    offset, length = challenge["offset"], challenge["length"]
+    digest = hashlib.blake2b(bytes.fromhex(challenge["nonce"]), digest_size=16)
+    digest.update(content[offset:offset + length])
+    return dict(challenge=challenge["challenge"], proof=digest.hexdigest())
+
+
+@pytest.mark.unit
+def test_precheck_skips_upload_when_content_exists(client, db_session, upload_dir, monkeypatch):
+    """测试证明持有文件内容且预检命中时，无需上传即可创建上传记录"""
+    monkeypatch.setattr(settings, "UPLOAD_PRECHECK_CHALLENGE_BYTES", 64)
+    content = _image_bytes("olive")
+    file_hash = FileManager.calculate_bytes_hash(content)
+    alice, bob, eve = register_user(client, "alice"), register_user(client, "bob"), register_user(client, "eve")
+    precheck = {
+        "file_hash": file_hash,
+        "file_size": len(content),
+        "filename": "scan.png",
+        "content_type": "image/png"
+    }
+
+    challenge = client.post("/api/v1/upload/precheck", json=precheck, headers=bob)
+    assert challenge.status_code == 200 and challenge.json()["length"] == 64
+    before = client.post("/api/v1/upload/precheck", json=dict(precheck, **_prove(content, challenge.json())), headers=bob)
+    assert before.status_code == 404
+
+    upload = client.post("/api/v1/upload/file", files={"file": ("scan.png", BytesIO(content), "image/png")}, headers=alice)
+    assert upload.status_code == 201
+
+    # 只有上传过相同内容的用户能查到，其他用户的查询和第一步预检结果与内容不存在时相同
+    assert client.head(f"/api/v1/upload/blob/{file_hash}", headers=alice).status_code == 200
+    assert client.head(f"/api/v1/upload/blob/{file_hash}", headers=bob).status_code == 404
+    challenge = client.post("/api/v1/upload/precheck", json=precheck, headers=eve)
+    assert challenge.status_code == 200
+
+    # 只知道哈希和大小不能取得文件
+    guessed = dict(precheck, challenge=challenge.json()["challenge"], proof=file_hash)
+    assert client.post("/api/v1/upload/precheck", json=guessed, headers=eve).status_code == 404
+    # 挑战令牌绑定用户，不能转给其他用户使用
+    proof = _prove(content, challenge.json())
+    assert client.post("/api/v1/upload/precheck", json=dict(precheck, **proof), headers=bob).status_code == 400
+    assert client.post("/api/v1/upload/precheck", json=dict(precheck, challenge="x", proof="y"), headers=bob).status_code == 400
+
+    challenge = client.post("/api/v1/upload/precheck", json=precheck, headers=bob).json()
+    mismatched = dict(precheck, file_size=1, **_prove(content, challenge))
+    assert client.post("/api/v1/upload/precheck", json=mismatched, headers=bob).status_code == 400
+
+    response = client.post("/api/v1/upload/precheck", json=dict(precheck, **_prove(content, challenge)), headers=bob)
+    assert response.status_code == 201
+    assert response.json()["file_path"] == upload.json()["file_path"]
+    assert db_session.query(FileBlob).one().ref_count == 2
+    assert client.head(f"/api/v1/upload/blob/{file_hash}", headers=bob).status_code == 200
+
+    # 已有相同文件的用户再次预检返回冲突
+    assert client.post("/api/v1/upload/precheck", json=precheck, headers=alice).status_code == 409
+
+
+@pytest.mark.unit
+def test_concurrent_first_upload_increments_existing_blob(db_session, upload_dir, monkeypatch):
+    """测试另一个请求抢先插入了相同哈希的存储记录时，改为原子地增加其引用计数"""
+    content = _image_bytes("navy")
+    file_hash = FileManager.calculate_bytes_hash(content)
+    blob_store = BlobStore()
+    put_file = blob_store.storage.put_file
+
+    def racing_put_file(key, path):
+        stored = put_file(key, path)
+        other = TestingSessionLocal()
+        other.add(FileBlob(file_hash=file_hash, file_path=stored, file_size=len(content), ref_count=1))
+        other.commit()
+        other.close()
+        return stored
+
+    monkeypatch.setattr(blob_store.storage, "put_file", racing_put_file)
+    temp_path, size = blob_store.file_manager.save_bytes(content, "tmp/race")
+    blob = blob_store.add(db_session, temp_path, size, file_hash, ".png")
+    db_session.commit()
+    assert blob.ref_count == 2
+    assert db_session.query(FileBlob).one().ref_count == 2
+
+
+@pytest.mark.unit
+def test_failed_delete_keeps_file(client, db_session, upload_dir, monkeypatch):
+    """测试删除上传记录的事务提交失败时回滚，不删除物理文件"""
+    headers = register_user(client, "alice")
+    content = _image_bytes("maroon")
+    upload = client.post("/api/v1/upload/file", files={"file": ("a.png", BytesIO(content), "image/png")}, headers=headers)
+    file_id, file_path = upload.json()["file_id"], upload.json()["file_path"]
+
+    def failing_commit():
+        raise RuntimeError("数据库不可用")
+
+    monkeypatch.setattr(db_session, "commit", failing_commit)
+    assert client.delete(f"/api/v1/upload/file/{file_id}", headers=headers).status_code == 500
+    monkeypatch.undo()
+
+    assert os.path.exists(file_path)
+    assert db_session.query(UploadedFile).filter(UploadedFile.id == file_id).count() == 1
+    assert db_session.query(FileBlob).one().ref_count == 1
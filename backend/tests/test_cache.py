@@ -0,0 +1,182 @@
+"""结果缓存单元测试"""
+import asyncio
+import pytest
+from app.core.config import settings
+from app.utils.cache import TieredCache
+from app.services.classification_cache import ClassificationCache
+from app.services.classification_service import ClassificationService
+from app.services.llm_gateway import MicroBatcher
+from app.services.ocr_cache import OCRResultCache
+
+
+@pytest.mark.unit
+def test_tiered_cache_hit_and_miss():
+    """测试缓存命中与未命中统计"""
+    cache = TieredCache("test", max_entries=10, use_redis=False)
+    
+    assert cache.get("a") is None
+    cache.set("a", {"text": "你好"})
+    assert cache.get("a") == {"text": "你好"}
+    
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["redis_enabled"] is False
+
+
+@pytest.mark.unit
+def test_tiered_cache_lru_eviction():
+    """测试超出容量时淘汰最久未使用的条目"""
+    cache = TieredCache("test", max_entries=2, use_redis=False)
+    
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # a 变为最近使用
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+@pytest.mark.unit
+def test_tiered_cache_ttl_expiry(monkeypatch):
+    """测试过期条目不会被返回"""
+    import app.utils.cache as cache_module
+    
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    
+    cache = TieredCache("test", max_entries=10, ttl_seconds=60, use_redis=False)
+    cache.set("a", 1)
+    now[0] += 59
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+
+
+@pytest.mark.unit
+def test_tiered_cache_returns_copies():
+    """测试修改取出的值不会影响缓存内容"""
+    cache = TieredCache("test", max_entries=10, use_redis=False)
+    cache.set("a", {"details": [1, 2]})
+    
+    value = cache.get("a")
+    value["details"].append(3)
+    
+    assert cache.get("a") == {"details": [1, 2]}
+
+
+@pytest.mark.unit
+def test_ocr_cache_key_includes_lang_and_model_version():
+    """测试OCR缓存键区分语言和模型版本"""
+    backend = TieredCache("ocr-test", max_entries=10, use_redis=False)
+    cache_v1 = OCRResultCache(backend, lang="ch", model_version="v1")
+    cache_v2 = OCRResultCache(backend, lang="ch", model_version="v2")
+    
+    result = {"success": True, "text": "测试", "details": [], "error": None}
+    cache_v1.set("abc", result)
+    
+    assert cache_v1.get("abc") == result
+    assert cache_v2.get("abc") is None
+
+
+@pytest.mark.unit
+def test_ocr_cache_key_includes_recognition_options(monkeypatch):
+    """测试OCR缓存键区分分块方式以及预处理、级联识别的配置"""
+    cache = OCRResultCache(TieredCache("ocr-test", max_entries=10, use_redis=False), lang="ch", model_version="v1")
+    result = {"success": True, "text": "测试", "details": [], "error": None}
+    monkeypatch.setattr(settings, "OCR_TILE_MIN_SIDE", 0)
+    cache.set("abc", result)
+
+    assert cache.get("abc") == result
+    assert cache.get("abc", tiled=False) == result
+    assert cache.get("abc", tiled=True) is None
+
+    for name, value in [
+        ("OCR_MAX_SIDE", 1024),
+        ("OCR_PREPROCESS_ENABLED", False),
+        ("OCR_CASCADE_THRESHOLD", 0.5),
+        ("OCR_CASCADE_ENABLED", False),
+        ("OCR_TILE_MIN_SIDE", 4000)
+    ]:
+        monkeypatch.setattr(settings, name, value)
+        assert cache.get("abc") is None, name
+
+    # 不分块时分块参数不影响缓存键
+    monkeypatch.setattr(settings, "OCR_TILE_MIN_SIDE", 0)
+    cache.set("abc", result)
+    monkeypatch.setattr(settings, "OCR_TILE_SIZE", 640)
+    assert cache.get("abc") == result
+
+
+@pytest.mark.unit
+def test_ocr_cache_skips_failed_results_and_missing_hash():
+    """测试失败的识别结果和没有哈希的文件不会被缓存"""
+    cache = OCRResultCache(TieredCache("ocr-test", use_redis=False), lang="ch", model_version="v1")
+    
+    cache.set("abc", {"success": False, "text": "", "details": [], "error": "失败"})
+    cache.set(None, {"success": True, "text": "x", "details": [], "error": None})
+    
+    assert cache.get("abc") is None
+    assert cache.get(None) is None
+
+
+@pytest.mark.unit
+def test_ocr_cache_disabled():
+    """测试禁用缓存时不读写"""
+    cache = OCRResultCache(
+        TieredCache("ocr-test", use_redis=False), lang="ch", model_version="v1", enabled=False
+    )
+    
+    cache.set("abc", {"success": True, "text": "x", "details": [], "error": None})
+    assert cache.get("abc") is None
+
+
+@pytest.mark.unit
+def test_classification_cache_key_normalizes_text():
+    """测试分类缓存键忽略全角半角、空白和大小写差异，区分提示词版本和模型"""
+    backend = TieredCache("classify-test", max_entries=10, use_redis=False)
+    cache = ClassificationCache(backend, prompt_version="1", model="qwen")
+
+    cache.set("  Team：Meeting\n明天 ", {"type": "schedule", "confidence": 0.9, "extracted_data": {"date": "x"}})
+    assert cache.get("team:meeting 明天") == {"type": "schedule", "confidence": 0.9}
+    assert ClassificationCache(backend, prompt_version="2", model="qwen").get("team:meeting 明天") is None
+    assert ClassificationCache(backend, prompt_version="1", model="other").get("team:meeting 明天") is None
+
+
+@pytest.mark.unit
+def test_cached_classification_re_resolves_relative_dates(monkeypatch):
+    """测试命中缓存时不再请求LLM，相对日期按读取当天重新解析"""
+    import datetime as datetime_module
+
+    class FakeDatetime(datetime_module.datetime):
+        today_value = datetime_module.datetime(2024, 3, 1)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.today_value
+
+    monkeypatch.setattr(datetime_module, "datetime", FakeDatetime)
+    monkeypatch.setattr(settings, "LLM_ENABLED", True)
+
+    calls = []
+
+    async def classify_batch(texts):
+        calls.append(texts)
+        return [{"type": "schedule", "confidence": 0.8} for _ in texts]
+
+    cache = ClassificationCache(TieredCache("classify-test", use_redis=False), prompt_version="1", model="qwen")
+    service = ClassificationService(cache=cache)
+    service.batcher = MicroBatcher(classify_batch, window=0, max_size=1)
+
+    first = asyncio.run(service.classify_text_with_llm("明天下午2点开会"))
+    FakeDatetime.today_value = datetime_module.datetime(2024, 3, 5)
+    second = asyncio.run(service.classify_text_with_llm(" 明天下午2点开会\n"))
+
+    assert len(calls) == 1
+    assert first["extracted_data"]["date"] == "2024-03-02"
+    assert second["type"] == "schedule" and second["confidence"] == 0.8
+    assert second["extracted_data"]["date"] == "2024-03-06"
+    assert cache.stats()["hits"] == 1
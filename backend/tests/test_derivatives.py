@@ -0,0 +1,91 @@
+"""缩略图和预览图单元测试"""
+from io import BytesIO
+import pytest
+from PIL import Image
+from app.core.config import settings
+from app.services.derivatives import DerivativeStore, schedule_derivatives
+from tests.conftest import register_user
+
+
+def _upload(client, headers, size=(2000, 1500), fmt="JPEG", name="photo.jpg", content_type="image/jpeg"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color="navy").save(buffer, format=fmt)
+    response = client.post(
+        "/api/v1/upload/file",
+        files={"file": (name, BytesIO(buffer.getvalue()), content_type)},
+        headers=headers
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+@pytest.mark.unit
+def test_thumbnail_generated_lazily_with_cache_headers(client, db_session, upload_dir):
+    """测试首次请求时生成WebP缩略图，带ETag和Cache-Control，ETag匹配时返回304"""
+    headers = register_user(client)
+    uploaded = _upload(client, headers)
+    assert uploaded["thumbnail_url"].endswith(f"/upload/file/{uploaded['file_id']}/thumbnail")
+    assert not (upload_dir / DerivativeStore.DERIVATIVE_DIR).exists()
+
+    response = client.get(uploaded["thumbnail_url"], headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert "immutable" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+    thumbnail = Image.open(BytesIO(response.content))
+    assert thumbnail.format == "WEBP"
+    assert thumbnail.size == (settings.UPLOAD_THUMBNAIL_SIZE, settings.UPLOAD_THUMBNAIL_SIZE * 3 // 4)
+
+    cached = client.get(uploaded["thumbnail_url"], headers=dict(headers, **{"If-None-Match": etag}))
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert not cached.content
+
+    preview = client.get(uploaded["preview_url"], headers=headers)
+    assert max(Image.open(BytesIO(preview.content)).size) == settings.UPLOAD_PREVIEW_SIZE
+    assert preview.headers["etag"] != etag
+
+    listed = client.get("/api/v1/upload/files", headers=headers).json()
+    assert listed[0]["preview_url"] == uploaded["preview_url"]
+
+    # 参数校验失败由全局异常处理返回业务错误码
+    invalid = client.get(f"/api/v1/upload/file/{uploaded['file_id']}/original", headers=headers)
+    assert invalid.json()["code"] == 400
+    assert client.get("/api/v1/upload/file/missing/thumbnail", headers=headers).status_code == 404
+
+
+@pytest.mark.unit
+def test_derivatives_generated_on_upload_and_deleted_with_file(client, db_session, upload_dir, monkeypatch):
+    """测试上传后在后台生成派生图，文件删除后派生图一起删除"""
+    monkeypatch.setattr(settings, "UPLOAD_DERIVATIVES_ON_UPLOAD", True)
+    headers = register_user(client)
+    uploaded = _upload(client, headers, size=(300, 600), fmt="PNG", name="tall.png", content_type="image/png")
+
+    from app.models.upload import UploadedFile
+
+    file_hash = db_session.query(UploadedFile).one().file_hash
+    store = DerivativeStore()
+    # 等待后台任务完成（同一文件的任务重复提交时直接返回已生成的图）
+    schedule_derivatives(uploaded["file_path"], file_hash).result(timeout=10)
+    assert store.storage.exists(store.key(file_hash, "thumbnail"))
+    assert store.storage.exists(store.key(file_hash, "preview"))
+    # 小于预览尺寸的图片不放大
+    assert Image.open(store.storage.local_path(store.key(file_hash, "preview"))).size == (300, 600)
+
+    client.delete(f"/api/v1/upload/file/{uploaded['file_id']}", headers=headers)
+    assert not store.storage.exists(store.key(file_hash, "thumbnail"))
+    assert not store.storage.exists(store.key(file_hash, "preview"))
+
+
+@pytest.mark.unit
+def test_document_thumbnail_uses_first_page(upload_dir):
+    """测试多页文档的缩略图取第一页"""
+    path = upload_dir / "scan.tiff"
+    frames = [Image.new("RGB", (400, 200), (shade, shade, shade)) for shade in (10, 200)]
+    frames[0].save(path, save_all=True, append_images=frames[1:])
+
+    store = DerivativeStore()
+    thumbnail = store.ensure(str(path), "ab" * 16, "thumbnail")
+    image = Image.open(store.storage.local_path(thumbnail)).convert("RGB")
+    assert image.size == (256, 128)
+    assert image.getpixel((0, 0))[0] < 50
@@ -0,0 +1,235 @@
+"""多页文档按页识别单元测试"""
+import threading
+import time
+import pytest
+from PIL import Image
+from app.core.config import settings
+from app.services.document_pages import (
+    count_pages,
+    render_page,
+    validate_document,
+    merge_page_results,
+    is_document
+)
+
+
+def _make_tiff(path, shades, size=(200, 120), dpi=None):
+    """生成多帧TIFF，每页为不同灰度的纯色图"""
+    frames = [Image.new("RGB", size, (shade, shade, shade)) for shade in shades]
+    options = {"dpi": (dpi, dpi)} if dpi else {}
+    frames[0].save(path, save_all=True, append_images=frames[1:], **options)
+    return str(path)
+
+
+class _ShadeOCR:
+    """代替PaddleOCR：把页面灰度值作为识别文本返回，并记录同时进行的识别数"""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    def ocr(self, image, cls=True):
+        with self.tracker["lock"]:
+            self.tracker["active"] += 1
+            self.tracker["max_active"] = max(self.tracker["max_active"], self.tracker["active"])
+        time.sleep(0.02)
+        with self.tracker["lock"]:
+            self.tracker["active"] -= 1
+        return [[[[[0, 0], [10, 0], [10, 10], [0, 10]], (f"shade{int(image[0, 0, 0])}", 0.99)]]]
+
+
+def _engine_pool(size):
+    from app.services.ocr_engine_pool import OCREnginePool
+    from app.services.ocr_service import OCRService
+
+    tracker = {"lock": threading.Lock(), "active": 0, "max_active": 0}
+
+    def factory():
+        service = OCRService.__new__(OCRService)
+        service.preprocessor = None
+        service.ocr = service.accurate_ocr = _ShadeOCR(tracker)
+        return service
+
+    pool = OCREnginePool(size, factory=factory)
+    pool.load()
+    return pool, tracker
+
+
+@pytest.mark.unit
+def test_tiff_pages_render_lazily(tmp_path):
+    """测试TIFF按页读取，分辨率高于配置时缩小"""
+    path = _make_tiff(tmp_path / "notes.tiff", [10, 20, 30], size=(400, 200), dpi=400)
+
+    assert is_document(path)
+    assert not is_document(str(tmp_path / "notes.png"))
+    assert count_pages(path) == 3
+
+    page = render_page(path, 2, dpi=200)
+    assert page.mode == "RGB"
+    assert page.size == (200, 100)
+    assert page.getpixel((0, 0)) == (20, 20, 20)
+
+    with pytest.raises(ValueError):
+        render_page(path, 4)
+
+
+@pytest.mark.unit
+def test_validate_document_page_limit(tmp_path, monkeypatch):
+    """测试文档页数超过限制时校验失败"""
+    path = _make_tiff(tmp_path / "long.tif", [0, 50, 100])
+
+    assert validate_document(path) == (True, None)
+    monkeypatch.setattr(settings, "OCR_DOCUMENT_MAX_PAGES", 2)
+    is_valid, error = validate_document(path)
+    assert not is_valid
+    assert "页数" in error
+    assert validate_document(str(tmp_path / "missing.pdf"))[0] is False
+
+
+@pytest.mark.unit
+def test_merge_page_results_keeps_successful_pages():
+    """测试合并各页结果：行带页码，部分页失败时保留成功页"""
+    box = [[0, 0], [1, 0], [1, 1], [0, 1]]
+    merged = merge_page_results({
+        2: {"success": True, "details": [{"text": "第二页", "confidence": 0.9, "box": box}], "tier": "fast"},
+        1: {"success": True, "details": [{"text": "第一页", "confidence": 0.8, "box": box}], "tier": "accurate"},
+        3: {"success": False, "details": [], "error": "坏页"}
+    }, 3)
+
+    assert merged["text"] == "第一页\n第二页"
+    assert [d["page"] for d in merged["details"]] == [1, 2]
+    assert not merged["success"]
+    assert "3" in merged["error"] and "坏页" in merged["error"]
+    assert merged["tier"] == "accurate"
+    assert merged["page_count"] == 3
+    assert [p["success"] for p in merged["pages"]] == [True, True, False]
+
+
+@pytest.mark.unit
+def test_recognize_document_limits_pages_in_flight(tmp_path, monkeypatch):
+    """测试按页并行识别时同时识别的页数不超过配置，结果按页码排列"""
+    from app.services import ocr_pool
+
+    shades = [10, 20, 30, 40, 50, 60]
+    path = _make_tiff(tmp_path / "book.tiff", shades)
+    pool, tracker = _engine_pool(4)
+    monkeypatch.setattr(ocr_pool, "get_ocr_engine_pool", lambda: pool)
+    monkeypatch.setattr(settings, "OCR_INFERENCE_MODE", "local")
+    monkeypatch.setattr(settings, "OCR_PAGE_CONCURRENCY", 2)
+
+    progress = []
+    result = ocr_pool.recognize_document(path, on_page=lambda done, total: progress.append((done, total)))
+
+    assert result["success"]
+    assert result["page_count"] == len(shades)
+    assert result["text"].split("\n") == [f"shade{s}" for s in shades]
+    assert [d["page"] for d in result["details"]] == list(range(1, len(shades) + 1))
+    assert tracker["max_active"] == 2
+    assert progress[-1] == (len(shades), len(shades))
+
+
+@pytest.mark.unit
+def test_document_upload_recognize_and_read_pages(client, db_session, tmp_path, monkeypatch):
+    """测试上传TIFF文档、识别后按页读取结果"""
+    from app.services import ocr_pool
+
+    pool, _ = _engine_pool(2)
+    monkeypatch.setattr(ocr_pool, "get_ocr_engine_pool", lambda: pool)
+    monkeypatch.setattr(settings, "OCR_INFERENCE_MODE", "local")
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+
+    register_response = client.post("/api/v1/auth/register", json={
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    })
+    headers = {"Authorization": f"Bearer {register_response.json()['access_token']}"}
+
+    path = _make_tiff(tmp_path / "scan.tiff", [70, 80, 90])
+    with open(path, "rb") as f:
+        upload = client.post(
+            "/api/v1/upload/file",
+            files={"file": ("scan.tiff", f, "image/tiff")},
+            headers=headers
+        )
+    assert upload.status_code == 201
+    file_id = upload.json()["file_id"]
+
+    response = client.post("/api/v1/ocr/recognize", json={"file_id": file_id}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["page_count"] == 3
+    assert response.json()["text"] == "shade70\nshade80\nshade90"
+
+    pages = client.get(f"/api/v1/ocr/result/{file_id}/pages", headers=headers)
+    assert pages.status_code == 200
+    assert [p["text"] for p in pages.json()] == ["shade70", "shade80", "shade90"]
+
+    page = client.get(f"/api/v1/ocr/result/{file_id}/pages/2", headers=headers)
+    assert page.status_code == 200
+    assert page.json()["details"][0]["page"] == 2
+
+    missing = client.get(f"/api/v1/ocr/result/{file_id}/pages/9", headers=headers)
+    assert missing.status_code == 404
+
+
+
+@pytest.mark.unit
+def test_document_retry_reuses_successful_pages(client, db_session, tmp_path, monkeypatch):
+    """测试部分页失败后重新识别只识别失败的页，已保存的结果读取时每行保留页码"""
+    from app.services import ocr_pool
+
+    pool, _ = _engine_pool(1)
+    monkeypatch.setattr(ocr_pool, "get_ocr_engine_pool", lambda: pool)
+    monkeypatch.setattr(settings, "OCR_INFERENCE_MODE", "local")
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+
+    # 第二页（灰度80）第一次识别失败
+    recognized = []
+    broken = {80}
+    shade_ocr = _ShadeOCR.ocr
+
+    def flaky_ocr(self, image, cls=True):
+        shade = int(image[0, 0, 0])
+        recognized.append(shade)
+        if shade in broken:
+            raise RuntimeError("坏页")
+        return shade_ocr(self, image, cls)
+
+    monkeypatch.setattr(_ShadeOCR, "ocr", flaky_ocr)
+
+    register_response = client.post("/api/v1/auth/register", json={
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    })
+    headers = {"Authorization": f"Bearer {register_response.json()['access_token']}"}
+
+    path = _make_tiff(tmp_path / "scan.tiff", [75, 80, 95])
+    with open(path, "rb") as f:
+        upload = client.post(
+            "/api/v1/upload/file",
+            files={"file": ("scan.tiff", f, "image/tiff")},
+            headers=headers
+        )
+    file_id = upload.json()["file_id"]
+
+    first = client.post("/api/v1/ocr/recognize", json={"file_id": file_id}, headers=headers)
+    assert first.json()["success"] is False
+    assert client.get(f"/api/v1/ocr/result/{file_id}", headers=headers).status_code == 404
+
+    broken.clear()
+    recognized.clear()
+    second = client.post("/api/v1/ocr/recognize", json={"file_id": file_id}, headers=headers)
+    assert second.json()["success"] is True
+    assert second.json()["text"] == "shade75\nshade80\nshade95"
+    assert set(recognized) == {80}
+
+    stored = client.get(f"/api/v1/ocr/result/{file_id}", headers=headers)
+    assert stored.status_code == 200
+    assert [d["page"] for d in stored.json()["details"]] == [1, 2, 3]
+
+    # 已保存的结果直接返回，同样带页码
+    recognized.clear()
+    third = client.post("/api/v1/ocr/recognize", json={"file_id": file_id}, headers=headers)
+    assert recognized == []
+    assert third.json()["page_count"] == 3
+    assert [d["page"] for d in third.json()["details"]] == [1, 2, 3]
@@ -0,0 +1,205 @@
+"""专用线程池单元测试"""
+import asyncio
+import json
+import threading
+import time
+import pytest
+from app.services.executors import MeteredExecutor
+
+
+@pytest.mark.unit
+def test_metered_executor_bounds_concurrency_and_records_stats():
+    """测试线程池同时运行的任务数不超过大小，排队和完成情况计入统计"""
+    executor = MeteredExecutor("test", max_workers=2)
+    lock = threading.Lock()
+    tracker = {"active": 0, "max_active": 0}
+
+    def work(value):
+        with lock:
+            tracker["active"] += 1
+            tracker["max_active"] = max(tracker["max_active"], tracker["active"])
+        time.sleep(0.02)
+        with lock:
+            tracker["active"] -= 1
+        return value * 2
+
+    def fail():
+        raise ValueError("坏任务")
+
+    async def run_all():
+        results = await asyncio.gather(*(executor.run(work, i) for i in range(6)))
+        with pytest.raises(ValueError):
+            await executor.run(fail)
+        return results
+
+    try:
+        assert asyncio.run(run_all()) == [i * 2 for i in range(6)]
+        stats = executor.stats()
+    finally:
+        executor.shutdown()
+
+    assert tracker["max_active"] == 2
+    assert stats["size"] == 2
+    assert stats["submitted"] == stats["completed"] == 7
+    assert stats["failed"] == 1
+    assert stats["active"] == stats["queued"] == 0
+    # 6个任务在2个线程上运行，后面的任务至少排队一轮
+    assert stats["wait_ms_max"] >= 15
+
+
+@pytest.mark.unit
+def test_engine_stats_expose_executor_sizes(client, monkeypatch):
+    """测试OCR统计接口返回各线程池的大小"""
+    from app.core.config import settings
+
+    register_response = client.post("/api/v1/auth/register", json={
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    })
+    headers = {"Authorization": f"Bearer {register_response.json()['access_token']}"}
+
+    response = client.get("/api/v1/ocr/engines/stats", headers=headers)
+    assert response.status_code == 200
+    executors = response.json()["executors"]
+    assert executors["inference"]["size"] == settings.OCR_INFERENCE_THREADS
+    assert executors["io"]["size"] == settings.UPLOAD_IO_THREADS
+    assert executors["default"]["size"] > 0
+
+
+@pytest.mark.unit
+def test_batch_stream_waits_on_inference_executor(client, db_session, tmp_path, monkeypatch):
+    """测试批量识别的结果流在推理线程池中等待识别结果"""
+    from io import BytesIO
+    from PIL import Image
+    from app.api import ocr as ocr_api
+    from app.core.config import settings
+    from app.services.executors import get_inference_executor
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    register_response = client.post("/api/v1/auth/register", json={
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    })
+    headers = {"Authorization": f"Bearer {register_response.json()['access_token']}"}
+
+    file_ids = []
+    for color in ("red", "blue"):
+        buffer = BytesIO()
+        Image.new("RGB", (64, 64), color=color).save(buffer, format="PNG")
+        upload = client.post(
+            "/api/v1/upload/file",
+            files={"file": (f"{color}.png", BytesIO(buffer.getvalue()), "image/png")},
+            headers=headers
+        )
+        file_ids.append(upload.json()["file_id"])
+
+    threads = []
+
+    class FakePool:
+        def recognize_many(self, image_paths):
+            for file_id in image_paths:
+                threads.append(threading.current_thread().name)
+                yield file_id, {"success": True, "text": file_id, "details": []}
+
+    monkeypatch.setattr(ocr_api, "get_ocr_pool", lambda: FakePool())
+    submitted = get_inference_executor().stats()["submitted"]
+
+    response = client.post("/api/v1/ocr/recognize/batch", json={"file_ids": file_ids}, headers=headers)
+    assert response.status_code == 200
+    items = [json.loads(line) for line in response.text.splitlines() if line]
+    assert sorted(item["file_id"] for item in items) == sorted(file_ids)
+    assert all(name.startswith("ocr-inference-wait") for name in threads)
+    # 两个结果加上结束时的一次取值
+    assert get_inference_executor().stats()["submitted"] - submitted == 3
+
+
+@pytest.mark.unit
+def test_batch_stream_finishes_in_background_after_disconnect(client, db_session, tmp_path, monkeypatch):
+    """测试客户端中途断开后，已提交的图片结果仍在后台保存，未开始识别的文件不会停留在 processing"""
+    from io import BytesIO
+    from PIL import Image
+    from app.api import ocr as ocr_api
+    from app.core.config import settings
+    from app.models.ocr import OCRResult
+    from app.models.upload import UploadedFile
+    from app.models.user import User
+    from app.schemas.ocr import OCRBatchRecognizeRequest
+    from app.services.ocr_cache import get_ocr_cache
+    from tests.conftest import TestingSessionLocal
+
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(ocr_api, "SessionLocal", TestingSessionLocal)
+    register_response = client.post("/api/v1/auth/register", json={
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    })
+    headers = {"Authorization": f"Bearer {register_response.json()['access_token']}"}
+    user = db_session.query(User).one()
+
+    file_ids = []
+    for color in ("olive", "teal"):
+        buffer = BytesIO()
+        Image.new("RGB", (64, 64), color=color).save(buffer, format="PNG")
+        upload = client.post(
+            "/api/v1/upload/file",
+            files={"file": (f"{color}.png", BytesIO(buffer.getvalue()), "image/png")},
+            headers=headers
+        )
+        file_ids.append(upload.json()["file_id"])
+
+    recognized = []
+
+    class FakePool:
+        def recognize_many(self, image_paths):
+            for file_id in image_paths:
+                recognized.append(file_id)
+                yield file_id, {"success": True, "text": f"后台{file_id}", "details": []}
+
+    monkeypatch.setattr(ocr_api, "get_ocr_pool", lambda: FakePool())
+    request = OCRBatchRecognizeRequest(file_ids=["missing"] + file_ids)
+
+    def statuses():
+        db = TestingSessionLocal()
+        try:
+            return {f.id: f.status for f in db.query(UploadedFile).filter(UploadedFile.id.in_(file_ids))}
+        finally:
+            db.close()
+
+    def wait_for(expected):
+        deadline = time.monotonic() + 5
+        while statuses() != expected and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return statuses()
+
+    async def read_then_disconnect(lines):
+        response = await ocr_api.recognize_images_batch(request, current_user=user, db=db_session)
+        first = [await response.body_iterator.__anext__() for _ in range(lines)]
+        await response.body_iterator.aclose()
+        return first
+
+    # 只读到被拒绝的文件就断开：图片还未开始识别，恢复为 uploaded
+    lines = asyncio.run(read_then_disconnect(1))
+    assert json.loads(lines[0])["file_id"] == "missing"
+    assert wait_for({file_id: "uploaded" for file_id in file_ids}) == {file_id: "uploaded" for file_id in file_ids}
+    assert recognized == []
+
+    # 读到第一张图片的结果后断开：第二张图片的结果在后台保存并缓存
+    lines = asyncio.run(read_then_disconnect(2))
+    assert wait_for({file_id: "processed" for file_id in file_ids}) == {file_id: "processed" for file_id in file_ids}
+    last = recognized[-1]
+    assert json.loads(lines[1])["file_id"] != last
+    db = TestingSessionLocal()
+    try:
+        assert db.query(OCRResult).filter(OCRResult.file_id == last).one().text == f"后台{last}"
+        file_hash = db.get(UploadedFile, last).file_hash
+    finally:
+        db.close()
+    ocr_cache = get_ocr_cache()
+    try:
+        assert ocr_cache.get(file_hash)["text"] == f"后台{last}"
+    finally:
+        for file_id in file_ids:
+            ocr_cache.cache.delete(ocr_cache.make_key(db_session.get(UploadedFile, file_id).file_hash))
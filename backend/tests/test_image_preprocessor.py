@@ -0,0 +1,120 @@
+"""图片预处理单元测试"""
+import pytest
+from io import BytesIO
+from PIL import Image, ImageDraw
+from app.services.image_preprocessor import ImagePreprocessor
+
+
+def _jpeg_bytes(img: Image.Image, **save_kwargs) -> bytes:
+    buffer = BytesIO()
+    img.save(buffer, format='JPEG', **save_kwargs)
+    return buffer.getvalue()
+
+
+@pytest.mark.unit
+def test_preprocess_downscales_long_side():
+    """测试长边超过限制时按比例缩小"""
+    content = _jpeg_bytes(Image.new('RGB', (4000, 3000), color='white'))
+    
+    result = ImagePreprocessor(max_side=1000).process(content)
+    
+    assert result.image.shape == (750, 1000, 3)
+    assert result.scale == pytest.approx(0.25)
+    assert result.original_size == (4000, 3000)
+    assert set(result.timings) == {"decode", "resize", "convert"}
+
+
+@pytest.mark.unit
+def test_preprocess_keeps_small_images():
+    """测试小图不缩放"""
+    content = _jpeg_bytes(Image.new('RGB', (300, 200), color='white'))
+    
+    result = ImagePreprocessor(max_side=1000).process(content)
+    
+    assert result.image.shape == (200, 300, 3)
+    assert result.scale == 1.0
+
+
+@pytest.mark.unit
+def test_preprocess_fixes_exif_orientation():
+    """测试按EXIF方向旋转图片（方向6表示需要顺时针旋转90度）"""
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    content = _jpeg_bytes(Image.new('RGB', (400, 200), color='white'), exif=exif)
+    
+    result = ImagePreprocessor().process(content)
+    
+    assert result.original_size == (200, 400)
+    assert result.image.shape[:2] == (400, 200)
+
+
+@pytest.mark.unit
+def test_preprocess_grayscale():
+    """测试灰度化输出单通道图片"""
+    content = _jpeg_bytes(Image.new('RGB', (300, 200), color='white'))
+    
+    result = ImagePreprocessor(grayscale=True).process(content)
+    
+    assert result.image.ndim == 2
+
+
+@pytest.mark.unit
+def test_preprocess_boxes_map_back_to_original():
+    """测试缩放和纠偏后的文本框能映射回原图坐标"""
+    import cv2
+    
+    img = Image.new('L', (1600, 1200), 255)
+    draw = ImageDraw.Draw(img)
+    for i in range(8):
+        draw.rectangle([200, 160 + i * 110, 1400, 200 + i * 110], fill=0)
+    content = _jpeg_bytes(img.rotate(6, fillcolor=255))
+    
+    result = ImagePreprocessor(max_side=800, grayscale=True, deskew=True).process(content)
+    assert result.inverse_rotation is not None
+    assert "deskew" in result.timings
+    
+    # 处理后图片中心对应原图中心
+    height, width = result.image.shape
+    center = result.to_original([[width / 2, height / 2]] * 4)
+    assert center[0][0] == pytest.approx(800, abs=1)
+    assert center[0][1] == pytest.approx(600, abs=1)
+    
+    # 纠偏后文本行接近水平
+    _, binary = cv2.threshold(result.image, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    angle = cv2.minAreaRect(cv2.findNonZero(binary))[-1] % 90
+    assert min(angle, 90 - angle) < 1.0
+
+
+@pytest.mark.unit
+def test_preprocess_contrast_normalization():
+    """测试对比度归一化拉开低对比度图片的灰度范围"""
+    img = Image.new('L', (200, 200), 120)
+    ImageDraw.Draw(img).rectangle([50, 50, 150, 150], fill=135)
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    
+    result = ImagePreprocessor(grayscale=True, normalize_contrast=True).process(buffer.getvalue())
+    
+    assert int(result.image.max()) - int(result.image.min()) > 15
+
+
+@pytest.mark.unit
+def test_preprocess_region_crops_before_resize():
+    """测试只处理识别区域，缩放按区域尺寸计算，坐标映射回原图"""
+    content = _jpeg_bytes(Image.new('RGB', (4000, 3000), color='white'))
+    
+    result = ImagePreprocessor(max_side=1000).process(content, region=(1000, 500, 2000, 1000))
+    
+    assert result.image.shape == (500, 1000, 3)
+    assert result.scale == pytest.approx(0.5)
+    assert result.offset == (1000, 500)
+    assert result.to_original([[0, 0], [1000, 500]]) == [[1000.0, 500.0], [3000.0, 1500.0]]
+
+
+@pytest.mark.unit
+def test_preprocess_region_outside_image():
+    """测试识别区域与图片没有交集"""
+    content = _jpeg_bytes(Image.new('RGB', (300, 200), color='white'))
+    
+    with pytest.raises(ValueError):
+        ImagePreprocessor().process(content, region=(400, 0, 100, 100))
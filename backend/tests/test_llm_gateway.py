@@ -0,0 +1,187 @@
+"""LLM网关单元测试"""
+import asyncio
+import json
+import httpx
+import pytest
+from app.core.config import settings
+from app.services.classification_cache import ClassificationCache
+from app.services.classification_service import ClassificationService
+from app.services.llm_gateway import AdaptiveTimeout, CircuitBreaker, LLMGateway
+from app.services.local_classifier import LocalClassifierService
+from app.utils.cache import TieredCache
+
+
+class _FakeLLM:
+    """chat/completions 接口替身：单条请求返回一个JSON对象，批量请求按 index 逐条返回"""
+
+    def __init__(self, delay=0.0, status_code=200):
+        self.delay = delay
+        self.status_code = status_code
+        self.batches = []
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, request):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if self.status_code != 200:
+            return httpx.Response(self.status_code)
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        if "文本列表（JSON数组）" in prompt:
+            entries = json.loads(prompt.split("文本列表（JSON数组）：\n")[1].split("\n\n请以JSON数组")[0])
+            self.batches.append([entry["text"] for entry in entries])
+            content = json.dumps([self._classify(entry["text"], entry["index"]) for entry in entries])
+        else:
+            text = prompt.split("文本内容：\n")[1].split("\n\n请以JSON格式")[0]
+            self.batches.append([text])
+            content = "```json\n" + json.dumps(self._classify(text)) + "\n```"
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    @staticmethod
+    def _classify(text, index=None):
+        result = {"type": "schedule" if "开会" in text else "memo", "confidence": 0.9}
+        if index is not None:
+            result["index"] = index
+        return result
+
+
+def _service(server, monkeypatch, window_ms=50, batch_size=4, cache=None, **gateway_options):
+    monkeypatch.setattr(settings, "LLM_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_BATCH_WINDOW_MS", window_ms)
+    monkeypatch.setattr(settings, "LLM_BATCH_MAX_SIZE", batch_size)
+    gateway = LLMGateway("http://llm.test/v1/chat/completions", "test-model",
+                         transport=httpx.MockTransport(server), **gateway_options)
+    if cache is None:
+        cache = ClassificationCache(TieredCache("classify-test", use_redis=False), "1", "test-model", enabled=False)
+    return ClassificationService(gateway=gateway, cache=cache, local=LocalClassifierService("", enabled=False))
+
+
+@pytest.mark.unit
+def test_circuit_breaker_opens_and_probes():
+    """测试连续失败后熔断，冷却后只放行一个探测请求，探测成功后恢复"""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+@pytest.mark.unit
+def test_adaptive_timeout_follows_latency():
+    """测试超时随响应时间收敛，超时后加倍，并限制在上下限之间"""
+    timeout = AdaptiveTimeout(initial=10, minimum=0.5, maximum=30)
+    assert timeout.value == 10
+    for _ in range(50):
+        timeout.observe(1.0)
+    assert 1.0 <= timeout.value < 1.2
+    timeout.backoff()
+    assert 2.0 <= timeout.value < 2.4
+    timeout.observe(0.01)
+    assert timeout.value < 2.0
+    for _ in range(50):
+        timeout.observe(0.01)
+    assert timeout.value == 0.5
+    for _ in range(10):
+        timeout.backoff()
+    assert timeout.value == 30
+
+
+@pytest.mark.unit
+def test_concurrent_classifications_are_batched(monkeypatch):
+    """测试同一时间窗口内的分类请求合并为批量调用，且同时进行的请求数不超过上限"""
+    server = _FakeLLM(delay=0.05)
+    service = _service(server, monkeypatch, max_concurrency=2)
+    texts = [f"明天{i}点开会" if i % 2 else f"第{i}条读书笔记" for i in range(10)]
+
+    async def classify_all():
+        return await asyncio.gather(*(service.classify_text_with_llm(text) for text in texts))
+
+    results = asyncio.run(classify_all())
+    assert [result["type"] for result in results] == ["memo", "schedule"] * 5
+    assert all(result["confidence"] == 0.9 for result in results)
+    assert results[1]["extracted_data"]["has_time_info"] is True
+    assert sorted(len(batch) for batch in server.batches) == [2, 4, 4]
+    assert server.max_active <= 2
+    stats = service.gateway.stats()
+    assert stats["requests"] == 3 and stats["items"] == 10 and stats["circuit"] == "closed"
+
+
+@pytest.mark.unit
+def test_unhealthy_llm_trips_circuit_and_falls_back(monkeypatch):
+    """测试LLM返回错误时使用规则方法，熔断后不再请求LLM"""
+    server = _FakeLLM(status_code=503)
+    service = _service(server, monkeypatch, window_ms=0,
+                       breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+    async def classify_many():
+        return [await service.classify_text_with_llm("明天下午2点开会") for _ in range(5)]
+
+    results = asyncio.run(classify_many())
+    assert all(result["type"] == "schedule" for result in results)
+    assert server.calls == 2 and service.gateway.stats()["failures"] == 2
+    assert service.gateway.stats()["rejected"] == 3
+    assert service.gateway.breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.unit
+def test_slow_llm_times_out(monkeypatch):
+    """测试LLM响应超过自适应超时时放弃并使用规则方法"""
+    server = _FakeLLM(delay=1.0)
+    service = _service(server, monkeypatch, window_ms=0, timeout=AdaptiveTimeout(0.1, 0.05, 0.2))
+    result = asyncio.run(service.classify_text_with_llm("记录一下今天的想法"))
+    assert result["type"] == "memo"
+    stats = service.gateway.stats()
+    assert stats["timeouts"] == 1 and stats["timeout"] == 0.2
+
+
+@pytest.mark.unit
+def test_streaming_classification_stops_after_type_and_confidence(monkeypatch):
+    """测试流式读取时得到类型和置信度后立即结束，不再读取分类理由；提示词默认不要求分类理由"""
+    requests = []
+    sent = []
+    chunks = ['{"type": "sch', 'edule", "confi', 'dence": 0.8', '5, "reasoning": "', '包含明确的时间', '和会议安排"}']
+
+    async def events():
+        for chunk in chunks:
+            sent.append(chunk)
+            data = {"choices": [{"delta": {"content": chunk}}]}
+            yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+
+    def server(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=events())
+
+    monkeypatch.setattr(settings, "LLM_STREAM", True)
+    monkeypatch.setattr(settings, "LLM_CLASSIFY_REASONING", False)
+    service = _service(server, monkeypatch, window_ms=0)
+    result = asyncio.run(service.classify_text_with_llm("明天下午2点开会"))
+    assert result["type"] == "schedule" and result["confidence"] == 0.85
+    assert len(sent) == 4
+    assert requests[0]["stream"] is True
+    assert "reasoning" not in requests[0]["messages"][-1]["content"]
+    assert service.gateway.stats()["early_exits"] == 1
+
+    # 模型把理由放在前面时读到置信度完整为止；置信度跨数据块时等到分隔符出现
+    chunks[:] = ['{"reasoning": "读书心得", ', '"type": "memo", "confidence": 0.', '7', '}', '\n']
+    sent.clear()
+    result = asyncio.run(service.classify_text_with_llm("今天读书的心得体会"))
+    assert result["type"] == "memo" and result["confidence"] == 0.7
+    assert len(sent) == 4 and service.gateway.stats()["early_exits"] == 2
@@ -0,0 +1,199 @@
+"""本地分类器单元测试"""
+import asyncio
+import json
+import os
+import random
+import threading
+from datetime import date
+import httpx
+import pytest
+from app.core.config import settings
+from app.models.memo import Memo
+from app.models.schedule import ScheduleItem
+from app.services import local_classifier as local_module
+from app.services.classification_cache import ClassificationCache, normalize_text
+from app.services.classification_service import ClassificationService
+from app.services.llm_gateway import LLMGateway
+from app.services.local_classifier import (
+    LocalClassifier,
+    LocalClassifierService,
+    collect_training_data,
+    hash_features
+)
+from app.utils.cache import TieredCache
+
+SCHEDULE_TEMPLATES = ["明天下午{}点开会", "周{}上午{}点面试", "下周三{}:30和客户吃饭", "{}月{}日交报告", "提醒我{}点去医院"]
+MEMO_TEMPLATES = ["今天读书的心得：第{}章", "记录一个想法{}", "总结：第{}条要点", "日记 第{}天", "注意事项{}"]
+
+
+def _examples(count=60, seed=0):
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for i in range(count):
+        label = "schedule" if i % 2 else "memo"
+        template = rng.choice(SCHEDULE_TEMPLATES if label == "schedule" else MEMO_TEMPLATES)
+        texts.append(template.format(*(rng.randint(1, 12) for _ in range(3))))
+        labels.append(label)
+    return texts, labels
+
+
+@pytest.mark.unit
+def test_local_classifier_trains_and_round_trips(tmp_path):
+    """测试训练后能区分日程和备忘录，保存后加载的预测结果相同"""
+    indices, values = hash_features("明天9:30开会", dim=1024)
+    assert set(indices) & set(hash_features("明天14:00开会", dim=1024)[0])
+    assert abs(float((values ** 2).sum()) - 1.0) < 1e-5
+    assert len(hash_features("  ", dim=1024)[0]) == 0
+
+    texts, labels = _examples()
+    model = LocalClassifier.train(texts, labels, dim=2 ** 16)
+    assert model.predict("后天下午3点开会")["type"] == "schedule"
+    assert model.predict("今天读书的心得体会")["type"] == "memo"
+    assert all(model.predict(text)["type"] == label for text, label in zip(texts, labels))
+
+    path = str(tmp_path / "model" / "local.npz")
+    model.save(path)
+    loaded = LocalClassifier.load(path)
+    assert loaded.dim == 2 ** 16 and loaded.examples == 60
+    assert loaded.predict_proba("后天下午3点开会") == pytest.approx(model.predict_proba("后天下午3点开会"))
+
+
+@pytest.mark.unit
+def test_concurrent_training_is_serialised(tmp_path, monkeypatch):
+    """测试同时训练时训练和保存串行执行，临时文件不会互相覆盖"""
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_MIN_EXAMPLES", 10)
+    local = LocalClassifierService(str(tmp_path / "local.npz"))
+    active, overlaps = [], []
+    train = LocalClassifier.train
+
+    def tracked_train(*args, **kwargs):
+        active.append(1)
+        overlaps.append(len(active))
+        try:
+            return train(*args, **kwargs)
+        finally:
+            active.pop()
+
+    monkeypatch.setattr(LocalClassifier, "train", staticmethod(tracked_train))
+    threads = [threading.Thread(target=local.train, args=_examples(seed=seed)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlaps == [1, 1, 1, 1]
+    assert LocalClassifier.load(local.path).examples == local.model.examples
+    assert os.listdir(tmp_path) == ["local.npz"]
+
+
+@pytest.mark.unit
+def test_training_evaluates_on_holdout_and_keeps_better_model(tmp_path, monkeypatch):
+    """测试在固定的验证集上评估，新模型不如当前模型时（例如标签被篡改）保留当前模型"""
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_MIN_EXAMPLES", 10)
+    local = LocalClassifierService(str(tmp_path / "local.npz"))
+    texts, labels = _examples(100)
+    holdout = [text for text in texts if local_module.is_holdout(text)]
+    assert 0 < len(holdout) < len(texts)
+    assert [local_module.is_holdout(text) for text in texts] == [local_module.is_holdout(text) for text in texts]
+
+    summary = local.train(texts, labels)
+    assert summary["trained"] is True and summary["holdout_examples"] == len(holdout)
+    assert summary["train_examples"] == local.model.examples == len(texts) - len(holdout)
+    assert summary["accuracy"] >= 0.9
+
+    # 训练集一侧的标签被篡改
+    poisoned = [
+        label if local_module.is_holdout(text) else ("memo" if label == "schedule" else "schedule")
+        for text, label in zip(texts, labels)
+    ]
+    mtime = os.path.getmtime(local.path)
+    rejected = local.train(texts, poisoned)
+    assert rejected["trained"] is False and rejected["accuracy"] < rejected["previous_accuracy"]
+    assert local.model.predict("明天下午3点开会")["type"] == "schedule"
+    assert os.path.getmtime(local.path) == mtime
+    assert local.stats()["last_training"] == rejected
+
+
+@pytest.mark.unit
+def test_uncertain_texts_escalate_to_llm(tmp_path, monkeypatch):
+    """测试本地分类器有把握时不请求LLM，没把握时升级到LLM，并统计升级比例和各层耗时"""
+    prompts = []
+
+    def server(request):
+        prompts.append(json.loads(request.content)["messages"][-1]["content"])
+        content = json.dumps({"type": "memo", "confidence": 0.8})
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    monkeypatch.setattr(settings, "LLM_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_BATCH_WINDOW_MS", 0)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_MIN_EXAMPLES", 10)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_THRESHOLD", 0.9)
+    local = LocalClassifierService(str(tmp_path / "local.npz"))
+    assert local.model is None
+    assert local.train(*_examples())["trained"] is True
+
+    service = ClassificationService(
+        gateway=LLMGateway("http://llm.test/v1/chat/completions", "test-model", transport=httpx.MockTransport(server)),
+        cache=ClassificationCache(TieredCache("classify-test", use_redis=False), "1", "test-model", enabled=False),
+        local=local
+    )
+    confident = asyncio.run(service.classify_text_with_llm("明天下午3点开会"))
+    assert confident["type"] == "schedule" and confident["confidence"] >= 0.9
+    assert confident["extracted_data"]["time"] == "15:00"
+    assert prompts == []
+
+    uncertain = asyncio.run(service.classify_text_with_llm("xyz"))
+    assert uncertain["type"] == "memo" and uncertain["confidence"] == 0.8
+    assert len(prompts) == 1
+
+    stats = service.tier_stats()
+    assert stats["local_answered"] == 1 and stats["escalated"] == 1 and stats["escalation_rate"] == 0.5
+    assert stats["tiers"]["local"]["count"] == 2 and stats["tiers"]["llm"]["count"] == 1
+
+
+@pytest.mark.unit
+def test_manual_choices_train_local_classifier(client, db_session, tmp_path, monkeypatch):
+    """测试手动选择的分类保存为训练样本，与已创建的日程、备忘录一起训练本地分类器"""
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_MIN_EXAMPLES", 10)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_RETRAIN_EVERY", 0)
+    monkeypatch.setattr(local_module, "_local_classifier_service", LocalClassifierService(str(tmp_path / "local.npz")))
+
+    response = client.post("/api/v1/auth/register", json={
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    })
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    user_id = client.get("/api/v1/auth/me", headers=headers).json()["id"]
+
+    texts, labels = _examples(20)
+    for text, label in zip(texts, labels):
+        response = client.post("/api/v1/classify/manual", json={"text": text, "type": label}, headers=headers)
+        assert response.status_code == 200
+    db_session.add(ScheduleItem(user_id=user_id, date=date.today(), description="开会",
+                                original_text="下周一上午9点开会"))
+    db_session.add(Memo(user_id=user_id, content="下周一上午9点开会", summary="开会"))
+    db_session.add(Memo(user_id=user_id, content="读书笔记：第三章", summary="读书笔记"))
+    db_session.commit()
+    # 规范化后相同的文本只保留一条，手动选择的分类优先
+    client.post("/api/v1/classify/manual", json={"text": "下周一上午９点开会", "type": "schedule"}, headers=headers)
+
+    collected = dict(zip(*collect_training_data(db_session)))
+    examples = len({normalize_text(text) for text in texts}) + 2
+    assert len(collected) == examples
+    assert collected["下周一上午９点开会"] == "schedule" and collected["读书笔记：第三章"] == "memo"
+
+    # 模型全局共享，默认不允许通过接口训练
+    assert client.post("/api/v1/classify/local/train", headers=headers).status_code == 403
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_HTTP_TRAIN", True)
+    response = client.post("/api/v1/classify/local/train", headers=headers)
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["trained"] is True and summary["examples"] == examples
+    assert summary["schedule"] == sum(1 for label in collected.values() if label == "schedule")
+    assert summary["train_examples"] + summary["holdout_examples"] == examples
+    assert summary["previous_accuracy"] is None
+
+    stats = client.get("/api/v1/classify/stats", headers=headers).json()
+    assert stats["local"]["trained"] is True and stats["local"]["examples"] == summary["train_examples"]
+    assert "escalation_rate" in stats["tiers"]
@@ -72,3 +72,45 @@ def test_memo_model_creation(db_session, sample_memo_data):
     assert memo.user_id == user.id
     assert memo.content == sample_memo_data["content"]
     assert memo.tags == sample_memo_data["tags"]
+
+
+@pytest.mark.unit
+def test_ocr_result_model_packs_boxes(db_session):
+    """测试OCR结果模型以紧凑格式保存文本框"""
+    from app.models.upload import UploadedFile
+    from app.models.ocr import OCRResult
+    from app.utils.box_codec import pack_boxes, unpack_boxes, pack_floats, unpack_floats
+    
+    user = User(username="testuser", email="test@example.com", password_hash="hash")
+    db_session.add(user)
+    db_session.commit()
+    
+    uploaded_file = UploadedFile(
+        user_id=user.id,
+        filename="a.jpg",
+        original_filename="a.jpg",
+        file_path="uploads/a.jpg",
+        file_size=1,
+        content_type="image/jpeg"
+    )
+    db_session.add(uploaded_file)
+    db_session.commit()
+    
+    boxes = [[[1.5, 2.0], [30.0, 2.0], [30.0, 12.25], [1.5, 12.25]]] * 3
+    ocr_result = OCRResult(
+        file_id=uploaded_file.id,
+        user_id=user.id,
+        text="a\nb\nc",
+        line_count=3,
+        line_boxes=pack_boxes(boxes),
+        line_confidences=pack_floats([0.5, 0.25, 1.0])
+    )
+    db_session.add(ocr_result)
+    db_session.commit()
+    db_session.refresh(ocr_result)
+    
+    # 每个文本框32字节，每个置信度4字节
+    assert len(ocr_result.line_boxes) == 3 * 32
+    assert unpack_boxes(ocr_result.line_boxes) == boxes
+    assert unpack_floats(ocr_result.line_confidences) == [0.5, 0.25, 1.0]
+    assert ocr_result.revision == 0
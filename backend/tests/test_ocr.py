@@ -130,3 +130,384 @@ def test_ocr_api_edit_result(client, db_session):
     )
     
     assert response.status_code == 404
+
+
+@pytest.mark.unit
+def test_ocr_api_recognize_batch_without_auth(client):
+    """测试未认证调用批量OCR API"""
+    response = client.post(
+        "/api/v1/ocr/recognize/batch",
+        json={"file_ids": ["test-file-id"]}
+    )
+    
+    assert response.status_code in [401, 403]
+
+
+@pytest.mark.unit
+def test_ocr_api_recognize_batch_files_not_found(client, db_session):
+    """测试批量识别不存在的文件，每个文件返回一行错误结果"""
+    register_data = {
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    }
+    register_response = client.post("/api/v1/auth/register", json=register_data)
+    token = register_response.json()["access_token"]
+    
+    response = client.post(
+        "/api/v1/ocr/recognize/batch",
+        json={"file_ids": ["missing-1", "missing-2", "missing-1"]},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    
+    import json
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [line["file_id"] for line in lines] == ["missing-1", "missing-2"]
+    assert all(not line["success"] for line in lines)
+    assert all("不存在" in line["error"] for line in lines)
+
+
+@pytest.mark.unit
+def test_ocr_api_recognize_batch_empty_list(client, db_session):
+    """测试批量识别空列表被拒绝"""
+    register_data = {
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    }
+    register_response = client.post("/api/v1/auth/register", json=register_data)
+    token = register_response.json()["access_token"]
+    
+    response = client.post(
+        "/api/v1/ocr/recognize/batch",
+        json={"file_ids": []},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    # 参数校验失败由全局异常处理器统一处理
+    assert response.json()["code"] == 400
+
+
+@pytest.mark.unit
+def test_ocr_api_recognize_uses_cache(client, db_session):
+    """测试命中缓存时直接返回缓存的识别结果"""
+    from app.models.upload import UploadedFile
+    from app.services.ocr_cache import get_ocr_cache
+    
+    register_data = {
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    }
+    register_response = client.post("/api/v1/auth/register", json=register_data)
+    token = register_response.json()["access_token"]
+    user_id = register_response.json()["user_id"]
+    
+    img = Image.new('RGB', (100, 100), color='white')
+    test_path = "test_cached.jpg"
+    img.save(test_path)
+    
+    file_hash = "cached-hash-for-test"
+    ocr_cache = get_ocr_cache()
+    cached_result = {
+        "success": True,
+        "text": "缓存的文本",
+        "details": [{"text": "缓存的文本", "confidence": 0.99, "box": [[0, 0], [10, 0], [10, 10], [0, 10]]}],
+        "error": None
+    }
+    ocr_cache.set(file_hash, cached_result)
+    
+    try:
+        uploaded_file = UploadedFile(
+            user_id=user_id,
+            filename="test_cached.jpg",
+            original_filename="test_cached.jpg",
+            file_path=test_path,
+            file_size=os.path.getsize(test_path),
+            content_type="image/jpeg",
+            file_hash=file_hash
+        )
+        db_session.add(uploaded_file)
+        db_session.commit()
+        
+        response = client.post(
+            "/api/v1/ocr/recognize",
+            json={"file_id": uploaded_file.id},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["text"] == "缓存的文本"
+        
+        db_session.refresh(uploaded_file)
+        assert uploaded_file.status == "processed"
+        
+        # 识别结果已保存，可直接读取
+        stored = client.get(
+            f"/api/v1/ocr/result/{uploaded_file.id}",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert stored.status_code == 200
+        assert stored.json()["text"] == "缓存的文本"
+        assert stored.json()["details"][0]["box"] == [[0, 0], [10, 0], [10, 10], [0, 10]]
+        assert stored.json()["details"][0]["confidence"] == pytest.approx(0.99)
+    finally:
+        ocr_cache.cache.delete(ocr_cache.make_key(file_hash))
+        if os.path.exists(test_path):
+            os.remove(test_path)
+
+
+@pytest.mark.unit
+def test_ocr_api_get_result_not_found(client, db_session):
+    """测试读取不存在的识别结果"""
+    register_data = {
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    }
+    register_response = client.post("/api/v1/auth/register", json=register_data)
+    token = register_response.json()["access_token"]
+    
+    response = client.get(
+        "/api/v1/ocr/result/nonexistent-file-id",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    assert response.status_code == 404
+
+
+@pytest.mark.unit
+def test_ocr_api_edit_saves_revisions(client, db_session):
+    """测试编辑OCR结果会保存为递增的版本"""
+    from app.models.upload import UploadedFile
+    
+    register_data = {
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    }
+    register_response = client.post("/api/v1/auth/register", json=register_data)
+    token = register_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    uploaded_file = UploadedFile(
+        user_id=register_response.json()["user_id"],
+        filename="edit.jpg",
+        original_filename="edit.jpg",
+        file_path="edit.jpg",
+        file_size=100,
+        content_type="image/jpeg"
+    )
+    db_session.add(uploaded_file)
+    db_session.commit()
+    
+    for i, text in enumerate(["第一版", "第二版"], start=1):
+        response = client.post(
+            "/api/v1/ocr/edit",
+            json={"file_id": uploaded_file.id, "edited_text": text},
+            headers=headers
+        )
+        assert response.status_code == 200
+        assert response.json()["revision"] == i
+    
+    stored = client.get(f"/api/v1/ocr/result/{uploaded_file.id}", headers=headers)
+    assert stored.status_code == 200
+    assert stored.json()["edited_text"] == "第二版"
+    assert stored.json()["revision"] == 2
+    
+    revisions = client.get(f"/api/v1/ocr/result/{uploaded_file.id}/revisions", headers=headers)
+    assert [r["text"] for r in revisions.json()] == ["第一版", "第二版"]
+
+
+@pytest.mark.unit
+def test_ocr_api_create_job_file_not_found(client, db_session):
+    """测试为不存在的文件提交异步任务"""
+    register_data = {
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    }
+    register_response = client.post("/api/v1/auth/register", json=register_data)
+    token = register_response.json()["access_token"]
+    
+    response = client.post(
+        "/api/v1/ocr/jobs",
+        json={"file_id": "nonexistent-file-id"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    assert response.status_code == 404
+
+
+@pytest.mark.unit
+def test_ocr_api_job_lifecycle(client, db_session, monkeypatch):
+    """测试异步任务从入队到完成，并可通过轮询和SSE获取结果"""
+    import time
+    from app.models.upload import UploadedFile
+    from app.services.ocr_cache import get_ocr_cache
+    from app.services.ocr_jobs import get_ocr_job_manager
+    from tests.conftest import TestingSessionLocal
+    
+    monkeypatch.setattr(get_ocr_job_manager(), "session_factory", TestingSessionLocal)
+    
+    register_data = {
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    }
+    register_response = client.post("/api/v1/auth/register", json=register_data)
+    token = register_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    img = Image.new('RGB', (100, 100), color='white')
+    test_path = "test_job.jpg"
+    img.save(test_path)
+    
+    file_hash = "job-hash-for-test"
+    ocr_cache = get_ocr_cache()
+    ocr_cache.set(file_hash, {"success": True, "text": "任务文本", "details": [], "error": None})
+    
+    try:
+        uploaded_file = UploadedFile(
+            user_id=register_response.json()["user_id"],
+            filename="test_job.jpg",
+            original_filename="test_job.jpg",
+            file_path=test_path,
+            file_size=os.path.getsize(test_path),
+            content_type="image/jpeg",
+            file_hash=file_hash
+        )
+        db_session.add(uploaded_file)
+        db_session.commit()
+        
+        response = client.post("/api/v1/ocr/jobs", json={"file_id": uploaded_file.id}, headers=headers)
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        assert response.json()["status"] == "queued"
+        
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            job = client.get(f"/api/v1/ocr/jobs/{job_id}", headers=headers).json()
+            if job["status"] in ("succeeded", "failed"):
+                break
+            time.sleep(0.1)
+        
+        assert job["status"] == "succeeded"
+        assert job["progress"] == 100
+        assert job["result"]["text"] == "任务文本"
+        
+        events = client.get(f"/api/v1/ocr/jobs/{job_id}/events", headers=headers)
+        assert events.headers["content-type"].startswith("text/event-stream")
+        assert "event: done" in events.text
+        
+        db_session.expire_all()
+        assert db_session.get(UploadedFile, uploaded_file.id).status == "processed"
+    finally:
+        ocr_cache.cache.delete(ocr_cache.make_key(file_hash))
+        if os.path.exists(test_path):
+            os.remove(test_path)
+
+
+@pytest.mark.unit
+def test_ocr_decode_image_bytes():
+    """测试图片字节流直接解码为数组"""
+    img = Image.new('RGB', (120, 80), color='red')
+    img_bytes = BytesIO()
+    img.save(img_bytes, format='PNG')
+    
+    image = OCRService.decode_image_bytes(img_bytes.getvalue())
+    
+    assert image.shape == (80, 120, 3)
+    # OpenCV解码为BGR顺序
+    assert tuple(image[0, 0]) == (0, 0, 255)
+
+
+@pytest.mark.unit
+def test_ocr_decode_invalid_bytes():
+    """测试无法解码的字节流"""
+    with pytest.raises(ValueError):
+        OCRService.decode_image_bytes(b"not an image")
+
+
+@pytest.mark.unit
+def test_ocr_recognize_invalid_bytes():
+    """测试识别无法解码的字节流返回失败结果"""
+    ocr_service = OCRService()
+    result = ocr_service.recognize_text_from_bytes(b"not an image")
+    
+    assert not result["success"]
+    assert result["text"] == ""
+
+
+@pytest.mark.unit
+def test_ocr_validate_image_bytes():
+    """测试验证内存中的图片"""
+    valid = BytesIO()
+    Image.new('RGB', (100, 100), color='white').save(valid, format='JPEG')
+    small = BytesIO()
+    Image.new('RGB', (5, 5), color='white').save(small, format='JPEG')
+    
+    assert OCRService.validate_image_bytes(valid.getvalue()) == (True, None)
+    is_valid, error = OCRService.validate_image_bytes(small.getvalue())
+    assert not is_valid
+    assert "过小" in error
+
+
+@pytest.mark.unit
+def test_ocr_api_upload_recognize(client, db_session):
+    """测试上传并识别，仅在归档时保存文件和识别结果"""
+    from app.services.ocr_cache import get_ocr_cache
+    from app.utils.file_handler import FileManager
+    
+    register_data = {
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    }
+    register_response = client.post("/api/v1/auth/register", json=register_data)
+    token = register_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    img_bytes = BytesIO()
+    Image.new('RGB', (100, 100), color='blue').save(img_bytes, format='JPEG')
+    content = img_bytes.getvalue()
+    
+    file_hash = FileManager.calculate_bytes_hash(content)
+    ocr_cache = get_ocr_cache()
+    ocr_cache.set(file_hash, {"success": True, "text": "内存识别", "details": [], "error": None})
+    
+    file_path = None
+    try:
+        response = client.post(
+            "/api/v1/ocr/upload-recognize",
+            files={"file": ("page.jpg", content, "image/jpeg")},
+            headers=headers
+        )
+        assert response.status_code == 200
+        assert response.json()["text"] == "内存识别"
+        assert response.json()["file_id"] is None
+        
+        response = client.post(
+            "/api/v1/ocr/upload-recognize",
+            files={"file": ("page.jpg", content, "image/jpeg")},
+            data={"archive": "true"},
+            headers=headers
+        )
+        assert response.status_code == 200
+        file_id = response.json()["file_id"]
+        assert file_id is not None
+        
+        stored = client.get(f"/api/v1/ocr/result/{file_id}", headers=headers)
+        assert stored.status_code == 200
+        assert stored.json()["text"] == "内存识别"
+        
+        from app.models.upload import UploadedFile
+        file_path = db_session.get(UploadedFile, file_id).file_path
+        assert os.path.exists(file_path)
+    finally:
+        ocr_cache.cache.delete(ocr_cache.make_key(file_hash))
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
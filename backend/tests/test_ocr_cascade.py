@@ -0,0 +1,112 @@
+"""级联识别单元测试"""
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.services.ocr_cascade import CascadeStats, TIER_FAST, TIER_ACCURATE, TIER_FULL
+
+
+class _ScriptedOCR:
+    """代替PaddleOCR：按是否使用方向分类器返回预设的识别结果，并记录调用"""
+    
+    def __init__(self, without_cls, with_cls):
+        self.results = {False: without_cls, True: with_cls}
+        self.calls = []
+    
+    def ocr(self, image, cls=True):
+        self.calls.append(cls)
+        lines = [[[[0, 0], [10, 0], [10, 10], [0, 10]], (text, conf)] for text, conf in self.results[cls]]
+        return [lines or None]
+
+
+def _service(engine, accurate=None):
+    from app.services.ocr_service import OCRService
+    service = OCRService.__new__(OCRService)
+    service.preprocessor = None
+    service.ocr = engine
+    service.accurate_ocr = accurate or engine
+    return service
+
+
+@pytest.fixture
+def cascade_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_CASCADE_ENABLED", True)
+    monkeypatch.setattr(settings, "OCR_CASCADE_THRESHOLD", 0.85)
+
+
+@pytest.mark.unit
+def test_cascade_confident_fast_tier_skips_classifier(cascade_enabled):
+    """测试快速档置信度足够时不使用方向分类器"""
+    engine = _ScriptedOCR([("快速", 0.95), ("识别", 0.9)], [("不应使用", 0.99)])
+    
+    result = _service(engine).recognize_image_array(np.zeros((10, 10, 3), dtype=np.uint8))
+    
+    assert result["tier"] == TIER_FAST
+    assert result["text"] == "快速\n识别"
+    assert engine.calls == [False]
+
+
+@pytest.mark.unit
+def test_cascade_escalates_on_low_confidence(cascade_enabled):
+    """测试平均置信度低于阈值时升级到精确档"""
+    fast = _ScriptedOCR([("模糊", 0.5)], [])
+    accurate = _ScriptedOCR([], [("清晰", 0.97)])
+    
+    result = _service(fast, accurate).recognize_image_array(np.zeros((10, 10, 3), dtype=np.uint8))
+    
+    assert result["tier"] == TIER_ACCURATE
+    assert result["text"] == "清晰"
+    assert fast.calls == [False]
+    assert accurate.calls == [True]
+
+
+@pytest.mark.unit
+def test_cascade_keeps_fast_result_when_escalation_is_worse(cascade_enabled):
+    """测试精确档结果更差时保留快速档结果"""
+    engine = _ScriptedOCR([("原文", 0.6)], [("更差", 0.3)])
+    
+    result = _service(engine).recognize_image_array(np.zeros((10, 10, 3), dtype=np.uint8))
+    
+    assert result["tier"] == TIER_ACCURATE
+    assert result["text"] == "原文"
+    assert engine.calls == [False, True]
+
+
+@pytest.mark.unit
+def test_cascade_does_not_escalate_empty_result(cascade_enabled):
+    """测试快速档没有检测到文本时不升级"""
+    engine = _ScriptedOCR([], [("不应使用", 0.99)])
+    
+    result = _service(engine).recognize_image_array(np.zeros((10, 10, 3), dtype=np.uint8))
+    
+    assert result["tier"] == TIER_FAST
+    assert result["text"] == ""
+    assert engine.calls == [False]
+
+
+@pytest.mark.unit
+def test_cascade_disabled_uses_full_pipeline(monkeypatch):
+    """测试关闭级联时始终使用方向分类器"""
+    monkeypatch.setattr(settings, "OCR_CASCADE_ENABLED", False)
+    engine = _ScriptedOCR([], [("完整", 0.9)])
+    
+    result = _service(engine).recognize_image_array(np.zeros((10, 10, 3), dtype=np.uint8))
+    
+    assert result["tier"] == TIER_FULL
+    assert engine.calls == [True]
+
+
+@pytest.mark.unit
+def test_cascade_stats_counts_tiers():
+    """测试分级统计和升级比例"""
+    stats = CascadeStats()
+    for tier in [TIER_FAST, TIER_FAST, TIER_FAST, TIER_ACCURATE]:
+        stats.record({"success": True, "tier": tier})
+    # 缓存结果没有分级，不计入
+    stats.record({"success": True})
+    
+    snapshot = stats.stats()
+    
+    assert snapshot["counts"][TIER_FAST] == 3
+    assert snapshot["counts"][TIER_ACCURATE] == 1
+    assert snapshot["total"] == 4
+    assert snapshot["escalation_rate"] == 0.25
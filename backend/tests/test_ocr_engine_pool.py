@@ -0,0 +1,132 @@
+"""OCR引擎池单元测试"""
+import threading
+import time
+import pytest
+from app.services.ocr_engine_pool import OCREnginePool, EngineUnavailableError
+
+
+class _FakeEngine:
+    """代替PaddleOCR引擎的轻量对象，只用于验证借出/归还逻辑"""
+
+
+@pytest.mark.unit
+def test_engine_pool_loads_configured_number_of_engines():
+    """测试引擎池按配置数量加载引擎，重复加载无副作用"""
+    created = []
+    pool = OCREnginePool(3, factory=lambda: created.append(_FakeEngine()) or created[-1])
+    
+    assert not pool.ready
+    assert pool.load()
+    assert pool.load()
+    
+    assert pool.ready
+    assert len(created) == 3
+    stats = pool.stats()
+    assert stats["loaded"] == 3
+    assert stats["available"] == 3
+    assert stats["load_seconds"] is not None
+
+
+@pytest.mark.unit
+def test_engine_pool_checkout_is_exclusive():
+    """测试同一引擎同一时刻只借给一个请求，并发请求排队等待"""
+    pool = OCREnginePool(2, factory=_FakeEngine)
+    pool.load()
+    
+    active = set()
+    overlaps = []
+    lock = threading.Lock()
+    
+    def use_engine():
+        with pool.checkout() as engine:
+            with lock:
+                if id(engine) in active:
+                    overlaps.append(engine)
+                active.add(id(engine))
+            time.sleep(0.02)
+            with lock:
+                active.discard(id(engine))
+    
+    threads = [threading.Thread(target=use_engine) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    stats = pool.stats()
+    assert overlaps == []
+    assert stats["checkouts"] == 6
+    assert stats["in_use"] == 0
+    assert stats["available"] == 2
+    # 6个请求竞争2个引擎，必然有请求等待
+    assert stats["wait_ms_max"] > 10
+
+
+@pytest.mark.unit
+def test_engine_pool_checkout_timeout():
+    """测试等待空闲引擎超时"""
+    pool = OCREnginePool(1, factory=_FakeEngine)
+    pool.load()
+    
+    with pool.checkout():
+        with pytest.raises(EngineUnavailableError):
+            with pool.checkout(timeout=0.05):
+                pass
+    
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["available"] == 1
+
+
+@pytest.mark.unit
+def test_engine_pool_load_failure_is_reported_and_retried():
+    """测试引擎加载失败时报告错误，之后借用时重试加载"""
+    attempts = []
+    
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("模型文件缺失")
+        return _FakeEngine()
+    
+    pool = OCREnginePool(1, factory=factory)
+    
+    assert not pool.load()
+    assert pool.stats()["load_error"] == "模型文件缺失"
+    
+    with pool.checkout() as engine:
+        assert isinstance(engine, _FakeEngine)
+    assert pool.ready
+    assert pool.stats()["load_error"] is None
+
+
+@pytest.mark.unit
+def test_engine_pool_background_loading():
+    """测试后台加载完成后引擎池就绪"""
+    pool = OCREnginePool(1, factory=_FakeEngine)
+    pool.start_loading()
+    
+    assert pool.wait_ready(timeout=5)
+
+
+@pytest.mark.unit
+def test_readiness_endpoint(client, monkeypatch):
+    """测试就绪检查在引擎加载前返回503，加载后返回200"""
+    import app.services.ocr_engine_pool as engine_pool_module
+    from app.core.config import settings
+    from app.services.ocr_pool import get_ocr_pool
+    
+    pool = OCREnginePool(1, factory=_FakeEngine)
+    monkeypatch.setattr(engine_pool_module, "_engine_pool", pool)
+    monkeypatch.setattr(settings, "OCR_PRELOAD_ENGINES", True)
+    monkeypatch.setattr(get_ocr_pool(), "max_workers", 0)
+    
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "loading"
+    
+    pool.load()
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["ocr_engines"]["ready"] is True
+    
+    assert client.get("/health/live").status_code == 200
@@ -0,0 +1,153 @@
+"""独立OCR推理进程任务分发的单元测试"""
+import fnmatch
+import threading
+import time
+import pytest
+from app.services.ocr_engine_pool import OCREnginePool, EngineUnavailableError
+from app.services.ocr_remote import RemoteOCRPool, InferenceWorker, TASK_QUEUE_KEY
+
+
+class _MemoryRedis:
+    """进程内的Redis替身，只实现推理任务分发用到的命令"""
+    
+    def __init__(self):
+        self._values = {}
+        self._lists = {}
+        self._cond = threading.Condition()
+    
+    def set(self, key, value, ex=None):
+        with self._cond:
+            self._values[key] = value if isinstance(value, bytes) else str(value).encode()
+    
+    def get(self, key):
+        with self._cond:
+            return self._values.get(key)
+    
+    def delete(self, *keys):
+        with self._cond:
+            for key in keys:
+                self._values.pop(key, None)
+                self._lists.pop(key, None)
+    
+    def expire(self, key, seconds):
+        return True
+    
+    def rpush(self, key, value):
+        with self._cond:
+            self._lists.setdefault(key, []).append(value.encode() if isinstance(value, str) else value)
+            self._cond.notify_all()
+    
+    def blpop(self, key, timeout=0):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._lists.get(key):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return key.encode(), self._lists[key].pop(0)
+    
+    def scan_iter(self, match, count=None):
+        with self._cond:
+            keys = [k for k in self._values if fnmatch.fnmatch(k, match)]
+        return iter(keys)
+
+
+class _FakeEngine:
+    """代替PaddleOCR引擎，按输入返回固定结构的结果"""
+    
+    def recognize_text(self, image_path, **options):
+        return {"success": True, "text": f"path:{image_path}", "details": [], "error": None}
+    
+    def recognize_text_from_bytes(self, content, **options):
+        return {"success": True, "text": f"bytes:{len(content)}", "details": [], "error": None}
+
+
+@pytest.fixture
+def remote_setup():
+    redis = _MemoryRedis()
+    engine_pool = OCREnginePool(2, factory=_FakeEngine)
+    engine_pool.load()
+    worker = InferenceWorker(redis, engine_pool)
+    pool = RemoteOCRPool(redis, timeout=5)
+    yield redis, worker, pool
+    worker.stop(timeout=5)
+    pool.shutdown()
+
+
+@pytest.mark.unit
+def test_remote_pool_routes_tasks_to_inference_worker(remote_setup):
+    """测试路径和字节流任务都由推理进程执行并返回结果"""
+    redis, worker, pool = remote_setup
+    
+    assert not pool.ready
+    worker.start()
+    time.sleep(0.05)
+    assert pool.ready
+    
+    assert pool.submit("a.jpg").result(timeout=5)["text"] == "path:a.jpg"
+    assert pool.submit_bytes(b"12345").result(timeout=5)["text"] == "bytes:5"
+    
+    results = dict(pool.recognize_many({"f1": "1.jpg", "f2": "2.jpg", "f3": "3.jpg"}))
+    assert {k: v["text"] for k, v in results.items()} == {
+        "f1": "path:1.jpg", "f2": "path:2.jpg", "f3": "path:3.jpg"
+    }
+    assert worker.stats()["processed"] == 5
+    # 字节流任务的图片数据用完即删除
+    assert not [k for k in redis._values if k.startswith("ocr:inference:data:")]
+
+
+@pytest.mark.unit
+def test_remote_pool_times_out_without_workers():
+    """测试没有推理进程时等待超时"""
+    pool = RemoteOCRPool(_MemoryRedis(), timeout=0.2)
+    try:
+        with pytest.raises(EngineUnavailableError):
+            pool.submit("a.jpg").result(timeout=5)
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.unit
+def test_inference_worker_skips_expired_tasks(remote_setup):
+    """测试等待方已放弃的过期任务不再执行"""
+    redis, worker, pool = remote_setup
+    
+    redis.rpush(TASK_QUEUE_KEY, '{"task_id": "old", "path": "a.jpg", "deadline": 1}')
+    worker.start()
+    time.sleep(0.1)
+    
+    assert redis.blpop("ocr:inference:result:old", timeout=0.1) is None
+
+
+@pytest.mark.unit
+def test_inference_worker_drains_in_flight_task_on_stop(remote_setup):
+    """测试停止时已领取的任务执行完成后才退出"""
+    redis, worker, pool = remote_setup
+    started = threading.Event()
+    
+    class _SlowEngine(_FakeEngine):
+        def recognize_text(self, image_path, **options):
+            started.set()
+            time.sleep(0.3)
+            return super().recognize_text(image_path, **options)
+    
+    worker.engine_pool = OCREnginePool(1, factory=_SlowEngine)
+    worker.start()
+    future = pool.submit("slow.jpg")
+    assert started.wait(timeout=5)
+    
+    worker.stop(timeout=5)
+    
+    assert future.result(timeout=5)["text"] == "path:slow.jpg"
+
+
+@pytest.mark.unit
+def test_serve_api_environment_routes_ocr_to_inference_processes():
+    """测试启动器为API进程配置远程推理"""
+    from serve import api_environment
+    
+    env = api_environment()
+    
+    assert env["OCR_INFERENCE_MODE"] == "remote"
+    assert env["OCR_POOL_WORKERS"] == "0"
@@ -0,0 +1,137 @@
+"""分块识别单元测试"""
+import numpy as np
+import pytest
+from app.services.ocr_tiling import _join_text, split_tiles, merge_tile_details, sort_reading_order
+
+
+def _detail(text, x0, y0, x1, y1, confidence=0.9):
+    return {"text": text, "confidence": confidence, "box": [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]}
+
+
+@pytest.mark.unit
+def test_split_tiles_covers_image_with_overlap():
+    """测试分块覆盖整张图片，相邻分块重叠，最后一块与边缘对齐"""
+    tiles = split_tiles(2000, 1000, 960, 96)
+    
+    xs = sorted({t[0] for t in tiles})
+    ys = sorted({t[1] for t in tiles})
+    assert xs == [0, 864, 1040]
+    assert ys == [0, 40]
+    assert all(x1 - x0 == 960 and y1 - y0 == 960 for x0, y0, x1, y1 in tiles)
+    assert max(t[2] for t in tiles) == 2000
+    assert max(t[3] for t in tiles) == 1000
+
+
+@pytest.mark.unit
+def test_split_tiles_small_image_single_tile():
+    """测试小于分块尺寸的图片只有一个分块"""
+    assert split_tiles(500, 300, 960, 96) == [(0, 0, 500, 300)]
+
+
+@pytest.mark.unit
+def test_merge_tile_details_removes_seam_duplicates():
+    """测试重叠区内被两个分块重复识别的文本只保留一次"""
+    tiles = [(0, 0, 960, 960), (864, 0, 1824, 960)]
+    left = [_detail("完整的一行", 870, 100, 950, 130)]
+    # 右侧分块中同一行（分块坐标），框略有偏差
+    right = [_detail("完整的一行", 7, 101, 85, 129, confidence=0.8)]
+    
+    details = merge_tile_details([(tiles[0], left), (tiles[1], right)])
+    
+    assert len(details) == 1
+    assert details[0]["text"] == "完整的一行"
+
+
+@pytest.mark.unit
+def test_merge_tile_details_joins_line_cut_by_seam():
+    """测试被接缝截断的同一行合并为一个框，重复识别的文字只保留一次"""
+    # 两个框横向相交160像素，约3个字符宽
+    tiles = [(0, 0, 960, 960), (800, 0, 1760, 960)]
+    left = [_detail("今天下午三点开", 600, 200, 960, 240)]
+    right = [_detail("三点开会讨论项目", 0, 202, 400, 238)]
+    
+    details = merge_tile_details([(tiles[0], left), (tiles[1], right)])
+    
+    assert len(details) == 1
+    assert details[0]["text"] == "今天下午三点开会讨论项目"
+    assert details[0]["box"][0] == [600.0, 200.0]
+    assert details[0]["box"][2] == [1200.0, 240.0]
+
+
+@pytest.mark.unit
+def test_merge_tile_details_keeps_repeated_digits_at_seam():
+    """测试接缝处的重复数字只去掉框相交部分内的字符，不会多删"""
+    # 原文"合计20000元"每个字符25像素宽，从x=800开始；两个框相交50像素（2个字符）
+    tiles = [(0, 0, 960, 960), (900, 0, 1860, 960)]
+    left = [_detail("合计2000", 800, 200, 950, 225)]
+    right = [_detail("000元", 0, 200, 100, 225)]
+
+    details = merge_tile_details([(tiles[0], left), (tiles[1], right)])
+
+    assert [d["text"] for d in details] == ["合计20000元"]
+    assert _join_text("20", "00", max_overlap=1) == "2000"
+    assert _join_text("好", "好的", max_overlap=5) == "好好的"
+
+
+@pytest.mark.unit
+def test_merge_tile_details_keeps_distinct_lines():
+    """测试同一分块内的相邻行和不同行都会保留，并按阅读顺序排列"""
+    tiles = [(0, 0, 960, 960), (0, 864, 960, 1824)]
+    top = [_detail("第二行", 100, 300, 400, 330), _detail("第一行", 100, 100, 400, 130)]
+    bottom = [_detail("第三行", 100, 100, 400, 130)]
+    
+    details = merge_tile_details([(tiles[0], top), (tiles[1], bottom)])
+    
+    assert [d["text"] for d in details] == ["第一行", "第二行", "第三行"]
+    assert details[2]["box"][0] == [100.0, 964.0]
+
+
+@pytest.mark.unit
+def test_sort_reading_order_same_line_left_to_right():
+    """测试同一行的文本按从左到右排列"""
+    details = [_detail("右", 500, 102, 600, 130), _detail("左", 100, 100, 200, 130)]
+    
+    assert [d["text"] for d in sort_reading_order(details)] == ["左", "右"]
+
+
+class _ComponentOCR:
+    """代替PaddleOCR：把图片中的每个黑色矩形识别为一行，文本为矩形在整图中的编号"""
+    
+    def __init__(self, image):
+        self.image = image
+        self.calls = 0
+    
+    def ocr(self, tile, cls=True):
+        import cv2
+        self.calls += 1
+        gray = tile if tile.ndim == 2 else cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)
+        count, _, stats, _ = cv2.connectedComponentsWithStats((gray < 128).astype(np.uint8))
+        lines = []
+        for x, y, w, h, _ in stats[1:count]:
+            box = [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+            lines.append([box, (f"{w}x{h}", 0.9)])
+        return [lines]
+
+
+@pytest.mark.unit
+def test_ocr_service_tiled_recognition_maps_boxes_to_page():
+    """测试分块识别的结果与整图坐标一致，跨接缝的行不重复"""
+    from app.services.ocr_service import OCRService
+    
+    page = np.full((1200, 2000, 3), 255, dtype=np.uint8)
+    page[100:130, 100:300] = 0      # 只在第一个分块中
+    page[500:530, 900:940] = 0      # 位于左右分块的重叠区
+    page[1100:1130, 1500:1700] = 0  # 只在右下分块中
+    
+    service = OCRService.__new__(OCRService)
+    service.preprocessor = None
+    service.ocr = _ComponentOCR(page)
+    
+    tiles = service._plan_tiles(page, tiled=True)
+    result = service._recognize_tiles(page, tiles, "<test>")
+    
+    assert len(tiles) > 1
+    assert service.ocr.calls == len(tiles)
+    assert result["success"]
+    boxes = [d["box"][0] for d in result["details"]]
+    assert boxes == [[100.0, 100.0], [900.0, 500.0], [1500.0, 1100.0]]
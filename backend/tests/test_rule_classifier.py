@@ -0,0 +1,47 @@
+"""规则分类器单元测试"""
+import pytest
+from app.services.classification_service import ClassificationService
+from app.services.rule_classifier import RuleClassifier, _prefilter, compile_rules
+
+
+@pytest.mark.unit
+def test_single_pass_analysis():
+    """测试一次扫描得出得分、时间日期片段和描述"""
+    service = ClassificationService()
+    analysis = service.rules.analyze("明天下午3点30分开会，记得带笔记")
+    assert analysis["time"] == "下午3点30分" and analysis["date"] == "明天"
+    assert [(kind, start, end) for kind, _, start, end in analysis["spans"]] == [("date", 0, 2), ("time", 2, 9)]
+    assert analysis["description"] == "开会，记得带笔记"
+    assert analysis["schedule_score"] == 1.0
+    assert analysis["memo_score"] == pytest.approx(0.55)
+
+    info = service.extract_schedule_info("2024年1月15日下午2点项目评审")
+    assert info["time"] == "14:00" and info["date"] == "2024-01-15"
+    assert info["description"] == "项目评审"
+
+    # 同类片段按模式优先级取，而不是按出现顺序
+    assert service.rules.analyze("下周开会，具体1月15日")["date"] == "1月15日"
+    assert compile_rules(
+        tuple(service.TIME_PATTERNS), tuple(service.DATE_PATTERNS),
+        tuple(service.SCHEDULE_KEYWORDS), tuple(service.MEMO_KEYWORDS)
+    ) is service.rules
+
+
+@pytest.mark.unit
+def test_keyword_scores_cap_and_match_substrings():
+    """测试关键词按小写子串匹配，得分封顶"""
+    rules = RuleClassifier([], [], ["Meeting", "会议", "plan", "todo"], ["Note", "想法"])
+    analysis = rules.analyze("MEETING会议 plan todo NOTEBOOK")
+    assert analysis["schedule_score"] == pytest.approx(0.3)
+    assert analysis["memo_score"] == pytest.approx(0.55)
+    assert analysis["time"] is None and analysis["description"] == "MEETING会议 plan todo NOTEBOOK"
+
+
+@pytest.mark.unit
+def test_prefilter_is_derived_from_patterns():
+    """测试由模式首字符推导预检字符集，可能匹配空串时不预检"""
+    assert _prefilter([r"\d{1,2}点", r"(上午|下午)\d点", r"[a-c]x"]) == r"(?=[\d上下a-c])"
+    assert _prefilter([r"\d+", r"x?y"]) == ""
+    rules = RuleClassifier([r"x?y"], [r"\d{4}"], [], [])
+    assert rules.analyze("ay 2024 xy")["description"] == "a"
+    assert [span[2:] for span in rules.scan("ay 2024 xy")] == [(1, 2), (3, 7), (8, 10)]
@@ -0,0 +1,121 @@
+"""OCR文本分段和批量分类单元测试"""
+import json
+import httpx
+import pytest
+from app.core.config import settings
+from app.services import classification_service as classification_module
+from app.services.classification_cache import ClassificationCache
+from app.services.classification_service import ClassificationService
+from app.services.llm_gateway import LLMGateway
+from app.services.local_classifier import LocalClassifierService
+from app.services.text_segmentation import is_bullet, segment_details, segment_text
+from app.utils.cache import TieredCache
+
+
+def _line(text, top, left=10, height=20, page=None):
+    box = [[left, top], [left + 200, top], [left + 200, top + height], [left, top + height]]
+    detail = {"text": text, "box": box, "confidence": 0.9}
+    if page is not None:
+        detail["page"] = page
+    return detail
+
+
+@pytest.mark.unit
+def test_segment_text_by_blank_lines_and_bullets():
+    """测试按空行和项目符号分段，续行接在当前条目后面"""
+    text = "明天下午2点开会\n带上季度报表\n\n- 买牛奶\n- 交水电费\n  记得要发票\n\n读书笔记：\n专注比时间更重要"
+    assert [s["text"] for s in segment_text(text)] == [
+        "明天下午2点开会\n带上季度报表",
+        "- 买牛奶",
+        "- 交水电费\n记得要发票",
+        "读书笔记：\n专注比时间更重要",
+    ]
+    assert segment_text("  \n") == []
+    assert all(is_bullet(line) for line in ["1. 交报告", "2、开会", "（3）复习", "① 买菜", "一、总结", "☐ 待办"])
+    assert not any(is_bullet(line) for line in ["3.5小时", "10:30开会", "2024-01-15 评审"])
+
+
+@pytest.mark.unit
+def test_segment_details_by_vertical_gaps():
+    """测试按文本框的垂直间距、项目符号和页码分段"""
+    details = [
+        _line("明天下午2点开会", 0),
+        _line("带上季度报表", 28),
+        _line("10:00", 80, left=10),
+        _line("面试", 82, left=300),
+        _line("感想：今天效率很高", 150),
+        _line("1. 复习第三章", 178),
+        _line("下一页的内容", 0, page=2),
+    ]
+    details[:2] = [dict(d, page=1) for d in details[:2]]
+    details[2:6] = [dict(d, page=1) for d in details[2:6]]
+    segments = segment_details(details)
+    assert [s["text"] for s in segments] == [
+        "明天下午2点开会\n带上季度报表",
+        "10:00\n面试",
+        "感想：今天效率很高",
+        "1. 复习第三章",
+        "下一页的内容",
+    ]
+    assert segments[0]["box"] == [10, 0, 210, 48] and segments[0]["page"] == 1
+    assert segments[1]["box"] == [10, 80, 500, 102]
+    assert segments[-1]["page"] == 2
+
+
+@pytest.mark.unit
+def test_batch_classify_api_uses_one_llm_call(client, db_session, monkeypatch):
+    """测试批量分类一次LLM调用分类全部条目，LLM遗漏的条目使用规则方法，再次分类命中缓存"""
+    requests = []
+
+    def handler(request):
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        if "文本列表（JSON数组）：" not in prompt:
+            # 单个条目使用单段文本的提示词
+            requests.append([prompt])
+            content = json.dumps({"type": "schedule", "confidence": 0.85})
+            return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+        entries = json.loads(prompt.split("文本列表（JSON数组）：\n")[1].split("\n\n请以JSON数组")[0])
+        requests.append(entries)
+        # 故意遗漏最后一个条目
+        content = json.dumps([
+            {"index": e["index"], "type": "schedule" if "开会" in e["text"] else "memo", "confidence": 0.9}
+            for e in entries[:-1]
+        ])
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    monkeypatch.setattr(settings, "LLM_ENABLED", True)
+    service = ClassificationService(
+        gateway=LLMGateway("http://llm.test/v1/chat/completions", "test-model", transport=httpx.MockTransport(handler)),
+        cache=ClassificationCache(TieredCache("classify-test", use_redis=False), "1", "test-model"),
+        local=LocalClassifierService("", enabled=False)
+    )
+    monkeypatch.setattr(classification_module, "_classification_service", service)
+
+    token = client.post("/api/v1/auth/register", json={
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    body = {"text": "明天下午2点开会\n\n今天读书的心得体会\n\n- 周五上午10点交报告"}
+
+    response = client.post("/api/v1/classify/batch", json=body, headers=headers)
+    assert response.status_code == 200
+    segments = response.json()["segments"]
+    assert len(requests) == 1 and len(requests[0]) == 3
+    assert [(s["type"], s["source"]) for s in segments] == [
+        ("schedule", "llm"), ("memo", "llm"), ("schedule", "rules")
+    ]
+    assert segments[0]["extracted_data"]["time"] == "14:00"
+    assert segments[2]["text"] == "- 周五上午10点交报告"
+
+    again = client.post("/api/v1/classify/batch", json=body, headers=headers).json()["segments"]
+    assert [s["source"] for s in again] == ["cache", "cache", "llm"]
+    assert len(requests) == 2 and len(requests[1]) == 1
+
+    details = [{"text": "明天下午2点开会", "box": [[0, 0], [100, 0], [100, 20], [0, 20]]}]
+    from_details = client.post("/api/v1/classify/batch", json={"text": "", "details": details}, headers=headers)
+    assert from_details.json()["segments"][0]["box"] == [0, 0, 100, 20]
+    assert from_details.json()["segments"][0]["source"] == "cache"
+
+    assert client.post("/api/v1/classify/batch", json={"text": " \n"}, headers=headers).status_code == 400
@@ -0,0 +1,104 @@
+"""请求分阶段计时和指标单元测试"""
+import asyncio
+from io import BytesIO
+import pytest
+from PIL import Image
+from app.core.config import settings
+from app.services.executors import MeteredExecutor
+from app.utils.metrics import Histogram
+from app.utils.timing import current_timings, record, server_timing_header, span, start_request, timed
+
+
+def _server_timing(response):
+    """解析 Server-Timing 响应头为 {阶段: 毫秒}"""
+    entries = {}
+    for entry in response.headers["server-timing"].split(","):
+        name, _, duration = entry.strip().partition(";dur=")
+        entries[name] = float(duration)
+    return entries
+
+
+@pytest.mark.unit
+def test_spans_are_collected_per_request_and_propagate_to_executor_threads():
+    """测试同名阶段累加、请求外调用不记录，上下文随专用线程池传入工作线程"""
+    with span("outside"):
+        record("outside", 1.0)
+    assert current_timings() is None
+
+    @timed("inference")
+    def work():
+        with span("db"):
+            pass
+        record("db", 2.0)
+        return "done"
+
+    async def handle_request():
+        timings = start_request()
+        executor = MeteredExecutor("test-timing", 1)
+        try:
+            assert await executor.run(work) == "done"
+        finally:
+            executor.shutdown()
+        return timings
+
+    totals = asyncio.run(handle_request()).totals()
+    assert list(totals) == ["db", "inference"]
+    assert totals["db"] >= 2.0
+    assert server_timing_header({"db": 2.25}, 10) == "db;dur=2.2, total;dur=10.0"
+
+
+@pytest.mark.unit
+def test_histogram_renders_prometheus_text():
+    """测试直方图按累计桶输出，标签值转义"""
+    metric = Histogram("demo_seconds", "示例", ("route",), buckets=(0.1, 1))
+    metric.observe(0.05, route='/a"b')
+    metric.observe(0.5, route='/a"b')
+    metric.observe(5, route='/a"b')
+    lines = metric.render()
+    assert lines[:2] == ["# HELP demo_seconds 示例", "# TYPE demo_seconds histogram"]
+    assert 'demo_seconds_bucket{route="/a\\"b",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/a\\"b",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a\\"b",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{route="/a\\"b"} 3' in lines
+
+
+@pytest.mark.unit
+def test_server_timing_header_and_metrics_endpoint(client, db_session, tmp_path, monkeypatch):
+    """测试响应带 Server-Timing，各阶段按路由模板计入 /metrics"""
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    token = client.post("/api/v1/auth/register", json={
+        "username": "testuser",
+        "email": "test@example.com",
+        "password": "Test123!"
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    buffer = BytesIO()
+    Image.new("RGB", (64, 64), color="red").save(buffer, format="PNG")
+    response = client.post(
+        "/api/v1/upload/file",
+        files={"file": ("red.png", BytesIO(buffer.getvalue()), "image/png")},
+        headers=headers
+    )
+    assert response.status_code == 201
+    assert response.headers["x-process-time"].endswith("s")
+    stages = _server_timing(response)
+    # 认证、临时文件写入（专用线程池）、存储、数据库和提交都有记录
+    assert {"auth", "write", "storage", "db", "commit", "total"} <= set(stages)
+    assert stages["total"] >= stages["write"]
+
+    client.get(f"/api/v1/upload/file/{response.json()['file_id']}/content", headers=headers)
+    client.get("/no/such/path")
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = metrics.text
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/v1/upload/file",status="201"}' in body
+    assert 'route="/api/v1/upload/file/{file_id}/content",status="200"' in body
+    assert 'route="<unmatched>",status="404"' in body
+    assert 'http_request_stage_duration_seconds_count{method="POST",route="/api/v1/upload/file",stage="auth"}' in body
+
+    monkeypatch.setattr(settings, "SERVER_TIMING_ENABLED", False)
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    assert "server-timing" not in client.get("/").headers
+    assert client.get("/metrics").status_code == 404
@@ -117,7 +117,7 @@ def test_file_manager_save_and_delete():
     
     # 计算文件哈希
     file_hash = file_manager.calculate_file_hash(file_path)
-    assert len(file_hash) == 32  # MD5哈希长度
+    assert len(file_hash) == 32  # 128位哈希的十六进制长度
     
     # 删除文件
     assert file_manager.delete_file(file_path)
@@ -475,7 +475,7 @@ def test_file_hash_calculation():
         
         # 相同内容应该有相同的哈希
         assert hash1 == hash2
-        assert len(hash1) == 32  # MD5哈希长度
+        assert len(hash1) == 32  # 128位哈希的十六进制长度
         
     finally:
         # 清理临时文件
@@ -654,3 +654,88 @@ def test_file_storage_persistence(client, db_session):
     
     # 验证文件大小
     assert os.path.getsize(file_path) == file_data["file_size"]
+
+
+@pytest.mark.unit
+def test_file_manager_save_stream_hashes_in_one_pass(tmp_path, monkeypatch):
+    """测试流式保存在同一遍读取中得到文件大小和哈希"""
+    import hashlib
+    from app.core.config import settings
+    
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    file_manager = FileManager()
+    content = os.urandom(FileManager.CHUNK_SIZE * 2 + 123)
+    mock_file = type('MockFile', (), {'file': BytesIO(content), 'filename': 'big.jpg'})()
+    
+    file_path, file_size, file_hash = file_manager.save_stream(mock_file, "big.jpg", max_size=len(content))
+    
+    assert file_size == len(content)
+    assert file_hash == hashlib.blake2b(content, digest_size=16).hexdigest()
+    assert file_hash == file_manager.calculate_file_hash(file_path)
+    assert not os.path.exists(file_path + ".part")
+
+
+@pytest.mark.unit
+def test_file_manager_save_stream_aborts_when_too_large(tmp_path, monkeypatch):
+    """测试超过大小限制时立即停止读取，且不留下不完整的文件"""
+    from app.core.config import settings
+    from app.utils.file_handler import FileTooLargeError
+    
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    file_manager = FileManager()
+    stream = BytesIO(b"x" * (FileManager.CHUNK_SIZE * 10))
+    mock_file = type('MockFile', (), {'file': stream, 'filename': 'huge.jpg'})()
+    
+    with pytest.raises(FileTooLargeError):
+        file_manager.save_stream(mock_file, "huge.jpg", max_size=FileManager.CHUNK_SIZE + 1)
+    
+    # 只读取了刚超过限制的两块
+    assert stream.tell() == FileManager.CHUNK_SIZE * 2
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.unit
+def test_upload_body_over_limit_rejected(client, monkeypatch):
+    """测试声明的请求体超过上传限制时直接返回413"""
+    from app.core.config import settings
+    
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1024)
+    monkeypatch.setattr(settings, "MAX_DOCUMENT_SIZE", 1024)
+    
+    files = {"file": ("big.jpg", BytesIO(b"x" * (256 * 1024)), "image/jpeg")}
+    response = client.post("/api/v1/upload/file", files=files)
+    
+    assert response.status_code == 413
+    assert "大小" in response.json()["detail"]
+
+
+@pytest.mark.unit
+def test_upload_limit_middleware_stops_reading_chunked_body():
+    """测试未声明长度的请求体在超过限制时停止接收并返回413"""
+    import asyncio
+    from app.core.upload_limit import UploadSizeLimitMiddleware
+    
+    chunks = [{"type": "http.request", "body": b"x" * 100, "more_body": True} for _ in range(10)]
+    pulled = []
+    sent = []
+    
+    async def receive():
+        pulled.append(1)
+        return chunks[len(pulled) - 1]
+    
+    async def send(message):
+        sent.append(message)
+    
+    async def app(scope, receive, send):
+        # 模拟表单解析：读到断开为止，然后返回解析失败
+        while (await receive())["type"] == "http.request":
+            pass
+        await send({"type": "http.response.start", "status": 400, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    
+    scope = {"type": "http", "headers": [(b"content-type", b"multipart/form-data; boundary=x")]}
+    middleware = UploadSizeLimitMiddleware(app, max_body_size=lambda: 250)
+    asyncio.run(middleware(scope, receive, send))
+    
+    assert len(pulled) == 3
+    assert sent[0]["status"] == 413
@@ -0,0 +1,252 @@
+"""上传目录迁移和清理单元测试"""
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+import pytest
+from app.core.config import settings
+from app.models.upload import UploadedFile, FileBlob
+from app.models.user import User
+from app.services.blob_store import BlobStore
+from sqlalchemy import create_engine, inspect, text
+from app.db.base import Base
+from app.services.upload_maintenance import UploadMaintenance, start_legacy_migration, upgrade_schema
+from app.utils.file_handler import FileManager
+from tests.conftest import TestingSessionLocal, engine as test_engine
+
+
+def _user(db):
+    user = User(username="alice", email="alice@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _legacy_file(db, user, upload_dir, name, content):
+    """按旧的平铺方式保存文件（MD5哈希）"""
+    path = upload_dir / name
+    path.write_bytes(content)
+    record = UploadedFile(
+        user_id=user.id,
+        filename=name,
+        original_filename=name,
+        file_path=str(path),
+        file_size=len(content),
+        content_type="image/png",
+        file_hash=hashlib.md5(content).hexdigest()
+    )
+    db.add(record)
+    db.commit()
+    return record
+
+
+def _age(path, seconds=7200):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def _maintenance(**kwargs):
+    return UploadMaintenance(session_factory=TestingSessionLocal, batch_size=2, max_files_per_second=0, **kwargs)
+
+
+@pytest.mark.unit
+def test_migrate_legacy_files_into_sharded_store(db_session, upload_dir):
+    """测试旧文件迁移到按哈希分级的目录，相同内容合并为一份"""
+    user = _user(db_session)
+    records = [
+        _legacy_file(db_session, user, upload_dir, "a.png", b"same"),
+        _legacy_file(db_session, user, upload_dir, "b.png", b"same"),
+        _legacy_file(db_session, user, upload_dir, "c.png", b"other")
+    ]
+    missing = _legacy_file(db_session, user, upload_dir, "gone.png", b"gone")
+    os.remove(missing.file_path)
+
+    report = _maintenance().migrate_legacy(dry_run=True)
+    assert report["migrated"] == 3 and report["missing"] == 1
+    assert (upload_dir / "a.png").exists()
+    assert db_session.query(FileBlob).count() == 0
+
+    report = _maintenance().migrate_legacy()
+    assert report["migrated"] == 3 and report["missing"] == 1
+    assert not any((upload_dir / name).exists() for name in ("a.png", "b.png", "c.png"))
+
+    db_session.expire_all()
+    same_hash = FileManager.calculate_bytes_hash(b"same")
+    blob = db_session.query(FileBlob).filter(FileBlob.file_hash == same_hash).one()
+    assert blob.ref_count == 2
+    assert blob.file_path.endswith(os.path.join(same_hash[:2], same_hash[2:4], f"{same_hash}.png"))
+    assert {r.file_path for r in records[:2]} == {blob.file_path}
+    assert records[0].file_hash == same_hash
+    assert open(records[2].file_path, "rb").read() == b"other"
+    assert not os.listdir(upload_dir / "tmp")
+
+    # 再次执行时没有需要迁移的文件
+    assert _maintenance().migrate_legacy().get("migrated", 0) == 0
+
+
+@pytest.mark.unit
+def test_sweep_removes_orphans_and_fixes_refcounts(db_session, upload_dir):
+    """测试清理孤立文件、修正引用计数，较新的文件和dry run时不删除"""
+    user = _user(db_session)
+    kept = _legacy_file(db_session, user, upload_dir, "kept.png", b"kept")
+    _age(kept.file_path)
+
+    orphan_legacy = upload_dir / "orphan.png"
+    orphan_legacy.write_bytes(b"orphan")
+    _age(orphan_legacy)
+    fresh_legacy = upload_dir / "fresh.png"
+    fresh_legacy.write_bytes(b"fresh")
+    (upload_dir / ".gitkeep").write_bytes(b"")
+    _age(upload_dir / ".gitkeep")
+
+    (upload_dir / "tmp").mkdir()
+    stale_temp = upload_dir / "tmp" / "abc.part"
+    stale_temp.write_bytes(b"partial")
+    _age(stale_temp)
+
+    blob_dir = upload_dir / "blobs" / "ab" / "cd"
+    blob_dir.mkdir(parents=True)
+    orphan_blob = blob_dir / "abcd.png"
+    orphan_blob.write_bytes(b"no row")
+    _age(orphan_blob)
+
+    # 引用计数偏大的存储文件，以及没有任何记录引用的存储文件
+    shared = blob_dir / "abce.png"
+    shared.write_bytes(b"shared")
+    unused = blob_dir / "abcf.png"
+    unused.write_bytes(b"unused")
+    long_ago = datetime.utcnow() - timedelta(hours=2)
+    db_session.add_all([
+        FileBlob(file_hash="abce", file_path=str(shared), file_size=6, ref_count=3,
+                 created_at=long_ago, updated_at=long_ago),
+        FileBlob(file_hash="abcf", file_path=str(unused), file_size=6, ref_count=1,
+                 created_at=long_ago, updated_at=long_ago)
+    ])
+    db_session.add(UploadedFile(
+        user_id=user.id, filename="s.png", original_filename="s.png", file_path=str(shared),
+        file_size=6, content_type="image/png", file_hash="abce"
+    ))
+    db_session.commit()
+
+    # 没有上传记录对应的派生图
+    derivative_dir = upload_dir / "derivatives" / "thumbnail" / "ff" / "ff"
+    derivative_dir.mkdir(parents=True)
+    orphan_derivative = derivative_dir / f"{'f' * 32}_{settings.UPLOAD_THUMBNAIL_SIZE}.webp"
+    orphan_derivative.write_bytes(b"webp")
+    _age(orphan_derivative)
+
+    report = _maintenance().sweep(dry_run=True)
+    assert report["orphan_derivatives"] == 1
+    assert report["orphan_temp"] == 1
+    assert report["orphan_blobs"] == 1
+    assert report["orphan_legacy"] == 1
+    assert report["unreferenced_blobs"] == 1
+    assert report["refcounts_fixed"] == 1
+    assert all(p.exists() for p in (orphan_legacy, stale_temp, orphan_blob, unused, orphan_derivative))
+
+    report = _maintenance(delete_legacy=True).sweep()
+    assert report["samples"]["orphan_legacy"] == [str(orphan_legacy)]
+    assert not any(p.exists() for p in (orphan_legacy, stale_temp, orphan_blob, unused, orphan_derivative))
+    assert all(p.exists() for p in (fresh_legacy, upload_dir / ".gitkeep", shared, upload_dir / "kept.png"))
+
+    db_session.expire_all()
+    assert db_session.query(FileBlob).filter(FileBlob.file_hash == "abce").one().ref_count == 1
+    assert db_session.query(FileBlob).filter(FileBlob.file_hash == "abcf").first() is None
+
+    # 已清理干净
+    report = _maintenance().sweep()
+    assert not any(key in report for key in ("orphan_temp", "orphan_blobs", "orphan_legacy", "refcounts_fixed"))
+
+
+@pytest.mark.unit
+def test_upgrade_schema_adds_missing_index(tmp_path):
+    """测试为已有数据库补建 create_all 不会添加的索引"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_uploaded_files_file_hash"))
+
+    assert upgrade_schema(engine) == ["ix_uploaded_files_file_hash"]
+    assert "ix_uploaded_files_file_hash" in {i["name"] for i in inspect(engine).get_indexes("uploaded_files")}
+    assert upgrade_schema(engine) == []
+
+
+@pytest.mark.unit
+def test_upgrade_schema_tolerates_index_created_concurrently(tmp_path, monkeypatch):
+    """测试检查之后其他进程抢先创建了索引时，补建索引不会失败"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    stale = inspect(engine)
+    monkeypatch.setattr(stale, "get_indexes", lambda table_name: [])
+    monkeypatch.setattr("app.services.upload_maintenance.inspect", lambda bind: stale)
+
+    upgrade_schema(engine)
+    assert "ix_uploaded_files_file_hash" in {i["name"] for i in inspect(engine).get_indexes("uploaded_files")}
+
+
+@pytest.mark.unit
+def test_migration_skips_files_migrated_by_another_process(db_session, upload_dir):
+    """测试另一个进程已迁移同一文件时跳过，不重复增加引用计数，也不记为失败"""
+    user = _user(db_session)
+    record = _legacy_file(db_session, user, upload_dir, "raced.png", b"raced")
+    legacy_path = record.file_path
+    maintenance = _maintenance()
+    assert maintenance.migrate_legacy()["migrated"] == 1
+
+    # 迁移前读到的旧路径：源文件已被删除，或仍在（例如删除前）
+    db = TestingSessionLocal()
+    try:
+        report = {"samples": {}}
+        maintenance._migrate_file(db, BlobStore(), legacy_path, report, dry_run=False)
+        (upload_dir / "raced.png").write_bytes(b"raced")
+        maintenance._migrate_file(db, BlobStore(), legacy_path, report, dry_run=False)
+    finally:
+        db.close()
+    assert report["skipped"] == 2 and "failed" not in report and "missing" not in report
+
+    db_session.expire_all()
+    assert db_session.query(FileBlob).one().ref_count == 1
+
+
+@pytest.mark.unit
+def test_legacy_migration_runs_at_startup(db_session, upload_dir):
+    """测试启动时的后台迁移把旧文件的MD5哈希改为BLAKE2b"""
+    user = _user(db_session)
+    record = _legacy_file(db_session, user, upload_dir, "old.png", b"legacy")
+
+    start_legacy_migration(test_engine, session_factory=TestingSessionLocal).join(timeout=30)
+
+    db_session.expire_all()
+    assert db_session.get(UploadedFile, record.id).file_hash == FileManager.calculate_bytes_hash(b"legacy")
+
+
+@pytest.mark.unit
+def test_sweep_compares_legacy_paths_after_resolving(db_session, tmp_path, monkeypatch):
+    """测试旧记录的路径与 UPLOAD_DIR 写法不同时不会被当作孤立文件，且默认只报告不删除"""
+    real_dir = tmp_path / "real"
+    real_dir.mkdir()
+    link_dir = tmp_path / "link"
+    link_dir.symlink_to(real_dir)
+    user = _user(db_session)
+
+    # 记录按相对路径保存，UPLOAD_DIR 配置为指向同一目录的符号链接
+    relative = _legacy_file(db_session, user, real_dir, "relative.png", b"relative")
+    relative.file_path = os.path.relpath(relative.file_path)
+    spelled = _legacy_file(db_session, user, real_dir, "spelled.png", b"spelled")
+    spelled.file_path = str(real_dir / "." / "spelled.png")
+    db_session.commit()
+    orphan = real_dir / "orphan.png"
+    orphan.write_bytes(b"orphan")
+    for path in real_dir.iterdir():
+        _age(path)
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(link_dir))
+
+    report = _maintenance().sweep()
+    assert report["delete_legacy"] is False
+    assert report["orphan_legacy"] == 1
+    assert report["samples"]["orphan_legacy"] == [str(link_dir / "orphan.png")]
+    assert orphan.exists()
+
+    _maintenance(delete_legacy=True).sweep()
+    assert not orphan.exists()
+    assert (real_dir / "relative.png").exists() and (real_dir / "spelled.png").exists()
@@ -7,6 +7,7 @@ export interface OCRTextDetail {
   text: string
   confidence: number
   box: number[][]
+  page?: number | null
 }
 
 export interface OCRRecognizeResponse {
@@ -14,9 +15,22 @@ export interface OCRRecognizeResponse {
   text: string
   details: OCRTextDetail[]
   error?: string
+  page_count?: number | null
 }
 
-export interface OCRRecognizeRequest {
+export interface OCRRegion {
+  x: number
+  y: number
+  width: number
+  height: number
+}
+
+export interface OCRRecognizeOptions {
+  region?: OCRRegion
+  tiled?: boolean
+}
+
+export interface OCRRecognizeRequest extends OCRRecognizeOptions {
   file_id: string
 }
 
@@ -26,11 +40,12 @@ export interface OCREditRequest {
 }
 
 /**
- * 识别图片中的文字
+ * 识别图片中的文字，指定region时只识别该区域（结果不保存）
  */
-export async function recognizeImage(fileId: string): Promise<OCRRecognizeResponse> {
+export async function recognizeImage(fileId: string, options: OCRRecognizeOptions = {}): Promise<OCRRecognizeResponse> {
   const response = await apiClient.post<OCRRecognizeResponse>('/ocr/recognize', {
-    file_id: fileId
+    file_id: fileId,
+    ...options
   })
   return response.data
 }
@@ -45,3 +60,98 @@ export async function editOCRResult(fileId: string, editedText: string): Promise
   })
   return response.data
 }
+
+export interface OCRStoredResult {
+  file_id: string
+  text: string
+  details: OCRTextDetail[]
+  edited_text?: string | null
+  revision: number
+  model_version?: string | null
+  created_at?: string
+  updated_at?: string
+}
+
+/**
+ * 获取已保存的识别结果（不会重新识别）
+ */
+export async function getOCRResult(fileId: string): Promise<OCRStoredResult> {
+  const response = await apiClient.get<OCRStoredResult>(`/ocr/result/${fileId}`)
+  return response.data
+}
+
+export interface OCRPageResult {
+  page: number
+  success: boolean
+  text: string
+  details: OCRTextDetail[]
+  error?: string | null
+}
+
+/**
+ * 获取多页文档（PDF、TIFF）的逐页识别结果
+ */
+export async function getOCRPageResults(fileId: string): Promise<OCRPageResult[]> {
+  const response = await apiClient.get<OCRPageResult[]>(`/ocr/result/${fileId}/pages`)
+  return response.data
+}
+
+export interface OCRJob {
+  job_id: string
+  file_id: string
+  status: 'queued' | 'processing' | 'succeeded' | 'failed'
+  progress: number
+  stage: string
+  result?: OCRRecognizeResponse | null
+  error?: string | null
+  created_at: string
+  updated_at: string
+}
+
+/**
+ * 提交OCR异步任务
+ */
+export async function createOCRJob(fileId: string): Promise<OCRJob> {
+  const response = await apiClient.post<OCRJob>('/ocr/jobs', {
+    file_id: fileId
+  })
+  return response.data
+}
+
+/**
+ * 查询OCR异步任务状态
+ */
+export async function getOCRJob(jobId: string): Promise<OCRJob> {
+  const response = await apiClient.get<OCRJob>(`/ocr/jobs/${jobId}`)
+  return response.data
+}
+
+export interface OCRUploadRecognizeResponse extends OCRRecognizeResponse {
+  file_id?: string | null
+}
+
+/**
+ * 上传并直接识别图片，archive为true时同时保存图片和识别结果
+ */
+export async function uploadAndRecognize(
+  file: File,
+  archive: boolean = false,
+  options: OCRRecognizeOptions = {}
+): Promise<OCRUploadRecognizeResponse> {
+  const formData = new FormData()
+  formData.append('file', file)
+  formData.append('archive', String(archive))
+  if (options.region) {
+    formData.append('region', JSON.stringify(options.region))
+  }
+  if (options.tiled !== undefined) {
+    formData.append('tiled', String(options.tiled))
+  }
+
+  const response = await apiClient.post<OCRUploadRecognizeResponse>('/ocr/upload-recognize', formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data'
+    }
+  })
+  return response.data
+}
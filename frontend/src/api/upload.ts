@@ -10,6 +10,8 @@ export interface FileUploadResponse {
   file_size: number
   content_type: string
   uploaded_at: string
+  thumbnail_url?: string
+  preview_url?: string
 }
 
 export interface TextInputRequest {
@@ -60,6 +62,19 @@ export async function getUploadedFiles(skip: number = 0, limit: number = 20): Pr
   return response.data
 }
 
+/**
+ * 获取缩略图或预览图（WebP），返回可用于 <img> 的对象URL，用完后需 URL.revokeObjectURL
+ */
+export async function getFileDerivative(
+  fileId: string,
+  kind: 'thumbnail' | 'preview' = 'thumbnail'
+): Promise<string> {
+  const response = await apiClient.get<Blob>(`/upload/file/${fileId}/${kind}`, {
+    responseType: 'blob'
+  })
+  return URL.createObjectURL(response.data)
+}
+
 /**
  * 删除上传文件
  */